@@ -2,8 +2,8 @@
 
 a = Analysis(
     ['src/app.py'],
-    pathex=[],
-    binaries=[('ffmpeg.exe', '.')],  # FFmpeg включается в сборку
+    pathex=['.'],  # корень проекта, чтобы находился пакет src
+    binaries=[('ffmpeg.exe', '.'), ('ffprobe.exe', '.')],  # FFmpeg и ffprobe (версии, библиотека) включаются в сборку
     datas=[
         ('resources/icon.ico', 'resources')
     ],
@@ -0,0 +1,245 @@
+"""
+Контроль свободного места на диске перед началом загрузки.
+
+Размер каждого элемента оценивается по метаданным (filesize,
+filesize_approx, иначе битрейт × длительность) и резервируется на время
+загрузки. Элемент допускается, только если свободного места за вычетом
+резервов остальных загрузок и запаса хватает; иначе он ждёт освобождения
+места или отклоняется — вместо того чтобы заполнить диск посреди пачки
+и оставить битые .part файлы.
+
+При загрузке через staging на другом диске место проверяется и в
+итоговой папке: там резерв держится целиком, пока файлы не перенесены.
+"""  # noqa: RUF002
+
+__all__ = ["AdmissionController", "InsufficientDiskSpaceError", "estimate_download_size"]
+
+import errno
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import time
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Запас свободного места, который никогда не занимается загрузками
+DEFAULT_MARGIN = 512 * 1024 * 1024
+
+# Склейка FFmpeg временно требует места и под потоки, и под итоговый файл
+MERGE_SPACE_FACTOR = 2
+
+# Период перепроверки места для ожидающих элементов, с
+HOLD_POLL_INTERVAL = 5.0
+
+
+class InsufficientDiskSpaceError(OSError):
+    """Элемент не помещается на диск"""
+
+    def __init__(self, directory, needed, available):
+        super().__init__(
+            errno.ENOSPC,
+            f"Недостаточно места: нужно {needed} байт, доступно {available} байт",
+            str(directory),
+        )
+        self.needed = needed
+        self.available = available
+
+
+def _format_size(info) -> int | None:
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size:
+        return int(size)
+    # Оценка по среднему битрейту (кбит/с) и длительности
+    tbr = info.get("tbr")
+    duration = info.get("duration")
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+
+def estimate_download_size(info) -> int | None:
+    """
+    Оценивает объём загрузки по информации yt-dlp.
+
+    Учитывает плейлисты (сумма элементов) и раздельные потоки
+    (requested_formats). Длительность берётся у видео, если её нет у формата.
+
+    Returns:
+        Оценка в байтах или None, если оценить нельзя
+    """
+    if info.get("entries") is not None:
+        sizes = [estimate_download_size(entry) for entry in info["entries"] if entry]
+        known = [size for size in sizes if size]
+        return sum(known) if known else None
+
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for fmt in formats:
+        size = _format_size({"duration": info.get("duration"), **fmt})
+        if size is None:
+            return None
+        total += size
+    return total or None
+
+
+class _Reservation:
+    def __init__(self, directory, device, size, final_device=None):
+        self.directory = directory
+        self.device = device
+        self.final_device = final_device  # ФС итоговой папки, если она другая
+        self.size = size
+        self.written = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.size - self.written)
+
+    def reserved_on(self, device) -> int:
+        """Резерв на файловой системе: записанное уменьшает только резерв рабочего каталога"""
+        if device == self.device:
+            return self.remaining
+        if device == self.final_device:
+            return self.size
+        return 0
+
+
+def _device(directory: pathlib.Path):
+    """Идентификатор файловой системы каталога (ближайшего существующего предка)"""
+    path = pathlib.Path(directory).resolve()
+    for candidate in (path, *path.parents):
+        try:
+            return os.stat(candidate).st_dev
+        except OSError:
+            continue
+    return None
+
+
+def _existing(directory: pathlib.Path) -> pathlib.Path:
+    path = pathlib.Path(directory).resolve()
+    for candidate in (path, *path.parents):
+        if candidate.exists():
+            return candidate
+    return path
+
+
+class AdmissionController:
+    """
+    Резервирование места на диске для одновременных загрузок.
+
+    Args:
+        margin: Запас свободного места в байтах
+        hold: Ждать освобождения места (True) или сразу отклонять (False)
+        hold_timeout: Максимальное ожидание в секундах (None — без ограничения)
+        disk_usage: Функция, возвращающая shutil.disk_usage (для тестов)
+    """
+
+    def __init__(self, margin=DEFAULT_MARGIN, hold=True, hold_timeout=None, disk_usage=shutil.disk_usage):
+        self.margin = margin
+        self.hold = hold
+        self.hold_timeout = hold_timeout
+        self._disk_usage = disk_usage
+        self._reservations = {}
+        self._cond = threading.Condition()
+
+    def _reserved_on(self, device) -> int:
+        return sum(r.reserved_on(device) for r in self._reservations.values())
+
+    def reserve(self, key, directory, size, cancelled=None, *, final_directory=None, written=0) -> bool:  # noqa: PLR0913
+        """
+        Резервирует место под загрузку.
+
+        Args:
+            key: Ключ резерва (id элемента)
+            directory: Каталог, куда будут писаться данные
+            size: Оценка размера в байтах (None — неизвестен)
+            cancelled: Функция без аргументов; True — прекратить ожидание
+            final_directory: Итоговая папка, куда файлы перенесут после загрузки
+                (учитывается, если она на другой файловой системе)
+            written: Уже записано в directory из size (предыдущие видео плейлиста)
+
+        Returns:
+            True — место зарезервировано, False — ожидание отменено
+
+        Raises:
+            InsufficientDiskSpaceError: Элемент не помещается
+        """
+        size = int(size or 0)
+        directory = pathlib.Path(directory)
+        device = _device(directory)
+        targets = [(directory, device)]
+        final_device = None
+        if final_directory is not None:
+            final_directory = pathlib.Path(final_directory)
+            final_device = _device(final_directory)
+            if final_device == device:
+                final_device = None
+            else:
+                targets.append((final_directory, final_device))
+        deadline = None if self.hold_timeout is None else time.monotonic() + self.hold_timeout
+        held = False
+
+        with self._cond:
+            while True:
+                for target, target_device in targets:
+                    usage = self._disk_usage(_existing(target))
+                    available = usage.free - self._reserved_on(target_device) - self.margin
+                    needed = size - written if target_device == device else size
+                    if needed > available:
+                        break
+                else:
+                    reservation = self._reservations[key] = _Reservation(directory, device, size, final_device)
+                    reservation.written = written
+                    if held:
+                        logger.info(f"Место освободилось, загрузка {key} допущена")  # noqa: G004
+                    return True
+
+                # Не поместится, даже если освободить весь диск, или ждать нельзя
+                never_fits = needed > usage.total - self.margin
+                timed_out = deadline is not None and time.monotonic() >= deadline
+                if never_fits or not self.hold or timed_out:
+                    logger.error(f"Загрузка {key} отклонена: нужно {needed}, доступно {max(0, available)} в {target}")  # noqa: G004
+                    raise InsufficientDiskSpaceError(target, needed, max(0, available))
+                if cancelled is not None and cancelled():
+                    return False
+
+                if not held:
+                    held = True
+                    logger.warning(f"Загрузка {key} ожидает места на диске: нужно {size}, доступно {max(0, available)}")  # noqa: G004
+                timeout = HOLD_POLL_INTERVAL
+                if deadline is not None:
+                    timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+                self._cond.wait(timeout)
+
+    def update(self, key, written):
+        """Учитывает уже записанные байты (резерв уменьшается)"""
+        with self._cond:
+            reservation = self._reservations.get(key)
+            if reservation is not None and written > reservation.written:
+                reservation.written = written
+
+    def release(self, key):
+        """Снимает резерв и будит ожидающие загрузки"""
+        with self._cond:
+            if self._reservations.pop(key, None) is not None:
+                self._cond.notify_all()
+
+    def usage(self, directory) -> dict:
+        """
+        Состояние диска для отображения в GUI.
+
+        Returns:
+            Словарь: free, total, reserved (байты), reservations (количество)
+        """
+        directory = pathlib.Path(directory)
+        device = _device(directory)
+        usage = self._disk_usage(_existing(directory))
+        with self._cond:
+            on_device = [r for r in self._reservations.values() if device in (r.device, r.final_device)]
+            return {
+                "free": usage.free,
+                "total": usage.total,
+                "reserved": sum(r.reserved_on(device) for r in on_device),
+                "reservations": len(on_device),
+            }
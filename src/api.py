@@ -0,0 +1,322 @@
+"""
+Локальный HTTP/JSON API для управления движком загрузок.
+
+Позволяет внутренним инструментам ставить ссылки пачками, следить за
+состоянием и скоростью элементов, приостанавливать и отменять их и получать события через
+Server-Sent Events — без записи в links.txt и без GUI.
+
+Эндпоинты:
+    GET    /health             — состояние сервиса
+    GET    /items[?state=...]  — список элементов
+    POST   /items              — {"urls": [...], "format": "...", "owner": "...", "outputs": [...],
+                                  "urgent": true}  (urgent — вне очереди, express lane)
+    GET    /items/<id>         — состояние элемента
+    DELETE /items/<id>         — отмена элемента
+    POST   /items/<id>/pause   — пауза (.part файл сохраняется)
+    POST   /items/<id>/resume  — продолжение с места остановки
+    GET    /events             — поток событий (text/event-stream)
+"""  # noqa: RUF002
+
+__all__ = ["ControlServer"]
+
+import contextlib
+import json
+import logging
+import queue
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.engine import QUEUED, is_valid_url
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Максимальный размер тела запроса (≈ десятки тысяч ссылок)
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+# Интервал комментариев keep-alive в потоке событий, с
+SSE_KEEPALIVE = 15.0
+
+# Очередь событий одного SSE-клиента; медленный клиент теряет события,
+# но никогда не блокирует рабочие потоки движка
+SSE_QUEUE_SIZE = 1000
+
+# Действия POST /items/<id>/<действие> (методы DownloadEngine)
+ITEM_ACTIONS = ("pause", "resume")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "YouTubeDownloaderAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def control(self):
+        return self.server.control
+
+    def log_message(self, format, *args):  # noqa: A002
+        logger.debug(f"API {self.address_string()} {format % args}")  # noqa: G004
+
+    # ---------- ответы ----------
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": message})
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length < 0:
+            raise ValueError("negative Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise ValueError("request body too large")
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def route_item_id(self, path):
+        """Извлекает id из пути /items/<id>"""
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "items":  # noqa: PLR2004
+            return None
+        try:
+            return int(parts[1])
+        except ValueError:
+            return None
+
+    def route_item_action(self, path):
+        """Извлекает (id, действие) из пути /items/<id>/pause|resume"""
+        parts = path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "items" or parts[2] not in ITEM_ACTIONS:  # noqa: PLR2004
+            return None
+        try:
+            return int(parts[1]), parts[2]
+        except ValueError:
+            return None
+
+    # ---------- методы ----------
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        engine = self.control.engine
+        if parsed.path == "/health":
+            items = engine.items()
+            self.send_json(
+                HTTPStatus.OK,
+                {
+                    "status": "ok",
+                    "workers": engine.max_workers,
+                    "pools": {name: pool.workers for name, pool in engine.pools.items()},
+                    "items": len(items),
+                    "queued": sum(1 for item in items if item.state == QUEUED),
+                    # Адаптивные пределы загрузок по сайтам
+                    "hosts": engine.concurrency.snapshot() if engine.concurrency is not None else {},
+                    # Egress-личности: занятость, доступность, оставшийся отдых
+                    "identities": engine.identities.snapshot() if engine.identities is not None else {},
+                    # Постоянный кэш yt-dlp: попадания, промахи, размер
+                    "cache": engine.cache.snapshot() if engine.cache is not None else None,
+                },
+            )
+        elif parsed.path == "/items":
+            states = parse_qs(parsed.query).get("state")
+            items = [
+                item.snapshot()
+                for item in engine.items()
+                if states is None or item.state in states
+            ]
+            self.send_json(HTTPStatus.OK, {"items": items})
+        elif parsed.path == "/events":
+            self.stream_events()
+        elif (item_id := self.route_item_id(parsed.path)) is not None:
+            item = engine.get(item_id)
+            if item is None:
+                self.send_error_json(HTTPStatus.NOT_FOUND, "item not found")
+            else:
+                self.send_json(HTTPStatus.OK, item.snapshot())
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "unknown endpoint")
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if (action := self.route_item_action(path)) is not None:
+            self.control_item(*action)
+            return
+        if path != "/items":
+            self.send_error_json(HTTPStatus.NOT_FOUND, "unknown endpoint")
+            return
+        try:
+            payload = self.read_json()
+        except ValueError as e:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+            return
+
+        urls = payload.get("urls") if isinstance(payload, dict) else None
+        if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "'urls' must be a list of strings")
+            return
+        invalid = [url for url in urls if not is_valid_url(url)]
+        if invalid:
+            self.send_json(
+                HTTPStatus.BAD_REQUEST,
+                {"error": "invalid urls", "invalid": invalid},
+            )
+            return
+
+        outputs = payload.get("outputs")
+        if outputs is not None and (not isinstance(outputs, list) or not all(isinstance(o, str) for o in outputs)):
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "'outputs' must be a list of strings")
+            return
+        fmt = payload.get("format")
+        if fmt is not None and not isinstance(fmt, str):
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "'format' must be a string")
+            return
+        urgent = payload.get("urgent", False)
+        if not isinstance(urgent, bool):
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "'urgent' must be a boolean")
+            return
+
+        try:
+            items = self.control.engine.submit(
+                urls,
+                fmt=fmt,
+                owner=payload.get("owner") or f"api:{self.client_address[0]}",
+                outputs=outputs,
+                urgent=urgent,
+            )
+        except ValueError as e:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        logger.info(f"API: поставлено в очередь {len(items)} ссылок")  # noqa: G004
+        self.send_json(HTTPStatus.CREATED, {"items": [item.snapshot() for item in items]})
+
+    def do_DELETE(self):
+        item_id = self.route_item_id(urlparse(self.path).path)
+        if item_id is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "unknown endpoint")
+            return
+        item = self.control.engine.get(item_id)
+        if item is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "item not found")
+        elif item.finished:
+            self.send_json(HTTPStatus.CONFLICT, item.snapshot())
+        else:
+            self.control.engine.cancel(item_id)
+            self.send_json(HTTPStatus.ACCEPTED, item.snapshot())
+
+    def control_item(self, item_id, action):
+        item = self.control.engine.get(item_id)
+        if item is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "item not found")
+        elif item.finished:
+            self.send_json(HTTPStatus.CONFLICT, item.snapshot())
+        else:
+            getattr(self.control.engine, action)(item_id)
+            self.send_json(HTTPStatus.ACCEPTED, item.snapshot())
+
+    # ---------- SSE ----------
+
+    def stream_events(self):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        events = self.control.subscribe()
+        try:
+            self.wfile.write(b": connected\n\n")
+            self.wfile.flush()
+            while not self.control.stopping.is_set():
+                try:
+                    event, snapshot = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    if event is None:
+                        break
+                    data = json.dumps(snapshot, ensure_ascii=False)
+                    self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.control.unsubscribe(events)
+
+
+class ControlServer:
+    """
+    HTTP-сервер управления поверх DownloadEngine.
+
+    Args:
+        engine: Движок загрузок
+        host: Адрес (по умолчанию только локальный)
+        port: Порт (0 — выбрать свободный)
+    """
+
+    def __init__(self, engine, host="127.0.0.1", port=8765):
+        self.engine = engine
+        self.stopping = threading.Event()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.control = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """Фактический (host, port) после привязки"""
+        return self._httpd.server_address[:2]
+
+    def start(self):
+        """Запускает сервер в фоновом потоке"""
+        self.engine.add_listener(self.on_engine_event)
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name="control-api",
+            daemon=True,
+        )
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"API управления запущен: http://{host}:{port}")  # noqa: G004
+
+    def stop(self):
+        self.stopping.set()
+        self.engine.remove_listener(self.on_engine_event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            with contextlib.suppress(queue.Full):
+                events.put_nowait((None, None))
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        logger.info("API управления остановлен")
+
+    def subscribe(self) -> queue.Queue:
+        events = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock, contextlib.suppress(ValueError):
+            self._subscribers.remove(events)
+
+    def on_engine_event(self, event, item):
+        """Рассылает событие движка всем SSE-клиентам"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        snapshot = item.snapshot()
+        for events in subscribers:
+            with contextlib.suppress(queue.Full):
+                events.put_nowait((event, snapshot))
@@ -4,22 +4,61 @@ import logging
 import os
 import pathlib
 import platform
-import re
 import shutil
+import sqlite3
 import subprocess
 import sys
+import threading
+import time
 import traceback
 from logging.handlers import RotatingFileHandler
-from urllib.parse import urlparse
 
-import yt_dlp
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QThreadPool
 
 ROOT_PATH = pathlib.Path(__file__).parent.parent
 
+if __package__ in (None, ""):
+    # Запуск как скрипта (py src/app.py): делаем пакет src импортируемым
+    sys.path.insert(0, str(ROOT_PATH.resolve()))
+
+from src.admission import AdmissionController  # noqa: E402
+from src.cache import CACHE_DIRNAME, PersistentCache  # noqa: E402
+from src.dedupe import INDEX_FILENAME, ContentIndex  # noqa: E402
+from src.engine import (  # noqa: E402
+    CANCELLED,
+    DONE,
+    DOWNLOADING,
+    EXTRACTING,
+    FAILED,
+    FINAL_STATES,
+    MOVING,
+    PAUSED,
+    POSTPROCESSING,
+    QUEUED,
+    DownloadEngine,
+    YTDLPLogger,  # noqa: F401
+    is_valid_url,
+)
+from src.failures import FAILURES_FILENAME, QUARANTINED, RETRY, FailureStore  # noqa: E402
+from src.formats import AUDIO_PROFILE, FAST_PROFILE  # noqa: E402
+from src.library import LibraryChanges, LibraryIndex  # noqa: E402
+from src.progress import BatchProgress  # noqa: E402
+from src.renditions import parse_output  # noqa: E402
+from src.routing import YOUTUBE_HOSTS, PoolPolicy  # noqa: E402
+from src.segmented import CONNECTIONS  # noqa: E402
+
 DEAFULT_FONT_SIZE = 16
 
+# Целевая громкость при выравнивании аудио, LUFS
+LOUDNESS_TARGET = -16.0
+
+# Период обновления таблицы очереди, мс: события движка не перерисовывают GUI напрямую
+STATUS_REFRESH_MS = 250
+
+# Скорость обычных загрузок, пока идёт срочная («Срочно»), байт/с
+URGENT_BULK_RATELIMIT = 2 * 1024 * 1024
+
 
 def resource_path(relative_path: str) -> pathlib.Path:
     """Получает абсолютный путь к ресурсу, работает для dev и PyInstaller"""  # noqa: RUF002
@@ -86,6 +125,12 @@ def setup_logging():
 
 APP_DIR = get_app_directory()
 DOWNLOAD_DIR = APP_DIR / "result"
+# Локальная папка для незавершённых файлов (SSD/tmpfs), если итоговая — сетевая
+STAGING_DIR = os.environ.get("YTDOWNLOADER_STAGING_DIR") or None
+# Резервы места на диске, общие для всех загрузок приложения
+ADMISSION = AdmissionController()
+# Кэш yt-dlp (player JS, подписи) переживает перезапуск exe и общий с демоном из той же папки
+CACHE = PersistentCache(APP_DIR / CACHE_DIRNAME)
 
 logger = setup_logging()
 
@@ -110,6 +155,22 @@ def get_ffmpeg_path():
     return "ffmpeg"
 
 
+def format_size(size) -> str:
+    """Размер в байтах в человекочитаемом виде"""
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if abs(size) < 1024:  # noqa: PLR2004
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ТБ"
+
+
+def format_duration(seconds) -> str:
+    """Длительность в виде ч:мм:сс или м:сс"""
+    minutes, secs = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
 def ensure_download_dir_exists():
     """
     Гарантирует что директория для загрузок существует.
@@ -136,45 +197,6 @@ def ensure_download_dir_exists():
         return True
 
 
-def is_valid_url(url: str) -> bool:
-    """Простая валидация HTTP(S) URL."""
-    try:
-        parsed = urlparse(url.strip())
-        return parsed.scheme in ("http", "https") and bool(parsed.netloc)
-    except Exception:
-        return False
-
-
-class YTDLPLogger:
-    """
-    Кастомный logger для yt-dlp, который перенаправляет
-    все сообщения в Python logging.
-    """
-
-    def __init__(self, logger_instance):
-        self.logger = logger_instance
-
-    def debug(self, msg):
-        """yt-dlp передаёт сюда информационные сообщения"""
-        # yt-dlp использует debug для обычных info-сообщений
-        if msg.startswith("[debug] "):
-            self.logger.debug(msg)
-        else:
-            self.logger.info(msg)
-
-    def info(self, msg):
-        """Информационные сообщения"""
-        self.logger.info(msg)
-
-    def warning(self, msg):
-        """Предупреждения (WARNING prefix от yt-dlp)"""
-        self.logger.warning(msg)
-
-    def error(self, msg):
-        """Ошибки"""
-        self.logger.error(msg)
-
-
 class DropArea(QtWidgets.QListWidget):
     """
     Зона для drag & drop ссылок.
@@ -286,6 +308,14 @@ class DropArea(QtWidgets.QListWidget):
         )
         self.addItem(item)
 
+    def remove_url(self, url_str: str):
+        """Убирает ссылку из списка (например, после успешной загрузки)"""
+        self._url_set.discard(url_str)
+        for row in range(self.count()):
+            if self.item(row).data(QtCore.Qt.UserRole) == url_str:
+                self.takeItem(row)
+                return
+
     def keyPressEvent(self, event):  # noqa: N802
         """Обработка Ctrl+V для вставки ссылок"""
         if (
@@ -331,116 +361,586 @@ class ClickableLabel(QtWidgets.QLabel):
         super().mousePressEvent(event)
 
 
-class DownloadTask(QtCore.QRunnable):
+class LibraryModel(QtCore.QAbstractTableModel):
     """
-    Represents a single download task to be executed in a background thread.
-
-    This class was refactored from using QThread to QRunnable to leverage the
-    QThreadPool infrastructure provided by Qt. By inheriting from QRunnable and
-    submitting instances to a QThreadPool, we can efficiently manage and execute
-    multiple concurrent download tasks without the overhead of manually managing
-    thread lifecycles.
-
-    Using QThreadPool with QRunnable improves maintainability and scalability,
-    as the thread pool automatically handles thread reuse and resource allocation.
-    This approach is particularly beneficial when handling many downloads in
-    parallel, as it avoids the pitfalls of creating and destroying QThread
-    objects for each task.
-
-    Signals are provided via the nested Signals class to communicate progress,
-    completion, and errors back to the GUI thread.
+    Таблица файлов библиотеки.
+
+    Изменения применяются точечно (apply/update): при обновлении папки
+    перерисовываются только затронутые строки, а не вся таблица.
+    """  # noqa: RUF002
+
+    COLUMNS = ("Имя", "Размер", "Длительность", "Разрешение", "Изменён")
+    # Больше стольких удалений за раз — проще пересобрать модель
+    RESET_THRESHOLD = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries = []
+        self._rows = {}  # путь -> номер строки
+
+    def rowCount(self, parent=QtCore.QModelIndex()):  # noqa: B008, N802
+        return 0 if parent.isValid() else len(self._entries)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):  # noqa: B008, N802
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):  # noqa: N802
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def entry(self, row):
+        return self._entries[row]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.UserRole:
+            # Ключ сортировки: числа, а не отображаемый текст
+            return (
+                pathlib.Path(entry.path).name.lower(),
+                entry.size,
+                entry.duration or 0.0,
+                (entry.height or 0) * 100000 + (entry.width or 0),
+                entry.mtime_ns,
+            )[column]
+        if role == QtCore.Qt.ToolTipRole:
+            return entry.path
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if column == 0:
+            return pathlib.Path(entry.path).name
+        if column == 1:
+            return format_size(entry.size)
+        if column == 2:  # noqa: PLR2004
+            return format_duration(entry.duration) if entry.duration else ""
+        if column == 3:  # noqa: PLR2004
+            return f"{entry.width}x{entry.height}" if entry.height else ""
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime_ns / 1e9))
+
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self._entries = list(entries)
+        self._rows = {entry.path: row for row, entry in enumerate(self._entries)}
+        self.endResetModel()
+
+    def update(self, entries):
+        """Обновляет уже показанные записи (например, после ffprobe)"""
+        for entry in entries:
+            row = self._rows.get(entry.path)
+            if row is None:
+                continue
+            self._entries[row] = entry
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def apply(self, changes):
+        """Применяет LibraryChanges из LibraryIndex.refresh()"""
+        if len(changes.removed) > self.RESET_THRESHOLD:
+            removed = set(changes.removed)
+            entries = [entry for entry in self._entries if entry.path not in removed]
+            self.set_entries(entries + changes.added)
+            self.update(changes.changed)
+            return
+        # С конца, чтобы номера оставшихся строк не сдвигались
+        rows = sorted((self._rows[path] for path in changes.removed if path in self._rows), reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self._entries[row]
+            self.endRemoveRows()
+        if rows:
+            self._rows = {entry.path: index for index, entry in enumerate(self._entries)}
+        self.update(changes.changed)
+        added = [entry for entry in changes.added if entry.path not in self._rows]
+        if added:
+            first = len(self._entries)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(added) - 1)
+            for row, entry in enumerate(added, first):
+                self._entries.append(entry)
+                self._rows[entry.path] = row
+            self.endInsertRows()
+
+    def remove(self, path):
+        self.apply(LibraryChanges([], [], [path]))
+
+
+class QueueModel(QtCore.QAbstractTableModel):
+    """
+    Очередь загрузок: состояние, объём, скорость и оставшееся время каждой ссылки.
+
+    Модель не подписана на события движка: refresh() вызывается по таймеру,
+    читает текущие поля DownloadItem и перерисовывает только строки,
+    изменившиеся с прошлого вызова.
+    """  # noqa: RUF002
+
+    COLUMNS = ("Видео", "Состояние", "Прогресс", "Размер", "Скорость", "Осталось")
+    PROGRESS_COLUMN = 2
+    STATE_LABELS = {  # noqa: RUF012
+        QUEUED: "В очереди",
+        EXTRACTING: "Получение данных",
+        DOWNLOADING: "Загрузка",
+        POSTPROCESSING: "Обработка",
+        MOVING: "Перенос",
+        PAUSED: "Пауза",
+        DONE: "Готово",
+        FAILED: "Ошибка",
+        CANCELLED: "Отменено",
+    }
+    # Постобработчики yt-dlp с отдельной подписью
+    POSTPROCESSOR_LABELS = {"Merger": "Склейка", "FFmpegExtractAudio": "Извлечение аудио"}  # noqa: RUF012
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        self._values = []  # последние показанные значения строк
+
+    def rowCount(self, parent=QtCore.QModelIndex()):  # noqa: B008, N802
+        return 0 if parent.isValid() else len(self._items)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):  # noqa: B008, N802
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):  # noqa: N802
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def item(self, row):
+        return self._items[row]
+
+    def items(self):
+        return list(self._items)
+
+    def _row_values(self, item) -> tuple:
+        """
+        Отображаемые значения строки по snapshot() элемента.
+
+        Returns:
+            (название, состояние, процент, размер, скорость, осталось, подсказка, state)
+        """
+        snap = item.snapshot()
+        state = snap["state"]
+        name = pathlib.Path(snap["filename"]).name if snap["filename"] else snap["url"]
+        label = self.STATE_LABELS.get(state, state)
+        if snap["urgent"]:
+            name = f"⚡ {name}"
+        if state == POSTPROCESSING and snap["postprocessor"]:
+            label = self.POSTPROCESSOR_LABELS.get(snap["postprocessor"], label)
+        percent = 100 if state in (MOVING, DONE) else int(snap["percent"])
+        size = ""
+        expected = max(snap["expected_bytes"] or 0, snap["total_bytes"] or 0)
+        if expected:
+            size = f"{format_size(snap['downloaded_bytes'])} / {format_size(expected)}"
+        elif snap["downloaded_bytes"]:
+            size = format_size(snap["downloaded_bytes"])
+        active = state == DOWNLOADING
+        speed = f"{format_size(snap['speed'])}/с" if active and snap["speed"] else ""
+        eta = format_duration(snap["eta"]) if active and snap["eta"] is not None else ""
+        tooltip = snap["error"] if state == FAILED and snap["error"] else snap["url"]
+        return (name, label, percent, size, speed, eta, tooltip, state)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        values = self._values[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.ToolTipRole:
+            return values[6]
+        if role == QtCore.Qt.UserRole:
+            return values[column]
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if column == self.PROGRESS_COLUMN:
+            return f"{values[column]}%"
+        return values[column]
+
+    def add_items(self, items):
+        """Добавляет элементы движка в конец таблицы"""
+        if not items:
+            return
+        first = len(self._items)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(items) - 1)
+        self._items.extend(items)
+        self._values.extend(self._row_values(item) for item in items)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._items = []
+        self._values = []
+        self.endResetModel()
+
+    def refresh(self) -> int:
+        """
+        Перечитывает состояние элементов.
+
+        Соседние изменившиеся строки объединяются в один сигнал dataChanged.
+
+        Returns:
+            Число изменившихся строк
+        """
+        changed = 0
+        first = None
+        last_column = len(self.COLUMNS) - 1
+        for row, item in enumerate(self._items):
+            values = self._row_values(item)
+            if values != self._values[row]:
+                self._values[row] = values
+                changed += 1
+                if first is None:
+                    first = row
+                continue
+            if first is not None:
+                self.dataChanged.emit(self.index(first, 0), self.index(row - 1, last_column))
+                first = None
+        if first is not None:
+            self.dataChanged.emit(self.index(first, 0), self.index(len(self._items) - 1, last_column))
+        return changed
+
+    def active_percent(self) -> int | None:
+        """Средний процент элементов в работе (по последнему refresh) или None, если таких нет"""
+        percents = [
+            values[self.PROGRESS_COLUMN]
+            for values in self._values
+            if values[-1] not in (QUEUED, PAUSED) and values[-1] not in FINAL_STATES
+        ]
+        return sum(percents) // len(percents) if percents else None
+
+
+class ProgressDelegate(QtWidgets.QStyledItemDelegate):
+    """Полоса прогресса в ячейке таблицы (значение — UserRole)"""
+
+    def paint(self, painter, option, index):
+        value = index.data(QtCore.Qt.UserRole)
+        if value is None:
+            super().paint(painter, option, index)
+            return
+        bar = QtWidgets.QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = value
+        bar.text = f"{value}%"
+        bar.textVisible = True
+        QtWidgets.QApplication.style().drawControl(QtWidgets.QStyle.CE_ProgressBar, bar, painter)
+
+
+class LibraryRefreshTask(QtCore.QRunnable):
+    """Обход папки и чтение параметров медиа в фоне"""
+
+    # Сколько файлов прочитать ffprobe между обновлениями таблицы
+    PROBE_BATCH = 20
+
+    class Signals(QtCore.QObject):
+        refreshed = QtCore.pyqtSignal(object)  # LibraryChanges
+        probed = QtCore.pyqtSignal(object)  # список обновлённых LibraryEntry
+
+    def __init__(self, index, stop):
+        super().__init__()
+        self.index = index
+        self.stop = stop  # threading.Event: окно закрывается или папка сменилась
+        self.signals = LibraryRefreshTask.Signals()
+
+    def run(self):
+        try:
+            changes = self.index.refresh()
+            self.signals.refreshed.emit(changes)
+            pending = self.index.pending_probe()
+            ffmpeg_location = get_ffmpeg_path() if pending else None
+            for start in range(0, len(pending), self.PROBE_BATCH):
+                if self.stop.is_set():
+                    return
+                batch = pending[start : start + self.PROBE_BATCH]
+                updated = self.index.probe(batch, ffmpeg_location, stop=self.stop.is_set)
+                self.signals.probed.emit(updated)
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Не удалось обновить библиотеку {self.index.root}: {e}")  # noqa: G004
+
+
+class LibraryPanel(QtWidgets.QWidget):
+    """
+    Панель «Библиотека»: скачанные файлы с сортировкой, фильтром и удалением.
+
+    Индекс открывается при первом показе вкладки (или первом refresh), а не
+    при создании окна. Список из кэша индекса показывается сразу, обновление
+    папки и чтение длительности/разрешения идут в фоне и затрагивают только
+    изменённые файлы.
+    """  # noqa: RUF002
+
+    def __init__(self, directory, parent=None):
+        super().__init__(parent)
+        self.directory = None
+        self.index = None
+        self._stop = threading.Event()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)  # обновления идут по очереди
+
+        self.model = LibraryModel(self)
+        self.proxy = QtCore.QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(QtCore.Qt.UserRole)
+        self.proxy.setFilterCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.proxy.setFilterKeyColumn(0)
+
+        self.filter_edit = QtWidgets.QLineEdit()
+        self.filter_edit.setPlaceholderText("Фильтр по имени")
+        self.filter_edit.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(4, QtCore.Qt.DescendingOrder)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.table.doubleClicked.connect(self.open_selected)
+
+        self.refresh_button = QtWidgets.QPushButton("Обновить")
+        self.refresh_button.clicked.connect(self.refresh)
+        self.delete_button = QtWidgets.QPushButton("Удалить")
+        self.delete_button.clicked.connect(self.delete_selected)
+        self.summary_label = QtWidgets.QLabel()
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.filter_edit, 1)
+        buttons.addWidget(self.refresh_button)
+        buttons.addWidget(self.delete_button)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+        layout.addWidget(self.summary_label)
+        self.setLayout(layout)
+
+        self.model.rowsInserted.connect(self.update_summary)
+        self.model.rowsRemoved.connect(self.update_summary)
+        self.model.modelReset.connect(self.update_summary)
+        self.set_directory(directory)
+
+    def set_directory(self, directory):
+        """Показывает другую папку; индекс откроется при следующем обновлении"""
+        self.close_index()
+        self._stop = threading.Event()
+        self.directory = pathlib.Path(directory)
+        self.model.set_entries([])
+        if self.isVisible():
+            self.refresh()
+
+    def open_index(self) -> bool:
+        """Открывает индекс папки и показывает список из его кэша"""  # noqa: RUF002
+        if self.index is not None:
+            return True
+        try:
+            self.index = LibraryIndex(self.directory)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Не удалось открыть библиотеку {self.directory}: {e}")  # noqa: G004
+            return False
+        self.model.set_entries(self.index.entries())
+        return True
+
+    def showEvent(self, event):  # noqa: N802
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        """Синхронизирует таблицу с папкой (только изменившиеся файлы)"""  # noqa: RUF002
+        if not self.open_index():
+            return
+        task = LibraryRefreshTask(self.index, self._stop)
+        task.signals.refreshed.connect(self.model.apply)
+        task.signals.probed.connect(self.model.update)
+        self.thread_pool.start(task)
+
+    def update_summary(self, *_args):
+        total = sum(self.model.entry(row).size for row in range(self.model.rowCount()))
+        self.summary_label.setText(f"Файлов: {self.model.rowCount()}, всего {format_size(total)}")
+
+    def selected_entries(self):
+        rows = {self.proxy.mapToSource(index).row() for index in self.table.selectionModel().selectedRows()}
+        return [self.model.entry(row) for row in sorted(rows)]
+
+    def open_selected(self, *_args):
+        for entry in self.selected_entries()[:1]:
+            QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(entry.path))
+
+    def delete_selected(self):
+        entries = self.selected_entries()
+        if not entries:
+            return
+        names = "\n".join(pathlib.Path(entry.path).name for entry in entries[:10])
+        if len(entries) > 10:  # noqa: PLR2004
+            names += f"\n… и ещё {len(entries) - 10}"
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Удаление файлов",
+            f"Удалить с диска {len(entries)} файл(ов)?\n{names}",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+        )
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+        for entry in entries:
+            try:
+                self.index.delete(entry.path)
+            except OSError as e:
+                logger.error(f"Не удалось удалить {entry.path}: {e}")  # noqa: G004
+                QtWidgets.QMessageBox.warning(self, "Ошибка", f"Не удалось удалить файл:\n{e}")
+                continue
+            self.model.remove(entry.path)
+
+    def close_index(self):
+        """Останавливает фоновое обновление и закрывает индекс"""
+        self._stop.set()
+        self.thread_pool.waitForDone()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+def create_engine() -> DownloadEngine:
+    """Движок загрузок приложения (папка и формат задаются при постановке ссылок)"""
+    return DownloadEngine(
+        # Другие сайты качаются в своём потоке и не задерживают YouTube
+        max_workers=1,
+        pools=[PoolPolicy("youtube", YOUTUBE_HOSTS, workers=1)],
+        download_dir=DOWNLOAD_DIR,
+        ffmpeg_location=get_ffmpeg_path(),
+        cookies_path=APP_DIR / "cookies.txt",
+        staging_dir=STAGING_DIR,
+        admission=ADMISSION,
+        # Следующие ссылки извлекаются, пока качается текущая
+        prefetch=2,
+        # Склейка FFmpeg не задерживает следующую загрузку
+        postprocess_workers=None,
+        # Срочные ссылки качаются в отдельном потоке, не дожидаясь очереди
+        urgent_workers=1,
+        bulk_ratelimit=URGENT_BULK_RATELIMIT,
+        # Большие одиночные файлы качаются в несколько соединений
+        connections=CONNECTIONS,
+        cache=CACHE,
+        # Уже скачанные видео (в любой папке загрузки) не скачиваются повторно
+        index=ContentIndex(APP_DIR / INDEX_FILENAME),
+    )
+
+
+class DownloadTask:
+    """
+    Represents a batch of links submitted to the download engine.
+
+    The task does not occupy a thread while its links are downloading: start()
+    puts the links into the shared engine from the GUI thread and returns, and
+    completion is tracked through engine events. Each link reaching a final
+    state is reported right away; when the last one finishes, the failure
+    store is closed and the finished signal is emitted.
+
+    run() is the blocking variant for use without a GUI: it creates its own
+    engine, waits for the links and shuts the engine down.
+
+    Signals are provided via the nested Signals class; they are emitted from
+    engine threads and delivered to the GUI thread by queued connections.
     """
 
     class Signals(QtCore.QObject):
         """Сигналы для передачи данных в GUI"""
 
-        progress = QtCore.pyqtSignal(int)  # процент загрузки текущего видео
-        overall_progress = QtCore.pyqtSignal(int)  # общий прогресс (по списку)
-        finished = QtCore.pyqtSignal()  # завершение всех загрузок
+        items_queued = QtCore.pyqtSignal(object)  # элементы движка (list[DownloadItem]) для таблицы очереди
+        item_finished = QtCore.pyqtSignal(str, str)  # ссылка и конечное состояние элемента
+        finished = QtCore.pyqtSignal()  # завершение всех загрузок задачи
         error_occurred = QtCore.pyqtSignal(str)  # ошибка загрузки
 
-    def __init__(self, urls, fmt, download_dir):
-        super().__init__()
+    def __init__(self, urls, fmt, download_dir, engine=None, outputs=None, urgent=False):  # noqa: PLR0913
         self.urls = urls
         self.fmt = fmt
         self.download_dir = download_dir
+        self.engine = engine
+        self.outputs = outputs or []  # доп. версии из каждого скачанного файла
+        self.urgent = urgent  # вне очереди (express lane движка)
         self.failed_videos = []
         self.signals = DownloadTask.Signals()
-
-    def progress_hook(self, d):
-        if d["status"] == "downloading":
-            percent_str = d.get("_percent_str", "0.0%").strip().replace("%", "")
-            percent_str = re.sub(r"\x1b\[[0-9;]*m", "", percent_str)
-            try:
-                percent = float(percent_str)
-                self.signals.progress.emit(int(percent))
-            except ValueError as e:
-                self.signals.overall_progress.emit(0)
-                logger.error(f"Ошибка парсинга процента загрузки: {e}")  # noqa: G004
-
-        elif d["status"] == "finished":
-            self.signals.progress.emit(100)
-            logger.debug("Загрузка файла завершена, начинается обработка")
+        self._failures = None  # база неудач, пока задача выполняется
+        self._lock = threading.Lock()
+        self._items = None  # элементы движка (None — ещё ставятся в очередь)
+        self._finished_ids = set()
+        self._closed = False
+
+    def on_engine_event(self, event, item):
+        """Пересылает события движка, относящиеся к этой задаче, в сигналы GUI"""
+        if item.owner is not self:
+            return  # движок общий: элементы других задач GUI
+        failures = self._failures
+        if failures is not None:
+            failures.on_engine_event(event, item)
+        # Ход загрузки не пересылается: таблица очереди и общий прогресс
+        # (по байтам, см. BatchProgress) читают элементы сами по таймеру
+        if event == FAILED:
+            self.failed_videos.append(f"{item.url}")
+            self.signals.error_occurred.emit(item.url)
+        if event in FINAL_STATES:
+            self.signals.item_finished.emit(item.url, event)
+            with self._lock:
+                self._finished_ids.add(item.id)
+            self._close_if_done()
+
+    def start(self, engine) -> list:
+        """
+        Ставит ссылки в движок и сразу возвращается (вызывается из потока GUI).
+
+        Returns:
+            Элементы движка
+        """
+        self.engine = engine
+        logger.info(f"Постановка в очередь {len(self.urls)} ссылок")  # noqa: G004
+        # Причины неудач, число попыток и время следующего повтора
+        self._failures = FailureStore(self.download_dir / FAILURES_FILENAME)
+        engine.add_listener(self.on_engine_event)
+        try:
+            items = engine.submit(
+                self.urls,
+                fmt=self.fmt,
+                download_dir=self.download_dir,
+                owner=self,
+                outputs=self.outputs,
+                urgent=self.urgent,
+            )
+        except BaseException:
+            engine.remove_listener(self.on_engine_event)
+            self._failures.close()
+            self._failures = None
+            raise
+        self.signals.items_queued.emit(items)
+        # Элементы могли завершиться, пока ставились в очередь
+        with self._lock:
+            self._items = items
+        self._close_if_done()
+        return items
 
     def run(self):
-        total = len(self.urls)
-
-        ydl_opts = {
-            "ffmpeg_location": get_ffmpeg_path(),
-            "outtmpl": str(self.download_dir / "%(title)s.%(ext)s"),
-            "format": self.fmt,  # "best[height<=1080]+bestaudio/best"
-            "progress_hooks": [self.progress_hook],
-            "socket_timeout": 30,
-            "retries": 3,
-            "quiet": False,
-            "noprogress": True,
-            "merge_output_format": "webm",
-            "continuedl": True,
-            "postprocessor_args": ["-v", "verbose"],
-            "logger": YTDLPLogger(logger),
-            "extractor_args": {"youtube": {"lang": ["ru", "ru-RU"]}},
-        }
-
-        # Проверяем существование файла cookies
-
-        cookies_path = APP_DIR / "cookies.txt"
-        if cookies_path.exists():
-            ydl_opts["cookiefile"] = str(cookies_path)
-            logger.info(f"Используются cookies из {cookies_path}")  # noqa: G004
-        else:
-            logger.info("Файл cookies.txt не найден, продолжаем без cookies")
-
-        for index, url in enumerate(self.urls, start=1):
-            logger.info(f"Начало загрузки [{index}/{total}]: {url}")  # noqa: G004
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                logger.info(f"Успешно загружено [{index}/{total}]: {url}")  # noqa: G004
-            except yt_dlp.utils.DownloadError as e:
-                # Попытка сменить контейнер на mkv, если mp4 не сработал
-                logger.warning(f"DownloadError для {url}, пробуем mkv: {e}")  # noqa: G004
-                ydl_opts["merge_output_format"] = "mkv"
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                    logger.info(f"Успешно загружено (mkv) [{index}/{total}]: {url}")  # noqa: G004
-                except Exception as e:
-                    logger.error(f"Не удалось скачать {url}: {e}")  # noqa: G004
-                    self.failed_videos.append(f"{url}")
-                    self.signals.error_occurred.emit(url)
-
-                self.signals.progress.emit(100)
-
-            # Обновляем общий прогресс после завершения текущего видео
-            overall_percent = int((index / total) * 100)
-            self.signals.overall_progress.emit(overall_percent)
+        """Загрузка в собственном движке с ожиданием всех ссылок (без GUI)"""  # noqa: RUF002
+        engine = create_engine()
+        try:
+            engine.wait(self.start(engine))
+        finally:
+            engine.shutdown()
+            self._close()
+
+    def _close_if_done(self):
+        with self._lock:
+            done = self._items is not None and self._finished_ids.issuperset(item.id for item in self._items)
+        if done:
+            self._close()
+
+    def _close(self):
+        """Отписывается от движка, закрывает базу неудач и сообщает о завершении (один раз)"""  # noqa: RUF002
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.engine.remove_listener(self.on_engine_event)
+        failures, self._failures = self._failures, None
+        failures.close()
 
         if self.failed_videos:
-            error_file = self.download_dir / "failed_downloads.txt"
-            with error_file.open("a", encoding="utf-8") as f:
-                for line in self.failed_videos:
-                    f.write(line + "\n")
-            logger.warning(f"Ошибки загрузки записаны в {error_file}")  # noqa: G004
+            logger.warning(f"Ошибки загрузки записаны в {failures.path}")  # noqa: G004
 
         logger.info("Завершение задачи загрузки")
         self.signals.finished.emit()
@@ -458,6 +958,10 @@ class MainWindow(QtWidgets.QWidget):
         self.setFont(font)
         self.error_flag = False
         self.download_dir = DOWNLOAD_DIR
+        # Общий движок: новые ссылки встают в очередь, не дожидаясь конца пакета
+        self.engine = None
+        self.active_tasks = 0
+        self.submitted_urls = set()  # ссылки в очереди или в работе
 
         logger.info(
             f"Установлена директория загрузки по умолчанию: {self.download_dir}"  # noqa: G004
@@ -481,28 +985,58 @@ class MainWindow(QtWidgets.QWidget):
         self.download_button.setIcon(
             self.style().standardIcon(QtWidgets.QStyle.SP_DialogSaveButton),
         )
-        # Основной layout
-        main_layout = QtWidgets.QVBoxLayout()
+        # Срочная загрузка: вне очереди, остальные уступают ей поток и скорость
+        self.urgent_check = QtWidgets.QCheckBox("Срочно (вне очереди)")
+        self.urgent_check.setToolTip(
+            "Ссылки начнут качаться сразу, даже если очередь занята:\n"
+            "обычные загрузки приостанавливаются или замедляются и продолжаются потом",
+        )
+        # Повтор неудачных загрузок с временными ошибками
+        self.retry_button = QtWidgets.QPushButton("Повторить неудачные")
+        self.retry_button.setToolTip(
+            "Добавляет в список ссылки, не скачанные из-за временных ошибок (сеть, лимиты),\n"
+            "если подошло время повтора. Удалённые и приватные видео не повторяются",
+        )
+        # Библиотека скачанных файлов
+        self.library_panel = LibraryPanel(self.download_dir)
+
+        # Вкладка загрузки
+        download_layout = QtWidgets.QVBoxLayout()
 
         # Первый слой: Настройки и DropArea
         top_layout = QtWidgets.QHBoxLayout()
         top_layout.addWidget(links_group, 1)
         top_layout.addWidget(settings_group)
 
-        main_layout.addLayout(top_layout)
+        download_layout.addLayout(top_layout)
         # Второй слой: Прогресс загрузки
-        main_layout.addWidget(progress_group)
-
-        # Кнопка скачивания
-        main_layout.addWidget(self.download_button)
+        download_layout.addWidget(progress_group)
+
+        # Кнопки скачивания и повтора
+        buttons_layout = QtWidgets.QHBoxLayout()
+        buttons_layout.addWidget(self.download_button, 1)
+        buttons_layout.addWidget(self.urgent_check)
+        buttons_layout.addWidget(self.retry_button)
+        download_layout.addLayout(buttons_layout)
+        download_tab = QtWidgets.QWidget()
+        download_tab.setLayout(download_layout)
+
+        # Основной layout: вкладки «Загрузка» и «Библиотека»
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.addTab(download_tab, "Загрузка")
+        self.tabs.addTab(self.library_panel, "Библиотека")
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.addWidget(self.tabs)
         self.setLayout(main_layout)
 
         # Сигналы
         self.download_button.clicked.connect(self.start_download)
+        self.retry_button.clicked.connect(self.retry_failed)
 
-        # Пул потоков автоматически управляет памятью!
-        self.thread_pool = QThreadPool()
-        self.thread_pool.setMaxThreadCount(1)  # 1 загрузка одновременно
+        # Задачи ставят ссылки в движок из потока GUI и не занимают потоков:
+        # о завершении сообщают события движка. Ссылки на задачи хранятся,
+        # пока не доставлен сигнал finished
+        self.tasks = set()
 
         logger.info("Главное окно успешно инициализировано")
 
@@ -612,10 +1146,43 @@ class MainWindow(QtWidgets.QWidget):
         self.dir_label.setToolTip("Нажмите, чтобы открыть директорию")
         self.dir_label.clicked.connect(self.open_directory)
 
+        # Свободное место и резервы текущих загрузок
+        self.disk_label = QtWidgets.QLabel()
+        self.disk_label.setWordWrap(True)
+        self.disk_timer = QtCore.QTimer(self)
+        self.disk_timer.timeout.connect(self.update_disk_usage)
+        self.disk_timer.start(2000)
+        self.update_disk_usage()
+
         self.combo_quality = QtWidgets.QComboBox()
         self.combo_quality.addItems(["До 1080p", "До 720p", "До 480p"])
         self.combo_quality.setCurrentIndex(0)
 
+        self.combo_mode = QtWidgets.QComboBox()
+        self.combo_mode.addItems(
+            [
+                "Лучшее качество",
+                "Быстро (без склейки)",
+                "Только аудио: MP3",
+                "Только аудио: M4A",
+                "Только аудио: Opus",
+            ],
+        )
+        self.combo_mode.setToolTip(
+            "Быстрый режим выбирает готовый файл или потоки, совместимые с контейнером,\n"
+            "если их качество близко к лучшему, — без долгой склейки FFmpeg",
+        )
+        self.loudness_check = QtWidgets.QCheckBox(f"Выравнивать громкость ({LOUDNESS_TARGET:g} LUFS)")
+        self.loudness_check.setToolTip("Только для аудио: требует перекодирования каждого файла")
+
+        self.outputs_edit = QtWidgets.QLineEdit()
+        self.outputs_edit.setPlaceholderText("например: 480, audio:mp3")
+        self.outputs_edit.setToolTip(
+            "Дополнительные версии из того же скачанного файла, через запятую:\n"
+            "480 / 720 — видео mp4 меньшего размера, audio:mp3 / audio:m4a — только аудио,\n"
+            "remux:mp4 — другой контейнер. Потоки копируются без перекодирования, где это возможно",
+        )
+
         settings_group = QtWidgets.QGroupBox("Настройки")
         settings_layout = QtWidgets.QVBoxLayout()
         settings_layout.addWidget(QtWidgets.QLabel("Размер шрифта:"))
@@ -623,8 +1190,14 @@ class MainWindow(QtWidgets.QWidget):
         settings_layout.addWidget(QtWidgets.QLabel("Папка для загрузки:"))
         settings_layout.addWidget(self.dir_button)
         settings_layout.addWidget(self.dir_label)
+        settings_layout.addWidget(self.disk_label)
         settings_layout.addWidget(QtWidgets.QLabel("Максимальное качество видео:"))
         settings_layout.addWidget(self.combo_quality)
+        settings_layout.addWidget(QtWidgets.QLabel("Режим выбора формата:"))
+        settings_layout.addWidget(self.combo_mode)
+        settings_layout.addWidget(self.loudness_check)
+        settings_layout.addWidget(QtWidgets.QLabel("Дополнительные версии:"))
+        settings_layout.addWidget(self.outputs_edit)
         settings_group.setLayout(settings_layout)
         return settings_group
 
@@ -650,10 +1223,43 @@ class MainWindow(QtWidgets.QWidget):
         self.overall_bar.setTextVisible(True)
         progress_group = QtWidgets.QGroupBox("Прогресс загрузки")
         progress_layout = QtWidgets.QVBoxLayout()
-        progress_layout.addWidget(QtWidgets.QLabel("Прогресс текущего видео:"))
+        # Состояние каждой ссылки; обновляется по таймеру, а не по событиям движка
+        self.queue_model = QueueModel(self)
+        self.queue_view = QtWidgets.QTableView()
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.setItemDelegateForColumn(QueueModel.PROGRESS_COLUMN, ProgressDelegate(self.queue_view))
+        self.queue_view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.queue_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.queue_view.verticalHeader().setVisible(False)
+        self.queue_view.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.status_timer = QtCore.QTimer(self)
+        self.status_timer.setInterval(STATUS_REFRESH_MS)
+        self.status_timer.timeout.connect(self.refresh_status)
+        progress_layout.addWidget(self.queue_view)
+        # Управление выделенными строками (без выделения — всем пакетом)
+        self.pause_button = QtWidgets.QPushButton("Пауза")
+        self.resume_button = QtWidgets.QPushButton("Продолжить")
+        self.cancel_button = QtWidgets.QPushButton("Отменить")
+        controls_layout = QtWidgets.QHBoxLayout()
+        for button, action in (
+            (self.pause_button, "pause"),
+            (self.resume_button, "resume"),
+            (self.cancel_button, "cancel"),
+        ):
+            button.setToolTip("Для выделенных в таблице видео, без выделения — для всех")
+            button.setEnabled(False)
+            button.clicked.connect(lambda _checked, action=action: self.control_downloads(action))
+            controls_layout.addWidget(button)
+        controls_layout.addStretch(1)
+        progress_layout.addLayout(controls_layout)
+        progress_layout.addWidget(QtWidgets.QLabel("Прогресс текущих видео:"))
         progress_layout.addWidget(self.progress_bar)
+        # Общий прогресс по байтам и оценка времени до конца пакета
+        self.batch_progress = BatchProgress()
+        self.eta_label = QtWidgets.QLabel()
         progress_layout.addWidget(QtWidgets.QLabel("Общий прогресс:"))
         progress_layout.addWidget(self.overall_bar)
+        progress_layout.addWidget(self.eta_label)
         progress_group.setLayout(progress_layout)
         return progress_group
 
@@ -665,12 +1271,26 @@ class MainWindow(QtWidgets.QWidget):
             self.download_dir = pathlib.Path(path)
             self.dir_label.setText(str(self.download_dir))
             self.dir_label.setToolTip("Нажмите, чтобы открыть директорию")
+            self.update_disk_usage()
+            self.library_panel.set_directory(self.download_dir)
             logger.info(
                 f"Директория загрузки изменена: {old_dir} -> {self.download_dir}"  # noqa: G004
             )
         else:
             logger.info("Выбор директории отменен пользователем")
 
+    def update_disk_usage(self):
+        """Обновляет строку со свободным местом и резервами загрузок"""
+        try:
+            usage = ADMISSION.usage(self.download_dir)
+        except OSError as e:
+            self.disk_label.setText(f"Свободное место неизвестно: {e}")
+            return
+        text = f"Свободно: {format_size(usage['free'])}"
+        if usage["reservations"]:
+            text += f", зарезервировано: {format_size(usage['reserved'])} ({usage['reservations']} загр.)"
+        self.disk_label.setText(text)
+
     def open_directory(self):
         """Открывает директорию загрузки в файловом менеджере"""
 
@@ -747,29 +1367,147 @@ class MainWindow(QtWidgets.QWidget):
         else:
             fmt = "video+bestaudio/best"
 
-        logger.info(f"Запуск загрузки {total} видео, формат: {fmt}")  # noqa: G004
-
-        # Обнуляем прогрессбары
-        self.progress_bar.setValue(0)  # текущего видео
-        self.overall_bar.setValue(0)  # общий прогресс
+        mode = self.combo_mode.currentIndex()
+        if mode == 1:
+            # Профиль "fast" с тем же ограничением высоты кадра
+            height = choice.removeprefix("До ").removesuffix("p")
+            fmt = f"{FAST_PROFILE}:{height}" if height.isdigit() else FAST_PROFILE
+        elif mode >= 2:  # noqa: PLR2004
+            codec = self.combo_mode.currentText().rsplit(" ", 1)[-1].lower()
+            fmt = f"{AUDIO_PROFILE}:{codec}"
+            if self.loudness_check.isChecked():
+                fmt += f":{LOUDNESS_TARGET:g}"
+
+        outputs = [spec.strip() for spec in self.outputs_edit.text().split(",") if spec.strip()]
+        try:
+            for spec in outputs:
+                parse_output(spec)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Ошибка", str(e))
+            return
 
-        # Собираем все ссылки
+        # Собираем ссылки, которых ещё нет в очереди
         urls = [self.drop_area.item(i).text() for i in range(total)]
+        urls = [url for url in urls if url not in self.submitted_urls]
+        if not urls:
+            QtWidgets.QMessageBox.information(self, "Загрузка", "Все ссылки из списка уже в очереди")
+            return
 
-        # Создаем задачу
-        task = DownloadTask(urls, fmt, self.download_dir)
+        logger.info(f"Постановка {len(urls)} видео в очередь, формат: {fmt}")  # noqa: G004
+
+        if not self.active_tasks:
+            # Новый пакет: обнуляем прогрессбары и таблицу очереди
+            self.progress_bar.setValue(0)  # текущих видео
+            self.overall_bar.setValue(0)  # общий прогресс
+            self.queue_model.clear()
+            self.batch_progress = BatchProgress()
+            self.eta_label.clear()
+
+        # Ссылки встают в очередь общего движка и начнут качаться, как только освободится поток
+        task = DownloadTask(
+            urls,
+            fmt,
+            self.download_dir,
+            outputs=outputs,
+            urgent=self.urgent_check.isChecked(),
+        )
+        self.submitted_urls.update(urls)
+        self.active_tasks += 1
+        self.tasks.add(task)
 
         # Подключаем сигналы
-        task.signals.progress.connect(self.progress_bar.setValue)
-        task.signals.overall_progress.connect(self.overall_bar.setValue)
+        task.signals.items_queued.connect(self.queue_model.add_items)
+        task.signals.item_finished.connect(self.on_item_finished)
         task.signals.finished.connect(self.on_finished)
+        task.signals.finished.connect(lambda: self.tasks.discard(task))
         task.signals.error_occurred.connect(lambda url: self.handle_error(url))
 
-        # QThreadPool reuses threads, but each task (QRunnable) is automatically deleted after completion.
-        # This prevents memory leaks as long as tasks are set up for auto-deletion (the default in PyQt5).
-        self.thread_pool.start(task)
-
-        self.download_button.setEnabled(False)
+        task.start(self.get_engine())
+        self.status_timer.start()
+        self.set_controls_enabled(True)
+
+    def get_engine(self) -> DownloadEngine:
+        """Общий движок загрузок (создаётся при первой загрузке)"""
+        if self.engine is None:
+            self.engine = create_engine()
+        return self.engine
+
+    def on_item_finished(self, url, state):
+        """Готовая ссылка убирается из списка сразу, не дожидаясь конца пакета"""
+        self.submitted_urls.discard(url)
+        if state == DONE:
+            self.drop_area.remove_url(url)
+
+    def set_controls_enabled(self, enabled):
+        for button in (self.pause_button, self.resume_button, self.cancel_button):
+            button.setEnabled(enabled)
+
+    def control_downloads(self, action):
+        """Пауза/продолжение/отмена выделенных видео или всего пакета"""
+        if self.engine is None:
+            return
+        rows = sorted({index.row() for index in self.queue_view.selectionModel().selectedRows()})
+        items = [self.queue_model.item(row) for row in rows] if rows else self.queue_model.items()
+        logger.info(f"Действие {action} для {len(items)} видео")  # noqa: G004
+        for item in items:
+            if not item.finished:
+                getattr(self.engine, action)(item.id)
+        self.refresh_status()
+
+    def refresh_status(self):
+        """Обновляет таблицу очереди и прогресс текущих видео (по таймеру)"""
+        self.queue_model.refresh()
+        percent = self.queue_model.active_percent()
+        if percent is not None:
+            self.progress_bar.setValue(percent)
+        status = self.batch_progress.update(self.queue_model.items())
+        self.overall_bar.setValue(status.percent)
+        text = f"{format_size(status.done_bytes)} из ~{format_size(status.total_bytes)}"
+        if status.rate:
+            text += f", {format_size(status.rate)}/с"
+        if status.eta is not None:
+            finish = time.strftime("%H:%M", time.localtime(time.time() + status.eta))
+            text += f", осталось ~{format_duration(status.eta)} (до {finish})"
+        self.eta_label.setText(text)
+
+    def closeEvent(self, event):  # noqa: N802
+        if self.engine is not None:
+            # Незавершённые загрузки прерываются, .part файлы остаются для докачки
+            for item in self.engine.items():
+                self.engine.cancel(item.id)
+            self.engine.shutdown(wait=False)
+            self.engine = None
+        self.library_panel.close_index()
+        super().closeEvent(event)
+
+    def retry_failed(self):
+        """Добавляет в список ссылки, которым пора повторить загрузку"""
+        path = self.download_dir / FAILURES_FILENAME
+        if not path.exists():
+            QtWidgets.QMessageBox.information(self, "Повтор", "Неудачных загрузок нет")
+            return
+        failures = FailureStore(path)
+        try:
+            due = failures.due()
+            summary = failures.summary()
+            next_retry_at = failures.next_retry_at()
+        finally:
+            failures.close()
+
+        added = 0
+        for url in due:
+            if url not in self.drop_area._url_set:  # noqa: SLF001
+                self.drop_area.add_url(url)
+                added += 1
+        waiting = summary.get(RETRY, 0) - len(due)
+        lines = [f"Добавлено для повтора: {added}"]
+        if waiting > 0 and next_retry_at is not None:
+            minutes = max(1, round((next_retry_at - time.time()) / 60))
+            lines.append(f"Ещё ждут повтора: {waiting} (ближайший через {minutes} мин)")
+        if summary.get(QUARANTINED):
+            lines.append(f"В карантине (не повторяются): {summary[QUARANTINED]}")
+        logger.info(f"Повтор неудачных: {'; '.join(lines)}")  # noqa: G004
+        QtWidgets.QMessageBox.information(self, "Повтор", "\n".join(lines))
 
     def handle_error(self, url):
         """Обработчик ошибок загрузки с логированием"""
@@ -777,6 +1515,13 @@ class MainWindow(QtWidgets.QWidget):
         logger.error(f"Ошибка при загрузке видео: {url}")  # noqa: G004
 
     def on_finished(self):
+        """Задача загрузки завершена; итог показывается, когда очередь опустела"""
+        self.active_tasks = max(0, self.active_tasks - 1)
+        if self.library_panel.isVisible():
+            self.library_panel.refresh()
+        if self.active_tasks:
+            return  # в очереди ещё ссылки, добавленные позже
+
         # Системный звук
         if sys.platform == "win32":
             import winsound  # noqa: PLC0415
@@ -785,8 +1530,11 @@ class MainWindow(QtWidgets.QWidget):
         else:
             logger.info("\a")  # Linux/macOS beep
 
-        self.drop_area.clear()
-        self.download_button.setEnabled(True)
+        self.status_timer.stop()
+        self.refresh_status()
+        self.progress_bar.setValue(100)
+        self.set_controls_enabled(False)
+        cancelled = sum(1 for item in self.queue_model.items() if item.state == CANCELLED)
 
         # Сообщение пользователю
         if self.error_flag:
@@ -794,8 +1542,16 @@ class MainWindow(QtWidgets.QWidget):
             QtWidgets.QMessageBox.warning(
                 self,
                 "Завершено с ошибками",  # noqa: RUF001
-                "Некоторые видео не удалось скачать. "
-                "Список нескаченных ссылок сохранён в failed_downloads.txt",
+                "Некоторые видео не удалось скачать. Причины сохранены; ссылки с временными "
+                "ошибками можно повторить кнопкой «Повторить неудачные»",
+            )
+        elif cancelled:
+            logger.info(f"Загрузка завершена, отменено видео: {cancelled}")  # noqa: G004
+            QtWidgets.QMessageBox.information(
+                self,
+                "Остановлено",
+                f"Отменено видео: {cancelled}. Недокачанные части (.part) сохранены: "
+                "повторная загрузка тех же ссылок продолжит их с места остановки",
             )
         else:
             logger.info("Все видео успешно загружены")
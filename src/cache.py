@@ -0,0 +1,155 @@
+"""
+Постоянный кэш yt-dlp, общий для рабочих потоков и процессов.
+
+yt-dlp кэширует разобранный player JS, функции расшифровки подписи (sig,
+nsig) и токены экстракторов в cachedir; без этой опции кэш лежит в
+~/.cache/yt-dlp, а у собранного PyInstaller exe может оказаться
+недоступным — тогда та же работа повторяется при каждом запуске.
+PersistentCache держит кэш в папке приложения и подключается к каждому
+YoutubeDL (attach):
+
+- чтение и запись кэша идут под файловой блокировкой (общей для чтения,
+  исключительной для записи) — рабочие потоки, демон и GUI,
+  запущенные одновременно, не читают наполовину записанный файл;
+- считаются попадания и промахи (видны в GET /health демона);
+- при превышении max_size удаляются записи, которые дольше всего
+  не читались.
+"""  # noqa: RUF002
+
+__all__ = ["CACHE_DIRNAME", "MAX_CACHE_SIZE", "PersistentCache", "default_cache_dir"]
+
+import contextlib
+import logging
+import os
+import pathlib
+import sys
+import threading
+
+from yt_dlp.cache import Cache
+from yt_dlp.utils import locked_file
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Папка кэша в директории приложения (yt-dlp удаляет только папки с "cache" в пути)
+CACHE_DIRNAME = "cache"
+# Предел размера кэша, байт
+MAX_CACHE_SIZE = 64 * 1024 * 1024
+# Файл блокировки в корне кэша
+LOCK_FILENAME = ".lock"
+
+_MISSING = object()
+
+
+def default_cache_dir() -> pathlib.Path:
+    """Папка кэша рядом с exe или в корне исходников (как директория приложения GUI)"""  # noqa: RUF002
+    if getattr(sys, "frozen", False):
+        app_dir = pathlib.Path(sys.executable).parent
+    else:
+        app_dir = pathlib.Path(__file__).resolve().parent.parent
+    return app_dir / CACHE_DIRNAME
+
+
+class _LockedCache(Cache):
+    """Cache yt-dlp с блокировкой, счётчиками и пределом размера"""  # noqa: RUF002
+
+    def __init__(self, ydl, owner):
+        super().__init__(ydl)
+        self.owner = owner
+
+    def load(self, section, key, dtype="json", default=None, *, min_ver=None):
+        if not self.enabled:
+            return default
+        with self.owner.locked(exclusive=False):
+            data = super().load(section, key, dtype, _MISSING, min_ver=min_ver)
+            if data is not _MISSING:
+                # Время изменения — время последнего чтения: по нему вытесняются старые записи
+                with contextlib.suppress(OSError):
+                    os.utime(self._get_cache_fn(section, key, dtype))
+        self.owner.count("hits" if data is not _MISSING else "misses")
+        return default if data is _MISSING else data
+
+    def store(self, section, key, data, dtype="json"):
+        if not self.enabled:
+            return
+        with self.owner.locked(exclusive=True):
+            super().store(section, key, data, dtype)
+            self.owner.count("stores")
+            self.owner.trim()
+
+
+class PersistentCache:
+    """
+    Постоянная папка кэша yt-dlp.
+
+    Args:
+        directory: Папка кэша (создаётся при первой записи)
+        max_size: Предел размера кэша, байт
+    """
+
+    def __init__(self, directory, max_size=MAX_CACHE_SIZE):
+        self.directory = pathlib.Path(directory)
+        self.max_size = max_size
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def attach(self, ydl):
+        """Подключает YoutubeDL к кэшу (опция cachedir уже должна указывать на directory)"""
+        ydl.cache = _LockedCache(ydl, self)
+        return ydl
+
+    @contextlib.contextmanager
+    def locked(self, exclusive):
+        """
+        Блокировка кэша между потоками и процессами.
+
+        flock/LockFileEx действуют на открытый файл, поэтому каждый вход
+        открывает файл блокировки заново — так исключаются и потоки
+        одного процесса.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_path = self.directory / LOCK_FILENAME
+        if not exclusive and not lock_path.exists():
+            lock_path.touch()
+        with locked_file(str(lock_path), "a" if exclusive else "r", block=True):
+            yield
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _entries(self):
+        """Файлы записей кэша: (время чтения, размер, путь)"""
+        entries = []
+        for path in self.directory.rglob("*"):
+            if path.name == LOCK_FILENAME or not path.is_file():
+                continue
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        """Размер кэша, байт"""
+        return sum(size for _, size, _ in self._entries()) if self.directory.exists() else 0
+
+    def trim(self):
+        """Удаляет давно не читавшиеся записи сверх max_size (под исключительной блокировкой)"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            return
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                path.unlink()
+                total -= size
+                self.count("evictions")
+                logger.debug(f"Запись кэша yt-dlp вытеснена: {path.name}")  # noqa: G004
+
+    def snapshot(self) -> dict:
+        """Счётчики и размер: {"hits": 3, "misses": 1, "stores": 1, "evictions": 0, "size": ...}"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size()
+        return stats
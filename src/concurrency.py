@@ -0,0 +1,233 @@
+"""
+Адаптивный предел одновременных загрузок с одного сайта (AIMD).
+
+Фиксированное число потоков либо недогружает канал, либо упирается в
+ограничения сайта: HTTP 429, 403 и резко упавшая скорость соединений.
+ConcurrencyController держит для каждого сайта свой предел и подстраивает
+его по результатам загрузок всех рабочих потоков:
+
+- успешная загрузка без признаков ограничения увеличивает предел
+  аддитивно — на 1 за каждые «предел» успешных загрузок;
+- ограничение (429/403, «подтвердите, что вы не бот» или скорость
+  загрузки ниже SLOWDOWN_RATIO от обычной для сайта) уменьшает предел
+  мультипликативно, не чаще раза в COOLDOWN секунд — одна волна ошибок
+  от уже идущих загрузок не обрушивает предел до единицы.
+
+Место в пределе сайта занимается, когда планировщик выдаёт элемент
+рабочему потоку (try_acquire): элемент сайта, который уже на пределе,
+остаётся в очереди, а поток берёт загрузку с другого сайта. Место
+освобождается после передачи данных, до постобработки.
+"""  # noqa: RUF002
+
+__all__ = ["ConcurrencyController", "host_of", "is_throttling"]
+
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Уменьшение предела при ограничении
+DECREASE_FACTOR = 0.5
+# Минимальный интервал между уменьшениями предела сайта, секунды
+COOLDOWN = 10.0
+# Скорость ниже этой доли от обычной для сайта считается ограничением
+SLOWDOWN_RATIO = 0.3
+# Загрузки меньше не дают оценки скорости
+MIN_SAMPLE_BYTES = 4 * 1024 * 1024
+# Вес новой оценки в скользящей средней скорости
+EWMA_ALPHA = 0.2
+# Период проверки отмены ожидания, секунды
+WAIT_POLL_INTERVAL = 1.0
+
+_THROTTLING = re.compile(
+    r"HTTP Error (?:429|403)|Too Many Requests|rate.?limit|confirm you.re not a bot",
+    re.IGNORECASE,
+)
+# Короткие домены, ограничения которых общие с основным сайтом
+_HOST_ALIASES = {"youtu.be": "youtube.com"}
+
+
+def host_of(url) -> str:
+    """Сайт ссылки: домен без www. и m."""
+    host = urlparse(url).netloc.lower().removeprefix("www.").removeprefix("m.")
+    return _HOST_ALIASES.get(host, host)
+
+
+def is_throttling(message) -> bool:
+    """Похоже ли сообщение об ошибке на ограничение со стороны сайта"""  # noqa: RUF002
+    return bool(_THROTTLING.search(message or ""))
+
+
+class _HostState:
+    def __init__(self, limit):
+        self.limit = limit
+        self.successes = 0  # успешных загрузок с последнего изменения предела
+        self.active = 0
+        self.rate = None  # обычная скорость загрузки, байт/с (EWMA)
+        self.decreased_at = None
+
+
+class ConcurrencyController:
+    """
+    Пределы одновременных загрузок по сайтам.
+
+    Args:
+        max_limit: Верхняя граница предела (обычно число рабочих потоков)
+        initial: Начальный предел для нового сайта
+        min_limit: Нижняя граница предела
+        cooldown: Минимальный интервал между уменьшениями, секунды
+        clock: Источник монотонного времени (для тестов)
+    """
+
+    def __init__(self, max_limit, initial=1, min_limit=1, cooldown=COOLDOWN, clock=time.monotonic):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.initial = max(self.min_limit, min(int(initial), self.max_limit))
+        self.cooldown = cooldown
+        self.clock = clock
+        self._hosts = {}
+        self._slots = {}  # ключ -> (сайт, время начала)
+        self._cond = threading.Condition()
+
+    def _state(self, host) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial)
+        return state
+
+    def limit(self, host) -> int:
+        """Текущий предел одновременных загрузок с сайта"""
+        with self._cond:
+            return self._state(host).limit
+
+    def available(self, host) -> bool:
+        """Есть ли свободное место в пределе сайта"""
+        with self._cond:
+            state = self._state(host)
+            return state.active < state.limit
+
+    def try_acquire(self, key, host) -> bool:
+        """
+        Занимает место в пределе сайта без ожидания.
+
+        Returns:
+            True — место получено (или уже занято этим ключом), False — сайт на пределе
+        """
+        with self._cond:
+            if key in self._slots:
+                return True
+            state = self._state(host)
+            if state.active >= state.limit:
+                return False
+            self._take(key, host, state)
+            return True
+
+    def _take(self, key, host, state):
+        state.active += 1
+        self._slots[key] = (host, self.clock())
+
+    def acquire(self, key, host, cancelled=None) -> bool:
+        """
+        Ждёт места в пределе сайта.
+
+        Повторный вызов с тем же ключом (видео плейлиста) место не занимает.
+
+        Args:
+            key: Ключ загрузки (id элемента)
+            host: Сайт
+            cancelled: Функция без аргументов; True — прекратить ожидание
+
+        Returns:
+            True — место получено, False — ожидание отменено
+        """  # noqa: RUF002
+        held = False
+        with self._cond:
+            if key in self._slots:
+                return True
+            state = self._state(host)
+            while state.active >= state.limit:
+                if cancelled is not None and cancelled():
+                    return False
+                if not held:
+                    held = True
+                    logger.info(f"Загрузка {key} ждёт: с {host} уже {state.active} из {state.limit}")  # noqa: G004
+                self._cond.wait(WAIT_POLL_INTERVAL)
+            self._take(key, host, state)
+            return True
+
+    def release(self, key, transferred=0, error=None, host=None):
+        """
+        Освобождает место и учитывает результат загрузки.
+
+        Args:
+            key: Ключ загрузки
+            transferred: Скачано байт (для оценки скорости)
+            error: Текст ошибки (None — успешно)
+            host: Сайт, если место не занималось (ошибка при извлечении)
+        """
+        with self._cond:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                host, started_at = slot
+                self._state(host).active -= 1
+                self._cond.notify_all()
+            if host is None:
+                return
+            if error is not None:
+                if is_throttling(error):
+                    self._decrease(host, "ошибка")
+                return
+            if slot is None:
+                return
+            elapsed = self.clock() - started_at
+            if transferred >= MIN_SAMPLE_BYTES and elapsed > 0 and self._slow(host, transferred / elapsed):
+                self._decrease(host, "скорость упала")
+            else:
+                self._increase(host)
+
+    def discard(self, key):
+        """Освобождает место без учёта результата (пауза, отмена)"""
+        with self._cond:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                self._state(slot[0]).active -= 1
+                self._cond.notify_all()
+
+    def _slow(self, host, rate) -> bool:
+        state = self._state(host)
+        slow = state.rate is not None and rate < state.rate * SLOWDOWN_RATIO
+        # Медленные загрузки тоже входят в среднюю: если сайт стал медленнее
+        # надолго, после нескольких загрузок это станет новой нормой
+        state.rate = rate if state.rate is None else state.rate + EWMA_ALPHA * (rate - state.rate)
+        return slow
+
+    def _increase(self, host):
+        state = self._state(host)
+        state.successes += 1
+        if state.successes < state.limit or state.limit >= self.max_limit:
+            return
+        state.successes = 0
+        state.limit += 1
+        logger.info(f"Предел одновременных загрузок с {host}: {state.limit}")  # noqa: G004
+        self._cond.notify_all()
+
+    def _decrease(self, host, reason):
+        state = self._state(host)
+        now = self.clock()
+        if state.decreased_at is not None and now - state.decreased_at < self.cooldown:
+            return
+        state.decreased_at = now
+        state.successes = 0
+        state.limit = max(self.min_limit, int(state.limit * DECREASE_FACTOR))
+        logger.warning(f"Ограничение со стороны {host} ({reason}), предел: {state.limit}")  # noqa: G004
+
+    def snapshot(self) -> dict:
+        """Состояние по сайтам: {"youtube.com": {"limit": 2, "active": 1, "rate": ...}}"""
+        with self._cond:
+            return {
+                host: {"limit": state.limit, "active": state.active, "rate": state.rate}
+                for host, state in self._hosts.items()
+            }
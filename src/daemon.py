@@ -0,0 +1,573 @@
+"""
+Headless-режим: постоянно работающий демон, следящий за файлами ссылок.
+
+Вместо однократного прохода main.py/local.py (прочитать links.txt, скачать,
+очистить, выйти) демон следит за файлами или папками со ссылками и забирает
+только новые дописанные строки, передавая их в постоянный DownloadEngine.
+
+Запуск:
+    python -m src.daemon links.txt --output result --workers 2
+
+Несколько экземпляров с общим backlog (см. jobqueue.py):
+    python -m src.daemon links.txt --queue-db queue.db --serve-coordinator 0.0.0.0:8766
+    python -m src.daemon --coordinator host:8766
+"""  # noqa: RUF002
+
+__all__ = ["LinksSource", "WatchDaemon", "main", "make_waiter"]
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import pathlib
+import select
+import shutil
+import signal
+import socket
+import sys
+import threading
+
+from src.admission import DEFAULT_MARGIN, AdmissionController
+from src.api import ControlServer
+from src.cache import MAX_CACHE_SIZE, PersistentCache, default_cache_dir
+from src.concurrency import ConcurrencyController
+from src.dedupe import INDEX_FILENAME, ContentIndex
+from src.egress import COOLDOWN, IdentityPool, parse_identity
+from src.engine import (
+    CANCELLED,
+    FILENAME_TEMPLATE,
+    UNIQUE_FILENAME_TEMPLATE,
+    DownloadEngine,
+    is_valid_url,
+)
+from src.failures import FAILURES_FILENAME, FailureStore
+from src.jobqueue import (
+    CoordinatorClient,
+    CoordinatorServer,
+    QueueWorker,
+    SQLiteJobQueue,
+)
+from src.routing import YOUTUBE_HOSTS, PoolPolicy, parse_pool
+from src.scheduling import POLICIES
+from src.segmented import CONNECTIONS
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Файлы, которые никогда не считаются источниками ссылок
+IGNORED_FILES = frozenset({"failed_downloads.txt", "error_copy_of_links.txt"})
+
+_WHITESPACE = b" \t\r\n"
+
+
+class LinksSource:
+    """
+    Файл со ссылками, из которого забираются только новые дописанные данные.
+
+    Позиция последнего прочитанного байта хранится рядом с файлом
+    (``<имя>.offset``) и сохраняется атомарно через os.replace, поэтому
+    перезапуск демона не приводит к повторным загрузкам. Позиция сдвигается
+    только через commit() — после того как ссылки приняты движком или
+    очередью, — поэтому падение между чтением и постановкой не теряет
+    ссылки: они будут прочитаны снова. Незавершённый хвост
+    (ссылка, которую ещё дописывают) не забирается до появления разделителя.
+    Если файл очистили или заменили, чтение начинается с начала.
+    """  # noqa: RUF002
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.state_path = self.path.with_name(self.path.name + ".offset")
+        self.offset = 0
+        self.inode = None
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self.offset = int(state.get("offset", 0))
+            self.inode = state.get("inode")
+        except (OSError, ValueError):
+            self.offset = 0
+            self.inode = None
+
+    def _save_state(self):
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"offset": self.offset, "inode": self.inode}),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.state_path)
+
+    def consume(self) -> tuple[list[str], int]:
+        """
+        Читает новые ссылки, дописанные после сохранённой позиции.
+
+        Позиция не сдвигается: после постановки ссылок вызовите commit()
+        с возвращённым смещением.
+
+        Returns:
+            Список валидных HTTP(S) ссылок и смещение после прочитанных данных
+        """  # noqa: RUF002
+        try:
+            with self.path.open("rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self.inode or stat.st_size < self.offset:
+                    # Файл заменён или очищен — начинаем сначала
+                    self.offset = 0
+                    self.inode = stat.st_ino
+                if stat.st_size == self.offset:
+                    return [], self.offset
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+        except FileNotFoundError:
+            return [], self.offset
+
+        # Забираем только до последнего разделителя, хвост ещё дописывается
+        cut = max(data.rfind(bytes([ch])) for ch in _WHITESPACE)
+        if cut < 0:
+            return [], self.offset
+        chunk = data[: cut + 1]
+
+        links = []
+        for token in chunk.decode("utf-8", errors="replace").split():
+            if is_valid_url(token):
+                links.append(token)
+            else:
+                logger.warning(f"Пропущена невалидная ссылка в {self.path}: {token[:100]}")  # noqa: G004
+        return links, self.offset + len(chunk)
+
+    def commit(self, offset):
+        """Сохраняет позицию после того, как прочитанные ссылки поставлены"""
+        if offset == self.offset:
+            return
+        self.offset = offset
+        self._save_state()
+
+
+def _iter_link_files(path: pathlib.Path):
+    """Файлы ссылок для пути: сам файл или все .txt в директории"""
+    if path.is_dir():
+        for entry in sorted(path.iterdir()):
+            if entry.suffix == ".txt" and entry.name not in IGNORED_FILES and entry.is_file():
+                yield entry
+    else:
+        yield path
+
+
+class _PollingWaiter:
+    """Запасной вариант ожидания изменений: периодический опрос"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._wakeup = threading.Event()
+
+    def wait(self, timeout=None):
+        timeout = self.interval if timeout is None else min(timeout, self.interval)
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def close(self):
+        self.wake()
+
+
+class _InotifyWaiter:
+    """Ожидание изменений через inotify (Linux)"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, directories, interval):
+        self.interval = interval
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        for directory in directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        # Канал для досрочного пробуждения из другого потока
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+
+    def wait(self, timeout=None):
+        # Даже с inotify иногда опрашиваем файлы (сетевые ФС не шлют событий)
+        timeout = self.interval if timeout is None else timeout
+        ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        # Содержимое событий не важно: после пробуждения пересканируем все файлы
+        for fd in ready:
+            try:
+                os.read(fd, 65536)
+            except BlockingIOError:
+                pass
+
+    def wake(self):
+        os.write(self._wake_w, b"\0")
+
+    def close(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def make_waiter(directories, interval=1.0, use_inotify=True):
+    """
+    Создаёт объект ожидания изменений в директориях.
+
+    На Linux используется inotify, иначе (или при ошибке) — опрос.
+    """  # noqa: RUF002
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            waiter = _InotifyWaiter(directories, interval=max(interval, 30.0))
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify недоступен, используется опрос: {e}")  # noqa: G004
+        else:
+            logger.info("Слежение за файлами через inotify")
+            return waiter
+    logger.info(f"Слежение за файлами опросом каждые {interval} с")  # noqa: G004
+    return _PollingWaiter(interval)
+
+
+class WatchDaemon:
+    """
+    Демон: следит за файлами/папками со ссылками и ставит их в движок.
+
+    Args:
+        paths: Файлы со ссылками или директории с .txt файлами
+        engine: Постоянный движок загрузок
+        poll_interval: Интервал опроса (и страховочного опроса при inotify)
+        use_inotify: Разрешить inotify на Linux
+        job_queue: Общая очередь (jobqueue.py); если задана, ссылки ставятся
+            в неё, а не напрямую в движок
+        failures: База неудач (failures.py); если задана, ссылки с временными
+            ошибками повторно ставятся в движок, когда подходит время повтора
+    """  # noqa: RUF002
+
+    def __init__(self, paths, engine, poll_interval=1.0, use_inotify=True, job_queue=None, failures=None):
+        self.paths = [pathlib.Path(p) for p in paths]
+        self.engine = engine
+        self.job_queue = job_queue
+        self.failures = failures
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self._sources = {}
+        self._submitted = []
+        self._stop = threading.Event()
+        self._waiter = None
+
+    def _source(self, path):
+        source = self._sources.get(path)
+        if source is None:
+            source = LinksSource(path)
+            self._sources[path] = source
+        return source
+
+    def scan(self):
+        """Один проход по всем источникам: забрать новые ссылки и поставить их"""
+        items = []
+        for path in self.paths:
+            for link_file in _iter_link_files(path):
+                source = self._source(link_file)
+                links, offset = source.consume()
+                if links:
+                    logger.info(f"Новых ссылок в {link_file}: {len(links)}")  # noqa: G004
+                    if self.job_queue is not None:
+                        added = self.job_queue.add(links)
+                        logger.info(f"В общую очередь добавлено новых ссылок: {added}")  # noqa: G004
+                    else:
+                        items.extend(self.engine.submit(links, owner=str(link_file)))
+                # Позиция сохраняется только после того, как ссылки приняты
+                source.commit(offset)
+        if self.failures is not None:
+            retries = self.failures.claim_due()
+            if retries:
+                logger.info(f"Повтор неудачных загрузок: {len(retries)}")  # noqa: G004
+                self.engine.submit(retries)
+        # Держим только незавершённые элементы — они нужны для requeue_unfinished()
+        self._submitted = [item for item in self._submitted if not item.finished]
+        self._submitted.extend(items)
+        return items
+
+    def requeue_unfinished(self):
+        """
+        Возвращает в файлы ссылки, отменённые при остановке движка.
+
+        Ссылки дописываются в конец исходного файла, то есть после сохранённой
+        позиции, и будут забраны при следующем запуске.
+        """
+        returned = 0
+        for item in self._submitted:
+            if item.state != CANCELLED or item.owner is None:
+                continue
+            with pathlib.Path(item.owner).open("a", encoding="utf-8") as f:
+                f.write(item.url + "\n")
+            returned += 1
+        self._submitted = []
+        if returned:
+            logger.info(f"Возвращено в файлы ссылок: {returned}")  # noqa: G004
+        return returned
+
+    def run(self):
+        """Главный цикл демона (блокирует до stop())"""
+        directories = sorted({str(p if p.is_dir() else p.parent) for p in self.paths})
+        self._waiter = make_waiter(directories, self.poll_interval, self.use_inotify)
+        logger.info(f"Демон запущен, источники: {', '.join(map(str, self.paths))}")  # noqa: G004
+        try:
+            while not self._stop.is_set():
+                self.scan()
+                self._waiter.wait()
+        finally:
+            self._waiter.close()
+            logger.info("Демон остановлен")
+
+    def stop(self):
+        self._stop.set()
+        if self._waiter is not None:
+            with contextlib.suppress(OSError):
+                self._waiter.wake()
+
+
+def main(argv=None):
+    """Точка входа headless-демона."""
+    parser = argparse.ArgumentParser(description="YouTube Downloader: headless-демон")
+    parser.add_argument("paths", nargs="*", default=["links.txt"], help="файлы или папки со ссылками")
+    parser.add_argument("--output", default="result", help="директория для загрузок")
+    parser.add_argument("--workers", type=int, default=2, help="число параллельных загрузок с YouTube")
+    parser.add_argument(
+        "--other-workers",
+        type=int,
+        default=1,
+        help="потоков для остальных сайтов (свой пул: не задерживают YouTube)",
+    )
+    parser.add_argument(
+        "--pool",
+        action="append",
+        default=[],
+        metavar="САЙТЫ=ПОТОКОВ[/МБ/с[/ПОВТОРОВ]]",
+        help="отдельный пул для сайтов, например vimeo.com,vk.com=2/5/10 (можно несколько)",
+    )
+    parser.add_argument("--format", default="best", help="формат yt-dlp")
+    parser.add_argument("--cookies", default="cookies.txt", help="файл cookies")
+    parser.add_argument(
+        "--identity",
+        action="append",
+        default=[],
+        metavar="proxy=URL,source=IP,cookies=ФАЙЛ",
+        help="egress-личность: прокси, исходный адрес и/или cookies (можно несколько, загрузки чередуются)",
+    )
+    parser.add_argument(
+        "--identity-cooldown",
+        type=float,
+        default=COOLDOWN,
+        help="отдых личности после ограничения со стороны сайта, с (удваивается при повторах)",
+    )
+    parser.add_argument("--staging-dir", help="локальная папка для незавершённых файлов")
+    parser.add_argument(
+        "--schedule",
+        choices=sorted(POLICIES),
+        default="fifo",
+        help="порядок загрузки: fifo, sjf (сначала короткие), fair (по очереди между файлами ссылок)",
+    )
+    parser.add_argument(
+        "--outputs",
+        default="",
+        help="доп. версии из каждого файла через запятую, например 480,audio:mp3",
+    )
+    parser.add_argument(
+        "--urgent-workers",
+        type=int,
+        default=1,
+        help="потоков только для срочных загрузок (urgent в API), сверх --workers",
+    )
+    parser.add_argument(
+        "--bulk-ratelimit",
+        type=float,
+        default=None,
+        help="скорость обычных загрузок во время срочной, МБ/с (по умолчанию — без ограничения)",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=CONNECTIONS,
+        help="соединений на большой одиночный файл (1 — загрузчик yt-dlp)",
+    )
+    parser.add_argument("--prefetch", type=int, default=4, help="сколько ссылок извлекать заранее (0 — выкл.)")
+    parser.add_argument(
+        "--postprocess-workers",
+        type=int,
+        default=None,
+        help="одновременных склеек FFmpeg (по умолчанию — число ядер, 0 — в потоке загрузки)",
+    )
+    parser.add_argument(
+        "--min-free",
+        type=int,
+        default=DEFAULT_MARGIN // (1024 * 1024),
+        help="запас свободного места на диске, МБ",
+    )
+    parser.add_argument("--no-admission", action="store_true", help="не проверять место на диске")
+    parser.add_argument(
+        "--no-adaptive",
+        action="store_true",
+        help="не подстраивать число загрузок с одного сайта (всегда --workers)",
+    )
+    parser.add_argument(
+        "--content-index",
+        help=f"индекс содержимого для пропуска уже скачанного (по умолчанию <output>/{INDEX_FILENAME})",
+    )
+    parser.add_argument("--no-content-index", action="store_true", help="не вести индекс содержимого")
+    parser.add_argument(
+        "--cache-dir",
+        help=f"постоянный кэш yt-dlp: player JS, подписи, токены (по умолчанию {default_cache_dir()})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=MAX_CACHE_SIZE // (1024 * 1024),
+        help="предел размера кэша yt-dlp, МБ",
+    )
+    parser.add_argument(
+        "--failures",
+        help=f"база неудачных загрузок (по умолчанию <output>/{FAILURES_FILENAME})",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="повторять ссылки с временными ошибками (с нарастающей задержкой)",
+    )
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="интервал опроса, с")
+    parser.add_argument("--no-inotify", action="store_true", help="только опрос")
+    parser.add_argument("--api-port", type=int, default=None, help="порт HTTP API управления")
+    parser.add_argument("--api-host", default="127.0.0.1", help="адрес HTTP API управления")
+    parser.add_argument("--queue-db", help="общая очередь заданий в SQLite")
+    parser.add_argument("--coordinator", help="адрес TCP-координатора очереди host:port")
+    parser.add_argument("--serve-coordinator", help="запустить координатор для --queue-db на host:port")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}:{os.getpid()}", help="имя исполнителя")
+    args = parser.parse_args(argv)
+    if args.queue_db and args.coordinator:
+        parser.error("--queue-db и --coordinator взаимоисключающие")
+    if args.serve_coordinator and not args.queue_db:
+        parser.error("--serve-coordinator требует --queue-db")
+    try:
+        pools = [parse_pool(spec) for spec in args.pool]
+    except ValueError as e:
+        parser.error(str(e))
+    # YouTube — свой пул на --workers потоков (если не задан через --pool)
+    if not any(set(pool.hosts) & set(YOUTUBE_HOSTS) for pool in pools):
+        pools.append(PoolPolicy("youtube", YOUTUBE_HOSTS, max(1, args.workers)))
+    workers = [pool.workers for pool in pools]
+    try:
+        identities = [parse_identity(spec) for spec in args.identity]
+        identity_pool = IdentityPool(identities, cooldown=args.identity_cooldown) if identities else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)-8s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    job_queue = None
+    if args.queue_db:
+        job_queue = SQLiteJobQueue(args.queue_db)
+    elif args.coordinator:
+        host, _, port = args.coordinator.rpartition(":")
+        job_queue = CoordinatorClient(host, int(port))
+
+    pathlib.Path(args.output).mkdir(parents=True, exist_ok=True)
+    index = None
+    if not args.no_content_index:
+        index = ContentIndex(args.content_index or pathlib.Path(args.output) / INDEX_FILENAME)
+    failures = FailureStore(args.failures or pathlib.Path(args.output) / FAILURES_FILENAME)
+    # Повторы, выданные прошлым запуском и не завершённые
+    failures.reset_claimed()
+    engine = DownloadEngine(
+        # Сайты без своего пула
+        max_workers=max(1, args.other_workers),
+        pools=pools,
+        download_dir=args.output,
+        fmt=args.format,
+        ffmpeg_location=shutil.which("ffmpeg"),
+        cookies_path=pathlib.Path(args.cookies),
+        staging_dir=args.staging_dir,
+        policy=args.schedule,
+        prefetch=max(0, args.prefetch),
+        postprocess_workers=args.postprocess_workers,
+        outputs=[spec.strip() for spec in args.outputs.split(",") if spec.strip()],
+        admission=None if args.no_admission else AdmissionController(margin=args.min_free * 1024 * 1024),
+        index=index,
+        urgent_workers=max(0, args.urgent_workers),
+        connections=args.connections,
+        concurrency=None if args.no_adaptive else ConcurrencyController(max(args.other_workers, *workers)),
+        identities=identity_pool,
+        cache=PersistentCache(args.cache_dir or default_cache_dir(), max_size=args.cache_size * 1024 * 1024),
+        bulk_ratelimit=int(args.bulk_ratelimit * 1024 * 1024) if args.bulk_ratelimit else None,
+        # В общей папке несколько хостов: одинаковые названия не должны совпадать
+        filename_template=UNIQUE_FILENAME_TEMPLATE if job_queue is not None else FILENAME_TEMPLATE,
+    )
+    daemon = WatchDaemon(
+        args.paths,
+        engine,
+        poll_interval=args.poll_interval,
+        use_inotify=not args.no_inotify,
+        job_queue=job_queue,
+        failures=failures if args.retry_failed else None,
+    )
+
+    def handle_signal(signum, frame):
+        logger.info(f"Получен сигнал {signum}, завершаем работу")  # noqa: G004
+        daemon.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    engine.add_listener(failures.on_engine_event)
+    engine.start()
+    api = None
+    if args.api_port is not None:
+        api = ControlServer(engine, host=args.api_host, port=args.api_port)
+        api.start()
+    coordinator = None
+    if args.serve_coordinator:
+        host, _, port = args.serve_coordinator.rpartition(":")
+        coordinator = CoordinatorServer(job_queue, host=host, port=int(port))
+        coordinator.start()
+    queue_worker = None
+    if job_queue is not None:
+        queue_worker = QueueWorker(job_queue, engine, args.worker_id)
+        queue_worker.start()
+    try:
+        daemon.run()
+    finally:
+        if api is not None:
+            api.stop()
+        if queue_worker is not None:
+            queue_worker.stop()
+        engine.shutdown()
+        if queue_worker is not None:
+            queue_worker.release_unfinished()
+        if coordinator is not None:
+            coordinator.stop()
+        if job_queue is not None:
+            job_queue.close()
+        if index is not None:
+            index.close()
+        failures.close()
+        daemon.requeue_unfinished()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Индекс содержимого загрузок и поиск дубликатов.
+
+Одно и то же видео часто оказывается сохранённым несколько раз — под
+немного другим названием или в другой папке. ContentIndex хранит в SQLite
+хеш SHA-256 каждого готового файла вместе с его размером, mtime и
+источником (экстрактор, id видео, формат):
+
+- хеш считается при переносе файла из staging на другую файловую систему
+  по тем же блокам, что и копирование (см. staging.move_file), без
+  отдельного прохода чтения; иначе — в пуле постобработки движка, пока
+  файл ещё в кэше страниц, не занимая рабочий поток загрузки;
+- перед загрузкой движок проверяет источник по индексу и пропускает
+  видео, чей файл уже лежит на диске без изменений;
+- ``python -m src.dedupe <папка>`` индексирует уже существующие файлы,
+  показывает группы одинаковых файлов и по ``--link`` заменяет копии
+  жёсткими ссылками или reflink-копиями (Linux: Btrfs, XFS).
+
+Запись индекса считается актуальной, пока размер и mtime файла совпадают
+с сохранёнными; изменённые файлы хешируются заново.
+"""  # noqa: RUF002
+
+__all__ = ["INDEX_FILENAME", "ContentIndex", "hash_file", "link_duplicates", "main", "source_key"]
+
+import argparse
+import contextlib
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import sys
+import threading
+import time
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Имя файла индекса по умолчанию (в корне папки загрузок)
+INDEX_FILENAME = ".content-index.sqlite3"
+
+HASH_ALGORITHM = "sha256"
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# ioctl FICLONE (Linux): reflink-копия файла
+_FICLONE = 0x40049409
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path       TEXT PRIMARY KEY,
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    digest     TEXT NOT NULL,
+    source     TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+CREATE INDEX IF NOT EXISTS files_source ON files (source);
+"""
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE) -> str:
+    """SHA-256 содержимого файла (hex)"""
+    hasher = hashlib.new(HASH_ALGORITHM)
+    with pathlib.Path(path).open("rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def source_key(info) -> str | None:
+    """
+    Ключ источника: экстрактор, id видео и формат.
+
+    Returns:
+        Строка вида ``"youtube dQw4w9WgXcQ 137+140"`` или None, если
+        в метаданных нет id
+    """
+    extractor = info.get("extractor_key") or info.get("extractor")
+    if not extractor or not info.get("id"):
+        return None
+    return f"{extractor.lower()} {info['id']} {info.get('format_id') or ''}".rstrip()
+
+
+class ContentIndex:
+    """
+    Индекс содержимого файлов в SQLite.
+
+    Безопасен для нескольких потоков (общее соединение под блокировкой).
+
+    Args:
+        path: Путь к файлу базы
+        clock: Источник времени (для тестов)
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = str(path)
+        self.clock = clock
+        self._lock = threading.Lock()
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _key(path) -> str:
+        return str(pathlib.Path(path).absolute())
+
+    def add(self, path, digest=None, source=None) -> list[pathlib.Path]:
+        """
+        Добавляет или обновляет файл в индексе.
+
+        Args:
+            path: Файл
+            digest: Уже посчитанный хеш (None — посчитать по файлу)
+            source: Ключ источника (см. source_key)
+
+        Returns:
+            Другие файлы индекса с тем же содержимым
+        """
+        key = self._key(path)
+        stat = os.stat(key)
+        if digest is None:
+            digest = hash_file(key)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest, source, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, digest, source, self.clock()),
+            )
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE digest = ? AND size = ? AND path != ?",
+                (digest, stat.st_size, key),
+            ).fetchall()
+        return [pathlib.Path(row[0]) for row in rows]
+
+    def forget(self, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (self._key(path),))
+
+    def lookup(self, path) -> str | None:
+        """Хеш файла из индекса или None, если файла нет или он изменился"""
+        key = self._key(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (row[0], row[1]):
+            return None
+        return row[2]
+
+    def find_source(self, source) -> pathlib.Path | None:
+        """
+        Файл, уже скачанный из этого источника.
+
+        Записи удалённых или изменённых файлов удаляются из индекса.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE source = ? ORDER BY indexed_at DESC",
+                (source,),
+            ).fetchall()
+        for path, size, mtime_ns in rows:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                return pathlib.Path(path)
+            self.forget(path)
+        return None
+
+    def scan(self, directory) -> int:
+        """
+        Индексирует файлы папки (рекурсивно).
+
+        Хешируются только новые и изменённые файлы; записи удалённых файлов
+        этой папки удаляются.
+
+        Returns:
+            Сколько файлов было захешировано
+        """
+        directory = pathlib.Path(directory).absolute()
+        index_files = {self._key(self.path + suffix) for suffix in ("", "-wal", "-shm", "-journal")}
+        seen = set()
+        hashed = 0
+        for path in sorted(directory.rglob("*")):
+            key = self._key(path)
+            if not path.is_file() or path.is_symlink() or key in index_files:
+                continue
+            if path.suffix in (".part", ".ytdl", ".moving", ".segments"):
+                continue  # незавершённые загрузки и переносы
+            if any(part.startswith(".") for part in path.relative_to(directory).parts):
+                continue  # служебные файлы приложения (.library.sqlite3, .failures.sqlite3, ...)
+            seen.add(key)
+            if self.lookup(key) is None:
+                try:
+                    self.add(key)
+                except OSError as e:
+                    logger.warning(f"Не удалось проиндексировать {path}: {e}")  # noqa: G004
+                    continue
+                hashed += 1
+        prefix = str(directory) + os.sep
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT path FROM files").fetchall()
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [row for row in rows if row[0].startswith(prefix) and row[0] not in seen],
+            )
+        return hashed
+
+    def duplicates(self) -> list[list[pathlib.Path]]:
+        """Группы файлов с одинаковым содержимым (больше одного пути в группе)"""  # noqa: RUF002
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, path FROM files WHERE size > 0 AND digest IN"
+                " (SELECT digest FROM files GROUP BY digest HAVING COUNT(*) > 1)"
+                " ORDER BY digest, indexed_at, path",
+            ).fetchall()
+        groups = {}
+        for digest, path in rows:
+            groups.setdefault(digest, []).append(pathlib.Path(path))
+        return list(groups.values())
+
+
+def _reflink(src: pathlib.Path, dst: pathlib.Path):
+    import fcntl  # noqa: PLC0415
+
+    with src.open("rb") as fin, dst.open("wb") as fout:
+        fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+
+
+def link_duplicates(paths, mode="hardlink", dry_run=False) -> int:
+    """
+    Заменяет копии первого файла группы ссылками на него.
+
+    Замена атомарна: ссылка создаётся рядом под временным именем
+    и переименовывается поверх копии. Файлы на другой файловой системе
+    и уже связанные жёсткой ссылкой пропускаются.
+
+    Args:
+        paths: Файлы с одинаковым содержимым (первый остаётся как есть)
+        mode: "hardlink" или "reflink"
+        dry_run: Только посчитать, ничего не меняя
+
+    Returns:
+        Сколько байт освобождено (или было бы освобождено)
+    """  # noqa: RUF002
+    keep, *copies = (pathlib.Path(path) for path in paths)
+    keep_stat = keep.stat()
+    saved = 0
+    for copy in copies:
+        try:
+            stat = copy.stat()
+        except OSError as e:
+            logger.warning(f"Пропуск {copy}: {e}")  # noqa: G004
+            continue
+        if (stat.st_dev, stat.st_ino) == (keep_stat.st_dev, keep_stat.st_ino):
+            continue  # уже одна и та же запись на диске
+        if stat.st_dev != keep_stat.st_dev:
+            logger.warning(f"Пропуск {copy}: другая файловая система, чем у {keep}")  # noqa: G004
+            continue
+        if not dry_run:
+            temp = copy.with_name(copy.name + ".dedupe")
+            try:
+                if mode == "reflink":
+                    _reflink(keep, temp)
+                else:
+                    os.link(keep, temp)
+                os.replace(temp, copy)
+            except OSError as e:
+                with contextlib.suppress(OSError):
+                    temp.unlink()
+                logger.warning(f"Не удалось связать {copy} с {keep}: {e}")  # noqa: G004
+                continue
+            logger.info(f"{copy} -> {keep} ({mode})")  # noqa: G004
+        saved += stat.st_size
+    return saved
+
+
+def _format_size(size) -> str:
+    return f"{size / 1024 / 1024:.1f} МБ"
+
+
+def main(argv=None):
+    """Точка входа: индексирование папки и поиск дубликатов"""
+    parser = argparse.ArgumentParser(description="YouTube Downloader: поиск одинаковых файлов")
+    parser.add_argument("directory", nargs="?", default="result", help="папка с загрузками")
+    parser.add_argument("--index", help=f"файл индекса (по умолчанию <папка>/{INDEX_FILENAME})")
+    parser.add_argument(
+        "--link",
+        choices=("hardlink", "reflink"),
+        help="заменить копии жёсткими ссылками или reflink-копиями",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="только показать, сколько места освободится")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s | %(message)s")
+    directory = pathlib.Path(args.directory)
+    index = ContentIndex(args.index or directory / INDEX_FILENAME)
+    try:
+        hashed = index.scan(directory)
+        logger.info(f"Захешировано файлов: {hashed}")  # noqa: G004
+        root = directory.absolute()
+        groups = [[path for path in group if root in path.parents] for group in index.duplicates()]
+        groups = [group for group in groups if len(group) > 1]
+        wasted = 0
+        for group in groups:
+            size = group[0].stat().st_size
+            print(f"{len(group)} одинаковых файла по {_format_size(size)}:")
+            for path in group:
+                print(f"    {path}")
+            if args.link:
+                wasted += link_duplicates(group, args.link, dry_run=args.dry_run)
+            else:
+                wasted += link_duplicates(group, dry_run=True)
+        if args.link and not args.dry_run:
+            # Связанные копии получили mtime оригинала — обновляем записи
+            for group in groups:
+                digest = index.lookup(group[0])
+                for path in group[1:]:
+                    index.add(path, digest=digest)
+            print(f"Освобождено: {_format_size(wasted)}")
+        else:
+            print(f"Групп дубликатов: {len(groups)}, можно освободить: {_format_size(wasted)}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Пул egress-личностей: прокси, исходный адрес и cookies для загрузок.
+
+Все загрузки по умолчанию идут с одного адреса и с одним cookies.txt,
+поэтому ограничения сайта по IP или аккаунту (HTTP 429, «подтвердите,
+что вы не бот») останавливают сразу все рабочие потоки. IdentityPool
+раздаёт загрузкам личности (EgressIdentity):
+
+- каждой загрузке — наименее занятая из доступных личностей;
+- видео одного плейлиста (параметр list= в ссылке) идут через одну и ту
+  же личность, пока она доступна (sticky);
+- личность, упёршаяся в ограничение, отдыхает COOLDOWN секунд, при
+  повторных ограничениях — вдвое дольше (до MAX_COOLDOWN);
+- фоновая проверка раз в CHECK_INTERVAL секунд исключает личности,
+  через которые не проходит запрос к CHECK_URL (упавший прокси).
+
+Если доступных личностей нет, загрузка получает ту, что освободится
+раньше всех, — очередь не останавливается.
+"""  # noqa: RUF002
+
+__all__ = ["EgressIdentity", "IdentityPool", "parse_identity", "probe_identity", "sticky_key"]
+
+import collections
+import logging
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import yt_dlp
+
+from src.concurrency import is_throttling
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Отдых личности после ограничения, секунды (удваивается при повторах)
+COOLDOWN = 300.0
+MAX_COOLDOWN = 3600.0
+# Период проверки доступности личностей, секунды
+CHECK_INTERVAL = 600.0
+# Адрес проверки: пустой ответ 204 без cookies и лимитов
+CHECK_URL = "https://www.youtube.com/generate_204"
+CHECK_TIMEOUT = 10.0
+
+# name — имя в логах и /health; proxy — URL прокси yt-dlp ("" — напрямую);
+# source_address — локальный адрес исходящих соединений; cookies — файл Netscape
+# (None — общий cookies.txt движка)
+EgressIdentity = collections.namedtuple(
+    "EgressIdentity",
+    ["name", "proxy", "source_address", "cookies"],
+    defaults=(None, None, None),
+)
+
+_SPEC_KEYS = {"name", "proxy", "source", "cookies"}
+
+
+def parse_identity(spec) -> EgressIdentity:
+    """
+    Разбирает описание личности ``ключ=значение[,ключ=значение...]``.
+
+    Ключи: proxy, source (исходный адрес), cookies (файл), name. Например,
+    ``proxy=socks5://127.0.0.1:1080,cookies=alt.txt``. Без name имя
+    берётся из прокси, адреса или файла cookies.
+
+    Raises:
+        ValueError: Неверное описание
+    """
+    values = {}
+    for part in spec.split(","):
+        key, sep, value = part.partition("=")
+        key = key.strip()
+        if not sep or key not in _SPEC_KEYS or not value.strip():
+            raise ValueError(f"Неверное описание личности {spec!r}: ожидается ключ=значение с ключами proxy, source, cookies, name")
+        values[key] = value.strip()
+    if not values.keys() & {"proxy", "source", "cookies"}:
+        raise ValueError(f"Неверное описание личности {spec!r}: нужен прокси, адрес или файл cookies")
+    proxy = values.get("proxy")
+    name = values.get("name")
+    if not name and proxy:
+        name = urlparse(proxy).netloc or proxy
+    name = name or values.get("source") or values["cookies"]
+    return EgressIdentity(name, proxy, values.get("source"), values.get("cookies"))
+
+
+def sticky_key(url) -> str | None:
+    """Ключ закрепления: id плейлиста из ссылки (None — ссылка не из плейлиста)"""
+    playlist = parse_qs(urlparse(url).query).get("list")
+    return f"list:{playlist[0]}" if playlist else None
+
+
+def probe_identity(identity, url=CHECK_URL, timeout=CHECK_TIMEOUT) -> bool:
+    """Проходит ли запрос к url через прокси и адрес личности"""
+    params = {"quiet": True, "no_warnings": True, "socket_timeout": timeout}
+    if identity.proxy is not None:
+        params["proxy"] = identity.proxy
+    if identity.source_address is not None:
+        params["source_address"] = identity.source_address
+    try:
+        with yt_dlp.YoutubeDL(params) as ydl, ydl.urlopen(url) as response:
+            return response.status < 400  # noqa: PLR2004
+    except Exception as e:  # noqa: BLE001
+        logger.debug(f"Проверка личности {identity.name} не прошла: {e}")  # noqa: G004
+        return False
+
+
+class _IdentityState:
+    def __init__(self, identity):
+        self.identity = identity
+        self.active = 0
+        self.uses = 0
+        self.healthy = True
+        self.strikes = 0  # ограничений подряд
+        self.cooldown_until = 0.0
+
+
+class IdentityPool:
+    """
+    Выбор egress-личности для загрузок.
+
+    Args:
+        identities: Личности (EgressIdentity) с уникальными именами
+        cooldown: Отдых после первого ограничения, секунды
+        max_cooldown: Верхняя граница отдыха, секунды
+        check_interval: Период фоновой проверки (0/None — не проверять)
+        probe: Функция проверки ``probe(identity) -> bool`` (по умолчанию probe_identity)
+        clock: Источник монотонного времени (для тестов)
+    """  # noqa: RUF002
+
+    def __init__(  # noqa: PLR0913
+        self,
+        identities,
+        cooldown=COOLDOWN,
+        max_cooldown=MAX_COOLDOWN,
+        check_interval=CHECK_INTERVAL,
+        probe=probe_identity,
+        clock=time.monotonic,
+    ):
+        self.identities = list(identities)
+        names = [identity.name for identity in self.identities]
+        if not names or len(set(names)) != len(names):
+            raise ValueError("Нужна хотя бы одна личность, имена личностей должны быть уникальны")
+        self.cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.check_interval = check_interval
+        self.probe = probe
+        self.clock = clock
+        self._states = {identity.name: _IdentityState(identity) for identity in self.identities}
+        self._assigned = {}  # ключ загрузки -> имя личности
+        self._sticky = {}  # ключ закрепления -> имя личности
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # ---------- выбор ----------
+
+    def _available(self, state, now) -> bool:
+        return state.healthy and state.cooldown_until <= now
+
+    def pick(self, sticky=None, prefer=None) -> EgressIdentity:
+        """
+        Личность, которую получила бы загрузка сейчас, без её занятия.
+
+        Args:
+            sticky: Ключ закрепления (sticky_key)
+            prefer: Личность, которой отдать предпочтение при равной занятости
+        """
+        with self._lock:
+            return self._pick(sticky, prefer).identity
+
+    def _pick(self, sticky, prefer) -> _IdentityState:
+        now = self.clock()
+        name = self._sticky.get(sticky) if sticky is not None else None
+        if name is not None and self._available(self._states[name], now):
+            return self._states[name]
+        candidates = [state for state in self._states.values() if self._available(state, now)]
+        if not candidates:
+            # Все отдыхают или недоступны: та, что освободится раньше, рабочие — первыми
+            return min(self._states.values(), key=lambda s: (not s.healthy, s.cooldown_until, s.active))
+        preferred = prefer.name if prefer is not None else None
+        return min(candidates, key=lambda s: (s.active, s.identity.name != preferred, s.uses))
+
+    def acquire(self, key, sticky=None, prefer=None) -> EgressIdentity:
+        """
+        Занимает личность для загрузки.
+
+        Повторный вызов с тем же ключом возвращает ту же личность.
+
+        Args:
+            key: Ключ загрузки (id элемента)
+            sticky: Ключ закрепления (sticky_key): видео одного плейлиста идут через одну личность
+            prefer: Личность, которой отдать предпочтение при равной занятости
+                (через неё уже извлечены метаданные или открыт «тёплый» YoutubeDL)
+        """  # noqa: RUF002
+        with self._lock:
+            name = self._assigned.get(key)
+            if name is not None:
+                return self._states[name].identity
+            state = self._pick(sticky, prefer)
+            if not self._available(state, self.clock()):
+                logger.warning(f"Нет доступных egress-личностей, загрузка {key} идёт через {state.identity.name}")  # noqa: G004
+            state.active += 1
+            state.uses += 1
+            self._assigned[key] = state.identity.name
+            if sticky is not None:
+                self._sticky[sticky] = state.identity.name
+            return state.identity
+
+    def release(self, key, error=None):
+        """
+        Освобождает личность загрузки и учитывает результат.
+
+        Args:
+            key: Ключ загрузки
+            error: Текст ошибки (None — успешно или отменено)
+        """
+        with self._lock:
+            name = self._assigned.pop(key, None)
+            if name is None:
+                return
+            state = self._states[name]
+            state.active -= 1
+            if error is None:
+                state.strikes = 0
+            elif is_throttling(error):
+                self._cool_down(state)
+
+    def _cool_down(self, state):
+        now = self.clock()
+        if state.cooldown_until > now:
+            return  # волна ошибок от уже идущих загрузок
+        state.strikes += 1
+        delay = min(self.max_cooldown, self.cooldown * 2 ** (state.strikes - 1))
+        state.cooldown_until = now + delay
+        # Плейлисты переходят на другие личности
+        self._sticky = {key: name for key, name in self._sticky.items() if name != state.identity.name}
+        logger.warning(f"Ограничение для egress-личности {state.identity.name}, отдых {delay:.0f} с")  # noqa: G004
+
+    # ---------- проверка доступности ----------
+
+    def check(self) -> dict:
+        """
+        Проверяет все личности функцией probe.
+
+        Returns:
+            {имя: доступна ли}
+        """
+        results = {}
+        for identity in self.identities:
+            try:
+                healthy = bool(self.probe(identity))
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Ошибка проверки личности {identity.name}: {e}")  # noqa: G004
+                healthy = False
+            results[identity.name] = healthy
+            with self._lock:
+                state = self._states[identity.name]
+                if state.healthy != healthy:
+                    if healthy:
+                        logger.info(f"Egress-личность {identity.name} снова доступна")  # noqa: G004
+                    else:
+                        logger.warning(f"Egress-личность {identity.name} недоступна, исключена из выдачи")  # noqa: G004
+                state.healthy = healthy
+        return results
+
+    def start(self):
+        """Запускает фоновую проверку (check_interval 0/None — не запускает)"""
+        if not self.check_interval or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="egress-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.check()
+            self._stopped.wait(self.check_interval)
+
+    def snapshot(self) -> dict:
+        """Состояние по личностям: {"имя": {"active": 1, "healthy": True, "cooldown": 0, "uses": 3}}"""
+        now = self.clock()
+        with self._lock:
+            return {
+                name: {
+                    "active": state.active,
+                    "healthy": state.healthy,
+                    "cooldown": max(0.0, round(state.cooldown_until - now, 1)),
+                    "uses": state.uses,
+                }
+                for name, state in self._states.items()
+            }
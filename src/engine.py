@@ -0,0 +1,1286 @@
+__all__ = [
+    "CANCELLED",
+    "DONE",
+    "DOWNLOADING",
+    "EXTRACTING",
+    "FAILED",
+    "FINAL_STATES",
+    "MOVING",
+    "PAUSED",
+    "POSTPROCESSING",
+    "QUEUED",
+    "UNIQUE_FILENAME_TEMPLATE",
+    "DownloadCancelledByUser",
+    "DownloadEngine",
+    "DownloadItem",
+    "YTDLPLogger",
+    "build_ydl_opts",
+    "is_valid_url",
+]
+
+import collections
+import contextlib
+import functools
+import hashlib
+import itertools
+import logging
+import pathlib
+import threading
+import time
+from urllib.parse import urlparse
+
+import yt_dlp
+from yt_dlp.postprocessor import PostProcessor
+
+from src.admission import (
+    MERGE_SPACE_FACTOR,
+    AdmissionController,
+    estimate_download_size,
+)
+from src.cache import PersistentCache
+from src.concurrency import ConcurrencyController, host_of
+from src.dedupe import HASH_ALGORITHM, ContentIndex, source_key
+from src.egress import IdentityPool, sticky_key
+from src.formats import audio_postprocessors, parse_audio_profile, resolve_format
+from src.postprocess import LoudnessNormalizePP, PostprocessPool, defer_postprocessing
+from src.prefetch import Prefetcher
+from src.renditions import make_rendition, parse_output
+from src.routing import DEFAULT_POOL, PoolPolicy, Router
+from src.scheduling import Scheduler
+from src.segmented import use_segmented_downloader
+from src.session import SharedSession
+from src.staging import FileMover, same_filesystem, staging_subdir
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Состояния элемента очереди
+QUEUED = "queued"
+EXTRACTING = "extracting"  # извлечение метаданных, байты ещё не идут
+DOWNLOADING = "downloading"
+POSTPROCESSING = "postprocessing"  # склейка/перепаковка в пуле постобработки
+MOVING = "moving"  # перенос из staging в итоговую папку
+PAUSED = "paused"  # приостановлен пользователем, .part файл ждёт докачки
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = frozenset({DONE, FAILED, CANCELLED})
+
+# Шаблон имени файла по умолчанию и уникальный (с id видео) для общей папки
+FILENAME_TEMPLATE = "%(title)s.%(ext)s"
+UNIQUE_FILENAME_TEMPLATE = "%(title)s [%(id)s].%(ext)s"
+
+# Контейнер для склейки по умолчанию и запасной, если первый не подошёл
+MERGE_FORMAT = "webm"
+FALLBACK_MERGE_FORMAT = "mkv"
+
+# Паузы перед повторами запросов yt-dlp растут: 1, 2, 4, … секунд, но не больше
+RETRY_SLEEP_MAX = 30.0
+
+
+def _retry_sleep(n) -> float:
+    """Пауза перед повтором номер n + 1 (retry_sleep_functions yt-dlp)"""
+    return min(RETRY_SLEEP_MAX, 2.0**n)
+
+
+def is_valid_url(url: str) -> bool:
+    """Простая валидация HTTP(S) URL."""
+    try:
+        parsed = urlparse(url.strip())
+        return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+    except Exception:  # noqa: BLE001
+        return False
+
+
+class DownloadCancelledByUser(yt_dlp.utils.DownloadCancelled):
+    """Загрузка отменена пользователем (бросается из progress hook)"""
+
+    msg = "Download cancelled by user"
+
+
+class YTDLPLogger:
+    """
+    Кастомный logger для yt-dlp, который перенаправляет
+    все сообщения в Python logging.
+    """
+
+    def __init__(self, logger_instance):
+        self.logger = logger_instance
+
+    def debug(self, msg):
+        """yt-dlp передаёт сюда информационные сообщения"""
+        # yt-dlp использует debug для обычных info-сообщений
+        if msg.startswith("[debug] "):
+            self.logger.debug(msg)
+        else:
+            self.logger.info(msg)
+
+    def info(self, msg):
+        """Информационные сообщения"""
+        self.logger.info(msg)
+
+    def warning(self, msg):
+        """Предупреждения (WARNING prefix от yt-dlp)"""
+        self.logger.warning(msg)
+
+    def error(self, msg):
+        """Ошибки"""
+        self.logger.error(msg)
+
+
+def build_ydl_opts(
+    download_dir: pathlib.Path,
+    fmt: str,
+    ffmpeg_location: str | None = None,
+    cookies_path: pathlib.Path | None = None,
+    merge_format: str = MERGE_FORMAT,
+    filename_template: str = FILENAME_TEMPLATE,
+    cache_dir: pathlib.Path | None = None,
+) -> dict:
+    """
+    Собирает опции yt-dlp, общие для GUI и headless-режима.
+
+    Args:
+        download_dir: Директория для сохранения
+        fmt: Строка выбора формата yt-dlp, профиль "fast[:высота[:допуск]]"
+            или "audio[:кодек[:громкость]]"
+        ffmpeg_location: Путь к FFmpeg (None — искать в PATH)
+        cookies_path: Файл cookies в формате Netscape (используется, если существует;
+            None — cookies подключает SharedSession)
+        merge_format: Контейнер для склейки видео и аудио
+        filename_template: Шаблон имени файла yt-dlp
+        cache_dir: Постоянная папка кэша yt-dlp (None — кэш yt-dlp по умолчанию)
+
+    Returns:
+        Словарь опций для yt_dlp.YoutubeDL
+    """
+    ydl_opts = {
+        "outtmpl": str(pathlib.Path(download_dir) / filename_template),
+        "format": resolve_format(fmt),
+        "socket_timeout": 30,
+        "retries": 3,
+        # Повторы сразу же только усиливают ограничение (429) со стороны сайта
+        "retry_sleep_functions": {"http": _retry_sleep, "fragment": _retry_sleep, "extractor": _retry_sleep},
+        "quiet": False,
+        "noprogress": True,
+        "merge_output_format": merge_format,
+        "continuedl": True,
+        "postprocessor_args": ["-v", "verbose"],
+        "logger": YTDLPLogger(logger),
+        "extractor_args": {"youtube": {"lang": ["ru", "ru-RU"]}},
+    }
+    if ffmpeg_location:
+        ydl_opts["ffmpeg_location"] = ffmpeg_location
+    if cache_dir is not None:
+        ydl_opts["cachedir"] = str(cache_dir)
+
+    audio = parse_audio_profile(fmt)
+    if audio is not None:
+        ydl_opts["postprocessors"] = audio_postprocessors(audio)
+
+    if cookies_path is not None:
+        if pathlib.Path(cookies_path).exists():
+            ydl_opts["cookiefile"] = str(cookies_path)
+            logger.info(f"Используются cookies из {cookies_path}")  # noqa: G004
+        else:
+            logger.info("Файл cookies.txt не найден, продолжаем без cookies")
+
+    return ydl_opts
+
+
+class DownloadItem:
+    """
+    Элемент очереди загрузки.
+
+    Поля состояния изменяются только рабочим потоком движка; остальные потоки
+    читают их через snapshot().
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, fmt, download_dir, owner=None, outputs=None, urgent=False, pool=DEFAULT_POOL):  # noqa: PLR0913
+        self.id = next(DownloadItem._ids)
+        self.url = url
+        self.fmt = fmt
+        self.download_dir = pathlib.Path(download_dir)
+        self.owner = owner  # кто поставил задачу (GUI-задача, клиент API и т.п.)
+        self.outputs = list(outputs or [])  # доп. версии из того же файла (renditions)
+        self.urgent = urgent  # интерактивная загрузка вне очереди (express lane)
+        self.pool = pool  # пул потоков движка (по сайту ссылки)
+        self.identity = None  # egress-личность загрузки (EgressIdentity)
+
+        self.state = QUEUED
+        self.error = None
+        self.filename = None
+        self.files = []  # итоговые файлы (после постобработки и переноса)
+        self.sources = {}  # файл -> ключ источника для индекса содержимого
+        self.reused = []  # уже скачанные ранее файлы (загрузка пропущена)
+        # Байты по всем файлам элемента (видео и аудио перед склейкой, видео плейлиста)
+        self.downloaded_bytes = 0
+        self.total_bytes = None  # известные размеры: готовые файлы + текущий
+        self.finished_bytes = 0  # полностью скачанные файлы
+        self.expected_bytes = None  # оценка размера по метаданным
+        self.speed = None
+        self.eta = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.pause_requested = False
+        self.preempted = False  # приостановлен ради срочного элемента, вернётся в начало очереди
+        self.merge_fallback = False  # повторная попытка со склейкой в mkv
+        self.postprocessor = None  # текущий постобработчик yt-dlp ("Merger", "ExtractAudio", ...)
+
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINAL_STATES
+
+    @property
+    def size_estimate(self) -> int | None:
+        """Ожидаемый объём: оценка по метаданным, уточнённая известными размерами файлов"""
+        size = max(self.expected_bytes or 0, self.total_bytes or 0, self.downloaded_bytes)
+        return size or None
+
+    @property
+    def percent(self) -> float:
+        if self.state == DONE:
+            return 100.0
+        size = self.size_estimate
+        if not size:
+            return 0.0
+        return min(100.0, self.downloaded_bytes * 100.0 / size)
+
+    def wait(self, timeout=None) -> bool:
+        """Ждёт перехода элемента в конечное состояние"""
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> dict:
+        """Копия состояния элемента, пригодная для сериализации в JSON"""
+        return {
+            "id": self.id,
+            "url": self.url,
+            "format": self.fmt,
+            "outputs": self.outputs,
+            "urgent": self.urgent,
+            "pool": self.pool,
+            "identity": self.identity.name if self.identity is not None else None,
+            "state": self.state,
+            "postprocessor": self.postprocessor,
+            "error": self.error,
+            "filename": self.filename,
+            "files": [str(f) for f in self.files],
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "expected_bytes": self.expected_bytes,
+            "percent": round(self.percent, 1),
+            "speed": self.speed,
+            "eta": self.eta,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Служебные постобработчики yt-dlp, не меняющие состояние элемента
+_SERVICE_POSTPROCESSORS = frozenset({"MoveFilesAfterDownload"})
+
+
+class _AdmissionCheck(PostProcessor):
+    """
+    Проверка места на диске и предела загрузок с сайта перед загрузкой.
+
+    Выполняется yt-dlp на этапе before_dl — после выбора форматов, когда
+    известны их размеры, но до записи первого байта.
+    """  # noqa: RUF002
+
+    def __init__(self, worker):
+        super().__init__()
+        self.worker = worker
+
+    def run(self, info):
+        item = self.worker.current
+        if item is not None:
+            self.worker.engine._admit(item, info)  # noqa: SLF001
+        return [], info
+
+
+class _IndexSource(PostProcessor):
+    """Запоминает источник (экстрактор, id, формат) итогового файла для индекса"""
+
+    def __init__(self, worker):
+        super().__init__()
+        self.worker = worker
+
+    def run(self, info):
+        item = getattr(self.worker._local, "item", None) or self.worker.current  # noqa: SLF001
+        if item is not None and info.get("filepath"):
+            item.sources[info["filepath"]] = source_key(info)
+        return [], info
+
+
+class _Worker(threading.Thread):
+    """
+    Рабочий поток движка.
+
+    Держит открытые экземпляры YoutubeDL (по одному на набор опций) на всё
+    время жизни потока: кэш экстракторов и player JS переиспользуются между
+    задачами, а соединения и cookies — общие для всех потоков (SharedSession).
+    Поток берёт элементы своего пула (routing); поток с urgent_only —
+    только срочные элементы любого пула (резерв express lane).
+    """  # noqa: RUF002
+
+    def __init__(self, engine, index, urgent_only=False, pool=DEFAULT_POOL):
+        if urgent_only:
+            name = f"urgent-worker-{index}"
+        elif pool == DEFAULT_POOL:
+            name = f"download-worker-{index}"
+        else:
+            name = f"download-{pool}-{index}"
+        super().__init__(name=name, daemon=True)
+        self.engine = engine
+        self.urgent_only = urgent_only
+        self.pool = None if urgent_only else pool
+        self.current = None
+        self.identity = None  # личность последней загрузки (её YoutubeDL уже «тёплый»)
+        self._stack = contextlib.ExitStack()
+        self._stack_lock = threading.Lock()  # экземпляры для постобработки создаются в потоках пула
+        self._ydls = {}
+        self.ydl = None  # YoutubeDL текущей загрузки
+        self._deferred = []  # постобработки текущего элемента в пуле
+        # Элемент, чья постобработка идёт в потоке пула (для post_hook)
+        self._local = threading.local()
+
+    def run(self):
+        with self._stack:
+            while True:
+                item = self.engine._queue.get(urgent_only=self.urgent_only, pool=self.pool)  # noqa: SLF001
+                if item is None:
+                    break
+                if not self.engine._claim(item):  # noqa: SLF001
+                    # Элемент отменён, пока стоял в очереди: место в пределе сайта не нужно
+                    self.engine._end_transfer(item, cancelled=True)  # noqa: SLF001
+                    continue
+                self.current = item
+                try:
+                    self.process(item)
+                finally:
+                    self.current = None
+
+    def ydl_for(self, item, merge_format):
+        """Возвращает «тёплый» YoutubeDL для опций элемента"""
+        identity = item.identity.name if item.identity is not None else None
+        key = (item.pool, identity, item.fmt, str(item.download_dir), merge_format)
+        ydl = self._ydls.get(key)
+        if ydl is None:
+            ydl_opts = self.engine.ydl_opts_for(item, merge_format, item.identity)
+            ydl_opts["progress_hooks"] = [self.progress_hook]
+            ydl_opts["post_hooks"] = [self.post_hook]
+            ydl_opts["postprocessor_hooks"] = [self.postprocessor_hook]
+            if self.engine.index is not None or self.engine.staging_dir is not None:
+                ydl_opts["match_filter"] = self.match_existing
+            ydl = self._stack.enter_context(yt_dlp.YoutubeDL(ydl_opts))
+            session = self.engine.session_for(item.identity)
+            session.attach(ydl)
+            # Колбэки ExitStack выполняются в обратном порядке: отключаем
+            # общий пул до YoutubeDL.close()
+            self._stack.callback(session.detach, ydl)
+            if self.engine.cache is not None:
+                self.engine.cache.attach(ydl)
+            if self.engine.admission is not None or self.engine.concurrency is not None:
+                ydl.add_post_processor(_AdmissionCheck(self), when="before_dl")
+            self._add_postprocessors(ydl, item.fmt)
+            if self.engine.postprocessor is not None:
+                factory = functools.partial(self._postprocess_ydl, dict(ydl_opts), item.fmt)
+                defer_postprocessing(ydl, self.dispatch, factory)
+            if self.engine.connections > 1:
+                use_segmented_downloader(ydl, self.engine.connections)
+            self._ydls[key] = ydl
+        # Опция читается yt-dlp на каждом блоке данных, поэтому её можно менять на лету
+        ydl.params["ratelimit"] = self.engine.ratelimit_for(item)
+        self.ydl = ydl
+        return ydl
+
+    def _add_postprocessors(self, ydl, fmt):
+        """Постобработчики движка после загрузки: нормализация громкости, источник для индекса"""
+        if self.engine.index is not None:
+            ydl.add_post_processor(_IndexSource(self), when="after_move")
+        audio = parse_audio_profile(fmt)
+        if audio is not None and audio.loudness is not None:
+            # После FFmpegExtractAudio из опции "postprocessors"
+            ydl.add_post_processor(LoudnessNormalizePP(ydl, audio.loudness), when="post_process")
+
+    def _postprocess_ydl(self, ydl_opts, fmt):
+        """
+        YoutubeDL для постобработки в пуле (создаётся в потоке пула).
+
+        Опции и постобработчики — как у загрузчика, но экземпляр отдельный:
+        YoutubeDL не потокобезопасен, а загрузчик уже качает следующую ссылку.
+        """  # noqa: RUF002
+        with self._stack_lock:
+            ydl = self._stack.enter_context(yt_dlp.YoutubeDL(ydl_opts, auto_init=False))
+        self._add_postprocessors(ydl, fmt)
+        return ydl
+
+    def throttle(self, limit):
+        """Меняет ограничение скорости текущей загрузки (None — без ограничения)"""
+        for ydl in list(self._ydls.values()):
+            ydl.params["ratelimit"] = limit
+
+    def progress_hook(self, d):
+        item = self.current
+        if item is None:
+            return
+        if item.cancel_requested or item.pause_requested:
+            # yt-dlp пробрасывает DownloadCancelled наружу из download()
+            raise DownloadCancelledByUser
+        if d["status"] == "downloading":
+            if item.state != DOWNLOADING:
+                # Первые байты (или следующее видео плейлиста после склейки)
+                item.state = DOWNLOADING
+            item.downloaded_bytes = item.finished_bytes + (d.get("downloaded_bytes") or 0)
+            file_total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            item.total_bytes = item.finished_bytes + file_total if file_total else None
+            item.speed = d.get("speed")
+            item.eta = d.get("eta")
+            item.filename = d.get("filename", item.filename)
+            if self.engine.admission is not None:
+                self.engine.admission.update(item.id, item.downloaded_bytes)
+            self.engine._emit("progress", item)  # noqa: SLF001
+        elif d["status"] == "finished":
+            item.finished_bytes += d.get("total_bytes") or d.get("downloaded_bytes") or 0
+            item.downloaded_bytes = item.total_bytes = item.finished_bytes
+            item.filename = d.get("filename", item.filename)
+            logger.debug("Загрузка файла завершена, начинается обработка")
+
+    def postprocessor_hook(self, d):
+        """Постобработка yt-dlp началась: склейка, извлечение аудио и т.п."""
+        name = d.get("postprocessor") or ""
+        if d["status"] != "started" or name.startswith("_") or name in _SERVICE_POSTPROCESSORS:
+            return
+        item = getattr(self._local, "item", None) or self.current
+        if item is None:
+            return
+        item.postprocessor = name
+        if item.state != POSTPROCESSING:
+            item.state = POSTPROCESSING
+            self.engine._emit(POSTPROCESSING, item)  # noqa: SLF001
+
+    def match_existing(self, info, incomplete=False):
+        """
+        match_filter yt-dlp: пропуск видео, уже скачанного в этом формате.
+
+        Вызывается перед загрузкой каждого видео (в том числе из плейлиста)
+        после выбора формата; строка-результат — причина пропуска.
+        При загрузке через staging проверка yt-dlp «уже скачано» видит
+        только staging, поэтому итоговая папка проверяется здесь.
+        """
+        if incomplete:
+            return None  # формат ещё не выбран
+        existing = self._existing_destination(info)
+        if existing is None and self.engine.index is not None:
+            key = source_key(info)
+            existing = self.engine.index.find_source(key) if key else None
+        if existing is None:
+            return None
+        item = self.current
+        if item is not None:
+            item.reused.append(str(existing))
+        logger.info(f"Уже скачано, загрузка пропущена: {existing}")  # noqa: G004
+        return f"Уже скачано: {existing}"
+
+    def _existing_destination(self, info) -> pathlib.Path | None:
+        """Файл видео, уже лежащий в итоговой папке (только при загрузке через staging)"""
+        item = self.current
+        if self.engine.staging_dir is None or item is None or self.ydl is None:
+            return None
+        path = item.download_dir / pathlib.Path(self.ydl.prepare_filename(info)).name
+        return path if path.exists() else None
+
+    def post_hook(self, filepath):
+        """Вызывается yt-dlp с путём итогового файла после всех постобработок"""  # noqa: RUF002
+        item = getattr(self._local, "item", None) or self.current
+        if item is not None:
+            item.files.append(filepath)
+
+    def dispatch(self, job):
+        """Ставит постобработку текущего элемента в пул"""
+        item = self.current
+        self._deferred.append(self.engine.postprocessor.submit(self._run_deferred, item, job))
+
+    def _run_deferred(self, item, job):
+        self._local.item = item
+        try:
+            job()
+        finally:
+            self._local.item = None
+
+    def download(self, item):
+        """
+        Скачивает элемент; при DownloadError повторяет со склейкой в mkv.
+
+        Если метаданные уже извлечены заранее, сразу начинается передача.
+        Повтор всегда извлекает ссылку заново — это покрывает и истёкшие
+        ссылки на потоки в заранее полученных метаданных.
+        """  # noqa: RUF002
+        if item.merge_fallback:
+            self.ydl_for(item, FALLBACK_MERGE_FORMAT).download([item.url])
+            return
+        prefetcher = self.engine.prefetcher
+        info = prefetcher.take(item, item.identity) if prefetcher is not None else None
+        try:
+            ydl = self.ydl_for(item, MERGE_FORMAT)
+            if info is not None:
+                ydl.process_ie_result(info, download=True)
+            else:
+                ydl.download([item.url])
+        except yt_dlp.utils.DownloadError as e:
+            # Попытка сменить контейнер на mkv, если webm не сработал
+            logger.warning(f"DownloadError для {item.url}, пробуем mkv: {e}")  # noqa: G004
+            item.downloaded_bytes = item.finished_bytes = 0
+            item.total_bytes = None
+            self.ydl_for(item, FALLBACK_MERGE_FORMAT).download([item.url])
+
+    def process(self, item):
+        engine = self.engine
+        item.started_at = time.time()
+        engine._emit("started", item)  # noqa: SLF001
+        logger.info(f"Начало загрузки #{item.id}: {item.url}")  # noqa: G004
+        self._deferred = []
+        # Предпочтительна личность, через которую метаданные извлечены заранее
+        prefetched = engine.prefetcher.identity_for(item) if engine.prefetcher is not None else None
+        item.identity = self.identity = engine._acquire_identity(item, prefetched or self.identity)  # noqa: SLF001
+        engine.session_for(item.identity).refresh()
+        if item.urgent:
+            engine._urgent_started()  # noqa: SLF001
+        try:
+            self.download(item)
+        except DownloadCancelledByUser:
+            engine._end_transfer(item, cancelled=True)  # noqa: SLF001
+            if not item.cancel_requested:
+                engine._stop_paused(item)  # noqa: SLF001
+            else:
+                engine._finish(item, CANCELLED)  # noqa: SLF001
+        except Exception as e:  # noqa: BLE001
+            engine._end_transfer(item, error=str(e))  # noqa: SLF001
+            engine._finish(item, FAILED, str(e))  # noqa: SLF001
+        else:
+            # Сеть элементу больше не нужна: постобработка не держит место в пределе сайта
+            engine._end_transfer(item)  # noqa: SLF001
+            if self._deferred:
+                engine._postprocess(item, self._deferred)  # noqa: SLF001
+            else:
+                engine._render(item)  # noqa: SLF001
+        finally:
+            self._deferred = []
+            if item.urgent:
+                engine._urgent_finished()  # noqa: SLF001
+
+
+class DownloadEngine:
+    """
+    Постоянно работающий пул загрузок.
+
+    Задачи ставятся через submit() и выполняются max_workers потоками;
+    сайты из pools обслуживаются собственными пулами потоков (routing).
+    Подписчики (add_listener) получают события ``(event, item)``:
+    "queued", "prefetched", "started", "progress", "postprocessing", "moving",
+    "paused", "done", "failed", "cancelled".
+    Состояния элемента: queued → extracting → downloading → postprocessing →
+    moving → done/failed/cancelled; queued/extracting/downloading → paused
+    (pause) → queued (resume).
+
+    Срочные элементы (submit(urgent=True)) выдаются раньше обычных, могут
+    занимать urgent_workers резервных потоков и, если свободных потоков
+    нет, вытесняют обычные загрузки: те приостанавливаются (.part
+    сохраняется) и возвращаются в начало очереди. Пока идёт срочная
+    загрузка, скорость обычных ограничена bulk_ratelimit.
+    С пулом identities каждая загрузка идёт через свою egress-личность
+    (прокси, исходный адрес, cookies) — см. src.egress.
+    Колбэки вызываются из рабочих потоков, поэтому GUI должен пересылать
+    их в свой поток через сигналы Qt.
+    """  # noqa: RUF002
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        download_dir: pathlib.Path | str = "result",
+        fmt: str = "best",
+        ffmpeg_location: str | None = None,
+        cookies_path: pathlib.Path | None = None,
+        filename_template: str = FILENAME_TEMPLATE,
+        session: SharedSession | None = None,
+        staging_dir: pathlib.Path | str | None = None,
+        admission: AdmissionController | None = None,
+        policy="fifo",
+        prefetch: int = 0,
+        prefetch_workers: int = 2,
+        postprocess_workers: int | None = 0,
+        outputs=None,
+        index: ContentIndex | None = None,
+        urgent_workers: int = 0,
+        bulk_ratelimit: int | None = None,
+        connections: int = 1,
+        concurrency: ConcurrencyController | None = None,
+        pools=(),
+        identities: IdentityPool | None = None,
+        cache: PersistentCache | None = None,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.download_dir = pathlib.Path(download_dir)
+        self.fmt = fmt
+        self.ffmpeg_location = ffmpeg_location
+        self.cookies_path = cookies_path
+        self.filename_template = filename_template
+        # Общие соединения, cookies и кэш DNS для всех рабочих потоков
+        self._own_session = session is None
+        self.session = session or SharedSession(cookies_path)
+        # Незавершённые файлы пишутся в staging, готовые переносятся в фоне
+        self.staging_dir = pathlib.Path(staging_dir) if staging_dir else None
+        self.mover = FileMover() if self.staging_dir else None
+        # Резервирование места на диске (None — без проверки)
+        self.admission = admission
+
+        # Порядок выдачи элементов рабочим потокам: "fifo", "sjf" или "fair"
+        self._queue = Scheduler(policy, ready=self._site_ready, reserve=self._reserve_site)
+        # Метаданные следующих prefetch элементов извлекаются заранее (0 — выключено)
+        self.prefetcher = Prefetcher(self, prefetch, prefetch_workers) if prefetch else None
+        # Склейка FFmpeg в отдельном пуле (None — по числу ядер, 0 — в рабочем потоке)
+        self.postprocessor = PostprocessPool(postprocess_workers) if postprocess_workers != 0 else None
+        # Доп. версии по умолчанию для новых элементов (например, ["480", "audio:mp3"])
+        self.outputs = list(outputs or [])
+        # Индекс содержимого: хеши готовых файлов и пропуск уже скачанного (None — выкл.)
+        self.index = index
+        # Потоки только для срочных элементов (сверх max_workers)
+        self.urgent_workers = max(0, int(urgent_workers))
+        # Скорость обычных загрузок (байт/с), пока идёт срочная (None — без ограничения)
+        self.bulk_ratelimit = bulk_ratelimit
+        self._urgent_active = 0
+        # Соединений на большой одиночный файл (1 — родной загрузчик yt-dlp)
+        self.connections = max(1, int(connections))
+        # Адаптивный предел загрузок с одного сайта (None — только max_workers)
+        self.concurrency = concurrency
+        # Отдельные пулы потоков для сайтов (PoolPolicy); остальные сайты — max_workers потоков
+        self.router = Router(pools)
+        self.pools = {pool.name: pool for pool in self.router.pools}
+        self.pools[DEFAULT_POOL] = PoolPolicy(DEFAULT_POOL, (), self.max_workers)
+        # Egress-личности загрузок (None — все загрузки с общими адресом и cookies)
+        self.identities = identities
+        self._identity_sessions = {}  # имя личности -> SharedSession с её cookies
+        # Постоянный кэш yt-dlp (player JS, подписи, токены) для всех потоков и запусков
+        self.cache = cache
+        self._items = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._workers = []
+
+    # ---------- жизненный цикл ----------
+
+    def start(self):
+        """Запускает рабочие потоки (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._workers:
+                return
+            for pool in self.pools.values():
+                for index in range(1, pool.workers + 1):
+                    worker = _Worker(self, index, pool=pool.name)
+                    worker.start()
+                    self._workers.append(worker)
+            for index in range(1, self.urgent_workers + 1):
+                worker = _Worker(self, index, urgent_only=True)
+                worker.start()
+                self._workers.append(worker)
+            if self.prefetcher is not None:
+                self.prefetcher.start()
+            if self.identities is not None:
+                self.identities.start()
+        pools = ", ".join(f"{pool.name}: {pool.workers}" for pool in self.pools.values())
+        logger.info(f"Движок загрузок запущен, потоков по пулам: {pools}, резерв для срочных: {self.urgent_workers}")  # noqa: G004
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает рабочие потоки после текущих задач"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        # Необработанные элементы отменяем, чтобы ожидающие не зависли
+        for item in self.items():
+            if item.state in (QUEUED, PAUSED):
+                self._finish(item, CANCELLED)
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        if self.identities is not None:
+            self.identities.stop()
+        for _ in workers:
+            self._queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+            if self.postprocessor is not None:
+                self.postprocessor.close()
+            if self.mover is not None:
+                self.mover.close()
+            if self._own_session:
+                self.session.close()
+            for session in self._identity_sessions.values():
+                session.close()
+        logger.info("Движок загрузок остановлен")
+
+    # ---------- подписки ----------
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock, contextlib.suppress(ValueError):
+            self._listeners.remove(callback)
+
+    def _emit(self, event, item):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event, item)
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Ошибка в обработчике события {event}: {e}")  # noqa: G004
+
+    # ---------- очередь ----------
+
+    def submit(  # noqa: PLR0913
+        self,
+        urls,
+        fmt=None,
+        download_dir=None,
+        owner=None,
+        outputs=None,
+        urgent=False,
+    ) -> list[DownloadItem]:
+        """
+        Ставит ссылки в очередь.
+
+        Args:
+            urls: Список ссылок
+            fmt: Формат yt-dlp (по умолчанию — формат движка)
+            download_dir: Директория сохранения (по умолчанию — директория движка)
+            owner: Произвольная метка владельца задачи
+            outputs: Доп. версии из скачанного файла (по умолчанию — версии движка)
+            urgent: Срочная загрузка вне очереди (может вытеснить обычные)
+
+        Returns:
+            Созданные элементы очереди
+
+        Raises:
+            ValueError: Некорректный формат или неизвестный выходной профиль
+        """
+        if fmt is not None:
+            resolve_format(fmt)
+        outputs = self.outputs if outputs is None else list(outputs)
+        for spec in outputs:
+            parse_output(spec)
+        self.start()
+        items = [
+            DownloadItem(
+                url.strip(),
+                fmt or self.fmt,
+                download_dir or self.download_dir,
+                owner=owner,
+                outputs=outputs,
+                urgent=urgent,
+                pool=self.router.route(url.strip()),
+            )
+            for url in urls
+            if url.strip()
+        ]
+        with self._lock:
+            for item in items:
+                self._items[item.id] = item
+        for item in items:
+            self._emit("queued", item)
+            self._queue.put(item)
+        if urgent and items:
+            self._preempt()
+        if self.prefetcher is not None:
+            self.prefetcher.notify()
+        return items
+
+    def cancel(self, item_id) -> DownloadItem | None:
+        """
+        Отменяет элемент очереди.
+
+        Элемент в очереди или на паузе отменяется сразу; у загружающегося
+        элемента выставляется флаг, и загрузка прерывается при следующем
+        вызове progress hook (.part файл сохраняется для докачки).
+
+        Returns:
+            Элемент или None, если такого нет
+        """  # noqa: RUF002
+        item = self.get(item_id)
+        if item is None or item.finished:
+            return item
+        with self._lock:
+            item.cancel_requested = True
+            still_queued = item.state in (QUEUED, PAUSED)
+        if still_queued:
+            self._queue.discard(item)
+            self._finish(item, CANCELLED)
+        logger.info(f"Запрошена отмена #{item.id}: {item.url}")  # noqa: G004
+        return item
+
+    def pause(self, item_id) -> DownloadItem | None:
+        """
+        Приостанавливает элемент.
+
+        Элемент в очереди снимается с неё сразу. Загружающийся элемент
+        прерывается при следующем вызове progress hook: .part файл остаётся
+        для докачки (continuedl), а поток сразу берёт следующий элемент
+        очереди. Постобработку и перенос приостановить нельзя.
+
+        Returns:
+            Элемент или None, если такого нет
+        """  # noqa: RUF002
+        item = self.get(item_id)
+        if item is None:
+            return None
+        with self._lock:
+            # Пауза пользователя: элемент не возвращается в очередь сам
+            item.preempted = False
+            if item.state == QUEUED:
+                item.state = PAUSED
+                paused_now = True
+            elif item.state in (EXTRACTING, DOWNLOADING):
+                item.pause_requested = True
+                paused_now = False
+            else:
+                return item
+        if paused_now:
+            self._queue.discard(item)
+            self._emit(PAUSED, item)
+        logger.info(f"Запрошена пауза #{item.id}: {item.url}")  # noqa: G004
+        return item
+
+    def resume(self, item_id) -> DownloadItem | None:
+        """
+        Возвращает приостановленный элемент в очередь.
+
+        Загрузка продолжится с сохранённого .part файла; запрос паузы,
+        ещё не дошедший до progress hook, просто снимается.
+
+        Returns:
+            Элемент или None, если такого нет
+        """  # noqa: RUF002
+        item = self.get(item_id)
+        if item is None:
+            return None
+        with self._lock:
+            item.pause_requested = False
+            if item.state != PAUSED:
+                return item
+            front, item.preempted = item.preempted, False
+            item.state = QUEUED
+            # yt-dlp заново сообщит уже скачанные байты и готовые файлы
+            item.downloaded_bytes = item.finished_bytes = 0
+            item.total_bytes = None
+            item.files = []
+            item.sources = {}
+            item.reused = []
+        logger.info(f"Возобновление #{item.id}: {item.url}")  # noqa: G004
+        self._emit("queued", item)
+        self._queue.put(item, front=front)
+        if self.prefetcher is not None:
+            self.prefetcher.notify()
+        return item
+
+    def get(self, item_id) -> DownloadItem | None:
+        with self._lock:
+            return self._items.get(item_id)
+
+    def items(self) -> list[DownloadItem]:
+        with self._lock:
+            return list(self._items.values())
+
+    def wait(self, items=None, timeout=None) -> bool:
+        """
+        Ждёт завершения элементов (по умолчанию — всех известных).
+
+        Returns:
+            True, если все элементы завершились до таймаута
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for item in items if items is not None else self.items():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not item.wait(remaining):
+                return False
+        return True
+
+    def ydl_opts_for(self, item, merge_format=MERGE_FORMAT, identity=None) -> dict:
+        """Опции yt-dlp для конкретного элемента очереди (и egress-личности)"""
+        ydl_opts = build_ydl_opts(
+            self.working_dir(item),
+            item.fmt,
+            ffmpeg_location=self.ffmpeg_location,
+            merge_format=merge_format,
+            filename_template=self.filename_template,
+            cache_dir=self.cache.directory if self.cache is not None else None,
+        )
+        retries = self.pools[item.pool].retries
+        if retries is not None:
+            ydl_opts["retries"] = ydl_opts["fragment_retries"] = retries
+        if identity is not None:
+            if identity.proxy is not None:
+                ydl_opts["proxy"] = identity.proxy
+            if identity.source_address is not None:
+                ydl_opts["source_address"] = identity.source_address
+        return ydl_opts
+
+    def working_dir(self, item) -> pathlib.Path:
+        """Папка, в которую пишет yt-dlp: своя подпапка staging для каждой итоговой папки или сама итоговая"""
+        if self.staging_dir is None:
+            return item.download_dir
+        return staging_subdir(self.staging_dir, item.download_dir)
+
+    def session_for(self, identity) -> SharedSession:
+        """Сессия с cookies egress-личности (общая, если личности нет или своих cookies у неё нет)"""  # noqa: RUF002
+        if identity is None or identity.cookies is None:
+            return self.session
+        with self._lock:
+            session = self._identity_sessions.get(identity.name)
+            if session is None:
+                session = self._identity_sessions[identity.name] = SharedSession(identity.cookies)
+            return session
+
+    def _acquire_identity(self, item, prefer=None):
+        """Egress-личность для загрузки элемента (None, если пула личностей нет)"""
+        if self.identities is None:
+            return None
+        identity = self.identities.acquire(item.id, sticky_key(item.url), prefer)
+        logger.debug(f"Загрузка #{item.id} идёт через egress-личность {identity.name}")  # noqa: G004
+        return identity
+
+    def _claim(self, item) -> bool:
+        """Атомарно переводит элемент из очереди в загрузку"""
+        with self._lock:
+            if item.state != QUEUED or item.cancel_requested:
+                return False
+            item.state = EXTRACTING
+            return True
+
+    def _site_ready(self, item) -> bool:
+        """Есть ли место в пределе загрузок с сайта элемента (для планировщика)"""  # noqa: RUF002
+        return self.concurrency is None or self.concurrency.available(host_of(item.url))
+
+    def _reserve_site(self, item) -> bool:
+        """Занимает место в пределе сайта при выдаче элемента рабочему потоку"""
+        return self.concurrency is None or self.concurrency.try_acquire(item.id, host_of(item.url))
+
+    def _admit(self, item, info):
+        """
+        Резервирует место под элемент по оценке размера из метаданных и
+        проверяет место в пределе одновременных загрузок с сайта.
+
+        Raises:
+            InsufficientDiskSpaceError: Элемент не помещается на диск
+            DownloadCancelledByUser: Элемент отменён во время ожидания
+        """  # noqa: RUF002
+        entry = estimate_download_size(info)
+        size = None
+        if entry is not None:
+            # Элемент-плейлист проходит проверку для каждого видео: уже скачанные
+            # видео остаются на диске (при staging — до переноса в итоговую папку)
+            size = item.finished_bytes + entry
+            item.expected_bytes = max(item.expected_bytes or 0, size)
+
+        def cancelled():
+            return item.cancel_requested or item.pause_requested
+
+        if self.admission is not None:
+            if entry is not None and len(info.get("requested_formats") or ()) > 1:
+                # Потоки и результат склейки одновременно лежат на диске
+                size += entry * (MERGE_SPACE_FACTOR - 1)
+            self.admission.release(item.id)
+            if not self.admission.reserve(
+                item.id,
+                self.working_dir(item),
+                size,
+                cancelled=cancelled,
+                final_directory=item.download_dir if self.staging_dir is not None else None,
+                written=item.finished_bytes if size is not None else 0,
+            ):
+                raise DownloadCancelledByUser
+        # Обычно место занято планировщиком при выдаче элемента, и вызов сразу
+        # возвращается; ждёт только повтор после освобождения места
+        if self.concurrency is not None and not self.concurrency.acquire(item.id, host_of(item.url), cancelled):
+            raise DownloadCancelledByUser
+
+    def _end_transfer(self, item, error=None, cancelled=False):
+        """Освобождает место в пределе сайта и egress-личность, сообщает результат загрузки"""
+        if self.identities is not None:
+            self.identities.release(item.id, error=None if cancelled else error)
+        if self.concurrency is None:
+            return
+        if cancelled:
+            self.concurrency.discard(item.id)
+        else:
+            self.concurrency.release(item.id, item.downloaded_bytes, error=error, host=host_of(item.url))
+        # Элементы этого сайта, пропущенные планировщиком, можно начинать
+        self._queue.wake()
+
+    def _postprocess(self, item, futures, renditions=False):
+        """
+        Элемент ждёт постобработки в пуле.
+
+        Args:
+            futures: Задачи пула (склейка yt-dlp или создание версий)
+            renditions: True — задачи возвращают пути созданных версий
+        """
+        item.state = POSTPROCESSING
+        self._emit(POSTPROCESSING, item)
+        lock = threading.Lock()
+        pending = len(futures)
+        errors = []
+
+        def on_done(future):
+            nonlocal pending
+            with lock:
+                if future.exception() is not None:
+                    errors.append(str(future.exception()))
+                elif renditions:
+                    item.files.append(str(future.result()))
+                pending -= 1
+                if pending:
+                    return
+            if not errors:
+                if renditions:
+                    self._complete(item)
+                else:
+                    self._render(item)
+            elif not renditions and not item.merge_fallback and self._workers:
+                # Как и при синхронной склейке: повтор с контейнером mkv
+                logger.warning(f"Ошибка постобработки {item.url}, пробуем mkv: {'; '.join(errors)}")  # noqa: G004
+                item.merge_fallback = True
+                item.files = []
+                item.sources = {}
+                item.reused = []
+                item.postprocessor = None
+                item.downloaded_bytes = item.finished_bytes = 0
+                item.total_bytes = None
+                item.state = QUEUED
+                self._queue.put(item)
+            else:
+                self._finish(item, FAILED, "; ".join(errors))
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def _render(self, item):
+        """Создаёт доп. версии из скачанных файлов (в пуле постобработки, если он есть)"""
+        if not item.outputs or not item.files:
+            self._complete(item)
+            return
+        # Каждое видео плейлиста получает свои версии
+        jobs = [(source, spec) for source in list(item.files) for spec in item.outputs]
+        if self.postprocessor is not None:
+            try:
+                futures = [
+                    self.postprocessor.submit(make_rendition, source, spec, self.ffmpeg_location)
+                    for source, spec in jobs
+                ]
+            except RuntimeError:
+                pass  # пул уже закрывается — создаём версии здесь же
+            else:
+                self._postprocess(item, futures, renditions=True)
+                return
+        item.state = POSTPROCESSING
+        self._emit(POSTPROCESSING, item)
+        try:
+            for source, spec in jobs:
+                item.files.append(str(make_rendition(source, spec, self.ffmpeg_location)))
+        except Exception as e:  # noqa: BLE001
+            self._finish(item, FAILED, str(e))
+            return
+        self._complete(item)
+
+    def _complete(self, item):
+        """Успешная загрузка: перенос из staging (в фоне) или сразу завершение"""
+        if self.mover is None or not item.files:
+            self._index_and_finish(item, [(path, path, None) for path in item.files])
+            return
+
+        item.state = MOVING
+        self._emit(MOVING, item)
+        lock = threading.Lock()
+        pending = len(item.files)
+        moved = []
+        errors = []
+
+        def on_moved(src, hasher, future):
+            nonlocal pending
+            with lock:
+                try:
+                    dst = future.result()
+                except Exception as e:  # noqa: BLE001
+                    errors.append(str(e))
+                else:
+                    moved.append((src, dst, hasher.hexdigest() if hasher is not None else None))
+                pending -= 1
+                if pending:
+                    return
+            item.files = [dst for _, dst, _ in moved]
+            if errors:
+                self._finish(item, FAILED, "; ".join(errors))
+            else:
+                item.filename = str(moved[0][1])
+                self._index_and_finish(item, moved)
+
+        # Директория назначения создаётся заранее, чтобы сравнить файловые системы
+        with contextlib.suppress(OSError):  # ошибку сообщит перенос
+            item.download_dir.mkdir(parents=True, exist_ok=True)
+        for path in list(item.files):
+            # Хеш считается по тем же блокам, что и копирование; переименование
+            # в пределах одной файловой системы файл не читает — хеш посчитает пул
+            copying = not same_filesystem(pathlib.Path(path), item.download_dir)
+            hasher = hashlib.new(HASH_ALGORITHM) if self.index is not None and copying else None
+            future = self.mover.submit(path, item.download_dir, hasher)
+            future.add_done_callback(functools.partial(on_moved, path, hasher))
+
+    def _finish_reused(self, item):
+        """Успешное завершение с учётом пропущенных (уже скачанных) видео"""  # noqa: RUF002
+        item.files = [*item.files, *item.reused]
+        if item.filename is None and item.files:
+            item.filename = str(item.files[0])
+        self._finish(item, DONE)
+
+    def _index_and_finish(self, item, files):
+        """
+        Индексирует готовые файлы и завершает элемент.
+
+        Файлы без хеша читаются заново — в пуле постобработки, чтобы не
+        держать рабочий поток загрузки (без пула — в текущем потоке).
+        """
+        if self.index is not None and self.postprocessor is not None and any(d is None for _, _, d in files):
+            try:
+                future = self.postprocessor.submit(self._index, item, files)
+            except RuntimeError:
+                pass  # пул уже закрывается — индексируем здесь же
+            else:
+                future.add_done_callback(lambda _future: self._finish_reused(item))
+                return
+        self._index(item, files)
+        self._finish_reused(item)
+
+    def _index(self, item, files):
+        """
+        Добавляет готовые файлы в индекс содержимого.
+
+        Args:
+            files: Тройки (путь в staging, итоговый путь, хеш или None)
+        """
+        if self.index is None:
+            return
+        for src, dst, digest in files:
+            try:
+                duplicates = self.index.add(dst, digest=digest, source=item.sources.get(str(src)))
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"Не удалось добавить {dst} в индекс: {e}")  # noqa: G004
+                continue
+            if duplicates:
+                logger.warning(f"Файл {dst} совпадает по содержимому с {duplicates[0]}")  # noqa: G004
+
+    def _stop_paused(self, item):
+        """Загрузка прервана по запросу паузы: поток свободен, .part файл сохранён"""
+        if self.admission is not None:
+            self.admission.release(item.id)
+        with self._lock:
+            # resume() мог прийти, пока загрузка останавливалась
+            resumed = not item.pause_requested or item.preempted
+            item.pause_requested = False
+            item.state = PAUSED
+        item.speed = item.eta = None
+        logger.info(f"Загрузка приостановлена #{item.id}: {item.url}")  # noqa: G004
+        self._emit(PAUSED, item)
+        if resumed:
+            self.resume(item.id)
+
+    # ---------- express lane ----------
+
+    def ratelimit_for(self, item) -> int | None:
+        """Ограничение скорости загрузки элемента: пул и идущие срочные загрузки"""
+        limits = [self.pools[item.pool].ratelimit]
+        if not item.urgent and self._urgent_active:
+            limits.append(self.bulk_ratelimit)
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
+
+    def _urgent_started(self):
+        with self._lock:
+            self._urgent_active += 1
+            first = self._urgent_active == 1
+        if first:
+            self._throttle_bulk()
+
+    def _urgent_finished(self):
+        with self._lock:
+            self._urgent_active -= 1
+            last = self._urgent_active == 0
+        if last:
+            self._throttle_bulk()
+
+    def _throttle_bulk(self):
+        """Применяет bulk_ratelimit к идущим обычным загрузкам (или снимает его)"""  # noqa: RUF002
+        if self.bulk_ratelimit is None:
+            return
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            item = worker.current
+            if item is not None and not item.urgent:
+                worker.throttle(self.ratelimit_for(item))
+
+    def _preempt(self):
+        """
+        Освобождает потоки для срочных элементов, которым не хватило свободных.
+
+        Приостанавливаются обычные загрузки с наименьшим числом скачанных
+        байт; после остановки они сразу возвращаются в начало очереди.
+        """  # noqa: RUF002
+        with self._lock:
+            workers = list(self._workers)
+        waiting = collections.Counter(item.pool for item in self._queue.pending() if item.urgent)
+        for pool, count in waiting.items():
+            # Срочный элемент берёт свободный поток своего пула или резервный
+            serving = [worker for worker in workers if worker.urgent_only or worker.pool == pool]
+            shortfall = count - sum(1 for worker in serving if worker.current is None)
+            if shortfall <= 0:
+                continue
+            running = []
+            for worker in serving:
+                item = worker.current
+                if (
+                    item is not None
+                    and not item.urgent
+                    and not item.pause_requested
+                    and item.state in (EXTRACTING, DOWNLOADING)
+                ):
+                    running.append(item)
+            running.sort(key=lambda item: item.downloaded_bytes)
+            for item in running[:shortfall]:
+                with self._lock:
+                    if item.state not in (EXTRACTING, DOWNLOADING) or item.pause_requested:
+                        continue
+                    item.preempted = True
+                    item.pause_requested = True
+                logger.info(f"Загрузка #{item.id} уступает поток срочной: {item.url}")  # noqa: G004
+
+    def _finish(self, item, state, error=None):
+        if self.admission is not None:
+            self.admission.release(item.id)
+        item.state = state
+        item.error = error
+        item.finished_at = time.time()
+        if state == DONE:
+            logger.info(f"Успешно загружено #{item.id}: {item.url}")  # noqa: G004
+        elif state == FAILED:
+            logger.error(f"Не удалось скачать {item.url}: {error}")  # noqa: G004
+        elif state == CANCELLED:
+            logger.info(f"Загрузка отменена #{item.id}: {item.url}")  # noqa: G004
+        item._done.set()  # noqa: SLF001
+        self._emit(state, item)
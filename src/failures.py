@@ -0,0 +1,286 @@
+"""
+База неудачных загрузок с классификацией ошибок и выборочным повтором.
+
+Вместо списка ссылок в failed_downloads.txt каждая неудача записывается в
+SQLite вместе с классом ошибки, текстом сообщения yt-dlp, числом попыток
+и временем. Класс определяет, что делать дальше:
+
+- временные ошибки (сеть, HTTP 5xx, ограничение частоты запросов, нехватка
+  места, сбой FFmpeg, неизвестные) повторяются с экспоненциальной
+  задержкой: 1, 2, 4, … минут (для 429 и 403 — от 15 минут), не больше 6 часов;
+- постоянные (видео удалено, приватное, недоступно в стране, требует входа,
+  ссылка не поддерживается) сразу помещаются в карантин и не повторяются,
+  как и временные после MAX_ATTEMPTS попыток.
+
+Успешная загрузка удаляет ссылку из базы. Ссылку из карантина можно
+вернуть вручную (release), например после добавления cookies.
+"""  # noqa: RUF002
+
+__all__ = [
+    "ERROR_CLASSES",
+    "FAILURES_FILENAME",
+    "PERMANENT_CLASSES",
+    "QUARANTINED",
+    "RETRY",
+    "Failure",
+    "FailureStore",
+    "classify_error",
+]
+
+import collections
+import logging
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from src.engine import DONE, FAILED
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Имя файла базы по умолчанию (в корне папки загрузок)
+FAILURES_FILENAME = ".failures.sqlite3"
+
+# Состояния записи
+RETRY = "retry"  # ждёт повтора после next_retry_at
+QUEUED = "queued"  # выдана на повтор, результат ещё неизвестен
+QUARANTINED = "quarantined"  # не повторяется
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 60.0
+BACKOFF_MAX = 6 * 60 * 60.0
+# Для ограничения частоты запросов ждём дольше
+_BACKOFF_BASE_BY_CLASS = {"rate_limited": 15 * 60.0}
+
+# Класс ошибки -> шаблоны сообщения (проверяются по порядку).
+# 403 на YouTube обычно временный: истёкшая подписанная ссылка или ограничение
+# (как в concurrency.is_throttling), поэтому он не считается «видео недоступно»
+_PATTERNS = (
+    ("rate_limited", r"HTTP Error (?:429|403)|Too Many Requests|rate.?limit|confirm you.re not a bot"),
+    ("private", r"Private video|This video is private"),
+    ("geo_blocked", r"not (?:made this video )?available in your country|geo.?restrict|blocked it in your country"),
+    (
+        "login_required",
+        r"Sign in to confirm|confirm your age|age.?restricted|members.?only|Join this channel"
+        r"|login required|requires? (?:authentication|login)",
+    ),
+    (
+        "unavailable",
+        r"Video unavailable|has been removed|no longer available|account .* terminated|copyright"
+        r"|HTTP Error 404|HTTP Error 410|does not exist",
+    ),
+    ("unsupported", r"Unsupported URL|is not a valid URL"),
+    ("disk", r"Errno 28|No space left|Недостаточно места"),
+    ("postprocess", r"ffmpeg|ffprobe|Postprocessing|Conversion failed|Не удалось создать версию"),
+    (
+        "network",
+        r"timed? ?out|Connection (?:reset|refused|aborted)|Remote end closed|Temporary failure in name resolution"
+        r"|Name or service not known|Network is unreachable|IncompleteRead|HTTP Error 5\d\d"
+        r"|Unable to download (?:webpage|API JSON)|SSL|fragment",
+    ),
+)
+_COMPILED = tuple((name, re.compile(pattern, re.IGNORECASE)) for name, pattern in _PATTERNS)
+
+ERROR_CLASSES = (*(name for name, _ in _PATTERNS), "unknown")
+PERMANENT_CLASSES = frozenset({"private", "geo_blocked", "login_required", "unavailable", "unsupported"})
+
+Failure = collections.namedtuple(
+    "Failure",
+    [
+        "url",
+        "error_class",
+        "message",
+        "extractor",
+        "attempts",
+        "first_failed_at",
+        "last_failed_at",
+        "next_retry_at",
+        "state",
+    ],
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    url             TEXT PRIMARY KEY,
+    error_class     TEXT NOT NULL,
+    message         TEXT,
+    extractor       TEXT,
+    attempts        INTEGER NOT NULL,
+    first_failed_at REAL NOT NULL,
+    last_failed_at  REAL NOT NULL,
+    next_retry_at   REAL,
+    state           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS failures_due ON failures (state, next_retry_at);
+"""
+
+_COLUMNS = ", ".join(Failure._fields)
+
+
+def classify_error(message) -> str:
+    """Класс ошибки по сообщению yt-dlp (см. ERROR_CLASSES)"""
+    for name, pattern in _COMPILED:
+        if pattern.search(message or ""):
+            return name
+    return "unknown"
+
+
+def _extractor(url) -> str:
+    """Сайт ссылки (без www.), пока экстрактор неизвестен"""
+    host = urlparse(url).netloc.lower()
+    return host.removeprefix("www.").removeprefix("m.")
+
+
+class FailureStore:
+    """
+    Неудачные загрузки в SQLite.
+
+    Подключается к движку как обработчик событий (on_engine_event):
+    неудачи записываются, успешные загрузки удаляются из базы.
+
+    Args:
+        path: Путь к файлу базы
+        max_attempts: Попыток до карантина для временных ошибок
+        clock: Источник времени (для тестов)
+    """
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, clock=time.time):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def backoff(error_class, attempts) -> float:
+        """Задержка перед повтором после attempts неудачных попыток"""
+        base = _BACKOFF_BASE_BY_CLASS.get(error_class, BACKOFF_BASE)
+        return min(BACKOFF_MAX, base * 2 ** (attempts - 1))
+
+    def record_failure(self, url, message, extractor=None) -> Failure:
+        """
+        Записывает неудачную попытку.
+
+        Returns:
+            Обновлённая запись (state — RETRY или QUARANTINED)
+        """
+        error_class = classify_error(message)
+        now = self.clock()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT attempts, first_failed_at FROM failures WHERE url = ?",
+                (url,),
+            ).fetchone()
+            attempts, first_failed_at = (row[0] + 1, row[1]) if row else (1, now)
+            if error_class in PERMANENT_CLASSES or attempts >= self.max_attempts:
+                state, next_retry_at = QUARANTINED, None
+            else:
+                state, next_retry_at = RETRY, now + self.backoff(error_class, attempts)
+            failure = Failure(
+                url,
+                error_class,
+                message,
+                extractor or _extractor(url),
+                attempts,
+                first_failed_at,
+                now,
+                next_retry_at,
+                state,
+            )
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO failures ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",  # noqa: S608
+                failure,
+            )
+        if state == QUARANTINED:
+            logger.warning(f"Ссылка в карантине ({error_class}, попыток: {attempts}): {url}")  # noqa: G004
+        else:
+            logger.info(f"Повтор {url} ({error_class}) не раньше чем через {next_retry_at - now:.0f} с")  # noqa: G004
+        return failure
+
+    def record_success(self, url):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM failures WHERE url = ?", (url,))
+
+    def on_engine_event(self, event, item):
+        """Обработчик событий DownloadEngine"""
+        try:
+            if event == FAILED:
+                self.record_failure(item.url, item.error)
+            elif event == DONE:
+                self.record_success(item.url)
+        except sqlite3.Error as e:
+            logger.error(f"Не удалось записать результат {item.url} в базу неудач: {e}")  # noqa: G004
+
+    def due(self) -> list[str]:
+        """Ссылки, которым пора повторить попытку (без выдачи)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM failures WHERE state = ? AND next_retry_at <= ? ORDER BY next_retry_at",
+                (RETRY, self.clock()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim_due(self, limit=None) -> list[str]:
+        """
+        Выдаёт ссылки, которым пора повторить попытку.
+
+        Выданные ссылки не выдаются снова, пока не придёт их результат
+        (или до reset_claimed() при следующем запуске).
+        """
+        now = self.clock()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT url FROM failures WHERE state = ? AND next_retry_at <= ? ORDER BY next_retry_at LIMIT ?",
+                (RETRY, now, -1 if limit is None else limit),
+            ).fetchall()
+            urls = [row[0] for row in rows]
+            self._conn.executemany("UPDATE failures SET state = ? WHERE url = ?", [(QUEUED, url) for url in urls])
+        return urls
+
+    def reset_claimed(self) -> int:
+        """Возвращает ссылки, выданные прошлым запуском и не завершённые, в ожидание повтора"""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE failures SET state = ? WHERE state = ?", (RETRY, QUEUED)).rowcount
+
+    def release(self, url) -> bool:
+        """Возвращает ссылку из карантина: повтор сразу, счётчик попыток сбрасывается"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE failures SET state = ?, attempts = 0, next_retry_at = ? WHERE url = ? AND state = ?",
+                (RETRY, self.clock(), url, QUARANTINED),
+            )
+        return cursor.rowcount > 0
+
+    def failures(self, state=None) -> list[Failure]:
+        """Записи (все или в заданном состоянии), последние неудачи первыми"""
+        query = f"SELECT {_COLUMNS} FROM failures"  # noqa: S608
+        params = ()
+        if state is not None:
+            query += " WHERE state = ?"
+            params = (state,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY last_failed_at DESC", params).fetchall()
+        return [Failure(*row) for row in rows]
+
+    def summary(self) -> dict:
+        """Число записей по состоянию: {"retry": 3, "quarantined": 1, ...}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM failures GROUP BY state").fetchall()
+        return dict(rows)
+
+    def next_retry_at(self) -> float | None:
+        """Время ближайшего ещё не наступившего повтора или None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_retry_at) FROM failures WHERE state = ? AND next_retry_at > ?",
+                (RETRY, self.clock()),
+            ).fetchone()
+        return row[0]
+
@@ -0,0 +1,261 @@
+"""
+Выбор форматов с учётом стоимости склейки.
+
+Профиль "quality" — обычные строки yt-dlp вида
+``bestvideo[height<=1080]+bestaudio/best``: почти всегда это раздельные потоки,
+которые FFmpeg склеивает в webm, тратя процессор, временное место на диске
+и время.
+
+Профиль "fast" (строка формата ``fast``, ``fast:<высота>`` или
+``fast:<высота>:<допуск>``) выбирает вариант без склейки или с самой
+дешёвой склейкой, если его качество не хуже лучшего более чем на допуск:
+
+1. готовый файл с видео и аудио (progressive) — склейки нет вообще;
+2. пара потоков, совместимых с контейнером (mp4+m4a → mp4, vp9/av1+opus →
+   webm) — склейка копированием потоков без перепаковки в mkv;
+3. остальные пары — склейка в mkv.
+
+Для каждого варианта оцениваются объём загрузки и объём склейки (сколько
+байт FFmpeg перепишет), варианты пишутся в лог.
+
+Профиль "audio" (``audio:<кодек>[:<громкость LUFS>]``, кодек mp3, m4a или
+opus) скачивает только лучший аудиопоток, никогда не видео. Предпочитается
+поток в целевом кодеке: тогда FFmpegExtractAudio только копирует его без
+перекодирования. Нормализация громкости всегда требует перекодирования.
+"""  # noqa: RUF002
+
+__all__ = [
+    "AUDIO_CODECS",
+    "AUDIO_PROFILE",
+    "FAST_PROFILE",
+    "FAST_TOLERANCE",
+    "AudioProfile",
+    "Choice",
+    "audio_postprocessors",
+    "fast_format_selector",
+    "parse_audio_profile",
+    "rank_formats",
+    "resolve_format",
+]
+
+import collections
+import logging
+import math
+
+from src.admission import estimate_download_size
+
+logger = logging.getLogger("YouTubeDownloader")
+
+FAST_PROFILE = "fast"
+
+# Допустимая потеря качества (доля высоты кадра) ради отказа от склейки
+FAST_TOLERANCE = 0.25
+
+# Контейнеры, в которые потоки копируются без перекодирования
+_CONTAINER_CODECS = {
+    "mp4": {"avc1", "h264", "hevc", "av01", "mp4a"},
+    "webm": {"vp9", "vp09", "vp8", "av01", "opus", "vorbis"},
+}
+
+AUDIO_PROFILE = "audio"
+
+# Выбор аудиопотока: сначала в целевом кодеке, чтобы обойтись без перекодирования
+AUDIO_CODECS = {
+    "mp3": "bestaudio",
+    "m4a": "bestaudio[acodec^=mp4a]/bestaudio",
+    "opus": "bestaudio[acodec=opus]/bestaudio",
+}
+
+# Битрейт при перекодировании, кбит/с
+AUDIO_QUALITY = {"mp3": "192", "m4a": "192", "opus": "160"}
+
+AudioProfile = collections.namedtuple("AudioProfile", ["codec", "loudness"])
+
+# kind — "progressive" или "merge"; merge_bytes — сколько байт перепишет склейка
+Choice = collections.namedtuple("Choice", ["kind", "formats", "ext", "height", "bytes", "merge_bytes"])
+
+
+def _codec(name) -> str:
+    return (name or "").split(".")[0].lower()
+
+
+def _has_video(fmt) -> bool:
+    return fmt.get("vcodec") != "none"
+
+
+def _has_audio(fmt) -> bool:
+    return fmt.get("acodec") != "none"
+
+
+def _container_for(video, audio) -> str:
+    codecs = {_codec(video.get("vcodec")), _codec(audio.get("acodec"))}
+    for ext, supported in _CONTAINER_CODECS.items():
+        if codecs <= supported:
+            return ext
+    return "mkv"
+
+
+def _size(fmts):
+    sizes = [estimate_download_size(fmt) for fmt in fmts]
+    return None if None in sizes else sum(sizes)
+
+
+def rank_formats(formats, max_height=None) -> list[Choice]:
+    """
+    Строит варианты загрузки из списка форматов yt-dlp.
+
+    Args:
+        formats: Форматы в порядке yt-dlp (от худшего к лучшему)
+        max_height: Максимальная высота кадра (None — без ограничения)
+
+    Returns:
+        Варианты: готовые файлы и пары «видео + лучшее совместимое аудио»
+    """
+    def fits(fmt):
+        return max_height is None or (fmt.get("height") or 0) <= max_height
+
+    choices = []
+    audio_only = [fmt for fmt in formats if _has_audio(fmt) and not _has_video(fmt)]
+    for fmt in formats:
+        if not _has_video(fmt) or not fits(fmt):
+            continue
+        if _has_audio(fmt):
+            size = _size([fmt])
+            choices.append(Choice("progressive", [fmt], fmt.get("ext"), fmt.get("height") or 0, size, 0))
+            continue
+        if not audio_only:
+            continue
+        # Лучшее аудио, которое копируется в тот же контейнер; иначе просто лучшее
+        audio = next(
+            (a for a in reversed(audio_only) if _container_for(fmt, a) != "mkv"),
+            audio_only[-1],
+        )
+        size = _size([fmt, audio])
+        choices.append(
+            Choice("merge", [fmt, audio], _container_for(fmt, audio), fmt.get("height") or 0, size, size),
+        )
+    return choices
+
+
+def _choice_cost(choice):
+    return (
+        choice.kind != "progressive",
+        choice.ext == "mkv",
+        -choice.height,
+        choice.bytes if choice.bytes is not None else math.inf,
+    )
+
+
+def _describe(choice) -> str:
+    ids = "+".join(str(fmt.get("format_id")) for fmt in choice.formats)
+    size = "?" if choice.bytes is None else f"{choice.bytes / 1024 / 1024:.1f} МБ"
+    merge = "нет" if not choice.merge_bytes else f"{choice.merge_bytes / 1024 / 1024:.1f} МБ -> {choice.ext}"
+    return f"{ids} {choice.height}p {choice.kind}: загрузка {size}, склейка {merge}"
+
+
+def _as_format(choice) -> dict:
+    if choice.kind == "progressive":
+        return choice.formats[0]
+    video, audio = choice.formats
+    return {
+        "requested_formats": choice.formats,
+        "format_id": f"{video['format_id']}+{audio['format_id']}",
+        "ext": choice.ext,
+        "protocol": f"{video.get('protocol')}+{audio.get('protocol')}",
+        "vcodec": video.get("vcodec"),
+        "acodec": audio.get("acodec"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": video.get("fps"),
+        "tbr": (video.get("tbr") or 0) + (audio.get("tbr") or 0) or None,
+        "filesize_approx": choice.bytes,
+    }
+
+
+def fast_format_selector(max_height=None, tolerance=FAST_TOLERANCE):
+    """
+    Селектор формата yt-dlp (значение опции "format") для профиля "fast".
+
+    Args:
+        max_height: Максимальная высота кадра
+        tolerance: Допустимая потеря высоты кадра (доля от лучшего варианта)
+    """
+
+    def select(ctx):
+        formats = ctx.get("formats") or []
+        choices = rank_formats(formats, max_height)
+        if not choices:
+            # Нет видео подходящей высоты (например, только аудио) — как "best"
+            if formats:
+                yield formats[-1]
+            return
+        best = max(choices, key=lambda choice: choice.height)
+        floor = best.height * (1 - tolerance)
+        eligible = [choice for choice in choices if choice.height >= floor]
+        chosen = min(eligible, key=_choice_cost)
+        for choice in sorted(eligible, key=_choice_cost):
+            logger.debug(f"Вариант формата: {_describe(choice)}")  # noqa: G004
+        logger.info(f"Выбран формат: {_describe(chosen)}")  # noqa: G004
+        yield _as_format(chosen)
+
+    return select
+
+
+def parse_audio_profile(fmt) -> AudioProfile | None:
+    """
+    Разбирает строку профиля ``audio[:кодек[:громкость]]``.
+
+    Returns:
+        AudioProfile (loudness — целевая громкость в LUFS или None) или None,
+        если это не аудиопрофиль
+
+    Raises:
+        ValueError: Неизвестный кодек или некорректная громкость
+    """
+    if not isinstance(fmt, str) or fmt.split(":")[0] != AUDIO_PROFILE:
+        return None
+    parts = fmt.split(":")
+    codec = parts[1] if len(parts) > 1 and parts[1] else "mp3"
+    if codec not in AUDIO_CODECS:
+        msg = f"Неизвестный аудиокодек: {codec} (поддерживаются {', '.join(AUDIO_CODECS)})"
+        raise ValueError(msg)
+    try:
+        loudness = float(parts[2]) if len(parts) > 2 and parts[2] else None  # noqa: PLR2004
+    except ValueError:
+        msg = f"Некорректная громкость: {parts[2]} (ожидается LUFS, например -16)"
+        raise ValueError(msg) from None
+    return AudioProfile(codec, loudness)
+
+
+def audio_postprocessors(profile: AudioProfile) -> list[dict]:
+    """Постобработчики yt-dlp (опция "postprocessors") для аудиопрофиля"""
+    return [
+        {
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": profile.codec,
+            "preferredquality": AUDIO_QUALITY[profile.codec],
+        },
+    ]
+
+
+def resolve_format(fmt):
+    """
+    Превращает строку формата в значение опции "format" yt-dlp.
+
+    ``fast``, ``fast:1080``, ``fast:1080:0.4`` — селектор профиля "fast";
+    ``audio:mp3`` и т.п. — выбор только аудиопотока;
+    любые другие строки передаются yt-dlp как есть.
+    """
+    audio = parse_audio_profile(fmt)
+    if audio is not None:
+        return AUDIO_CODECS[audio.codec]
+    if not isinstance(fmt, str) or fmt.split(":")[0] != FAST_PROFILE:
+        return fmt
+    parts = fmt.split(":")
+    try:
+        max_height = int(parts[1]) if len(parts) > 1 and parts[1] else None
+        tolerance = float(parts[2]) if len(parts) > 2 else FAST_TOLERANCE  # noqa: PLR2004
+    except ValueError:
+        msg = f"Некорректный формат: {fmt} (ожидается fast[:высота[:допуск]])"
+        raise ValueError(msg) from None
+    return fast_format_selector(max_height, tolerance)
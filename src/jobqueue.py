@@ -0,0 +1,473 @@
+"""
+Общая очередь заданий с арендой (lease) для нескольких экземпляров.
+
+Несколько копий приложения или демона, работающих с одним backlog и одной
+папкой result/, берут ссылки из общей очереди: задание выдаётся одному
+исполнителю на время аренды, исполнитель продлевает её heartbeat-ами и
+сообщает о завершении. Просроченная аренда (упал процесс, пропала сеть)
+возвращает задание в очередь.
+
+- SQLiteJobQueue — очередь в SQLite (WAL) для одного хоста;
+- CoordinatorServer/CoordinatorClient — небольшой TCP-координатор
+  (JSON построчно) поверх SQLiteJobQueue для нескольких хостов;
+- QueueWorker — забирает задания в DownloadEngine и отчитывается о них.
+"""  # noqa: RUF002
+
+__all__ = [
+    "CoordinatorClient",
+    "CoordinatorServer",
+    "Job",
+    "QueueWorker",
+    "SQLiteJobQueue",
+]
+
+import collections
+import contextlib
+import json
+import logging
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+
+from src.engine import CANCELLED, DONE, FAILED
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Состояния заданий в очереди
+PENDING = "pending"
+LEASED = "leased"
+COMPLETED = "completed"
+DEAD = "dead"
+
+Job = collections.namedtuple("Job", ["id", "url", "attempts", "lease_until"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    url         TEXT NOT NULL UNIQUE,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    worker      TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+
+class SQLiteJobQueue:
+    """
+    Очередь заданий с арендой в SQLite.
+
+    Безопасна для нескольких потоков и процессов одного хоста: журнал WAL,
+    выдача заданий в транзакции BEGIN IMMEDIATE. Ссылка уникальна, поэтому
+    повторная постановка уже известной ссылки игнорируется.
+
+    Args:
+        path: Путь к файлу базы
+        lease_seconds: Длительность аренды без heartbeat
+        max_attempts: После стольких неудачных попыток задание считается мёртвым
+        clock: Источник времени (для тестов)
+    """  # noqa: RUF002
+
+    def __init__(self, path, lease_seconds=120.0, max_attempts=3, clock=time.time):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,  # транзакции управляются вручную
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._conn.execute("COMMIT")
+
+    def add(self, urls) -> int:
+        """
+        Ставит ссылки в очередь.
+
+        Returns:
+            Количество реально добавленных (новых) ссылок
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (url, created_at, updated_at) VALUES (?, ?, ?)",
+                [(url, now, now) for url in urls],
+            )
+            return conn.total_changes - before
+
+    def requeue_expired(self) -> int:
+        """Возвращает в очередь задания с истёкшей арендой"""  # noqa: RUF002
+        with self._transaction() as conn:
+            return self._requeue_expired(conn, self.clock())
+
+    def _requeue_expired(self, conn, now):
+        cursor = conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END,"
+            " worker = NULL, lease_until = NULL, error = 'lease expired', updated_at = ?"
+            " WHERE state = ? AND lease_until < ?",
+            (self.max_attempts, DEAD, PENDING, now, LEASED, now),
+        )
+        if cursor.rowcount:
+            logger.warning(f"Возвращено в очередь заданий с истёкшей арендой: {cursor.rowcount}")  # noqa: G004
+        return cursor.rowcount
+
+    def claim(self, worker, limit=1) -> list[Job]:
+        """
+        Выдаёт исполнителю до limit заданий в аренду.
+
+        Returns:
+            Список выданных заданий
+        """
+        now = self.clock()
+        lease_until = now + self.lease_seconds
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            rows = conn.execute(
+                "SELECT id, url, attempts FROM jobs WHERE state = ? ORDER BY id LIMIT ?",
+                (PENDING, int(limit)),
+            ).fetchall()
+            jobs = []
+            for job_id, url, attempts in rows:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, worker = ?, lease_until = ?,"
+                    " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (LEASED, worker, lease_until, now, job_id),
+                )
+                jobs.append(Job(job_id, url, attempts + 1, lease_until))
+        return jobs
+
+    def heartbeat(self, worker, job_ids) -> int:
+        """
+        Продлевает аренду заданий исполнителя.
+
+        Returns:
+            Количество продлённых заданий (меньше переданных — аренду потеряли)
+        """
+        if not job_ids:
+            return 0
+        now = self.clock()
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "UPDATE jobs SET lease_until = ?, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                [(now + self.lease_seconds, now, job_id, worker, LEASED) for job_id in job_ids],
+            )
+            return cursor.rowcount
+
+    def complete(self, worker, job_id) -> bool:
+        """Отмечает задание выполненным (только если аренда ещё у исполнителя)"""  # noqa: RUF002
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = NULL, error = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                (COMPLETED, self.clock(), job_id, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, worker, job_id, error=None, retry=True) -> bool:
+        """
+        Сообщает о неудаче задания.
+
+        Args:
+            retry: Вернуть задание в очередь, если попытки не исчерпаны
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND state = ?",
+                (job_id, worker, LEASED),
+            ).fetchone()
+            if row is None:
+                return False
+            state = PENDING if retry and row[0] < self.max_attempts else DEAD
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL,"
+                " error = ?, updated_at = ? WHERE id = ?",
+                (state, error, self.clock(), job_id),
+            )
+            return True
+
+    def release(self, worker, job_id) -> bool:
+        """Возвращает задание в очередь без учёта попытки (остановка исполнителя)"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL,"
+                " attempts = MAX(attempts - 1, 0), updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                (PENDING, self.clock(), job_id, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def stats(self) -> dict:
+        """Количество заданий по состояниям"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys((PENDING, LEASED, COMPLETED, DEAD), 0)
+        counts.update(rows)
+        return counts
+
+
+# ==================== TCP-координатор ====================
+
+# Операции, доступные удалённым исполнителям
+_OPERATIONS = ("add", "claim", "heartbeat", "complete", "fail", "release", "stats")
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        job_queue = self.server.job_queue
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.pop("op")
+                if op not in _OPERATIONS:
+                    raise ValueError(f"unknown op: {op}")  # noqa: TRY301
+                result = getattr(job_queue, op)(**request)
+                response = {"ok": True, "result": result}
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Координатор: ошибка запроса: {e}")  # noqa: G004
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """
+    TCP-координатор очереди для нескольких хостов.
+
+    Протокол: один JSON-объект на строку, ``{"op": "claim", ...аргументы}``,
+    ответ ``{"ok": true, "result": ...}``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, job_queue, host="127.0.0.1", port=8766):
+        super().__init__((host, port), _CoordinatorHandler)
+        self.job_queue = job_queue
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="coordinator", daemon=True)
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"Координатор очереди запущен: {host}:{port}")  # noqa: G004
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class CoordinatorClient:
+    """
+    Клиент TCP-координатора с тем же интерфейсом, что у SQLiteJobQueue.
+
+    Соединение устанавливается лениво и переустанавливается после ошибок.
+    """  # noqa: RUF002
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _disconnect(self):
+        for resource in (self._file, self._sock):
+            if resource is not None:
+                with contextlib.suppress(OSError):
+                    resource.close()
+        self._sock = self._file = None
+
+    def _call(self, op, **kwargs):
+        payload = json.dumps({"op": op, **kwargs}).encode("utf-8") + b"\n"
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._sock = socket.create_connection((self.host, self.port), self.timeout)
+                    self._file = self._sock.makefile("rwb")
+                self._file.write(payload)
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("coordinator closed connection")
+                response = json.loads(line)
+                ok = response["ok"]
+            except OSError:
+                self._disconnect()
+                raise
+            except (ValueError, KeyError, TypeError) as e:
+                # Поток ответов рассинхронизирован: следующий запрос — по новому соединению
+                self._disconnect()
+                raise RuntimeError(f"malformed coordinator reply: {line[:200]!r}") from e
+        if not ok:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def add(self, urls):
+        return self._call("add", urls=list(urls))
+
+    def claim(self, worker, limit=1):
+        return [Job(*job) for job in self._call("claim", worker=worker, limit=limit)]
+
+    def heartbeat(self, worker, job_ids):
+        return self._call("heartbeat", worker=worker, job_ids=list(job_ids))
+
+    def complete(self, worker, job_id):
+        return self._call("complete", worker=worker, job_id=job_id)
+
+    def fail(self, worker, job_id, error=None, retry=True):
+        return self._call("fail", worker=worker, job_id=job_id, error=error, retry=retry)
+
+    def release(self, worker, job_id):
+        return self._call("release", worker=worker, job_id=job_id)
+
+    def stats(self):
+        return self._call("stats")
+
+
+# ==================== Исполнитель ====================
+
+
+class QueueWorker:
+    """
+    Забирает задания из общей очереди в DownloadEngine.
+
+    Держит в работе не больше заданий, чем потоков у движка во всех пулах
+    (routing), продлевает аренду heartbeat-ами и отчитывается о результате
+    каждого элемента.
+
+    Args:
+        job_queue: SQLiteJobQueue или CoordinatorClient
+        engine: Движок загрузок
+        worker_id: Уникальное имя исполнителя (хост:pid)
+        poll_interval: Пауза между запросами, когда очередь пуста
+    """  # noqa: RUF002
+
+    def __init__(self, job_queue, engine, worker_id, poll_interval=2.0):
+        self.job_queue = job_queue
+        self.engine = engine
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = getattr(job_queue, "lease_seconds", 120.0) / 3
+        self._in_flight = {}  # job.id -> DownloadItem
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.engine.add_listener(self.on_engine_event)
+        for target, name in ((self._claim_loop, "queue-claim"), (self._heartbeat_loop, "queue-heartbeat")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Исполнитель очереди запущен: {self.worker_id}")  # noqa: G004
+
+    def stop(self):
+        """Останавливает выдачу; незапущенные элементы вернутся в очередь через release"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def release_unfinished(self):
+        """Возвращает в очередь задания, которые не были завершены"""
+        with self._lock:
+            in_flight, self._in_flight = self._in_flight, {}
+        for job_id, item in in_flight.items():
+            if not item.finished or item.state == CANCELLED:
+                with contextlib.suppress(OSError, RuntimeError):
+                    self.job_queue.release(self.worker_id, job_id)
+        self.engine.remove_listener(self.on_engine_event)
+
+    def _claim_loop(self):
+        while not self._stop.is_set():
+            # Потоки всех пулов движка, включая пул по умолчанию (max_workers)
+            capacity = sum(pool.workers for pool in self.engine.pools.values())
+            with self._lock:
+                free = capacity - len(self._in_flight)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = self.job_queue.claim(self.worker_id, limit=free)
+                except (OSError, RuntimeError, ValueError) as e:
+                    logger.error(f"Не удалось получить задания: {e}")  # noqa: G004
+            for job in jobs:
+                (item,) = self.engine.submit([job.url], owner=job)
+                with self._lock:
+                    self._in_flight[job.id] = item
+            # Ждём освобождения слота или паузы опроса
+            self._wakeup.wait(self.poll_interval if not jobs else 0.05)
+            self._wakeup.clear()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._in_flight)
+            if not job_ids:
+                continue
+            try:
+                renewed = self.job_queue.heartbeat(self.worker_id, job_ids)
+            except (OSError, RuntimeError) as e:
+                logger.error(f"Heartbeat не удался: {e}")  # noqa: G004
+                continue
+            if renewed < len(job_ids):
+                logger.warning(f"Аренда потеряна для {len(job_ids) - renewed} заданий")  # noqa: G004
+
+    def on_engine_event(self, event, item):
+        job = item.owner
+        if not isinstance(job, Job) or event not in (DONE, FAILED, CANCELLED):
+            return
+        if self._stop.is_set() and event == CANCELLED:
+            return  # остановка: задание вернётся в очередь через release_unfinished()
+        with self._lock:
+            self._in_flight.pop(job.id, None)
+        try:
+            if event == DONE:
+                self.job_queue.complete(self.worker_id, job.id)
+            elif event == FAILED:
+                self.job_queue.fail(self.worker_id, job.id, error=item.error)
+            else:
+                self.job_queue.fail(self.worker_id, job.id, error="cancelled", retry=False)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Не удалось отчитаться о задании #{job.id}: {e}")  # noqa: G004
+        self._wakeup.set()
@@ -0,0 +1,233 @@
+"""
+Инкрементальный индекс папки загрузок для панели «Библиотека».
+
+Список файлов, их размер, mtime и параметры медиа (длительность,
+разрешение) хранятся в SQLite рядом с загрузками. Открытие панели
+показывает сохранённый список сразу, без обхода папки; refresh() обходит
+папку через os.scandir, сравнивает размер и mtime с сохранёнными и
+записывает только изменившиеся записи. ffprobe запускается лишь для новых
+и изменённых медиафайлов — в папке на 50 тысяч файлов повторное открытие
+не трогает ни один из них.
+"""  # noqa: RUF002
+
+__all__ = ["LIBRARY_FILENAME", "MEDIA_EXTENSIONS", "LibraryChanges", "LibraryEntry", "LibraryIndex"]
+
+import collections
+import logging
+import os
+import pathlib
+import sqlite3
+import subprocess
+import threading
+
+from src.renditions import probe
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Файл кэша индекса (в корне папки загрузок)
+LIBRARY_FILENAME = ".library.sqlite3"
+
+MEDIA_EXTENSIONS = frozenset(
+    {".mp4", ".mkv", ".webm", ".mov", ".avi", ".flv", ".m4a", ".mp3", ".opus", ".ogg", ".aac", ".flac", ".wav"},
+)
+
+# Незавершённые загрузки, переносы и склейки
+_PARTIAL_SUFFIXES = (".part", ".ytdl", ".moving", ".dedupe", ".segments")
+
+# duration — секунды; width/height — None для аудио; probed — ffprobe уже запускался
+LibraryEntry = collections.namedtuple(
+    "LibraryEntry",
+    ["path", "size", "mtime_ns", "duration", "width", "height", "probed"],
+)
+
+# added/changed — записи LibraryEntry, removed — пути
+LibraryChanges = collections.namedtuple("LibraryChanges", ["added", "changed", "removed"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    width    INTEGER,
+    height   INTEGER,
+    probed   INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_SORT_KEYS = {
+    "name": lambda entry: pathlib.Path(entry.path).name.lower(),
+    "size": lambda entry: entry.size,
+    "mtime": lambda entry: entry.mtime_ns,
+    "duration": lambda entry: entry.duration or 0,
+    "height": lambda entry: entry.height or 0,
+}
+
+
+def _is_listed(name) -> bool:
+    return not name.startswith(".") and not name.endswith(_PARTIAL_SUFFIXES) and ".temp." not in name
+
+
+class LibraryIndex:
+    """
+    Кэшированный список файлов папки загрузок.
+
+    Безопасен для нескольких потоков: обход и ffprobe можно выполнять в
+    фоне, пока GUI читает entries().
+
+    Args:
+        root: Папка загрузок
+        db_path: Файл кэша (по умолчанию ``<root>/.library.sqlite3``)
+    """
+
+    def __init__(self, root, db_path=None):
+        self.root = pathlib.Path(root)
+        self.db_path = pathlib.Path(db_path) if db_path else self.root / LIBRARY_FILENAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        rows = self._conn.execute("SELECT path, size, mtime_ns, duration, width, height, probed FROM entries")
+        self._entries = {row[0]: LibraryEntry(*row[:6], bool(row[6])) for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def entries(self) -> list[LibraryEntry]:
+        """Текущие записи (из кэша, без обращения к диску)"""
+        with self._lock:
+            return list(self._entries.values())
+
+    def query(self, text="", sort="mtime", descending=True) -> list[LibraryEntry]:
+        """
+        Записи, отфильтрованные по подстроке имени и отсортированные.
+
+        Args:
+            text: Подстрока имени файла (без учёта регистра)
+            sort: "name", "size", "mtime", "duration" или "height"
+            descending: По убыванию
+        """
+        needle = text.lower()
+        entries = [entry for entry in self.entries() if needle in pathlib.Path(entry.path).name.lower()]
+        return sorted(entries, key=_SORT_KEYS[sort], reverse=descending)
+
+    def _walk(self) -> dict:
+        """Обход папки: путь -> (размер, mtime_ns)"""
+        found = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if not _is_listed(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                found[os.path.abspath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+                        except OSError:
+                            continue  # файл удалён во время обхода
+            except OSError as e:
+                logger.warning(f"Не удалось прочитать {directory}: {e}")  # noqa: G004
+        return found
+
+    def refresh(self) -> LibraryChanges:
+        """
+        Синхронизирует кэш с папкой.
+
+        Записываются только новые, изменённые и удалённые файлы.
+        """  # noqa: RUF002
+        found = self._walk()
+        added, changed = [], []
+        with self._lock:
+            for path, (size, mtime_ns) in found.items():
+                old = self._entries.get(path)
+                if old is not None and (old.size, old.mtime_ns) == (size, mtime_ns):
+                    continue
+                entry = LibraryEntry(path, size, mtime_ns, None, None, None, probed=False)
+                (added if old is None else changed).append(entry)
+                self._entries[path] = entry
+            removed = [path for path in self._entries if path not in found]
+            for path in removed:
+                del self._entries[path]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (path, size, mtime_ns, duration, width, height, probed)"
+                    " VALUES (?, ?, ?, NULL, NULL, NULL, 0)",
+                    [(entry.path, entry.size, entry.mtime_ns) for entry in added + changed],
+                )
+                self._conn.executemany("DELETE FROM entries WHERE path = ?", [(path,) for path in removed])
+        if added or changed or removed:
+            logger.info(
+                f"Библиотека {self.root}: новых {len(added)}, изменено {len(changed)}, удалено {len(removed)}",  # noqa: G004
+            )
+        return LibraryChanges(added, changed, removed)
+
+    def pending_probe(self) -> list[str]:
+        """Медиафайлы, для которых ещё не известны длительность и разрешение"""
+        with self._lock:
+            return [
+                entry.path
+                for entry in self._entries.values()
+                if not entry.probed and pathlib.Path(entry.path).suffix.lower() in MEDIA_EXTENSIONS
+            ]
+
+    def probe(self, paths=None, ffmpeg_location=None, stop=None) -> list[LibraryEntry]:
+        """
+        Читает длительность и разрешение через ffprobe.
+
+        Args:
+            paths: Файлы (по умолчанию — pending_probe())
+            ffmpeg_location: Путь к FFmpeg (файл или папка)
+            stop: Функция без аргументов; True — прервать (закрытие окна)
+
+        Returns:
+            Обновлённые записи
+        """
+        updated = []
+        for path in self.pending_probe() if paths is None else paths:
+            if stop is not None and stop():
+                break
+            try:
+                info = probe(path, ffmpeg_location)
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                logger.debug(f"ffprobe не смог прочитать {path}: {e}")  # noqa: G004
+                info = {}
+            with self._lock:
+                old = self._entries.get(path)
+                if old is None:
+                    continue  # удалён во время чтения
+                entry = old._replace(
+                    duration=info.get("duration"),
+                    width=info.get("width"),
+                    height=info.get("height"),
+                    probed=True,
+                )
+                self._entries[path] = entry
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE entries SET duration = ?, width = ?, height = ?, probed = 1 WHERE path = ?",
+                        (entry.duration, entry.width, entry.height, path),
+                    )
+            updated.append(entry)
+        return updated
+
+    def delete(self, path):
+        """
+        Удаляет файл с диска и из индекса.
+
+        Raises:
+            OSError: Файл не удалось удалить
+        """  # noqa: RUF002
+        path = os.path.abspath(path)
+        pathlib.Path(path).unlink(missing_ok=True)
+        with self._lock:
+            self._entries.pop(path, None)
+            with self._conn:
+                self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+        logger.info(f"Файл удалён: {path}")  # noqa: G004
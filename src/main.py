@@ -1,7 +1,18 @@
+import sys
 from pathlib import Path
 
 import yt_dlp
 
+if __package__ in (None, ""):
+    # Запуск как скрипта (py src/main.py): делаем пакет src импортируемым
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.cache import PersistentCache, default_cache_dir
+from src.formats import audio_postprocessors, parse_audio_profile, resolve_format
+from src.postprocess import LoudnessNormalizePP
+
+# Постоянный кэш player JS и подписей, общий с GUI и демоном
+CACHE = PersistentCache(default_cache_dir())
 
 
 def read_links(filename: str = "links.txt") -> list[str]:
@@ -24,26 +35,34 @@ def read_links(filename: str = "links.txt") -> list[str]:
         return [link.strip() for link in links if link.strip()]
 
 
-def download_video(url: str, output_dir: str = "result") -> bool:
+def download_video(url: str, output_dir: str = "result", fmt: str = "best") -> bool:
     """
     Скачивает видео по URL.
 
     Args:
         url: URL видео
         output_dir: Директория для сохранения
+        fmt: Формат yt-dlp или профиль "audio:mp3" / "audio:m4a:-16" и т.п.
 
     Returns:
         True если успешно, False иначе
     """
     ydl_opts = {
-        "format": "best",
+        "format": resolve_format(fmt),
         "outtmpl": f"{output_dir}/%(title)s.%(ext)s",
         "quiet": True,
         "extractor_args": {"youtube": {"lang": ["ru", "ru-RU"]}},
     }
+    ydl_opts["cachedir"] = str(CACHE.directory)
+    audio = parse_audio_profile(fmt)
+    if audio is not None:
+        ydl_opts["postprocessors"] = audio_postprocessors(audio)
 
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            CACHE.attach(ydl)
+            if audio is not None and audio.loudness is not None:
+                ydl.add_post_processor(LoudnessNormalizePP(ydl, audio.loudness), when="post_process")
             ydl.download([url])
     except Exception as e:
         print(f"Error downloading {url}: {e}")
@@ -0,0 +1,131 @@
+"""
+Отдельный пул постобработки (склейка, перепаковка, извлечение аудио).
+
+yt-dlp выполняет постобработку в том же потоке сразу после загрузки, и
+рабочий поток ждёт FFmpeg, вместо того чтобы начинать следующую ссылку.
+defer_postprocessing() подменяет YoutubeDL.post_process так, что вся цепочка
+постобработчиков (включая перенос файлов и post_hooks) ставится в очередь
+PostprocessPool, а рабочий поток сразу освобождается.
+
+YoutubeDL не потокобезопасен, а рабочий поток сразу начинает на нём
+следующую загрузку. Поэтому постобработка в пуле идёт на отдельных
+экземплярах YoutubeDL с теми же опциями и постобработчиками (factory):
+по одному на каждую одновременную задачу, свободные переиспользуются.
+
+Тяжёлая работа выполняется процессами FFmpeg, поэтому потоки пула не
+упираются в GIL: размер пула ограничивает число одновременных процессов
+FFmpeg и по умолчанию равен числу ядер.
+"""  # noqa: RUF002
+
+__all__ = ["LoudnessNormalizePP", "PostprocessPool", "defer_postprocessing"]
+
+import concurrent.futures
+import functools
+import logging
+import os
+import queue
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import prepend_extension
+
+logger = logging.getLogger("YouTubeDownloader")
+
+
+# Кодировщик и битрейт для перекодирования после нормализации громкости
+_LOUDNESS_ENCODERS = {
+    "mp3": ("libmp3lame", "192k"),
+    "m4a": ("aac", "192k"),
+    "opus": ("libopus", "160k"),
+    "ogg": ("libopus", "160k"),
+}
+
+
+class LoudnessNormalizePP(FFmpegPostProcessor):
+    """
+    Нормализация громкости (фильтр FFmpeg loudnorm, EBU R128).
+
+    Выполняется после FFmpegExtractAudio и перекодирует файл в тот же
+    формат: фильтр несовместим с копированием потока.
+
+    Args:
+        downloader: YoutubeDL
+        target: Целевая интегральная громкость, LUFS
+    """  # noqa: RUF002
+
+    def __init__(self, downloader=None, target=-16.0):
+        super().__init__(downloader)
+        self.target = target
+
+    def run(self, info):
+        path = info["filepath"]
+        encoder, bitrate = _LOUDNESS_ENCODERS.get(info.get("ext"), _LOUDNESS_ENCODERS["mp3"])
+        temp_path = prepend_extension(path, "temp")
+        self.to_screen(f"Нормализация громкости до {self.target} LUFS: {path}")
+        self.run_ffmpeg(
+            path,
+            temp_path,
+            ["-vn", "-af", f"loudnorm=I={self.target}:TP=-1.5:LRA=11", "-c:a", encoder, "-b:a", bitrate],
+        )
+        os.replace(temp_path, path)
+        return [], info
+
+
+def defer_postprocessing(ydl, dispatch, factory=None):
+    """
+    Переносит постобработку YoutubeDL в другой поток.
+
+    Args:
+        ydl: Экземпляр YoutubeDL
+        dispatch: Функция, принимающая задачу без аргументов
+        factory: Функция без аргументов, создающая YoutubeDL для постобработки
+            (те же опции и постобработчики); None — постобработка на самом ydl
+    """
+    original = ydl.post_process
+    idle = queue.SimpleQueue()  # свободные экземпляры для постобработки
+
+    def run(filename, info, files_to_move):
+        try:
+            twin = idle.get_nowait()
+        except queue.Empty:
+            twin = factory()
+        # Склейку (FFmpegMergerPP) process_info создаёт с загрузчиком потока:
+        # её хуки, параметры и вывод должны идти через экземпляр постобработки
+        for pp in info.get("__postprocessors") or ():
+            pp.set_downloader(twin)
+        try:
+            return twin.post_process(filename, info, files_to_move)
+        finally:
+            idle.put(twin)
+
+    def post_process(filename, info, files_to_move=None):
+        job = run if factory is not None else original
+        dispatch(functools.partial(job, filename, info, files_to_move))
+        return info
+
+    # Атрибут экземпляра перекрывает метод класса: process_info вызывает
+    # self.post_process()
+    ydl.post_process = post_process
+    return ydl
+
+
+class PostprocessPool:
+    """
+    Очередь постобработки с ограниченным параллелизмом.
+
+    Args:
+        max_workers: Число одновременных постобработок (None — число ядер)
+    """  # noqa: RUF002
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="postprocess",
+        )
+        logger.info(f"Пул постобработки: {self.max_workers} потоков")  # noqa: G004
+
+    def submit(self, fn, *args) -> concurrent.futures.Future:
+        return self._executor.submit(fn, *args)
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,198 @@
+"""
+Предварительное чтение метаданных для следующих элементов очереди.
+
+Пока рабочие потоки качают, небольшой пул заранее выполняет для следующих
+N элементов то, что иначе делалось бы после предыдущей загрузки: загрузку
+страницы, player JS и выбор форматов (extract_info без скачивания).
+Освободившийся рабочий поток сразу начинает передачу по готовой
+информации (process_ie_result), а оценка размера становится доступна
+политике sjf и контролю места на диске до начала загрузки.
+
+Элементы просматриваются в порядке выдачи политикой планирования. Для
+политики sjf, которой нужны оценки размера всех ожидающих элементов,
+извлекаются и элементы за пределами окна: от них остаётся только оценка,
+а метаданные хранятся лишь для первых N элементов.
+
+Ссылки на потоки в метаданных со временем истекают, поэтому информация
+старше PREFETCH_MAX_AGE не используется — элемент извлекается заново.
+Ссылки привязаны и к адресу, с которого извлечены: если загрузка получила
+другую egress-личность, чем извлечение, метаданные тоже не используются.
+"""  # noqa: RUF002
+
+__all__ = ["Prefetcher"]
+
+import contextlib
+import logging
+import threading
+import time
+
+import yt_dlp
+
+from src.admission import estimate_download_size
+from src.egress import sticky_key
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Сколько секунд метаданные считаются свежими
+PREFETCH_MAX_AGE = 30 * 60
+
+
+class Prefetcher:
+    """
+    Пул предварительного извлечения метаданных.
+
+    Args:
+        engine: DownloadEngine, чья очередь просматривается
+        lookahead: Для скольких следующих элементов держать готовые метаданные
+        max_workers: Число потоков извлечения
+    """
+
+    def __init__(self, engine, lookahead=4, max_workers=2):
+        self.engine = engine
+        self.lookahead = max(1, int(lookahead))
+        self.max_workers = max(1, int(max_workers))
+        self._cond = threading.Condition()
+        self._results = {}  # id элемента -> (время, info)
+        self._busy = {}  # id элемента -> Event завершения извлечения
+        self._skipped = set()  # id элементов, для которых извлечение не удалось
+        self._identities = {}  # id элемента -> egress-личность извлечения
+        self._threads = []
+        self._stopped = False
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopped = False
+            for index in range(1, self.max_workers + 1):
+                thread = threading.Thread(target=self._run, name=f"prefetch-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            threads, self._threads = self._threads, []
+            self._cond.notify_all()
+        for thread in threads:
+            thread.join()
+
+    def notify(self):
+        """Очередь изменилась: появились элементы или освободилось окно"""
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---------- выдача результатов ----------
+
+    def identity_for(self, item):
+        """Egress-личность, через которую метаданные элемента извлекаются заранее"""
+        with self._cond:
+            return self._identities.get(item.id)
+
+    def take(self, item, identity=None) -> dict | None:
+        """
+        Забирает метаданные элемента для загрузки.
+
+        Если извлечение уже идёт, дожидается его: это та же работа, которую
+        иначе пришлось бы начинать заново.
+
+        Args:
+            item: Элемент очереди
+            identity: Egress-личность загрузки
+
+        Returns:
+            info для process_ie_result или None, если метаданных нет
+        """  # noqa: RUF002
+        with self._cond:
+            busy = self._busy.get(item.id)
+        if busy is not None:
+            busy.wait()
+        with self._cond:
+            result = self._results.pop(item.id, None)
+            via = self._identities.pop(item.id, None)
+            self._skipped.discard(item.id)
+            self._cond.notify_all()
+        if result is None:
+            return None
+        fetched_at, info = result
+        if time.monotonic() - fetched_at > PREFETCH_MAX_AGE:
+            logger.info(f"Метаданные #{item.id} устарели, извлекаем заново")  # noqa: G004
+            return None
+        if via != identity:
+            logger.info(f"Метаданные #{item.id} извлечены через другую egress-личность, извлекаем заново")  # noqa: G004
+            return None
+        return info
+
+    # ---------- рабочие потоки ----------
+
+    def _next(self):
+        """Следующий элемент для извлечения или None при остановке"""
+        with self._cond:
+            while not self._stopped:
+                queue = self.engine._queue  # noqa: SLF001
+                ordered = queue.ordered()
+                window = ordered[: self.lookahead]
+                window_ids = {item.id for item in window}
+                # Метаданные нужны только ближайшим элементам: у остальных
+                # (и отменённых) остаётся лишь оценка размера
+                for item_id in list(self._results):
+                    if item_id not in window_ids:
+                        del self._results[item_id]
+                        self._identities.pop(item_id, None)
+                candidates = [item for item in window if item.id not in self._results]
+                if getattr(queue.policy, "uses_size", False):
+                    candidates += [item for item in ordered[self.lookahead :] if item.expected_bytes is None]
+                for item in candidates:
+                    if item.id not in self._busy and item.id not in self._skipped:
+                        self._busy[item.id] = threading.Event()
+                        identities = self.engine.identities
+                        if identities is not None:
+                            self._identities[item.id] = identities.pick(sticky_key(item.url))
+                        return item
+                self._cond.wait(1.0)
+            return None
+
+    def _run(self):
+        ydls = {}
+        with contextlib.ExitStack() as stack:
+            while (item := self._next()) is not None:
+                try:
+                    self._prefetch(item, ydls, stack)
+                finally:
+                    with self._cond:
+                        self._busy.pop(item.id).set()
+                        self._cond.notify_all()
+
+    def _ydl_for(self, item, ydls, stack):
+        identity = self.identity_for(item)
+        key = (identity, item.fmt, str(item.download_dir))
+        ydl = ydls.get(key)
+        if ydl is None:
+            ydl = stack.enter_context(yt_dlp.YoutubeDL(self.engine.ydl_opts_for(item, identity=identity)))
+            session = self.engine.session_for(identity)
+            session.attach(ydl)
+            stack.callback(session.detach, ydl)
+            if self.engine.cache is not None:
+                self.engine.cache.attach(ydl)
+            ydls[key] = ydl
+        return ydl
+
+    def _prefetch(self, item, ydls, stack):
+        logger.debug(f"Предварительное извлечение #{item.id}: {item.url}")  # noqa: G004
+        try:
+            info = self._ydl_for(item, ydls, stack).extract_info(item.url, download=False)
+        except Exception as e:  # noqa: BLE001
+            # Ошибку покажет сама загрузка, здесь просто не используем prefetch
+            logger.warning(f"Не удалось заранее извлечь {item.url}: {e}")  # noqa: G004
+            info = None
+        if not isinstance(info, dict):
+            with self._cond:
+                self._skipped.add(item.id)
+            return
+
+        item.expected_bytes = estimate_download_size(info)
+        # Как при --load-info-json: без служебных полей прошлой обработки
+        info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+        with self._cond:
+            self._results[item.id] = (time.monotonic(), info)
+        self.engine._emit("prefetched", item)  # noqa: SLF001
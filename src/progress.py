@@ -0,0 +1,110 @@
+"""
+Общий прогресс пакета загрузок по байтам и оценка времени окончания.
+
+Процент готовых ссылок обманчив: пакет из одного видео на 10 ГБ и девяти
+роликов по 10 МБ показывал бы 90% почти в самом начале. BatchProgress
+считает долю по байтам: объём каждого элемента берётся из оценки по
+метаданным (expected_bytes) и уточняется, когда yt-dlp сообщает настоящие
+размеры файлов. Для элементов, размер которых ещё неизвестен, берётся
+средний из известных.
+
+Скорость — скользящее среднее прироста скачанных байт всех элементов
+за последние WINDOW секунд, поэтому оценка не скачет от мгновенной
+скорости отдельных потоков и учитывает параллельные загрузки.
+"""
+
+__all__ = ["BatchProgress", "BatchStatus", "ThroughputEstimator"]
+
+import collections
+import time
+
+from src.engine import FINAL_STATES
+
+# Окно скользящего среднего скорости, секунды
+WINDOW = 30.0
+# Меньше стольких секунд наблюдений — скорость ещё не известна
+MIN_SPAN = 2.0
+
+# done_bytes/total_bytes — байты пакета; percent — 0..100;
+# rate — байт/с или None; eta — секунды или None
+BatchStatus = collections.namedtuple("BatchStatus", ["done_bytes", "total_bytes", "percent", "rate", "eta"])
+
+
+class ThroughputEstimator:
+    """
+    Скорость как скользящее среднее по окну.
+
+    Args:
+        window: Ширина окна, секунды
+        min_span: Минимальная длительность наблюдений для оценки
+        clock: Источник монотонного времени (для тестов)
+    """
+
+    def __init__(self, window=WINDOW, min_span=MIN_SPAN, clock=time.monotonic):
+        self.window = window
+        self.min_span = min_span
+        self.clock = clock
+        self._samples = collections.deque()  # (время, скачано байт всего)
+
+    def add(self, transferred):
+        """Добавляет наблюдение: сколько байт скачано к текущему моменту"""
+        now = self.clock()
+        if self._samples and transferred < self._samples[-1][1]:
+            # Счётчик уменьшился (повтор загрузки с нуля) — начинаем заново
+            self._samples.clear()
+        self._samples.append((now, transferred))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:  # noqa: PLR2004
+            self._samples.popleft()
+
+    def rate(self) -> float | None:
+        """Средняя скорость за окно (байт/с) или None, если данных мало"""  # noqa: RUF002
+        if len(self._samples) < 2:  # noqa: PLR2004
+            return None
+        (start, first), (end, last) = self._samples[0], self._samples[-1]
+        if end - start < self.min_span:
+            return None
+        return (last - first) / (end - start)
+
+
+class BatchProgress:
+    """
+    Прогресс пакета элементов движка по байтам.
+
+    update() вызывается периодически (таймер GUI): каждый вызов читает
+    snapshot() элементов и добавляет наблюдение в оценку скорости.
+
+    Args:
+        estimator: Оценка скорости (по умолчанию ThroughputEstimator())
+    """
+
+    def __init__(self, estimator=None):
+        self.estimator = estimator or ThroughputEstimator()
+
+    @staticmethod
+    def _sizes(snapshots):
+        """Тройки (скачано, объём, завершён) элементов; объём None — неизвестен"""
+        sizes = []
+        for snap in snapshots:
+            done = snap["downloaded_bytes"]
+            final = snap["state"] in FINAL_STATES
+            # У завершённых оставшихся байт нет: объём — сколько скачано на деле
+            size = done if final else max(snap["expected_bytes"] or 0, snap["total_bytes"] or 0, done) or None
+            sizes.append((done, size, final))
+        return sizes
+
+    def update(self, items) -> BatchStatus:
+        """Текущее состояние пакета"""
+        sizes = self._sizes(item.snapshot() for item in items)
+        known = [size for _, size, _ in sizes if size]
+        average = sum(known) / len(known) if known else 0
+        total = int(sum(average if size is None else size for _, size, _ in sizes))
+        done = sum(done for done, _, _ in sizes)
+        self.estimator.add(done)
+        rate = self.estimator.rate()
+        if total:
+            percent = min(100, done * 100 // total)
+        else:
+            percent = 100 if sizes and all(final for _, _, final in sizes) else 0
+        remaining = max(0, total - done)
+        eta = remaining / rate if rate and remaining else None
+        return BatchStatus(done, total, percent, rate, eta)
@@ -0,0 +1,200 @@
+"""
+Дополнительные версии (renditions) из одного скачанного файла.
+
+Вместо повторной постановки ссылки с другим форматом (повторное
+извлечение и загрузка) элементу можно задать список выходных профилей —
+после загрузки каждый из них получается из уже скачанного файла на этапе
+постобработки:
+
+- ``480`` / ``720p`` — видео mp4 с высотой кадра не больше заданной;
+- ``audio:<кодек>[:<громкость LUFS>]`` — только аудио (как профиль "audio");
+- ``remux:<контейнер>`` — тот же поток в другом контейнере (mp4, mkv, webm).
+
+Потоки копируются без перекодирования, когда это возможно (кодек уже
+подходит, высота кадра не больше нужной); перекодируется только то, что
+иначе получить нельзя.
+"""  # noqa: RUF002
+
+__all__ = ["Rendition", "make_rendition", "parse_output", "plan_rendition", "probe"]
+
+import collections
+import json
+import logging
+import pathlib
+import subprocess
+
+from src.formats import parse_audio_profile
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# kind — "video", "audio" или "remux"; value — высота, AudioProfile или контейнер
+Rendition = collections.namedtuple("Rendition", ["spec", "kind", "value"])
+
+REMUX_CONTAINERS = ("mp4", "mkv", "webm")
+
+# Кодеки, которые mp4 принимает без перекодирования
+_MP4_VIDEO_CODECS = {"h264", "hevc", "av1"}
+_MP4_AUDIO_CODECS = {"aac", "mp3"}
+
+# Аудио: контейнер, кодек источника для копирования, кодировщик и битрейт
+_AUDIO_TARGETS = {
+    "mp3": ("mp3", "mp3", "libmp3lame", "192k"),
+    "m4a": ("m4a", "aac", "aac", "192k"),
+    "opus": ("opus", "opus", "libopus", "160k"),
+}
+
+
+def parse_output(spec: str) -> Rendition:
+    """
+    Разбирает выходной профиль.
+
+    Raises:
+        ValueError: Неизвестный профиль
+    """
+    spec = spec.strip()
+    audio = parse_audio_profile(spec)
+    if audio is not None:
+        return Rendition(spec, "audio", audio)
+    if spec.startswith("remux:"):
+        container = spec.split(":", 1)[1]
+        if container not in REMUX_CONTAINERS:
+            msg = f"Неизвестный контейнер: {container} (поддерживаются {', '.join(REMUX_CONTAINERS)})"
+            raise ValueError(msg)
+        return Rendition(spec, "remux", container)
+    height = spec.removesuffix("p")
+    if height.isdigit() and int(height) > 0:
+        return Rendition(spec, "video", int(height))
+    msg = f"Неизвестный выходной профиль: {spec} (ожидается 480, audio:mp3 или remux:mp4)"
+    raise ValueError(msg)
+
+
+def _tool(ffmpeg_location, name) -> str:
+    """Путь к ffmpeg/ffprobe с учётом ffmpeg_location (файл или папка)"""
+    if not ffmpeg_location:
+        return name
+    location = pathlib.Path(ffmpeg_location)
+    if location.is_dir():
+        return str(location / name)
+    return str(location.with_name(name + location.suffix))
+
+
+def probe(path, ffmpeg_location=None) -> dict:
+    """
+    Кодеки, размер кадра и длительность файла (через ffprobe).
+
+    Returns:
+        Словарь: vcodec, acodec (None, если потока нет), width, height,
+        duration (секунды или None)
+    """
+    result = subprocess.run(  # noqa: S603
+        [
+            _tool(ffmpeg_location, "ffprobe"),
+            "-v",
+            "error",
+            "-show_entries",
+            "stream=codec_type,codec_name,width,height:format=duration",
+            "-of",
+            "json",
+            str(path),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    data = json.loads(result.stdout)
+    duration = (data.get("format") or {}).get("duration")
+    info = {
+        "vcodec": None,
+        "acodec": None,
+        "width": None,
+        "height": None,
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+    }
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and info["vcodec"] is None:
+            info["vcodec"] = stream.get("codec_name")
+            info["width"] = stream.get("width")
+            info["height"] = stream.get("height")
+        elif stream.get("codec_type") == "audio" and info["acodec"] is None:
+            info["acodec"] = stream.get("codec_name")
+    return info
+
+
+def plan_rendition(rendition: Rendition, source: dict) -> tuple[str, str, list[str]]:
+    """
+    Выбирает копирование или перекодирование для версии.
+
+    Args:
+        rendition: Выходной профиль
+        source: Результат probe() для исходного файла
+
+    Returns:
+        (суффикс имени, расширение, аргументы ffmpeg между входом и выходом)
+    """
+    if rendition.kind == "audio":
+        audio = rendition.value
+        ext, copy_codec, encoder, bitrate = _AUDIO_TARGETS[audio.codec]
+        if audio.loudness is not None:
+            args = ["-vn", "-af", f"loudnorm=I={audio.loudness:g}:TP=-1.5:LRA=11", "-c:a", encoder, "-b:a", bitrate]
+        elif source.get("acodec") == copy_codec:
+            args = ["-vn", "-c:a", "copy"]
+        else:
+            args = ["-vn", "-c:a", encoder, "-b:a", bitrate]
+        return "audio", ext, args
+
+    if rendition.kind == "remux":
+        return "remux", rendition.value, ["-map", "0", "-c", "copy"]
+
+    height = rendition.value
+    if (source.get("height") or 0) <= height and source.get("vcodec") in _MP4_VIDEO_CODECS:
+        video_args = ["-c:v", "copy"]
+    else:
+        video_args = ["-vf", f"scale=-2:min({height}\\,ih)", "-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+    if source.get("acodec") is None:
+        audio_args = ["-an"]
+    elif source["acodec"] in _MP4_AUDIO_CODECS:
+        audio_args = ["-c:a", "copy"]
+    else:
+        audio_args = ["-c:a", "aac", "-b:a", "192k"]
+    return f"{height}p", "mp4", [*video_args, *audio_args, "-movflags", "+faststart"]
+
+
+def make_rendition(source, spec, ffmpeg_location=None) -> pathlib.Path:
+    """
+    Создаёт версию рядом с исходным файлом.
+
+    Args:
+        source: Скачанный файл
+        spec: Выходной профиль (см. parse_output)
+        ffmpeg_location: Путь к FFmpeg (файл или папка; None — искать в PATH)
+
+    Returns:
+        Путь к созданному файлу (``<имя>.<суффикс>.<расширение>``)
+    """  # noqa: RUF002
+    source = pathlib.Path(source)
+    rendition = parse_output(spec)
+    try:
+        source_info = probe(source, ffmpeg_location)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        # Без ffprobe кодеки неизвестны — перекодируем всё
+        logger.warning(f"ffprobe недоступен для {source.name}: {e}")  # noqa: G004
+        source_info = {"vcodec": None, "acodec": "unknown", "height": None}
+    suffix, ext, args = plan_rendition(rendition, source_info)
+    target = source.with_name(f"{source.stem}.{suffix}.{ext}")
+    copy = all(args[i + 1] == "copy" for i, arg in enumerate(args) if arg in ("-c", "-c:v", "-c:a"))
+    logger.info(f"Версия {spec} ({'копирование' if copy else 'перекодирование'}): {target.name}")  # noqa: G004
+
+    temp = target.with_name(f"{target.stem}.temp.{ext}")
+    try:
+        subprocess.run(  # noqa: S603
+            [_tool(ffmpeg_location, "ffmpeg"), "-y", "-v", "error", "-i", str(source), *args, str(temp)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        temp.replace(target)
+    except subprocess.CalledProcessError as e:
+        temp.unlink(missing_ok=True)
+        msg = f"Не удалось создать версию {spec}: {e.stderr.strip()}"
+        raise RuntimeError(msg) from e
+    return target
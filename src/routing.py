@@ -0,0 +1,91 @@
+"""
+Маршрутизация элементов очереди по сайтам в отдельные пулы потоков.
+
+is_valid_url пропускает любые http(s) ссылки, поэтому в одной очереди
+оказываются YouTube и другие сайты, поддерживаемые yt-dlp, — с разными
+ограничениями частоты запросов и задержками. Пул (PoolPolicy) —
+собственные рабочие потоки движка со своими ограничением скорости и
+числом повторов; элемент попадает в пул по сайту ссылки. Медленный или
+ограничивающий загрузки сайт занимает только потоки своего пула и не
+задерживает загрузки с YouTube.
+
+Сайты, не попавшие ни в один пул, обслуживаются пулом по умолчанию
+(DEFAULT_POOL, max_workers потоков движка).
+"""  # noqa: RUF002
+
+__all__ = ["DEFAULT_POOL", "YOUTUBE_HOSTS", "PoolPolicy", "Router", "parse_pool"]
+
+import collections
+
+from src.concurrency import host_of
+
+DEFAULT_POOL = "default"
+
+# Сайты YouTube (поддомены вроде music.youtube.com и youtu.be сводятся к youtube.com)
+YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com")
+
+# name — имя пула; hosts — сайты; workers — потоков;
+# ratelimit — байт/с на загрузку или None; retries — повторов yt-dlp или None (как в build_ydl_opts)
+PoolPolicy = collections.namedtuple(
+    "PoolPolicy",
+    ["name", "hosts", "workers", "ratelimit", "retries"],
+    defaults=(1, None, None),
+)
+
+
+def parse_pool(spec) -> PoolPolicy:
+    """
+    Разбирает описание пула ``сайт[,сайт...]=потоков[/МБ/с[/повторов]]``.
+
+    Например, ``vimeo.com,vk.com=2/5/10`` — два потока, до 5 МБ/с на
+    загрузку, 10 повторов. Имя пула — первый сайт.
+
+    Raises:
+        ValueError: Неверное описание
+    """  # noqa: RUF002
+    hosts_part, sep, limits_part = spec.partition("=")
+    hosts = tuple(host_of(f"//{host.strip()}") for host in hosts_part.split(",") if host.strip())
+    if not sep or not hosts:
+        raise ValueError(f"Неверное описание пула {spec!r}: ожидается сайт[,сайт...]=потоков[/МБ/с[/повторов]]")
+    values = limits_part.split("/")
+    if len(values) > 3:  # noqa: PLR2004
+        raise ValueError(f"Неверное описание пула {spec!r}: лишние параметры")
+    try:
+        workers = int(values[0])
+        ratelimit = int(float(values[1]) * 1024 * 1024) if len(values) > 1 and values[1] else None
+        retries = int(values[2]) if len(values) > 2 and values[2] else None  # noqa: PLR2004
+    except ValueError:
+        raise ValueError(f"Неверное описание пула {spec!r}: числа потоков, МБ/с и повторов") from None
+    if workers < 1:
+        raise ValueError(f"Неверное описание пула {spec!r}: нужен хотя бы один поток")
+    return PoolPolicy(hosts[0], hosts, workers, ratelimit, retries)
+
+
+class Router:
+    """
+    Выбор пула по сайту ссылки.
+
+    Args:
+        pools: Пулы (PoolPolicy); сайт, указанный в нескольких, идёт в первый
+    """
+
+    def __init__(self, pools=()):
+        self.pools = list(pools)
+        names = [pool.name for pool in self.pools]
+        if DEFAULT_POOL in names or len(set(names)) != len(names):
+            raise ValueError(f"Имена пулов должны быть уникальны и не совпадать с {DEFAULT_POOL!r}")
+        self._by_host = {}
+        for pool in self.pools:
+            for host in pool.hosts:
+                self._by_host.setdefault(host, pool.name)
+
+    def route(self, url) -> str:
+        """Имя пула для ссылки (DEFAULT_POOL, если сайт не указан ни в одном)"""
+        host = host_of(url)
+        while host:
+            name = self._by_host.get(host)
+            if name is not None:
+                return name
+            # Поддомены: player.vimeo.com -> vimeo.com
+            host = host.partition(".")[2] if host.count(".") > 1 else ""
+        return DEFAULT_POOL
@@ -0,0 +1,227 @@
+"""
+Политики выбора следующего элемента очереди загрузок.
+
+- fifo — строго в порядке постановки;
+- sjf  — сначала самые короткие по оценке размера (expected_bytes из
+  предварительного чтения метаданных): больше готовых элементов в минуту,
+  одно длинное видео не задерживает десятки коротких;
+- fair — по очереди между владельцами (GUI-задачами, файлами ссылок,
+  клиентами API), чтобы один большой плейлист не занимал все потоки.
+
+Срочные элементы (urgent) выдаются раньше обычных при любой политике.
+Потоки пула (см. routing) получают только элементы своего пула.
+Элементы, которые пока нельзя начать (сайт на пределе одновременных
+загрузок, см. concurrency), пропускаются и остаются в очереди.
+"""
+
+__all__ = ["POLICIES", "FIFOPolicy", "FairPolicy", "Scheduler", "ShortestJobFirstPolicy", "make_policy"]
+
+import itertools
+import threading
+import time
+
+# Период повторной проверки элементов, которые пока нельзя начать, секунды
+BLOCKED_POLL_INTERVAL = 1.0
+
+
+class FIFOPolicy:
+    """Порядок постановки в очередь"""
+
+    name = "fifo"
+    # Нужны ли политике оценки размера всех ожидающих элементов (см. prefetch)
+    uses_size = False
+
+    def pick(self, pending):
+        return pending[0]
+
+    def order(self, pending):
+        return list(pending)
+
+
+class ShortestJobFirstPolicy:
+    """
+    Сначала элементы с наименьшей оценкой размера.
+
+    Элементы без оценки идут после оценённых в порядке постановки.
+    Элемент, ждущий дольше max_wait секунд, выбирается вне очереди,
+    чтобы длинные видео не голодали бесконечно.
+    """  # noqa: RUF002
+
+    name = "sjf"
+    uses_size = True
+
+    def __init__(self, max_wait=600.0, clock=time.time):
+        self.max_wait = max_wait
+        self.clock = clock
+
+    def _overdue(self, item):
+        return self.max_wait is not None and self.clock() - item.created_at >= self.max_wait
+
+    @staticmethod
+    def _size_key(item):
+        return item.expected_bytes is None, item.expected_bytes or 0
+
+    def pick(self, pending):
+        oldest = pending[0]
+        if self._overdue(oldest):
+            return oldest
+        return min(pending, key=self._size_key)
+
+    def order(self, pending):
+        # Как в pick(): сначала ждущие дольше max_wait в порядке постановки
+        overdue = [item for item in pending if self._overdue(item)]
+        rest = [item for item in pending if not self._overdue(item)]
+        return overdue + sorted(rest, key=self._size_key)
+
+
+class FairPolicy:
+    """Круговой обход владельцев; внутри владельца — порядок постановки"""
+
+    name = "fair"
+    uses_size = False
+
+    def __init__(self):
+        self._served = {}  # владелец -> номер последнего обслуживания
+        self._counter = itertools.count(1)
+
+    def pick(self, pending):
+        first_of_owner = {}
+        for item in pending:
+            first_of_owner.setdefault(item.owner, item)
+        # Владелец, дольше всех не получавший поток (новые — первыми)
+        owner = min(first_of_owner, key=lambda key: self._served.get(key, 0))
+        self._served[owner] = next(self._counter)
+        if len(self._served) > len(first_of_owner) * 4:
+            # Забываем владельцев, у которых давно нет элементов
+            self._served = {key: value for key, value in self._served.items() if key in first_of_owner}
+        return first_of_owner[owner]
+
+    def order(self, pending):
+        by_owner = {}
+        for item in pending:
+            by_owner.setdefault(item.owner, []).append(item)
+        owners = sorted(by_owner, key=lambda key: self._served.get(key, 0))
+        # Круговой обход: первые элементы всех владельцев, затем вторые и т.д.
+        rounds = itertools.zip_longest(*(by_owner[owner] for owner in owners))
+        return [item for items in rounds for item in items if item is not None]
+
+
+POLICIES = {
+    FIFOPolicy.name: FIFOPolicy,
+    ShortestJobFirstPolicy.name: ShortestJobFirstPolicy,
+    FairPolicy.name: FairPolicy,
+}
+
+
+def make_policy(policy):
+    """Возвращает политику по имени ("fifo", "sjf", "fair") или как есть"""
+    if isinstance(policy, str):
+        try:
+            return POLICIES[policy]()
+        except KeyError:
+            msg = f"Неизвестная политика планирования: {policy}"
+            raise ValueError(msg) from None
+    return policy
+
+
+class Scheduler:
+    """
+    Очередь элементов с выбором следующего по политике.
+
+    Интерфейс как у queue.Queue для рабочих потоков: put(None) — сигнал
+    остановки, get() блокируется до появления элемента. Завершённые
+    (отменённые в очереди) элементы отбрасываются при выборе.
+
+    Args:
+        policy: Политика выбора ("fifo", "sjf", "fair" или объект с pick())
+        ready: Функция ``(item) -> bool``: можно ли начать элемент сейчас;
+            остальные элементы пропускаются до следующего get()
+        reserve: Функция ``(item) -> bool``, вызывается для выбранного
+            элемента под блокировкой очереди и занимает его ресурсы;
+            False — элемент остаётся в очереди
+    """  # noqa: RUF002
+
+    def __init__(self, policy="fifo", ready=None, reserve=None):
+        self.policy = make_policy(policy)
+        self.ready = ready
+        self.reserve = reserve
+        self._pending = []
+        self._stops = 0
+        self._cond = threading.Condition()
+
+    def put(self, item, front=False):
+        """
+        Добавляет элемент (None — сигнал остановки одному потоку).
+
+        Args:
+            front: Поставить первым (например, вытесненный срочной загрузкой)
+        """
+        with self._cond:
+            if item is None:
+                self._stops += 1
+            elif front:
+                self._pending.insert(0, item)
+            else:
+                self._pending.append(item)
+            # Все: поток срочной полосы не берёт обычные элементы
+            self._cond.notify_all()
+
+    def get(self, urgent_only=False, pool=None):
+        """
+        Следующий элемент: срочные всегда раньше обычных.
+
+        Args:
+            urgent_only: Ждать только срочные элементы (зарезервированный поток)
+            pool: Брать только элементы этого пула (None — любого)
+        """
+        with self._cond:
+            while True:
+                if self._stops:
+                    self._stops -= 1
+                    return None
+                self._pending = [item for item in self._pending if not item.finished]
+                routed = [item for item in self._pending if pool is None or item.pool == pool]
+                ready = [item for item in routed if self.ready is None or self.ready(item)]
+                candidates = [item for item in ready if item.urgent]
+                if not candidates and not urgent_only:
+                    candidates = ready
+                if candidates:
+                    item = self.policy.pick(candidates)
+                    if self.reserve is not None and not self.reserve(item):
+                        continue
+                    self._pending.remove(item)
+                    return item
+                # Пропущенные элементы проверяются снова и без wake()
+                self._cond.wait(BLOCKED_POLL_INTERVAL if len(ready) < len(routed) else None)
+
+    def wake(self):
+        """Будит ждущие потоки: пропущенный элемент, возможно, можно начать"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def discard(self, item):
+        """Убирает элемент из очереди (приостановлен или отменён), если он там есть"""
+        with self._cond:
+            self._pending = [pending for pending in self._pending if pending is not item]
+
+    def pending(self) -> list:
+        """Ожидающие элементы в порядке постановки"""
+        with self._cond:
+            return [item for item in self._pending if not item.finished]
+
+    def ordered(self) -> list:
+        """
+        Ожидающие элементы в порядке выдачи: срочные, затем обычные по политике.
+
+        Пулы потоков и пределы сайтов не учитываются — это порядок, в котором
+        элементы стоят в очереди, а не точное расписание.
+        """  # noqa: RUF002
+        pending = self.pending()
+        order = getattr(self.policy, "order", list)
+        with self._cond:
+            return order([item for item in pending if item.urgent]) + order(
+                [item for item in pending if not item.urgent],
+            )
+
+    def __len__(self):
+        return len(self.pending())
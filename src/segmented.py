@@ -0,0 +1,320 @@
+"""
+Загрузка больших одиночных файлов по диапазонам байт в несколько соединений.
+
+Родной загрузчик yt-dlp (HttpFD) качает одиночный (не фрагментированный)
+формат через одно HTTP-соединение, а CDN ограничивает скорость каждого
+соединения — канал остаётся недогруженным. SegmentedFD делит файл
+известного размера на сегменты и качает их параллельно (Range: bytes=a-b):
+
+- .part файл сразу получает полный размер, каждый сегмент пишется по своему
+  смещению;
+- номера готовых сегментов сохраняются в ``<файл>.part.segments``, поэтому
+  после паузы или сбоя докачиваются только недостающие (недокачанный
+  сегмент начинается с начала);
+- если сервер не поддерживает Range, загрузка передаётся HttpFD.
+
+use_segmented_downloader() подключает его к экземпляру YoutubeDL только для
+подходящих форматов: http/https с точным размером от MIN_SIZE. HLS/DASH,
+трансляции, вырезки и небольшие файлы качаются как обычно.
+"""  # noqa: RUF002
+
+__all__ = [
+    "CONNECTIONS",
+    "MIN_SIZE",
+    "SEGMENT_SIZE",
+    "STATE_SUFFIX",
+    "SegmentedFD",
+    "is_eligible",
+    "split_segments",
+    "use_segmented_downloader",
+]
+
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import IncompleteRead, RequestError
+from yt_dlp.utils import determine_protocol
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Параллельных соединений на файл
+CONNECTIONS = 4
+# Размер сегмента (не больше http_chunk_size экстрактора, если он задан)
+SEGMENT_SIZE = 8 * 1024 * 1024
+# Файлы меньше качаются одним соединением: выигрыш не окупает лишние запросы
+MIN_SIZE = 32 * 1024 * 1024
+# Повторов одного сегмента при сетевой ошибке (продолжается с места обрыва)
+SEGMENT_RETRIES = 3
+# Список готовых сегментов рядом с .part файлом
+STATE_SUFFIX = ".segments"
+
+_BLOCK_SIZE = 64 * 1024
+# Период вызова progress hooks, секунды
+_PROGRESS_INTERVAL = 0.5
+
+
+class _RangeNotSupported(Exception):
+    """Сервер отдал файл целиком вместо запрошенного диапазона"""
+
+
+def is_eligible(info, min_size=MIN_SIZE) -> bool:
+    """Можно ли качать формат сегментами (info — словарь формата yt-dlp)"""
+    size = info.get("filesize")
+    headers = info.get("http_headers") or {}
+    return (
+        bool(info.get("url"))
+        and determine_protocol(info) in ("http", "https")
+        and bool(size)
+        and size >= min_size
+        and not info.get("is_live")
+        and not info.get("request_data")
+        and not info.get("section_start")
+        and not info.get("section_end")
+        and info.get("impersonate") is None
+        and not any(name.lower() == "range" for name in headers)
+    )
+
+
+def split_segments(size, segment_size) -> list[tuple[int, int]]:
+    """Диапазоны (начало, конец включительно), покрывающие size байт"""
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+def _load_state(path, size, segment_size) -> set[int]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if not isinstance(state, dict) or (state.get("size"), state.get("segment_size")) != (size, segment_size):
+        return set()
+    return {index for index in state.get("done", []) if isinstance(index, int)}
+
+
+def _save_state(path, size, segment_size, done):
+    # Сначала во временный файл: обрыв записи не портит список
+    tmp_path = f"{path.removesuffix(STATE_SUFFIX)}.new{STATE_SUFFIX}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"size": size, "segment_size": segment_size, "done": sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+class SegmentedFD(FileDownloader):
+    """
+    Загрузчик yt-dlp, качающий файл сегментами в несколько соединений.
+
+    Progress hooks вызываются из потока загрузки (не из потоков сегментов),
+    поэтому исключение из hook (пауза, отмена) останавливает все сегменты.
+    Ограничение скорости (ratelimit) действует на сумму всех соединений.
+
+    Args:
+        ydl: Экземпляр YoutubeDL
+        params: Опции yt-dlp
+        connections: Число параллельных соединений
+        segment_size: Размер сегмента, байт
+    """
+
+    FD_NAME = "segmented"
+
+    def __init__(self, ydl, params, connections=CONNECTIONS, segment_size=SEGMENT_SIZE):
+        super().__init__(ydl, params)
+        self.connections = max(1, int(connections))
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._downloaded = 0
+
+    def real_download(self, filename, info_dict):
+        size = info_dict["filesize"]
+        chunk_size = (info_dict.get("downloader_options") or {}).get("http_chunk_size")
+        segment_size = min(self.segment_size, chunk_size) if chunk_size else self.segment_size
+        segments = split_segments(size, segment_size)
+        tmpfilename = self.temp_name(filename)
+        state_path = tmpfilename + STATE_SUFFIX
+
+        done = self._resumable(tmpfilename, state_path, size, segment_size, segments)
+        self.report_destination(filename)
+        self._allocate(tmpfilename, size)
+        _save_state(state_path, size, segment_size, done)
+        logger.info(
+            f"Загрузка {filename} в {self.connections} соединения: "  # noqa: G004
+            f"сегментов {len(segments) - len(done)} из {len(segments)}",
+        )
+        try:
+            self._download_segments(filename, tmpfilename, state_path, info_dict, segments, segment_size, done)
+        except _RangeNotSupported:
+            logger.info(f"Сервер не поддерживает Range, качаем одним соединением: {filename}")  # noqa: G004
+            for path in (tmpfilename, state_path):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            fd = HttpFD(self.ydl, self.params)
+            for hook in self._progress_hooks:
+                fd.add_progress_hook(hook)
+            return fd.real_download(filename, info_dict)
+
+        with contextlib.suppress(OSError):
+            os.remove(state_path)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress(
+            {
+                "status": "finished",
+                "downloaded_bytes": size,
+                "total_bytes": size,
+                "filename": filename,
+            },
+            info_dict,
+        )
+        return True
+
+    def _resumable(self, tmpfilename, state_path, size, segment_size, segments) -> set[int]:
+        """Номера сегментов, которые уже лежат в .part файле"""
+        if not self.params.get("continuedl", True):
+            return set()
+        try:
+            existing = os.path.getsize(tmpfilename)
+        except OSError:
+            return set()
+        if existing == size:
+            return _load_state(state_path, size, segment_size) & set(range(len(segments)))
+        if existing < size:
+            # .part от HttpFD: файл скачан подряд до existing
+            return {index for index, (_, end) in enumerate(segments) if end < existing}
+        return set()
+
+    @staticmethod
+    def _allocate(tmpfilename, size):
+        """Выделяет .part файлу полный размер (место на диске занимается сразу)"""
+        mode = "r+b" if os.path.isfile(tmpfilename) else "wb"
+        with open(tmpfilename, mode) as f:
+            f.truncate(size)
+            if hasattr(os, "posix_fallocate"):
+                # Без поддержки в ФС файл остаётся разреженным
+                with contextlib.suppress(OSError):
+                    os.posix_fallocate(f.fileno(), 0, size)
+
+    def _download_segments(self, filename, tmpfilename, state_path, info_dict, segments, segment_size, done):  # noqa: PLR0913
+        size = info_dict["filesize"]
+        self._stop.clear()
+        self._downloaded = resumed = sum(end - start + 1 for index, (start, end) in enumerate(segments) if index in done)
+        start_time = time.time()
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.connections,
+            thread_name_prefix="segment",
+        )
+        futures = {
+            executor.submit(self._fetch_segment, info_dict, tmpfilename, segments[index], start_time, resumed): index
+            for index in range(len(segments))
+            if index not in done
+        }
+        try:
+            pending = set(futures)
+            while pending:
+                finished, pending = concurrent.futures.wait(
+                    pending,
+                    timeout=_PROGRESS_INTERVAL,
+                    return_when=concurrent.futures.FIRST_EXCEPTION,
+                )
+                for future in finished:
+                    future.result()  # ошибка сегмента останавливает загрузку
+                    done.add(futures[future])
+                if finished:
+                    _save_state(state_path, size, segment_size, done)
+                self._report(filename, tmpfilename, info_dict, start_time, resumed)
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _report(self, filename, tmpfilename, info_dict, start_time, resumed):
+        now = time.time()
+        with self._lock:
+            downloaded = self._downloaded
+        size = info_dict["filesize"]
+        speed = self.calc_speed(start_time, now, downloaded - resumed)
+        self._hook_progress(
+            {
+                "status": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": size,
+                "filename": filename,
+                "tmpfilename": tmpfilename,
+                "speed": speed,
+                "eta": self.calc_eta(speed, size - downloaded),
+                "elapsed": now - start_time,
+            },
+            info_dict,
+        )
+
+    def _fetch_segment(self, info_dict, tmpfilename, segment, start_time, resumed):
+        """Качает сегмент; после сетевой ошибки продолжает с места обрыва"""  # noqa: RUF002
+        offset, end = segment
+        attempt = 0
+        with open(tmpfilename, "r+b") as f:
+            while offset <= end and not self._stop.is_set():
+                try:
+                    offset = self._fetch_range(info_dict, f, offset, end, start_time, resumed)
+                except RequestError as e:
+                    attempt += 1
+                    if attempt > SEGMENT_RETRIES:
+                        raise
+                    logger.debug(f"Повтор сегмента {offset}-{end} ({attempt}/{SEGMENT_RETRIES}): {e}")  # noqa: G004
+                    self._stop.wait(attempt)
+
+    def _fetch_range(self, info_dict, f, offset, end, start_time, resumed) -> int:  # noqa: PLR0913
+        """Пишет байты offset..end в файл; возвращает смещение после записанного"""
+        headers = HTTPHeaderDict({"Accept-Encoding": "identity"}, info_dict.get("http_headers"))
+        headers["Range"] = f"bytes={offset}-{end}"
+        response = self.ydl.urlopen(Request(info_dict["url"], headers=headers))
+        with contextlib.closing(response):
+            if response.status != 206:  # noqa: PLR2004
+                raise _RangeNotSupported(response.status)
+            f.seek(offset)
+            while offset <= end and not self._stop.is_set():
+                block = response.read(min(_BLOCK_SIZE, end - offset + 1))
+                if not block:
+                    raise IncompleteRead(partial=offset, expected=end + 1)
+                f.write(block)
+                offset += len(block)
+                with self._lock:
+                    self._downloaded += len(block)
+                    downloaded = self._downloaded
+                # Общий счётчик: ratelimit ограничивает сумму соединений
+                self.slow_down(start_time, None, downloaded - resumed)
+        return offset
+
+
+def use_segmented_downloader(ydl, connections=CONNECTIONS, min_size=MIN_SIZE):
+    """
+    Качает подходящие форматы экземпляра YoutubeDL через SegmentedFD.
+
+    Args:
+        ydl: Экземпляр YoutubeDL
+        connections: Параллельных соединений на файл
+        min_size: Минимальный размер файла для сегментной загрузки
+    """
+    original = ydl.dl
+
+    def dl(name, info, subtitle=False, test=False):
+        if subtitle or test or name == "-" or not is_eligible(info, min_size):
+            return original(name, info, subtitle=subtitle, test=test)
+        fd = SegmentedFD(ydl, ydl.params, connections=connections)
+        for hook in ydl._progress_hooks:  # noqa: SLF001
+            fd.add_progress_hook(hook)
+        new_info = ydl._copy_infodict(info)  # noqa: SLF001
+        if new_info.get("http_headers") is None:
+            new_info["http_headers"] = ydl._calc_headers(new_info)  # noqa: SLF001
+        return fd.download(name, new_info, subtitle)
+
+    # Атрибут экземпляра перекрывает метод класса: process_info вызывает self.dl()
+    ydl.dl = dl
+    return ydl
@@ -0,0 +1,243 @@
+"""
+Общий сетевой слой для всех рабочих потоков движка.
+
+Каждый YoutubeDL по умолчанию создаёт собственные соединения (свой
+RequestDirector и пул requests/urllib3) и заново читает cookies.txt с диска.
+SharedSession раздаёт всем экземплярам YoutubeDL:
+
+- один RequestDirector на набор сетевых опций — соединения keep-alive
+  к одним и тем же CDN/API хостам переиспользуются между потоками;
+- один cookie jar в памяти, который перечитывается только при изменении
+  файла и сохраняется на диск один раз при закрытии;
+- кэш DNS с TTL поверх socket.getaddrinfo (подмена действует на весь
+  процесс, пока не закрыта последняя сессия, которая его включила).
+
+Пул соединений работает при установленном пакете requests (обработчик
+Requests в yt-dlp); без него yt-dlp использует urllib без keep-alive.
+"""  # noqa: RUF002
+
+__all__ = ["DNSCache", "SharedSession", "install_dns_cache", "release_dns_cache"]
+
+import logging
+import pathlib
+import socket
+import threading
+import time
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Опции yt-dlp, от которых зависят сетевые обработчики
+_DIRECTOR_PARAMS = (
+    "proxy",
+    "source_address",
+    "socket_timeout",
+    "nocheckcertificate",
+    "legacyserverconnect",
+    "impersonate",
+    "client_certificate",
+)
+
+
+class DNSCache:
+    """
+    Кэш результатов socket.getaddrinfo с TTL.
+
+    Кэшируются только успешные ответы; ошибки разрешения имён
+    пробрасываются как есть, чтобы не «залипать» на сбое DNS.
+    """  # noqa: RUF002
+
+    def __init__(self, ttl=300.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):  # noqa: A002
+        key = (host, port, family, type, proto, flags)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+        resolve = self._original or socket.getaddrinfo
+        result = resolve(host, port, family, type, proto, flags)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, tuple(result))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def installed(self) -> bool:
+        return self._original is not None
+
+    def install(self):
+        """Подменяет socket.getaddrinfo кэширующей версией"""
+        if self._original is None:
+            self._original = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+
+    def uninstall(self):
+        if self._original is not None:
+            socket.getaddrinfo = self._original
+            self._original = None
+
+
+_dns_cache = None
+_dns_users = 0
+_dns_lock = threading.Lock()
+
+
+def install_dns_cache(ttl=300.0) -> DNSCache:
+    """
+    Устанавливает общий для процесса кэш DNS.
+
+    Повторный вызов возвращает тот же кэш; каждому вызову должен
+    соответствовать release_dns_cache().
+    """
+    global _dns_cache, _dns_users  # noqa: PLW0603
+    with _dns_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl)
+            _dns_cache.install()
+            logger.info(f"Включён кэш DNS, TTL {ttl} с")  # noqa: G004
+        _dns_users += 1
+        return _dns_cache
+
+
+def release_dns_cache():
+    """Отказ от кэша DNS: последний пользователь возвращает исходный socket.getaddrinfo"""
+    global _dns_cache, _dns_users  # noqa: PLW0603
+    with _dns_lock:
+        if _dns_cache is None:
+            return
+        _dns_users -= 1
+        if _dns_users <= 0:
+            _dns_cache.uninstall()
+            _dns_cache = None
+            _dns_users = 0
+            logger.info("Кэш DNS отключён")
+
+
+class SharedSession:
+    """
+    Общие соединения и cookies для всех экземпляров YoutubeDL.
+
+    Args:
+        cookies_path: Файл cookies в формате Netscape (может отсутствовать)
+        dns_ttl: TTL кэша DNS в секундах (0/None — не включать)
+    """
+
+    def __init__(self, cookies_path=None, dns_ttl=300.0):
+        self.cookies_path = pathlib.Path(cookies_path) if cookies_path else None
+        self.dns_cache = install_dns_cache(dns_ttl) if dns_ttl else None
+        self._lock = threading.Lock()
+        self._cookiejar = None
+        self._cookies_mtime = None
+        self._directors = {}
+
+    # ---------- cookies ----------
+
+    def _cookies_file_mtime(self):
+        if self.cookies_path is None:
+            return None
+        try:
+            return self.cookies_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    @property
+    def cookiejar(self) -> YoutubeDLCookieJar:
+        """Общий cookie jar (загружается один раз)"""
+        with self._lock:
+            if self._cookiejar is None:
+                self._cookiejar = YoutubeDLCookieJar(
+                    str(self.cookies_path) if self.cookies_path else None,
+                )
+                self._load_cookies()
+            return self._cookiejar
+
+    def _load_cookies(self):
+        mtime = self._cookies_file_mtime()
+        self._cookies_mtime = mtime
+        if mtime is None:
+            logger.info("Файл cookies.txt не найден, продолжаем без cookies")
+            return
+        # Перечитываем в тот же объект: его уже держат YoutubeDL и обработчики
+        self._cookiejar.clear()
+        self._cookiejar.load()
+        logger.info(f"Используются cookies из {self.cookies_path}")  # noqa: G004
+
+    def refresh(self) -> bool:
+        """
+        Перечитывает cookies, если файл изменился.
+
+        Returns:
+            True, если cookies были перечитаны
+        """
+        with self._lock:
+            if self._cookiejar is None or self._cookies_file_mtime() == self._cookies_mtime:
+                return False
+            try:
+                self._load_cookies()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Не удалось перечитать cookies: {e}")  # noqa: G004
+                return False
+            return True
+
+    # ---------- YoutubeDL ----------
+
+    @staticmethod
+    def _director_key(params):
+        return tuple(repr(params.get(name)) for name in _DIRECTOR_PARAMS)
+
+    def attach(self, ydl):
+        """Подключает YoutubeDL к общему cookie jar и пулу соединений"""
+        # cookiejar и _request_director у YoutubeDL — cached_property,
+        # поэтому значение в __dict__ экземпляра имеет приоритет
+        ydl.__dict__["cookiejar"] = self.cookiejar
+        key = self._director_key(ydl.params)
+        with self._lock:
+            director = self._directors.get(key)
+            if director is None:
+                director = ydl._request_director  # noqa: SLF001
+                self._directors[key] = director
+        ydl.__dict__["_request_director"] = director
+        return ydl
+
+    def detach(self, ydl):
+        """
+        Отключает YoutubeDL перед его закрытием.
+
+        YoutubeDL.close() закрывает свой RequestDirector — общий пул должен
+        закрываться только вместе с сессией.
+        """  # noqa: RUF002
+        ydl.__dict__.pop("_request_director", None)
+        ydl.__dict__.pop("cookiejar", None)
+
+    def close(self):
+        """Сохраняет cookies, закрывает общие соединения и отказывается от кэша DNS"""
+        with self._lock:
+            directors, self._directors = list(self._directors.values()), {}
+            jar = self._cookiejar
+            dns_cache, self.dns_cache = self.dns_cache, None
+        if dns_cache is not None:
+            release_dns_cache()
+        for director in directors:
+            director.close()
+        if jar is not None and self.cookies_path is not None and self.cookies_path.exists():
+            try:
+                jar.save()
+                with self._lock:
+                    self._cookies_mtime = self._cookies_file_mtime()
+            except OSError as e:
+                logger.error(f"Не удалось сохранить cookies: {e}")  # noqa: G004
@@ -0,0 +1,162 @@
+"""
+Локальная промежуточная папка (staging) и фоновый перенос готовых файлов.
+
+.part файлы, фрагменты и промежуточные файлы склейки FFmpeg пишутся на
+быстрый локальный диск (SSD/tmpfs), а готовый файл переносится в итоговую
+папку (часто — медленный сетевой ресурс) отдельным потоком, не занимая
+рабочий поток загрузки.
+
+В пределах одной файловой системы перенос — атомарный os.replace; между
+файловыми системами — потоковое копирование во временный файл рядом с
+целевым, fsync и os.replace, после чего исходный файл удаляется.
+Существующий файл в итоговой папке не перезаписывается: перенесённый
+получает имя «name (1).ext».
+
+Файлы для каждой итоговой папки пишутся в свою подпапку staging
+(staging_subdir): одноимённые видео разных папок не смешиваются.
+
+Если передан hasher (объект hashlib), перенос заодно считает хеш
+содержимого: при копировании — по тем же блокам, без отдельного чтения.
+В пределах одной файловой системы файл для этого пришлось бы прочитать
+заново, поэтому движок передаёт hasher только при копировании.
+"""  # noqa: RUF002
+
+__all__ = ["FileMover", "free_path", "move_file", "same_filesystem", "staging_subdir"]
+
+import concurrent.futures
+import contextlib
+import hashlib
+import logging
+import os
+import pathlib
+
+logger = logging.getLogger("YouTubeDownloader")
+
+# Размер блока потокового копирования между файловыми системами
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def same_filesystem(src: pathlib.Path, dst_dir: pathlib.Path) -> bool:
+    """Лежат ли файл и директория на одной файловой системе (False, если директории ещё нет)"""
+    try:
+        return src.stat().st_dev == dst_dir.stat().st_dev
+    except OSError:
+        return False
+
+
+def staging_subdir(staging_dir, download_dir) -> pathlib.Path:
+    """Подпапка staging для итоговой папки (имя — хеш её абсолютного пути)"""
+    key = hashlib.sha256(str(pathlib.Path(download_dir).resolve()).encode()).hexdigest()[:16]
+    return pathlib.Path(staging_dir) / key
+
+
+def free_path(path) -> pathlib.Path:
+    """Путь, не занятый существующим файлом: path, «name (1).ext», «name (2).ext»..."""
+    path = pathlib.Path(path)
+    candidate = path
+    number = 1
+    while candidate.exists():
+        candidate = path.with_name(f"{path.stem} ({number}){path.suffix}")
+        number += 1
+    return candidate
+
+
+def _fsync_directory(directory: pathlib.Path):
+    """fsync каталога, чтобы переименование пережило сбой питания (POSIX)"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _hash_into(path: pathlib.Path, hasher, chunk_size: int):
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+
+
+def _copy_streamed(src: pathlib.Path, dst: pathlib.Path, chunk_size: int, hasher=None):
+    tmp = dst.with_name(dst.name + ".moving")
+    try:
+        with src.open("rb") as fin, tmp.open("wb") as fout:
+            while chunk := fin.read(chunk_size):
+                fout.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp.unlink()
+        raise
+
+
+def move_file(src, dst_dir, chunk_size=COPY_CHUNK_SIZE, hasher=None) -> pathlib.Path:
+    """
+    Переносит файл в директорию, не перезаписывая существующий.
+
+    Args:
+        src: Исходный файл
+        dst_dir: Целевая директория (создаётся при необходимости)
+        chunk_size: Размер блока при копировании между файловыми системами
+        hasher: Объект hashlib, в который передаётся содержимое файла
+
+    Returns:
+        Путь к файлу в целевой директории (с суффиксом « (1)», если имя занято)
+    """  # noqa: RUF002
+    src = pathlib.Path(src)
+    dst_dir = pathlib.Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    dst = free_path(dst_dir / src.name)
+    if dst.name != src.name:
+        logger.warning(f"{src.name} уже есть в {dst_dir}, файл сохранён как {dst.name}")  # noqa: G004
+
+    if same_filesystem(src, dst_dir):
+        if hasher is not None:
+            # Файл только что записан и ещё в кэше страниц
+            _hash_into(src, hasher, chunk_size)
+        os.replace(src, dst)
+    else:
+        _copy_streamed(src, dst, chunk_size, hasher)
+        src.unlink()
+    _fsync_directory(dst_dir)
+    return dst
+
+
+class FileMover:
+    """
+    Фоновый перенос готовых файлов из staging в итоговую папку.
+
+    Args:
+        max_workers: Число одновременных переносов (для сетевого ресурса
+            обычно достаточно одного)
+        chunk_size: Размер блока копирования
+    """  # noqa: RUF002
+
+    def __init__(self, max_workers=1, chunk_size=COPY_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="file-mover",
+        )
+
+    def submit(self, src, dst_dir, hasher=None) -> concurrent.futures.Future:
+        """Ставит файл в очередь переноса; Future возвращает итоговый путь"""
+        return self._executor.submit(self._move, pathlib.Path(src), pathlib.Path(dst_dir), hasher)
+
+    def _move(self, src, dst_dir, hasher=None):
+        logger.info(f"Перенос {src.name} -> {dst_dir}")  # noqa: G004
+        try:
+            dst = move_file(src, dst_dir, self.chunk_size, hasher)
+        except Exception as e:
+            logger.error(f"Не удалось перенести {src} в {dst_dir}: {e}")  # noqa: G004
+            raise
+        logger.info(f"Файл перенесён: {dst}")  # noqa: G004
+        return dst
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
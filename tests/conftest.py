@@ -104,6 +104,13 @@ def mock_yt_dlp(mocker):
 # ==================== GUI ФИКСТУРЫ ====================
 
 
+@pytest.fixture(autouse=True)
+def app_dir(tmp_path, monkeypatch):
+    """Директория приложения во временной папке: движок GUI создаёт там индекс содержимого."""
+    monkeypatch.setattr(app_module, "APP_DIR", tmp_path)
+    return tmp_path
+
+
 @pytest.fixture
 def main_window(qapp, tmp_path, monkeypatch):
     """Фикстура главного окна приложения."""
@@ -0,0 +1,207 @@
+# tests/test_admission.py
+import threading
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.admission import (
+    AdmissionController,
+    InsufficientDiskSpaceError,
+    estimate_download_size,
+)
+from src.engine import DONE, FAILED, DownloadEngine
+
+Usage = namedtuple("Usage", "total used free")
+
+GB = 1024**3
+
+
+def fake_disk(free, total=100 * GB):
+    return lambda _path: Usage(total, total - free, free)
+
+
+@pytest.mark.unit
+class TestEstimateDownloadSize:
+    """Тесты оценки размера по метаданным."""
+
+    def test_filesize_and_approx(self):
+        assert estimate_download_size({"filesize": 100}) == 100
+        assert estimate_download_size({"filesize_approx": 200}) == 200
+
+    def test_bitrate_and_duration(self):
+        """Тест оценки по битрейту при отсутствии размера."""
+        assert estimate_download_size({"tbr": 8, "duration": 10}) == 10_000
+
+    def test_requested_formats_are_summed(self):
+        """Тест суммирования раздельных потоков видео и аудио."""
+        info = {
+            "duration": 10,
+            "requested_formats": [{"filesize": 1000}, {"tbr": 8}],
+        }
+        assert estimate_download_size(info) == 11_000
+
+    def test_playlist_entries(self):
+        info = {"entries": [{"filesize": 1}, {"filesize_approx": 2}, {}, None]}
+        assert estimate_download_size(info) == 3
+
+    def test_unknown(self):
+        assert estimate_download_size({"title": "x"}) is None
+
+
+@pytest.mark.unit
+class TestAdmissionController:
+    """Тесты резервирования места."""
+
+    def test_reservations_reduce_available_space(self, tmp_path):
+        """Тест: второй элемент не помещается из-за резерва первого."""
+        admission = AdmissionController(margin=GB, hold=False, disk_usage=fake_disk(10 * GB))
+
+        assert admission.reserve(1, tmp_path, 6 * GB)
+        with pytest.raises(InsufficientDiskSpaceError) as exc_info:
+            admission.reserve(2, tmp_path, 6 * GB)
+        assert exc_info.value.needed == 6 * GB
+
+        usage = admission.usage(tmp_path)
+        assert usage["reserved"] == 6 * GB
+        assert usage["reservations"] == 1
+
+    def test_written_bytes_shrink_reservation(self, tmp_path):
+        """Тест: записанные байты уже учтены в свободном месте."""
+        admission = AdmissionController(margin=0, disk_usage=fake_disk(10 * GB))
+        admission.reserve(1, tmp_path, 4 * GB)
+        admission.update(1, GB)
+
+        assert admission.usage(tmp_path)["reserved"] == 3 * GB
+
+    def test_held_item_admitted_after_release(self, tmp_path):
+        """Тест ожидания места до снятия чужого резерва."""
+        admission = AdmissionController(margin=0, disk_usage=fake_disk(10 * GB))
+        admission.reserve(1, tmp_path, 8 * GB)
+        admitted = threading.Event()
+
+        def reserve_second():
+            admission.reserve(2, tmp_path, 8 * GB)
+            admitted.set()
+
+        thread = threading.Thread(target=reserve_second)
+        thread.start()
+        assert not admitted.wait(0.2)
+
+        admission.release(1)
+        assert admitted.wait(5)
+        thread.join()
+
+    def test_larger_than_disk_is_rejected_immediately(self, tmp_path):
+        """Тест: элемент больше диска отклоняется без ожидания."""
+        admission = AdmissionController(margin=0, disk_usage=fake_disk(10 * GB, total=20 * GB))
+
+        with pytest.raises(InsufficientDiskSpaceError):
+            admission.reserve(1, tmp_path, 30 * GB)
+
+    def test_cancelled_while_held(self, tmp_path):
+        admission = AdmissionController(margin=0, disk_usage=fake_disk(GB))
+
+        assert admission.reserve(1, tmp_path, 2 * GB, cancelled=lambda: True) is False
+        assert admission.usage(tmp_path)["reservations"] == 0
+
+    def test_hold_timeout(self, tmp_path):
+        admission = AdmissionController(margin=0, hold_timeout=0.1, disk_usage=fake_disk(GB))
+
+        with pytest.raises(InsufficientDiskSpaceError):
+            admission.reserve(1, tmp_path, 2 * GB)
+
+    def test_final_directory_on_other_filesystem(self, tmp_path):
+        """Тест: при staging на другом диске место нужно и в итоговой папке, до снятия резерва."""
+        staging_dir, final_dir = tmp_path / "staging", tmp_path / "final"
+        free = {staging_dir: 100 * GB, final_dir: 5 * GB}
+        admission = AdmissionController(margin=0, hold=False, disk_usage=lambda path: Usage(200 * GB, 0, free[path]))
+
+        with (
+            patch("src.admission._device", side_effect=lambda path: path.name),
+            patch("src.admission._existing", side_effect=lambda path: path),
+        ):
+            assert admission.reserve(1, staging_dir, 4 * GB, final_directory=final_dir)
+            admission.update(1, 4 * GB)  # записанное лежит в staging
+            assert admission.usage(final_dir)["reserved"] == 4 * GB
+            assert admission.usage(staging_dir)["reserved"] == 0
+            with pytest.raises(InsufficientDiskSpaceError) as exc_info:
+                admission.reserve(2, staging_dir, 2 * GB, final_directory=final_dir)
+            assert exc_info.value.filename == str(final_dir)
+
+            admission.release(1)
+            assert admission.reserve(2, staging_dir, 2 * GB, final_directory=final_dir)
+
+
+@pytest.mark.integration
+class TestEngineAdmission:
+    """Тесты проверки места в движке."""
+
+    def run_engine(self, tmp_path, info, free):
+        admission = AdmissionController(margin=0, hold=False, disk_usage=fake_disk(free))
+        with patch("yt_dlp.YoutubeDL") as mock_class:
+            instance = MagicMock()
+            mock_class.return_value.__enter__.return_value = instance
+            checks = []
+            instance.add_post_processor.side_effect = lambda pp, when: checks.append(pp)
+
+            def download(_urls):
+                for check in checks:
+                    check.run(info)
+                assert admission.usage(tmp_path)["reservations"] == 1
+
+            instance.download.side_effect = download
+            engine = DownloadEngine(download_dir=tmp_path, admission=admission)
+            try:
+                (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+                assert item.wait(5)
+            finally:
+                engine.shutdown()
+        return item, admission
+
+    def test_item_fits(self, tmp_path):
+        """Тест: элемент помещается, резерв снимается после загрузки."""
+        item, admission = self.run_engine(tmp_path, {"filesize": GB}, free=10 * GB)
+
+        assert item.state == DONE
+        assert item.expected_bytes == GB
+        assert admission.usage(tmp_path)["reservations"] == 0
+
+    def test_playlist_accumulates_expected_bytes(self, tmp_path):
+        """Тест: оценка плейлиста растёт с каждым видео, скачанное не резервируется повторно."""  # noqa: RUF002
+        admission = AdmissionController(margin=0, hold=False, disk_usage=fake_disk(10 * GB))
+        reserved = []
+        with patch("yt_dlp.YoutubeDL") as mock_class:
+            instance = MagicMock()
+            mock_class.return_value.__enter__.return_value = instance
+            checks = []
+            instance.add_post_processor.side_effect = lambda pp, when: checks.append(pp)
+
+            def download(_urls):
+                hook = mock_class.call_args.args[0]["progress_hooks"][0]
+                for _ in range(2):
+                    for check in checks:
+                        check.run({"filesize": GB})
+                    reserved.append(admission.usage(tmp_path)["reserved"])
+                    hook({"status": "finished", "total_bytes": GB})
+
+            instance.download.side_effect = download
+            engine = DownloadEngine(download_dir=tmp_path, admission=admission)
+            try:
+                (item,) = engine.submit(["https://youtube.com/playlist?list=PL1"])
+                assert item.wait(5)
+            finally:
+                engine.shutdown()
+
+        assert item.state == DONE
+        assert item.expected_bytes == 2 * GB
+        assert reserved == [GB, GB]
+
+    def test_merge_needs_double_space(self, tmp_path):
+        """Тест: склейка требует места под потоки и итоговый файл."""
+        info = {"requested_formats": [{"filesize": 3 * GB}, {"filesize": GB}]}
+        item, admission = self.run_engine(tmp_path, info, free=6 * GB)
+
+        assert item.state == FAILED
+        assert "Недостаточно места" in item.error
+        assert admission.usage(tmp_path)["reservations"] == 0
@@ -0,0 +1,199 @@
+# tests/test_api.py
+import http.client
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.api import ControlServer
+from src.engine import CANCELLED, PAUSED, QUEUED, DownloadEngine
+
+
+@pytest.fixture
+def idle_engine(tmp_path):
+    """Движок без рабочих потоков: элементы остаются в очереди."""
+    engine = DownloadEngine(download_dir=tmp_path)
+    engine.start = lambda: None
+    yield engine
+    engine.shutdown()
+
+
+@pytest.fixture
+def api(idle_engine):
+    """Запущенный сервер API на свободном порту."""
+    server = ControlServer(idle_engine, port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def request(server, method, path, payload=None):
+    """Выполняет запрос и возвращает (status, json)."""
+    host, port = server.address
+    conn = http.client.HTTPConnection(host, port, timeout=5)
+    body = json.dumps(payload) if payload is not None else None
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = json.loads(response.read() or b"null")
+    conn.close()
+    return response.status, data
+
+
+@pytest.mark.integration
+class TestControlApi:
+    """Тесты HTTP API управления."""
+
+    def test_health(self, api):
+        """Тест эндпоинта состояния."""
+        status, data = request(api, "GET", "/health")
+
+        assert status == 200
+        assert data["status"] == "ok"
+
+    def test_submit_bulk_and_query(self, api):
+        """Тест постановки пачки ссылок и запроса состояния."""
+        urls = [f"https://youtube.com/watch?v={i}" for i in range(3)]
+        status, data = request(api, "POST", "/items", {"urls": urls, "format": "worst"})
+
+        assert status == 201
+        assert [item["url"] for item in data["items"]] == urls
+        assert all(item["format"] == "worst" for item in data["items"])
+
+        item_id = data["items"][0]["id"]
+        status, item = request(api, "GET", f"/items/{item_id}")
+        assert status == 200
+        assert item["state"] == "queued"
+        assert {"percent", "speed", "eta", "downloaded_bytes"} <= item.keys()
+
+        status, listing = request(api, "GET", "/items?state=queued")
+        assert status == 200
+        assert len(listing["items"]) == 3
+
+    def test_submit_rejects_invalid_urls(self, api):
+        """Тест отклонения невалидных ссылок."""
+        status, data = request(api, "POST", "/items", {"urls": ["not-a-url"]})
+
+        assert status == 400
+        assert data["invalid"] == ["not-a-url"]
+
+    def test_submit_requires_list(self, api):
+        """Тест проверки формата тела запроса."""
+        status, _ = request(api, "POST", "/items", {"urls": "https://youtube.com"})
+
+        assert status == 400
+
+    def test_submit_rejects_unknown_output(self, api):
+        """Тест проверки выходных профилей."""
+        status, data = request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=1"], "outputs": ["8k"]})
+
+        assert status == 400
+        assert "8k" in data["error"]
+
+    @pytest.mark.parametrize("fmt", [5, "fast:abc"])
+    def test_submit_rejects_invalid_format(self, api, fmt):
+        """Тест проверки формата загрузки."""
+        status, _ = request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=1"], "format": fmt})
+
+        assert status == 400
+
+    def test_submit_rejects_negative_content_length(self, api):
+        """Тест отклонения отрицательного Content-Length."""
+        host, port = api.address
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        conn.request("POST", "/items", body=b"", headers={"Content-Length": "-1"})
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+
+        assert response.status == 400
+
+    def test_submit_urgent_goes_first(self, api, idle_engine):
+        """Тест срочной ссылки: встаёт перед обычными, флаг проверяется."""
+        request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=1"]})
+        status, data = request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=2"], "urgent": True})
+
+        assert status == 201
+        assert data["items"][0]["urgent"]
+        assert idle_engine._queue.get().url == "https://youtube.com/watch?v=2"  # noqa: SLF001
+        assert request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=3"], "urgent": "yes"})[0] == 400
+
+    def test_cancel_item(self, api):
+        """Тест отмены элемента."""
+        _, data = request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=1"]})
+        item_id = data["items"][0]["id"]
+
+        status, item = request(api, "DELETE", f"/items/{item_id}")
+        assert status == 202
+        assert item["state"] == CANCELLED
+
+        status, _ = request(api, "DELETE", f"/items/{item_id}")
+        assert status == 409
+
+    def test_pause_and_resume_item(self, api):
+        """Тест паузы и продолжения элемента."""
+        _, data = request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=1"]})
+        item_id = data["items"][0]["id"]
+
+        status, item = request(api, "POST", f"/items/{item_id}/pause")
+        assert status == 202
+        assert item["state"] == PAUSED
+
+        status, item = request(api, "POST", f"/items/{item_id}/resume")
+        assert status == 202
+        assert item["state"] == QUEUED
+        assert request(api, "POST", f"/items/{item_id}/stop")[0] == 404
+        assert request(api, "POST", "/items/999999/pause")[0] == 404
+
+    def test_unknown_item(self, api):
+        """Тест несуществующего элемента."""
+        assert request(api, "GET", "/items/999999")[0] == 404
+        assert request(api, "DELETE", "/items/999999")[0] == 404
+        assert request(api, "GET", "/nope")[0] == 404
+
+    def test_event_stream(self, api):
+        """Тест потока событий SSE."""
+        host, port = api.address
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        conn.request("GET", "/events")
+        response = conn.getresponse()
+        assert response.getheader("Content-Type").startswith("text/event-stream")
+        assert response.readline() == b": connected\n"
+        response.readline()
+
+        request(api, "POST", "/items", {"urls": ["https://youtube.com/watch?v=sse"]})
+
+        assert response.readline() == b"event: queued\n"
+        data = json.loads(response.readline().removeprefix(b"data: "))
+        assert data["url"] == "https://youtube.com/watch?v=sse"
+        conn.close()
+
+
+@pytest.mark.integration
+def test_cancel_in_flight_download(tmp_path):
+    """Тест отмены загрузки из progress hook."""
+    started = threading.Event()
+    release = threading.Event()
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+
+        def download(urls):
+            hook = mock_class.call_args.args[0]["progress_hooks"][0]
+            started.set()
+            release.wait(5)
+            hook({"status": "downloading", "downloaded_bytes": 10})
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(download_dir=tmp_path)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+            assert started.wait(5)
+            engine.cancel(item.id)
+            release.set()
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == CANCELLED
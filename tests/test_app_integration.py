@@ -1,10 +1,13 @@
 # tests/test_app_integration.py
 import sys
-from unittest.mock import MagicMock
+import threading
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from src.app import MainWindow
+from src.engine import DownloadEngine
+from src.failures import FAILURES_FILENAME, FailureStore
 
 sys.path.insert(0, ".")
 
@@ -79,6 +82,63 @@ class TestDownloadCompletion:
         # Проверяем что кнопка включена
         assert main_window.download_button.isEnabled()
 
+    def test_links_added_during_batch_join_queue(self, main_window, qtbot, mocker, tmp_path):
+        """Тест: ссылка, добавленная во время загрузки, встаёт в ту же очередь."""
+        mocker.patch("PyQt5.QtWidgets.QMessageBox.information")
+        mocker.patch("src.app.create_engine", side_effect=lambda: DownloadEngine(download_dir=tmp_path))
+        release = threading.Event()
+
+        with patch("yt_dlp.YoutubeDL") as mock_class:
+            instance = MagicMock()
+            mock_class.return_value.__enter__.return_value = instance
+            instance.download.side_effect = lambda urls: release.wait(5)
+
+            main_window.drop_area.add_url("https://youtube.com/watch?v=1")
+            main_window.download_button.click()
+            main_window.drop_area.add_url("https://youtube.com/watch?v=2")
+            main_window.download_button.click()
+
+            assert main_window.download_button.isEnabled()
+            assert main_window.active_tasks == 2  # noqa: PLR2004
+            qtbot.waitUntil(lambda: main_window.queue_model.rowCount() == 2, timeout=5000)  # noqa: PLR2004
+            assert main_window.drop_area.count() == 2  # noqa: PLR2004
+
+            release.set()
+            qtbot.waitUntil(lambda: main_window.active_tasks == 0, timeout=5000)
+
+        # Готовые ссылки убраны из списка по одной, таблица очереди сохранена
+        assert main_window.drop_area.count() == 0
+        assert main_window.queue_model.rowCount() == 2  # noqa: PLR2004
+
+    def test_batches_do_not_hold_threads(self, main_window, qtbot, mocker, tmp_path):
+        """Тест: пакеты не занимают потоков, срочная ссылка после многих пакетов сразу в очереди."""
+        mocker.patch("PyQt5.QtWidgets.QMessageBox.information")
+        mocker.patch("src.app.create_engine", side_effect=lambda: DownloadEngine(download_dir=tmp_path))
+        release = threading.Event()
+        batches = 20
+
+        with patch("yt_dlp.YoutubeDL") as mock_class:
+            instance = MagicMock()
+            mock_class.return_value.__enter__.return_value = instance
+            instance.download.side_effect = lambda urls: release.wait(5)
+
+            main_window.drop_area.add_url("https://youtube.com/watch?v=0")
+            main_window.download_button.click()
+            for number in range(1, batches):
+                main_window.urgent_check.setChecked(number == batches - 1)
+                main_window.drop_area.add_url(f"https://youtube.com/watch?v={number}")
+                main_window.download_button.click()
+
+            # Ссылки поставлены в движок прямо из обработчика кнопки
+            assert main_window.queue_model.rowCount() == batches
+            assert main_window.engine.items()[-1].urgent
+
+            release.set()
+            qtbot.waitUntil(lambda: main_window.active_tasks == 0, timeout=10000)
+
+        assert not main_window.tasks
+        assert main_window.drop_area.count() == 0
+
     def test_download_finished_with_errors(self, main_window, mocker):
         """Тест завершения скачивания с ошибками."""  # noqa: RUF002
         # Устанавливаем флаг ошибки
@@ -93,6 +153,20 @@ class TestDownloadCompletion:
         # Проверяем что флаг сброшен
         assert main_window.error_flag is False
 
+    def test_retry_failed_adds_due_links(self, main_window, mocker):
+        """Тест: в список добавляются только ссылки с временными ошибками."""  # noqa: RUF002
+        failures = FailureStore(main_window.download_dir / FAILURES_FILENAME, clock=lambda: 0.0)
+        failures.record_failure("https://youtube.com/watch?v=net", "Connection reset by peer")
+        failures.record_failure("https://youtube.com/watch?v=gone", "Video unavailable")
+        failures.close()
+        info = mocker.patch("PyQt5.QtWidgets.QMessageBox.information")
+
+        main_window.retry_failed()
+
+        assert main_window.drop_area.count() == 1
+        assert main_window.drop_area.item(0).text() == "https://youtube.com/watch?v=net"
+        assert "В карантине (не повторяются): 1" in info.call_args.args[2]
+
 
 @pytest.mark.integration
 class TestFontSizeChange:
@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+import yt_dlp
+
+from src.cache import LOCK_FILENAME, PersistentCache
+
+LOCK_HOLDER = """
+import sys
+from yt_dlp.utils import locked_file
+
+with locked_file(sys.argv[1], "a", block=True):
+    print("locked", flush=True)
+    sys.stdin.read()
+"""
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PersistentCache(tmp_path / "cache", max_size=1024 * 1024)
+
+
+@pytest.fixture
+def ydl(cache):
+    with yt_dlp.YoutubeDL({"quiet": True, "cachedir": str(cache.directory)}) as instance:
+        yield cache.attach(instance)
+
+
+@pytest.mark.unit
+class TestPersistentCache:
+    """Тесты постоянного кэша yt-dlp."""
+
+    def test_hits_and_misses(self, cache, ydl):
+        """Тест: запись переживает новый YoutubeDL, чтения считаются."""
+        assert ydl.cache.load("youtube-sigfuncs", "js_abc", default="нет") == "нет"
+        ydl.cache.store("youtube-sigfuncs", "js_abc", [3, 1, 2])
+
+        with yt_dlp.YoutubeDL({"quiet": True, "cachedir": str(cache.directory)}) as other:
+            assert cache.attach(other).cache.load("youtube-sigfuncs", "js_abc") == [3, 1, 2]
+
+        stats = cache.snapshot()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+        assert stats["size"] > 0
+
+    def test_size_cap_evicts_least_recently_read(self, cache, ydl):
+        """Тест: сверх предела удаляются записи, которые дольше всего не читались."""
+        blob = "x" * 4000
+        for key in ("old", "used"):
+            ydl.cache.store("youtube-nsig", key, blob)
+        # "used" прочитана позже "old"
+        os.utime(ydl.cache._get_cache_fn("youtube-nsig", "old", "json"), (1, 1))  # noqa: SLF001
+        cache.max_size = 9000
+
+        ydl.cache.store("youtube-nsig", "new", blob)
+
+        assert ydl.cache.load("youtube-nsig", "old") is None
+        assert ydl.cache.load("youtube-nsig", "used") == blob
+        assert ydl.cache.load("youtube-nsig", "new") == blob
+        assert cache.snapshot()["evictions"] == 1
+        assert (cache.directory / LOCK_FILENAME).exists()
+
+    def test_disabled_cache_is_not_counted(self, cache):
+        with yt_dlp.YoutubeDL({"quiet": True, "cachedir": False}) as instance:
+            assert cache.attach(instance).cache.load("youtube-nsig", "x", default=1) == 1
+
+        assert cache.snapshot()["misses"] == 0
+
+
+@pytest.mark.integration
+class TestCrossProcessLock:
+    """Тест блокировки кэша другим процессом."""
+
+    def test_reader_waits_for_writer_process(self, cache, ydl):
+        """Тест: пока другой процесс пишет в кэш, чтение ждёт."""
+        cache.directory.mkdir(parents=True)
+        holder = subprocess.Popen(
+            [sys.executable, "-c", LOCK_HOLDER, str(cache.directory / LOCK_FILENAME)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            assert holder.stdout.readline().strip() == "locked"
+            loaded = threading.Event()
+            reader = threading.Thread(target=lambda: ydl.cache.load("youtube-nsig", "x") or loaded.set())
+            reader.start()
+            assert not loaded.wait(0.5)
+        finally:
+            holder.stdin.close()
+            holder.wait(10)
+        assert loaded.wait(5)
+        reader.join()
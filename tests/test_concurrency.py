@@ -0,0 +1,104 @@
+# tests/test_concurrency.py
+import threading
+
+import pytest
+
+from src.concurrency import (
+    MIN_SAMPLE_BYTES,
+    ConcurrencyController,
+    host_of,
+    is_throttling,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.unit
+class TestConcurrencyController:
+    """Тесты AIMD-предела загрузок по сайтам."""
+
+    def test_additive_increase(self):
+        """Тест: предел растёт на 1 за каждые «предел» успешных загрузок."""
+        controller = ConcurrencyController(max_limit=3)
+        limits = []
+        for key in range(4):
+            controller.acquire(key, "youtube.com")
+            controller.release(key)
+            limits.append(controller.limit("youtube.com"))
+
+        assert limits == [2, 2, 3, 3]
+
+    def test_multiplicative_decrease_with_cooldown(self):
+        """Тест: 429 вдвое уменьшает предел, волна ошибок — только один раз."""
+        clock = FakeClock()
+        controller = ConcurrencyController(max_limit=8, initial=8, cooldown=10, clock=clock)
+        for key in range(3):
+            controller.acquire(key, "youtube.com")
+        for key in range(3):
+            controller.release(key, error="ERROR: HTTP Error 429: Too Many Requests")
+        assert controller.limit("youtube.com") == 4  # noqa: PLR2004
+
+        clock.now = 11
+        controller.release(99, error="HTTP Error 403: Forbidden", host="youtube.com")
+        assert controller.limit("youtube.com") == 2  # noqa: PLR2004
+        assert controller.limit("vimeo.com") == 8  # noqa: PLR2004
+
+    def test_other_errors_do_not_change_limit(self):
+        """Тест: удалённое видео не считается ограничением."""
+        controller = ConcurrencyController(max_limit=4, initial=2)
+        controller.acquire(1, "youtube.com")
+        controller.release(1, error="Video unavailable")
+
+        assert controller.limit("youtube.com") == 2  # noqa: PLR2004
+
+    def test_slowdown_backs_off(self):
+        """Тест: скорость намного ниже обычной уменьшает предел."""
+        clock = FakeClock()
+        controller = ConcurrencyController(max_limit=4, initial=4, clock=clock)
+        controller.acquire(1, "youtube.com")
+        clock.now = 1
+        controller.release(1, transferred=10 * MIN_SAMPLE_BYTES)  # обычная скорость
+        controller.acquire(2, "youtube.com")
+        clock.now = 11
+        controller.release(2, transferred=MIN_SAMPLE_BYTES)  # в 100 раз медленнее
+
+        assert controller.limit("youtube.com") == 2  # noqa: PLR2004
+
+    def test_acquire_waits_for_host_slot(self):
+        """Тест: загрузка ждёт места в пределе своего сайта, другие сайты не ждут."""
+        controller = ConcurrencyController(max_limit=2)
+        assert controller.acquire(1, "youtube.com")
+        assert controller.acquire(2, "vimeo.com")
+        assert not controller.acquire(3, "youtube.com", cancelled=lambda: True)
+
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: controller.acquire(4, "youtube.com") and acquired.set())
+        thread.start()
+        assert not acquired.wait(0.2)
+        controller.discard(1)
+        assert acquired.wait(5)
+        thread.join()
+
+    def test_try_acquire_does_not_wait(self):
+        """Тест: try_acquire не ждёт места, повторный вызов с тем же ключом проходит."""  # noqa: RUF002
+        controller = ConcurrencyController(max_limit=2)
+
+        assert controller.try_acquire(1, "youtube.com")
+        assert controller.try_acquire(1, "youtube.com")
+        assert not controller.available("youtube.com")
+        assert not controller.try_acquire(2, "youtube.com")
+        assert controller.try_acquire(3, "vimeo.com")
+        controller.discard(1)
+        assert controller.try_acquire(2, "youtube.com")
+
+    def test_helpers(self):
+        assert host_of("https://www.youtube.com/watch?v=1") == "youtube.com"
+        assert host_of("https://youtu.be/abc") == "youtube.com"
+        assert is_throttling("Sign in to confirm you're not a bot")
+        assert not is_throttling("Private video")
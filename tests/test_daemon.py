@@ -0,0 +1,185 @@
+# tests/test_daemon.py
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.daemon import LinksSource, WatchDaemon, make_waiter
+from src.engine import CANCELLED
+
+
+@pytest.fixture
+def fake_engine():
+    """Движок-заглушка, запоминающий поставленные ссылки."""
+    engine = MagicMock()
+    engine.submitted = []
+
+    def submit(urls, owner=None, **kwargs):
+        items = []
+        for url in urls:
+            item = MagicMock(url=url, owner=owner, state="queued", finished=False)
+            items.append(item)
+        engine.submitted.extend(urls)
+        return items
+
+    engine.submit.side_effect = submit
+    return engine
+
+
+@pytest.mark.unit
+class TestLinksSource:
+    """Тесты чтения новых строк из файла ссылок."""
+
+    @staticmethod
+    def consume(source):
+        """Читает новые ссылки и сразу подтверждает позицию."""
+        links, offset = source.consume()
+        source.commit(offset)
+        return links
+
+    def test_consume_appended_links(self, tmp_path):
+        """Тест: забираются только новые дописанные ссылки."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\n")
+        source = LinksSource(path)
+
+        assert self.consume(source) == ["https://youtube.com/watch?v=1"]
+        assert self.consume(source) == []
+
+        with path.open("a") as f:
+            f.write("https://youtube.com/watch?v=2 https://youtube.com/watch?v=3\n")
+
+        assert self.consume(source) == [
+            "https://youtube.com/watch?v=2",
+            "https://youtube.com/watch?v=3",
+        ]
+
+    def test_partial_tail_is_not_consumed(self, tmp_path):
+        """Тест: недописанная ссылка без разделителя ждёт следующего прохода."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\nhttps://youtube.com/wa")
+        source = LinksSource(path)
+
+        assert self.consume(source) == ["https://youtube.com/watch?v=1"]
+
+        with path.open("a") as f:
+            f.write("tch?v=2\n")
+
+        assert self.consume(source) == ["https://youtube.com/watch?v=2"]
+
+    def test_offset_survives_restart(self, tmp_path):
+        """Тест: позиция сохраняется между запусками."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\n")
+        self.consume(LinksSource(path))
+
+        assert self.consume(LinksSource(path)) == []
+
+    def test_uncommitted_links_are_read_again(self, tmp_path):
+        """Тест: без commit() позиция не сдвигается ни в памяти, ни на диске."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\n")
+        source = LinksSource(path)
+        source.consume()
+
+        assert source.consume()[0] == ["https://youtube.com/watch?v=1"]
+        assert LinksSource(path).consume()[0] == ["https://youtube.com/watch?v=1"]
+
+    def test_truncated_file_is_read_from_start(self, tmp_path):
+        """Тест: после очистки файла чтение начинается сначала."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\nhttps://youtube.com/watch?v=2\n")
+        source = LinksSource(path)
+        self.consume(source)
+
+        path.write_text("https://youtu.be/x\n")
+
+        assert self.consume(source) == ["https://youtu.be/x"]
+
+    def test_invalid_tokens_are_skipped(self, tmp_path):
+        """Тест пропуска невалидных ссылок."""
+        path = tmp_path / "links.txt"
+        path.write_text("not-a-url https://youtube.com/watch?v=1\n")
+
+        assert self.consume(LinksSource(path)) == ["https://youtube.com/watch?v=1"]
+
+    def test_missing_file(self, tmp_path):
+        """Тест отсутствующего файла."""
+        assert self.consume(LinksSource(tmp_path / "missing.txt")) == []
+
+
+@pytest.mark.integration
+class TestWatchDaemon:
+    """Тесты демона слежения за ссылками."""
+
+    def test_scan_directory(self, tmp_path, fake_engine):
+        """Тест прохода по всем .txt файлам директории."""
+        (tmp_path / "a.txt").write_text("https://youtube.com/watch?v=a\n")
+        (tmp_path / "b.txt").write_text("https://youtube.com/watch?v=b\n")
+        (tmp_path / "failed_downloads.txt").write_text("https://youtube.com/watch?v=f\n")
+
+        daemon = WatchDaemon([tmp_path], fake_engine)
+        daemon.scan()
+
+        assert fake_engine.submitted == [
+            "https://youtube.com/watch?v=a",
+            "https://youtube.com/watch?v=b",
+        ]
+
+    def test_requeue_unfinished(self, tmp_path, fake_engine):
+        """Тест возврата отменённых ссылок в конец файла."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\n")
+        daemon = WatchDaemon([path], fake_engine)
+        (item,) = daemon.scan()
+        item.state = CANCELLED
+
+        assert daemon.requeue_unfinished() == 1
+        assert LinksSource(path).consume()[0] == ["https://youtube.com/watch?v=1"]
+
+    def test_crash_before_submit_keeps_links(self, tmp_path, fake_engine):
+        """Тест: демон, упавший между чтением и постановкой, не теряет ссылки."""
+        path = tmp_path / "links.txt"
+        path.write_text("https://youtube.com/watch?v=1\n")
+        crashing_engine = MagicMock()
+        crashing_engine.submit.side_effect = SystemExit
+
+        with pytest.raises(SystemExit):
+            WatchDaemon([path], crashing_engine).scan()
+
+        # Перезапуск: ссылка читается снова и ставится в движок
+        WatchDaemon([path], fake_engine).scan()
+
+        assert fake_engine.submitted == ["https://youtube.com/watch?v=1"]
+        assert LinksSource(path).consume()[0] == []
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_run_picks_up_new_links(self, tmp_path, fake_engine, use_inotify):
+        """Тест главного цикла: новые строки подхватываются без перезапуска."""
+        path = tmp_path / "links.txt"
+        path.write_text("")
+        daemon = WatchDaemon([path], fake_engine, poll_interval=0.05, use_inotify=use_inotify)
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        try:
+            with path.open("a") as f:
+                f.write("https://youtube.com/watch?v=1\n")
+            for _ in range(100):
+                if fake_engine.submitted:
+                    break
+                threading.Event().wait(0.05)
+        finally:
+            daemon.stop()
+            thread.join(5)
+
+        assert fake_engine.submitted == ["https://youtube.com/watch?v=1"]
+        assert not thread.is_alive()
+
+
+@pytest.mark.unit
+def test_polling_waiter_wakes_up(tmp_path):
+    """Тест досрочного пробуждения опроса."""
+    waiter = make_waiter([str(tmp_path)], interval=10, use_inotify=False)
+    waiter.wake()
+    waiter.wait()
+    waiter.close()
@@ -0,0 +1,262 @@
+# tests/test_dedupe.py
+import hashlib
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.dedupe import ContentIndex, hash_file, link_duplicates, main, source_key
+from src.engine import DONE, DownloadEngine
+
+
+@pytest.fixture
+def index(tmp_path):
+    content_index = ContentIndex(tmp_path / "index.sqlite3")
+    yield content_index
+    content_index.close()
+
+
+@pytest.mark.unit
+def test_hash_file(tmp_path):
+    """Тест хеша файла (блоками меньше размера файла)."""
+    path = tmp_path / "a.mp4"
+    path.write_bytes(b"x" * 1000)
+
+    assert hash_file(path, chunk_size=64) == hashlib.sha256(b"x" * 1000).hexdigest()
+
+
+@pytest.mark.unit
+def test_source_key():
+    """Тест ключа источника из метаданных yt-dlp."""
+    info = {"extractor_key": "Youtube", "id": "abc", "format_id": "137+140"}
+
+    assert source_key(info) == "youtube abc 137+140"
+    assert source_key({"extractor": "generic"}) is None
+
+
+@pytest.mark.unit
+class TestContentIndex:
+    """Тесты индекса содержимого."""
+
+    def test_add_reports_same_content(self, index, tmp_path):
+        """Тест: add() возвращает файлы с тем же содержимым."""  # noqa: RUF002
+        first = tmp_path / "Video.webm"
+        second = tmp_path / "other" / "Video (1).webm"
+        second.parent.mkdir()
+        first.write_bytes(b"video")
+        second.write_bytes(b"video")
+
+        assert index.add(first) == []
+        assert index.add(second) == [first]
+        assert index.duplicates() == [[first, second]]
+
+    def test_lookup_ignores_changed_file(self, index, tmp_path):
+        """Тест: запись изменённого файла не используется."""
+        path = tmp_path / "a.mp4"
+        path.write_bytes(b"data")
+        index.add(path)
+        assert index.lookup(path) == hashlib.sha256(b"data").hexdigest()
+
+        path.write_bytes(b"changed")
+
+        assert index.lookup(path) is None
+
+    def test_find_source_drops_deleted_files(self, index, tmp_path):
+        """Тест поиска по источнику и удаления записей пропавших файлов."""
+        path = tmp_path / "a.mp4"
+        path.write_bytes(b"data")
+        index.add(path, source="youtube abc 22")
+
+        assert index.find_source("youtube abc 22") == path
+        assert index.find_source("youtube abc 18") is None
+
+        path.unlink()
+
+        assert index.find_source("youtube abc 22") is None
+        assert index.lookup(path) is None
+
+    def test_scan_hashes_only_new_files(self, tmp_path):
+        """Тест: повторное сканирование не хеширует неизменённые файлы."""
+        library = tmp_path / "result"
+        (library / "sub").mkdir(parents=True)
+        (library / "a.mp4").write_bytes(b"a")
+        (library / "sub" / "b.mp4").write_bytes(b"b")
+        (library / "c.mp4.part").write_bytes(b"partial")
+        # Служебные базы приложения не индексируются
+        (library / ".library.sqlite3").write_bytes(b"db")
+        (library / ".failures.sqlite3").write_bytes(b"db")
+        content_index = ContentIndex(library / ".index.sqlite3")
+        try:
+            assert content_index.scan(library) == 2  # noqa: PLR2004
+
+            with patch("src.dedupe.hash_file") as hasher:
+                assert content_index.scan(library) == 0
+            hasher.assert_not_called()
+
+            (library / "a.mp4").unlink()
+            content_index.scan(library)
+            assert content_index.lookup(library / "sub" / "b.mp4") is not None
+            with content_index._conn:  # noqa: SLF001
+                count = content_index._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]  # noqa: SLF001
+        finally:
+            content_index.close()
+
+        assert count == 1
+
+
+@pytest.mark.unit
+class TestLinkDuplicates:
+    """Тесты замены копий ссылками."""
+
+    def test_hardlink_replaces_copies(self, tmp_path):
+        """Тест замены копии жёсткой ссылкой."""
+        keep = tmp_path / "a.mp4"
+        copy = tmp_path / "b.mp4"
+        keep.write_bytes(b"video")
+        copy.write_bytes(b"video")
+
+        assert link_duplicates([keep, copy]) == len(b"video")
+
+        assert copy.stat().st_ino == keep.stat().st_ino
+        assert copy.read_bytes() == b"video"
+        assert not (tmp_path / "b.mp4.dedupe").exists()
+        # Повторный вызов: уже связаны
+        assert link_duplicates([keep, copy]) == 0
+
+    def test_dry_run_changes_nothing(self, tmp_path):
+        """Тест: dry_run только считает освобождаемое место."""
+        keep = tmp_path / "a.mp4"
+        copy = tmp_path / "b.mp4"
+        keep.write_bytes(b"video")
+        copy.write_bytes(b"video")
+
+        assert link_duplicates([keep, copy], dry_run=True) == len(b"video")
+        assert copy.stat().st_ino != keep.stat().st_ino
+
+    def test_failed_link_keeps_copy(self, tmp_path):
+        """Тест: при ошибке создания ссылки копия остаётся."""
+        keep = tmp_path / "a.mp4"
+        copy = tmp_path / "b.mp4"
+        keep.write_bytes(b"video")
+        copy.write_bytes(b"video")
+
+        with patch("src.dedupe.os.link", side_effect=OSError("not supported")):
+            assert link_duplicates([keep, copy]) == 0
+
+        assert copy.read_bytes() == b"video"
+        assert copy.stat().st_ino != keep.stat().st_ino
+
+
+@pytest.mark.integration
+def test_main_reports_and_links(tmp_path, capsys):
+    """Тест CLI: отчёт о дубликатах и замена ссылками."""  # noqa: RUF002
+    library = tmp_path / "result"
+    library.mkdir()
+    (library / "Video.webm").write_bytes(b"video")
+    (library / "Video (1).webm").write_bytes(b"video")
+    (library / "Other.webm").write_bytes(b"other")
+
+    main([str(library)])
+    report = capsys.readouterr().out
+    assert "Групп дубликатов: 1" in report
+    assert "Other.webm" not in report
+
+    main([str(library), "--link", "hardlink"])
+
+    assert (library / "Video.webm").stat().st_ino == (library / "Video (1).webm").stat().st_ino
+    assert "Освобождено" in capsys.readouterr().out
+
+
+def _engine_ydl(mock_class, directory, info):
+    """Мок YoutubeDL: скачивание одного видео с проверкой match_filter"""  # noqa: RUF002
+    instance = MagicMock()
+    mock_class.return_value.__enter__.return_value = instance
+    instance.prepare_filename.return_value = str(directory / "Video.webm")
+
+    def download(urls):
+        opts = mock_class.call_args.args[0]
+        if opts["match_filter"](info, incomplete=False) is not None:
+            return
+        directory.mkdir(exist_ok=True)
+        path = directory / "Video.webm"
+        path.write_bytes(b"video")
+        for hook in opts["post_hooks"]:
+            hook(str(path))
+
+    instance.download.side_effect = download
+    return instance
+
+
+@pytest.mark.integration
+def test_engine_indexes_moved_files(tmp_path, index):
+    """Тест движка: хеш файла считается при переносе из staging."""
+    staging_dir = tmp_path / "staging"
+    final_dir = tmp_path / "final"
+    info = {"extractor_key": "Youtube", "id": "abc", "format_id": "22"}
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        _engine_ydl(mock_class, staging_dir, info)
+        engine = DownloadEngine(download_dir=final_dir, staging_dir=staging_dir, index=index)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=abc"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert index.lookup(final_dir / "Video.webm") == hashlib.sha256(b"video").hexdigest()
+
+
+@pytest.mark.integration
+def test_engine_skips_already_downloaded(tmp_path, index):
+    """Тест движка: видео, уже лежащее на диске, не скачивается повторно."""
+    existing = tmp_path / "old" / "Video [abc].webm"
+    existing.parent.mkdir()
+    existing.write_bytes(b"video")
+    index.add(existing, source="youtube abc 22")
+    info = {"extractor_key": "Youtube", "id": "abc", "format_id": "22"}
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        _engine_ydl(mock_class, tmp_path / "result", info)
+        engine = DownloadEngine(download_dir=tmp_path / "result", index=index)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=abc"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert item.files == [str(existing)]
+    assert item.filename == str(existing)
+    assert not (tmp_path / "result" / "Video.webm").exists()
+    assert os.path.exists(existing)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("staging", [False, True])
+def test_engine_hashes_outside_download_worker(tmp_path, index, staging):
+    """Тест: без копирования между ФС файл хешируется в пуле постобработки, а не в рабочем потоке."""  # noqa: RUF002
+    final_dir = tmp_path / "final"
+    staging_dir = tmp_path / "staging" if staging else None
+    info = {"extractor_key": "Youtube", "id": "abc", "format_id": "22"}
+    threads = []
+    original = hash_file
+
+    def tracking_hash(path, *args):
+        threads.append(threading.current_thread().name)
+        return original(path, *args)
+
+    with patch("yt_dlp.YoutubeDL") as mock_class, patch("src.dedupe.hash_file", side_effect=tracking_hash):
+        _engine_ydl(mock_class, staging_dir or final_dir, info)
+        engine = DownloadEngine(download_dir=final_dir, staging_dir=staging_dir, index=index, postprocess_workers=1)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=abc"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert len(threads) == 1
+    assert threads[0].startswith("postprocess")
+    assert index.lookup(final_dir / "Video.webm") == hashlib.sha256(b"video").hexdigest()
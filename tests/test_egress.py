@@ -0,0 +1,185 @@
+# tests/test_egress.py
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.egress import (
+    EgressIdentity,
+    IdentityPool,
+    parse_identity,
+    probe_identity,
+    sticky_key,
+)
+
+THROTTLED = "ERROR: HTTP Error 429: Too Many Requests"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Прокси-заглушка: отвечает 204 на любой запрос в absolute-form."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+@pytest.fixture
+def proxy():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ProxyHandler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def dead_proxy_url():
+    """Адрес, на котором никто не слушает."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def identities(*names):
+    return [EgressIdentity(name, proxy=f"http://{name}:3128") for name in names]
+
+
+@pytest.mark.unit
+class TestParsing:
+    """Тесты разбора описаний личностей и ключей закрепления."""
+
+    def test_parse_identity(self):
+        identity = parse_identity("proxy=socks5://127.0.0.1:1080,cookies=alt.txt")
+
+        assert identity == EgressIdentity("127.0.0.1:1080", "socks5://127.0.0.1:1080", None, "alt.txt")
+        assert parse_identity("source=192.0.2.10").name == "192.0.2.10"
+        assert parse_identity("name=home,cookies=cookies.txt").name == "home"
+
+    @pytest.mark.parametrize("spec", ["", "proxy", "name=only", "proxy=http://x,port=1"])
+    def test_invalid_spec(self, spec):
+        with pytest.raises(ValueError, match="Неверное описание личности"):
+            parse_identity(spec)
+
+    def test_sticky_key(self):
+        """Тест: видео и сам плейлист дают один ключ, одиночное видео — никакого."""
+        assert sticky_key("https://www.youtube.com/playlist?list=PL1") == "list:PL1"
+        assert sticky_key("https://www.youtube.com/watch?v=a&list=PL1&index=2") == "list:PL1"
+        assert sticky_key("https://www.youtube.com/watch?v=a") is None
+
+
+@pytest.mark.unit
+class TestIdentityPool:
+    """Тесты выбора, закрепления и отдыха личностей."""
+
+    def test_least_busy_identity(self):
+        """Тест: одновременные загрузки расходятся по личностям."""
+        pool = IdentityPool(identities("a", "b"), check_interval=0)
+
+        first = pool.acquire(1)
+        second = pool.acquire(2)
+        assert {first.name, second.name} == {"a", "b"}
+        assert pool.acquire(1) == first  # повторный вызов — та же личность
+
+        pool.release(1)
+        assert pool.acquire(3) == first
+
+    def test_playlist_sticks_to_identity(self):
+        """Тест: видео одного плейлиста идут через одну личность."""
+        pool = IdentityPool(identities("a", "b"), check_interval=0)
+        first = pool.acquire(1, sticky="list:PL1")
+        pool.release(1)
+        pool.acquire(2)  # занимает другую личность
+
+        assert pool.acquire(3, sticky="list:PL1") == first
+
+    def test_throttling_cools_identity_down(self):
+        """Тест: после 429 личность отдыхает, повтор удваивает отдых, плейлист уходит на другую."""
+        clock = FakeClock()
+        pool = IdentityPool(identities("a", "b"), cooldown=100, check_interval=0, clock=clock)
+        assert pool.acquire(1, sticky="list:PL1").name == "a"
+        pool.release(1, error=THROTTLED)
+
+        assert pool.acquire(2, sticky="list:PL1").name == "b"
+        assert pool.snapshot()["a"]["cooldown"] == 100  # noqa: PLR2004
+
+        clock.now = 101
+        assert pool.acquire(3, prefer=EgressIdentity("a")).name == "a"
+        pool.release(3, error=THROTTLED)
+        assert pool.snapshot()["a"]["cooldown"] == 200  # noqa: PLR2004
+
+    def test_other_errors_do_not_cool_down(self):
+        pool = IdentityPool(identities("a"), check_interval=0)
+        pool.acquire(1)
+        pool.release(1, error="Video unavailable")
+
+        assert pool.snapshot()["a"]["cooldown"] == 0
+
+    def test_all_cooling_uses_soonest_available(self):
+        """Тест: без доступных личностей загрузка не ждёт, а идёт через ту, что отдохнёт раньше."""  # noqa: RUF002
+        clock = FakeClock()
+        pool = IdentityPool(identities("a", "b"), cooldown=100, check_interval=0, clock=clock)
+        pool.acquire(1)
+        pool.release(1, error=THROTTLED)  # a до 100
+        clock.now = 50
+        pool.acquire(2)
+        pool.release(2, error=THROTTLED)  # b до 150
+
+        assert pool.acquire(3).name == "a"
+
+
+@pytest.mark.integration
+class TestHealthCheck:
+    """Тесты проверки доступности через локальные прокси-заглушки."""
+
+    def test_probe_goes_through_proxy(self, proxy, dead_proxy_url):
+        host, port = proxy.server_address
+        alive = EgressIdentity("alive", proxy=f"http://{host}:{port}")
+
+        assert probe_identity(alive, url="http://check.invalid/generate_204", timeout=5)
+        assert proxy.requests == ["http://check.invalid/generate_204"]
+        assert not probe_identity(EgressIdentity("dead", proxy=dead_proxy_url), "http://check.invalid/", timeout=5)
+
+    def test_unhealthy_identity_is_skipped(self, proxy, dead_proxy_url):
+        """Тест: личность с упавшим прокси исключается, после восстановления возвращается."""  # noqa: RUF002
+        host, port = proxy.server_address
+        alive = EgressIdentity("alive", proxy=f"http://{host}:{port}")
+        dead = EgressIdentity("dead", proxy=dead_proxy_url)
+        pool = IdentityPool(
+            [dead, alive],
+            check_interval=0,
+            probe=lambda identity: probe_identity(identity, "http://check.invalid/", timeout=5),
+        )
+
+        assert pool.check() == {"dead": False, "alive": True}
+        assert [pool.acquire(key).name for key in (1, 2)] == ["alive", "alive"]
+
+        pool.probe = lambda identity: True
+        pool.check()
+        assert pool.acquire(3).name == "dead"
+
+    def test_background_check(self):
+        checked = threading.Event()
+        pool = IdentityPool(identities("a"), check_interval=60, probe=lambda identity: checked.set() or False)
+        pool.start()
+        try:
+            assert checked.wait(5)
+        finally:
+            pool.stop()
+
+        assert not pool.snapshot()["a"]["healthy"]
@@ -0,0 +1,432 @@
+# tests/test_engine.py
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yt_dlp
+
+from src.concurrency import ConcurrencyController
+from src.egress import EgressIdentity, IdentityPool
+from src.engine import (
+    CANCELLED,
+    DONE,
+    DOWNLOADING,
+    EXTRACTING,
+    FAILED,
+    PAUSED,
+    POSTPROCESSING,
+    QUEUED,
+    DownloadEngine,
+    build_ydl_opts,
+)
+from src.routing import YOUTUBE_HOSTS, PoolPolicy
+
+
+@pytest.fixture
+def mock_ytdlp():
+    """Мокирует yt_dlp.YoutubeDL и возвращает экземпляр из __enter__."""
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        instance.download.return_value = 0
+        mock_class.return_value.__enter__.return_value = instance
+        yield mock_class, instance
+
+
+@pytest.mark.unit
+class TestBuildYdlOpts:
+    """Тесты сборки опций yt-dlp."""
+
+    def test_basic_options(self, tmp_path):
+        """Тест основных опций."""
+        opts = build_ydl_opts(tmp_path, "best", ffmpeg_location="ffmpeg")
+
+        assert opts["format"] == "best"
+        assert opts["outtmpl"].startswith(str(tmp_path))
+        assert opts["ffmpeg_location"] == "ffmpeg"
+        assert opts["merge_output_format"] == "webm"
+        assert "cookiefile" not in opts
+
+    def test_cache_dir(self, tmp_path):
+        """Тест: постоянная папка кэша yt-dlp передаётся в cachedir."""
+        assert "cachedir" not in build_ydl_opts(tmp_path, "best")
+        assert build_ydl_opts(tmp_path, "best", cache_dir=tmp_path / "cache")["cachedir"] == str(tmp_path / "cache")
+
+    def test_cookies_used_when_file_exists(self, tmp_path):
+        """Тест подключения существующего файла cookies."""
+        cookies = tmp_path / "cookies.txt"
+        cookies.write_text("# Netscape HTTP Cookie File\n")
+
+        opts = build_ydl_opts(tmp_path, "best", cookies_path=cookies)
+
+        assert opts["cookiefile"] == str(cookies)
+
+
+@pytest.mark.integration
+class TestDownloadEngine:
+    """Тесты постоянного движка загрузок."""
+
+    def test_download_all_items(self, mock_ytdlp, tmp_path):
+        """Тест успешной загрузки нескольких ссылок."""
+        _, instance = mock_ytdlp
+        engine = DownloadEngine(max_workers=2, download_dir=tmp_path)
+        try:
+            items = engine.submit([f"https://youtube.com/watch?v={i}" for i in range(3)])
+            assert engine.wait(items, timeout=5)
+        finally:
+            engine.shutdown()
+
+        assert [item.state for item in items] == [DONE, DONE, DONE]
+        assert instance.download.call_count == 3
+
+    def test_youtubedl_instance_is_reused(self, mock_ytdlp, tmp_path):
+        """Тест «тёплого» YoutubeDL: один экземпляр на поток для одинаковых опций."""
+        mock_class, _ = mock_ytdlp
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        try:
+            engine.wait(engine.submit(["https://a.example/1", "https://a.example/2"]), timeout=5)
+            engine.wait(engine.submit(["https://a.example/3"]), timeout=5)
+        finally:
+            engine.shutdown()
+
+        assert mock_class.call_count == 1
+
+    def test_fallback_to_mkv_then_fail(self, mock_ytdlp, tmp_path):
+        """Тест повторной попытки в mkv и перехода в failed."""
+        mock_class, instance = mock_ytdlp
+        instance.download.side_effect = yt_dlp.utils.DownloadError("boom")
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=bad"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+        merge_formats = [c.args[0]["merge_output_format"] for c in mock_class.call_args_list]
+        assert merge_formats == ["webm", "mkv"]
+        assert item.state == FAILED
+        assert "boom" in item.error
+
+    def test_events_are_emitted(self, mock_ytdlp, tmp_path):
+        """Тест событий движка для подписчиков."""
+        events = []
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        engine.add_listener(lambda event, item: events.append(event))
+        try:
+            engine.wait(engine.submit(["https://youtube.com/watch?v=1"]), timeout=5)
+        finally:
+            engine.shutdown()
+
+        assert events == ["queued", "started", DONE]
+
+    def test_item_states_follow_ytdlp_hooks(self, mock_ytdlp, tmp_path):
+        """Тест состояний элемента: извлечение, загрузка, склейка."""
+        mock_class, instance = mock_ytdlp
+        states = []
+        started = []
+
+        def download(urls):
+            opts = mock_class.call_args.args[0]
+            (item,) = started
+            states.append(item.state)
+            opts["progress_hooks"][0]({"status": "downloading", "downloaded_bytes": 5, "total_bytes": 10})
+            states.append(item.state)
+            # Служебный перенос yt-dlp не меняет состояние
+            opts["postprocessor_hooks"][0]({"status": "started", "postprocessor": "MoveFilesAfterDownload"})
+            states.append(item.state)
+            opts["postprocessor_hooks"][0]({"status": "started", "postprocessor": "Merger"})
+            states.append((item.state, item.postprocessor))
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        engine.add_listener(lambda event, item: started.append(item) if event == "started" else None)
+        try:
+            items = engine.submit(["https://youtube.com/watch?v=1"])
+            assert items[0].wait(5)
+        finally:
+            engine.shutdown()
+
+        assert states == [EXTRACTING, DOWNLOADING, DOWNLOADING, (POSTPROCESSING, "Merger")]
+        assert items[0].state == DONE
+
+    def test_bytes_accumulate_over_item_files(self, mock_ytdlp, tmp_path):
+        """Тест: байты видео и аудио перед склейкой суммируются в элементе."""
+        mock_class, instance = mock_ytdlp
+        seen = []
+
+        def download(urls):
+            hook = mock_class.call_args.args[0]["progress_hooks"][0]
+            hook({"status": "downloading", "downloaded_bytes": 600, "total_bytes": 800})
+            hook({"status": "finished", "total_bytes": 800})
+            hook({"status": "downloading", "downloaded_bytes": 100, "total_bytes": 200})
+            (item,) = started
+            seen.append((item.downloaded_bytes, item.total_bytes, item.percent))
+
+        started = []
+        instance.download.side_effect = download
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        engine.add_listener(lambda event, item: started.append(item) if event == "started" else None)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert seen == [(900, 1000, 90.0)]
+
+    def test_pause_frees_worker_and_resume_continues(self, mock_ytdlp, tmp_path):
+        """Тест паузы: поток сразу берёт следующий элемент, продолжение докачивает."""
+        mock_class, instance = mock_ytdlp
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def download(urls):
+            calls.append(urls[0])
+            hook = mock_class.call_args.args[0]["progress_hooks"][0]
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+            hook({"status": "downloading", "downloaded_bytes": 10, "total_bytes": 100})
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        try:
+            first, second = engine.submit(["https://a.example/1", "https://a.example/2"])
+            assert started.wait(5)
+            engine.pause(first.id)
+            release.set()
+            assert second.wait(5)
+            assert first.state == PAUSED
+            assert not first.finished
+
+            engine.resume(first.id)
+            assert first.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert calls == ["https://a.example/1", "https://a.example/2", "https://a.example/1"]
+        assert (first.state, second.state) == (DONE, DONE)
+
+    def test_urgent_item_preempts_bulk_download(self, mock_ytdlp, tmp_path):
+        """Тест express lane: срочный элемент вытесняет обычный, тот докачивается следом."""
+        mock_class, instance = mock_ytdlp
+        started = threading.Event()
+        calls = []
+
+        def download(urls):
+            calls.append(urls[0])
+            hook = mock_class.call_args.args[0]["progress_hooks"][0]
+            if len(calls) == 1:
+                started.set()
+                # Качаем, пока progress hook не прервёт загрузку
+                for _ in range(500):
+                    hook({"status": "downloading", "downloaded_bytes": 10, "total_bytes": 100})
+                    threading.Event().wait(0.01)
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        events = []
+        engine.add_listener(lambda event, item: events.append((event, item.url)))
+        try:
+            (bulk,) = engine.submit(["https://a.example/bulk"])
+            assert started.wait(5)
+            (urgent,) = engine.submit(["https://a.example/urgent"], urgent=True)
+            assert urgent.wait(5)
+            assert bulk.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert calls == ["https://a.example/bulk", "https://a.example/urgent", "https://a.example/bulk"]
+        assert (PAUSED, "https://a.example/bulk") in events
+        assert (bulk.state, urgent.state) == (DONE, DONE)
+        assert urgent.snapshot()["urgent"]
+
+    def test_reserved_worker_throttles_bulk(self, tmp_path):
+        """Тест резервного потока: обычная загрузка не прерывается, но ограничивается по скорости."""
+        release = threading.Event()
+        bulk_started = threading.Event()
+        ydls = []
+        limits = []
+
+        def make_ydl(opts):
+            ydl = MagicMock()
+            ydl.params = {}
+            hook = opts["progress_hooks"][0]
+
+            def download(urls):
+                if urls[0].endswith("bulk"):
+                    bulk_started.set()
+                    release.wait(5)
+                else:
+                    limits.append([other.params.get("ratelimit") for other in ydls if other is not ydl])
+                hook({"status": "downloading", "downloaded_bytes": 10, "total_bytes": 100})
+
+            ydl.download.side_effect = download
+            ydls.append(ydl)
+            context = MagicMock()
+            context.__enter__.return_value = ydl
+            return context
+
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path, urgent_workers=1, bulk_ratelimit=1000)
+        try:
+            with patch("yt_dlp.YoutubeDL", side_effect=make_ydl):
+                (bulk,) = engine.submit(["https://a.example/bulk"])
+                assert bulk_started.wait(5)
+                (urgent,) = engine.submit(["https://a.example/urgent"], urgent=True)
+                assert urgent.wait(5)
+                assert not bulk.finished
+                assert not bulk.pause_requested
+                assert ydls[0].params["ratelimit"] is None
+                release.set()
+                assert bulk.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert limits == [[1000]]
+        assert bulk.state == DONE
+
+    def test_throttling_error_lowers_host_limit(self, mock_ytdlp, tmp_path):
+        """Тест: ошибка 429 уменьшает предел загрузок с сайта."""  # noqa: RUF002
+        _, instance = mock_ytdlp
+        instance.download.side_effect = yt_dlp.utils.DownloadError("HTTP Error 429: Too Many Requests")
+        concurrency = ConcurrencyController(max_limit=4, initial=4)
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path, concurrency=concurrency)
+        try:
+            (item,) = engine.submit(["https://www.youtube.com/watch?v=1"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert item.state == FAILED
+        assert concurrency.limit("youtube.com") == 2  # noqa: PLR2004
+
+    def test_throttled_site_does_not_park_workers(self, mock_ytdlp, tmp_path):
+        """Тест: элемент сайта на пределе остаётся в очереди, поток берёт другой сайт."""
+        _, instance = mock_ytdlp
+        release = threading.Event()
+
+        def download(urls):
+            if urls[0].endswith("v=1"):
+                release.wait(5)
+
+        instance.download.side_effect = download
+        concurrency = ConcurrencyController(max_limit=2, initial=1)
+        engine = DownloadEngine(max_workers=2, download_dir=tmp_path, concurrency=concurrency)
+        try:
+            first, second, other = engine.submit(
+                ["https://www.youtube.com/watch?v=1", "https://www.youtube.com/watch?v=2", "https://vimeo.com/1"],
+            )
+            assert other.wait(5)
+            assert not first.finished
+            assert second.state == QUEUED
+            release.set()
+            assert first.wait(5)
+            assert second.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert [item.state for item in (first, second, other)] == [DONE, DONE, DONE]
+
+    def test_slow_site_does_not_block_youtube(self, mock_ytdlp, tmp_path):
+        """Тест пулов: зависшая загрузка с другого сайта не задерживает YouTube."""  # noqa: RUF002
+        _, instance = mock_ytdlp
+        release = threading.Event()
+
+        def download(urls):
+            if "vimeo" in urls[0]:
+                release.wait(5)
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(
+            max_workers=1,
+            download_dir=tmp_path,
+            pools=[PoolPolicy("youtube", YOUTUBE_HOSTS, workers=1)],
+        )
+        try:
+            slow, youtube = engine.submit(["https://vimeo.com/1", "https://www.youtube.com/watch?v=1"])
+            assert youtube.wait(5)
+            assert not slow.finished
+            release.set()
+            assert slow.wait(5)
+        finally:
+            engine.shutdown()
+
+        assert (slow.pool, youtube.pool) == ("default", "youtube")
+        assert youtube.state == DONE
+
+    def test_downloads_rotate_egress_identities(self, mock_ytdlp, tmp_path):
+        """Тест: загрузки идут через прокси личностей, личность после 429 отдыхает."""
+        mock_class, instance = mock_ytdlp
+        proxies = []
+
+        def download(urls):
+            proxies.append(mock_class.call_args.args[0].get("proxy"))
+            if urls[0].endswith("throttled"):
+                raise yt_dlp.utils.DownloadError("HTTP Error 429: Too Many Requests")
+
+        instance.download.side_effect = download
+        identities = IdentityPool(
+            [EgressIdentity("a", proxy="http://a:3128"), EgressIdentity("b", proxy="http://b:3128")],
+            check_interval=0,
+        )
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path, identities=identities)
+        try:
+            (throttled,) = engine.submit(["https://www.youtube.com/watch?v=throttled"])
+            assert throttled.wait(5)
+            items = engine.submit(["https://www.youtube.com/watch?v=1", "https://www.youtube.com/watch?v=2"])
+            assert engine.wait(items, timeout=5)
+        finally:
+            engine.shutdown()
+
+        # Первая попытка и повтор в mkv — через a, дальше a отдыхает
+        assert proxies == ["http://a:3128", "http://a:3128", "http://b:3128", "http://b:3128"]
+        assert throttled.snapshot()["identity"] == "a"
+        assert identities.snapshot()["a"]["cooldown"] > 0
+
+    def test_pause_and_cancel_queued_item(self, tmp_path):
+        """Тест паузы элемента в очереди и отмены приостановленного."""
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        engine.start = lambda: None
+        events = []
+        engine.add_listener(lambda event, item: events.append(event))
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+            engine.pause(item.id)
+            assert item.state == PAUSED
+            assert engine._queue.pending() == []  # noqa: SLF001
+
+            engine.resume(item.id)
+            assert item.state == QUEUED
+            assert engine._queue.pending() == [item]  # noqa: SLF001
+
+            engine.pause(item.id)
+            engine.cancel(item.id)
+        finally:
+            engine.shutdown()
+
+        assert item.state == CANCELLED
+        assert events == ["queued", PAUSED, "queued", PAUSED, CANCELLED]
+
+    def test_shutdown_cancels_queued_items(self, tmp_path):
+        """Тест отмены необработанных элементов при остановке."""
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        # Рабочие потоки не запущены — элементы остаются в очереди
+        engine.start = lambda: None
+        items = engine.submit(["https://youtube.com/watch?v=1"])
+        engine.shutdown()
+
+        assert items[0].state == CANCELLED
+        assert engine.wait(items, timeout=1)
+
+    def test_snapshot_is_serializable(self, tmp_path):
+        """Тест снимка состояния элемента."""
+        engine = DownloadEngine(download_dir=tmp_path)
+        engine.start = lambda: None
+        (item,) = engine.submit(["https://youtube.com/watch?v=1"], fmt="worst")
+        snapshot = item.snapshot()
+        engine.shutdown()
+
+        assert snapshot["url"] == "https://youtube.com/watch?v=1"
+        assert snapshot["format"] == "worst"
+        assert snapshot["state"] == "queued"
+        assert snapshot["percent"] == 0.0
@@ -0,0 +1,146 @@
+# tests/test_failures.py
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.daemon import WatchDaemon
+from src.engine import DONE, FAILED
+from src.failures import QUARANTINED, RETRY, FailureStore, classify_error
+
+URL = "https://www.youtube.com/watch?v=abc"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    failure_store = FailureStore(tmp_path / "failures.sqlite3", max_attempts=3, clock=clock)
+    yield failure_store
+    failure_store.close()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("message", "error_class"),
+    [
+        ("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader", "unavailable"),
+        ("ERROR: [youtube] abc: Private video. Sign in if you've been granted access", "private"),
+        ("ERROR: [youtube] abc: Sign in to confirm your age", "login_required"),
+        ("ERROR: [youtube] abc: Sign in to confirm you’re not a bot", "rate_limited"),
+        ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", "rate_limited"),
+        ("ERROR: unable to download video data: HTTP Error 403: Forbidden", "rate_limited"),
+        ("ERROR: unable to download webpage: HTTP Error 404: Not Found", "unavailable"),
+        ("ERROR: unable to download webpage: HTTP Error 410: Gone", "unavailable"),
+        ("ERROR: The uploader has not made this video available in your country", "geo_blocked"),
+        ("ERROR: Unsupported URL: https://example.com/", "unsupported"),
+        ("ERROR: unable to download video data: HTTP Error 503: Service Unavailable", "network"),
+        ("ERROR: [Errno 104] Connection reset by peer", "network"),
+        ("ERROR: The read operation timed out", "network"),
+        ("[Errno 28] Недостаточно места: нужно 10 байт, доступно 1 байт", "disk"),
+        ("ERROR: Postprocessing: Conversion failed!", "postprocess"),
+        ("something odd", "unknown"),
+    ],
+)
+def test_classify_error(message, error_class):
+    assert classify_error(message) == error_class
+
+
+@pytest.mark.unit
+class TestFailureStore:
+    """Тесты базы неудачных загрузок."""
+
+    def test_transient_failure_backs_off(self, store, clock):
+        """Тест: временная ошибка повторяется с нарастающей задержкой."""  # noqa: RUF002
+        first = store.record_failure(URL, "Connection reset by peer")
+        assert (first.state, first.attempts, first.extractor) == (RETRY, 1, "youtube.com")
+        assert first.next_retry_at == clock.now + 60
+        assert store.due() == []
+
+        clock.now += 60
+        assert store.claim_due() == [URL]
+        assert store.claim_due() == []  # уже выдана
+
+        second = store.record_failure(URL, "Connection reset by peer")
+        assert second.attempts == 2  # noqa: PLR2004
+        assert second.next_retry_at == clock.now + 120
+        assert second.first_failed_at == first.first_failed_at
+
+    def test_permanent_failure_is_quarantined(self, store, clock):
+        """Тест: удалённое видео сразу попадает в карантин."""
+        failure = store.record_failure(URL, "Video unavailable")
+
+        assert failure.state == QUARANTINED
+        clock.now += 10**6
+        assert store.due() == []
+        assert store.summary() == {QUARANTINED: 1}
+
+    def test_forbidden_is_retried(self, store, clock):
+        """Тест: 403 (истёкшая ссылка, ограничение) не отправляет ссылку в карантин."""
+        failure = store.record_failure(URL, "ERROR: unable to download video data: HTTP Error 403: Forbidden")
+
+        assert (failure.state, failure.error_class) == (RETRY, "rate_limited")
+        assert failure.next_retry_at == clock.now + 15 * 60
+
+    def test_quarantine_after_max_attempts(self, store):
+        for _ in range(3):
+            failure = store.record_failure(URL, "timed out")
+
+        assert failure.state == QUARANTINED
+        assert failure.error_class == "network"
+
+    def test_release_from_quarantine(self, store):
+        store.record_failure(URL, "Sign in to confirm your age")
+
+        assert store.release(URL)
+        assert store.due() == [URL]
+        assert store.failures()[0].attempts == 0
+
+    def test_reset_claimed(self, store, clock):
+        """Тест: выданные, но не завершённые повторы возвращаются в ожидание."""
+        store.record_failure(URL, "timed out")
+        clock.now += 60
+        store.claim_due()
+
+        assert store.reset_claimed() == 1
+        assert store.due() == [URL]
+
+    def test_engine_events(self, store):
+        """Тест записи неудач и удаления после успешной загрузки."""
+        item = MagicMock(url=URL, error="HTTP Error 500")
+        store.on_engine_event(FAILED, item)
+        store.on_engine_event(FAILED, item)
+        store.on_engine_event("progress", item)
+
+        (failure,) = store.failures()
+        assert failure.attempts == 2  # noqa: PLR2004
+        assert failure.message == "HTTP Error 500"
+
+        store.on_engine_event(DONE, item)
+        assert store.failures() == []
+
+
+@pytest.mark.unit
+def test_daemon_requeues_due_failures(tmp_path, store, clock):
+    """Тест демона: повторно ставятся только ссылки, которым пора повторить."""
+    store.record_failure(URL, "timed out")
+    store.record_failure("https://youtube.com/watch?v=gone", "Video unavailable")
+    engine = MagicMock()
+    daemon = WatchDaemon([tmp_path / "links.txt"], engine, failures=store)
+
+    daemon.scan()
+    engine.submit.assert_not_called()
+
+    clock.now += 60
+    daemon.scan()
+    engine.submit.assert_called_once_with([URL])
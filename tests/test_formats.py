@@ -0,0 +1,149 @@
+# tests/test_formats.py
+import pytest
+import yt_dlp
+
+from src.engine import build_ydl_opts
+from src.formats import (
+    AUDIO_CODECS,
+    FAST_PROFILE,
+    AudioProfile,
+    parse_audio_profile,
+    rank_formats,
+    resolve_format,
+)
+
+MB = 1024 * 1024
+
+
+def fmt(format_id, height=None, vcodec="none", acodec="none", ext="mp4", size=None):
+    return {
+        "format_id": format_id,
+        "url": f"https://example.com/{format_id}",
+        "protocol": "https",
+        "height": height,
+        "vcodec": vcodec,
+        "acodec": acodec,
+        "ext": ext,
+        "filesize": size,
+    }
+
+
+# Порядок как у yt-dlp: от худшего к лучшему
+FORMATS = [
+    fmt("18", 360, "avc1.42001E", "mp4a.40.2", size=20 * MB),
+    fmt("140", acodec="mp4a.40.2", ext="m4a", size=5 * MB),
+    fmt("251", acodec="opus", ext="webm", size=6 * MB),
+    fmt("136", 720, "avc1.4d401f", size=40 * MB),
+    fmt("247", 720, "vp9", ext="webm", size=35 * MB),
+    fmt("22", 720, "avc1.64001F", "mp4a.40.2", size=60 * MB),
+    fmt("137", 1080, "avc1.640028", size=80 * MB),
+    fmt("248", 1080, "vp9", ext="webm", size=70 * MB),
+]
+
+
+def select(format_spec, formats=FORMATS):
+    return list(resolve_format(format_spec)({"formats": formats}))[0]
+
+
+@pytest.mark.unit
+class TestRankFormats:
+    """Тесты построения вариантов."""
+
+    def test_pairs_use_compatible_audio(self):
+        """Тест: видео mp4 идёт с m4a, vp9 — с opus."""  # noqa: RUF002
+        pairs = {c.formats[0]["format_id"]: c for c in rank_formats(FORMATS) if c.kind == "merge"}
+
+        assert pairs["137"].formats[1]["format_id"] == "140"
+        assert pairs["137"].ext == "mp4"
+        assert pairs["248"].formats[1]["format_id"] == "251"
+        assert pairs["248"].ext == "webm"
+
+    def test_bytes_and_merge_cost(self):
+        """Тест оценки объёма загрузки и склейки."""
+        choices = {c.formats[0]["format_id"]: c for c in rank_formats(FORMATS)}
+
+        assert choices["18"].bytes == 20 * MB
+        assert choices["18"].merge_bytes == 0
+        assert choices["248"].bytes == choices["248"].merge_bytes == 76 * MB
+
+    def test_max_height(self):
+        assert all(c.height <= 720 for c in rank_formats(FORMATS, max_height=720))  # noqa: PLR2004
+
+
+@pytest.mark.unit
+class TestFastSelector:
+    """Тесты профиля fast."""
+
+    def test_progressive_within_tolerance(self):
+        """Тест: готовый 720p-файл вместо склейки при лимите 720p."""
+        assert select(f"{FAST_PROFILE}:720")["format_id"] == "22"
+
+    def test_progressive_outside_tolerance(self):
+        """Тест: 720p далеко от 1080p — берётся пара без перепаковки в mkv."""
+        chosen = select(f"{FAST_PROFILE}:1080")
+
+        assert chosen["format_id"] == "248+251"
+        assert chosen["ext"] == "webm"
+        assert chosen["filesize_approx"] == 76 * MB
+
+    def test_large_tolerance_prefers_progressive(self):
+        assert select(f"{FAST_PROFILE}:1080:0.4")["format_id"] == "22"
+
+    def test_audio_only_source(self):
+        formats = [fmt("140", acodec="mp4a.40.2", ext="m4a")]
+        assert select(FAST_PROFILE, formats)["format_id"] == "140"
+
+    def test_regular_format_passed_through(self):
+        assert resolve_format("bestvideo+bestaudio/best") == "bestvideo+bestaudio/best"
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError, match="fast"):
+            resolve_format("fast:high")
+
+
+@pytest.mark.integration
+def test_selector_with_yt_dlp():
+    """Тест: yt-dlp принимает выбор селектора (без сети)."""
+    info = {"id": "x", "title": "Video", "extractor": "test", "extractor_key": "Test", "formats": FORMATS}
+    opts = {"format": resolve_format(f"{FAST_PROFILE}:1080"), "quiet": True, "simulate": True}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        result = ydl.process_ie_result(info, download=False)
+
+    assert result["format_id"] == "248+251"
+    assert [f["format_id"] for f in result["requested_formats"]] == ["248", "251"]
+    assert result["ext"] == "webm"
+
+
+@pytest.mark.unit
+class TestAudioProfile:
+    """Тесты аудиопрофиля."""
+
+    def test_parse(self):
+        assert parse_audio_profile("audio") == AudioProfile("mp3", None)
+        assert parse_audio_profile("audio:opus:-14") == AudioProfile("opus", -14.0)
+        assert parse_audio_profile("bestaudio") is None
+
+    def test_invalid(self):
+        with pytest.raises(ValueError, match="аудиокодек"):
+            parse_audio_profile("audio:flac")
+        with pytest.raises(ValueError, match="громкость"):
+            parse_audio_profile("audio:mp3:loud")
+
+    def test_only_audio_streams_selected(self):
+        """Тест: выбирается только аудио, в целевом кодеке — если есть."""
+        info = {"id": "x", "title": "Song", "extractor": "test", "extractor_key": "Test", "formats": FORMATS}
+        chosen = {}
+        for codec in AUDIO_CODECS:
+            opts = {"format": resolve_format(f"audio:{codec}"), "quiet": True, "simulate": True}
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                chosen[codec] = ydl.process_ie_result(dict(info), download=False)["format_id"]
+
+        assert chosen == {"mp3": "251", "m4a": "140", "opus": "251"}
+
+    def test_build_ydl_opts_adds_extract_audio(self, tmp_path):
+        opts = build_ydl_opts(tmp_path, "audio:m4a")
+
+        assert opts["format"] == AUDIO_CODECS["m4a"]
+        assert opts["postprocessors"] == [
+            {"key": "FFmpegExtractAudio", "preferredcodec": "m4a", "preferredquality": "192"},
+        ]
@@ -0,0 +1,288 @@
+# tests/test_jobqueue.py
+import json
+import socketserver
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.engine import DownloadEngine
+from src.jobqueue import (
+    CoordinatorClient,
+    CoordinatorServer,
+    QueueWorker,
+    SQLiteJobQueue,
+)
+from src.routing import YOUTUBE_HOSTS, PoolPolicy
+
+
+class FakeClock:
+    """Управляемые часы для проверки аренды."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def job_queue(tmp_path, clock):
+    """Очередь в SQLite с короткой арендой."""  # noqa: RUF002
+    queue = SQLiteJobQueue(tmp_path / "queue.db", lease_seconds=10, max_attempts=2, clock=clock)
+    yield queue
+    queue.close()
+
+
+@pytest.mark.unit
+class TestSQLiteJobQueue:
+    """Тесты очереди заданий с арендой."""  # noqa: RUF002
+
+    def test_add_deduplicates_urls(self, job_queue):
+        """Тест: одна ссылка попадает в очередь один раз."""
+        assert job_queue.add(["https://a/1", "https://a/2", "https://a/1"]) == 2
+        assert job_queue.add(["https://a/2"]) == 0
+        assert job_queue.stats()["pending"] == 2
+
+    def test_claim_is_exclusive(self, job_queue):
+        """Тест: задание выдаётся только одному исполнителю."""
+        job_queue.add(["https://a/1", "https://a/2"])
+
+        first = job_queue.claim("w1", limit=1)
+        second = job_queue.claim("w2", limit=5)
+
+        assert [job.url for job in first] == ["https://a/1"]
+        assert [job.url for job in second] == ["https://a/2"]
+        assert job_queue.claim("w3") == []
+
+    def test_wal_mode_enabled(self, job_queue):
+        """Тест включения WAL."""
+        mode = job_queue._conn.execute("PRAGMA journal_mode").fetchone()[0]  # noqa: SLF001
+        assert mode == "wal"
+
+    def test_expired_lease_is_requeued(self, job_queue, clock):
+        """Тест возврата задания после истечения аренды."""
+        job_queue.add(["https://a/1"])
+        (job,) = job_queue.claim("w1")
+
+        clock.now += 11
+        (reclaimed,) = job_queue.claim("w2")
+
+        assert reclaimed.id == job.id
+        assert reclaimed.attempts == 2
+        # Старый исполнитель больше не может отчитаться
+        assert job_queue.complete("w1", job.id) is False
+        assert job_queue.complete("w2", job.id) is True
+
+    def test_heartbeat_extends_lease(self, job_queue, clock):
+        """Тест продления аренды."""
+        job_queue.add(["https://a/1"])
+        (job,) = job_queue.claim("w1")
+
+        clock.now += 8
+        assert job_queue.heartbeat("w1", [job.id]) == 1
+        clock.now += 8
+
+        assert job_queue.claim("w2") == []
+        assert job_queue.heartbeat("w2", [job.id]) == 0
+
+    def test_fail_retries_then_dead(self, job_queue):
+        """Тест повторов и исчерпания попыток."""
+        job_queue.add(["https://a/1"])
+
+        (job,) = job_queue.claim("w1")
+        job_queue.fail("w1", job.id, error="network")
+        assert job_queue.stats()["pending"] == 1
+
+        (job,) = job_queue.claim("w1")
+        job_queue.fail("w1", job.id, error="network")
+        assert job_queue.stats()["dead"] == 1
+
+    def test_release_does_not_count_attempt(self, job_queue):
+        """Тест возврата задания без учёта попытки."""
+        job_queue.add(["https://a/1"])
+        (job,) = job_queue.claim("w1")
+
+        assert job_queue.release("w1", job.id)
+        (job,) = job_queue.claim("w1")
+        assert job.attempts == 1
+
+    def test_shared_between_connections(self, tmp_path, clock):
+        """Тест: две очереди на одном файле видят общие задания."""
+        first = SQLiteJobQueue(tmp_path / "shared.db", clock=clock)
+        second = SQLiteJobQueue(tmp_path / "shared.db", clock=clock)
+        try:
+            first.add(["https://a/1"])
+            assert [job.url for job in second.claim("w2")] == ["https://a/1"]
+            assert first.claim("w1") == []
+        finally:
+            first.close()
+            second.close()
+
+
+@pytest.mark.integration
+class TestCoordinator:
+    """Тесты TCP-координатора."""
+
+    def test_client_roundtrip(self, job_queue):
+        """Тест операций через координатор."""
+        server = CoordinatorServer(job_queue, port=0)
+        server.start()
+        client = CoordinatorClient(*server.address)
+        try:
+            assert client.add(["https://a/1", "https://a/2"]) == 2
+            jobs = client.claim("remote", limit=2)
+            assert [job.url for job in jobs] == ["https://a/1", "https://a/2"]
+            assert client.heartbeat("remote", [job.id for job in jobs]) == 2
+            assert client.complete("remote", jobs[0].id) is True
+            assert client.fail("remote", jobs[1].id, error="boom", retry=False) is True
+            assert client.stats() == {"pending": 0, "leased": 0, "completed": 1, "dead": 1}
+        finally:
+            client.close()
+            server.stop()
+
+    def test_malformed_reply(self):
+        """Тест: испорченный ответ координатора — RuntimeError, а не ValueError."""  # noqa: RUF002
+
+        class Garbage(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+                self.wfile.write(b"not json\n")
+
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Garbage)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = CoordinatorClient(*server.server_address)
+        try:
+            with pytest.raises(RuntimeError, match="malformed coordinator reply"):
+                client.claim("remote")
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_unknown_operation(self, job_queue):
+        """Тест ошибки для неизвестной операции."""
+        server = CoordinatorServer(job_queue, port=0)
+        server.start()
+        client = CoordinatorClient(*server.address)
+        try:
+            with pytest.raises(RuntimeError, match="unknown op"):
+                client._call("drop_table")  # noqa: SLF001
+        finally:
+            client.close()
+            server.stop()
+
+
+@pytest.mark.integration
+def test_queue_worker_reports_results(tmp_path):
+    """Тест исполнителя: задания скачиваются и отмечаются выполненными."""
+    job_queue = SQLiteJobQueue(tmp_path / "queue.db", max_attempts=1)
+    job_queue.add(["https://youtube.com/watch?v=ok", "https://youtube.com/watch?v=bad"])
+    done = threading.Event()
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+
+        def download(urls):
+            if "bad" in urls[0]:
+                raise RuntimeError("boom")
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(max_workers=2, download_dir=tmp_path)
+        worker = QueueWorker(job_queue, engine, "w1", poll_interval=0.05)
+        engine.add_listener(lambda event, item: len(engine.items()) == 2 and engine.wait(timeout=0) and done.set())
+        worker.start()
+        try:
+            assert done.wait(5)
+        finally:
+            worker.stop()
+            engine.shutdown()
+            worker.release_unfinished()
+
+    stats = job_queue.stats()
+    job_queue.close()
+    assert stats["completed"] == 1
+    assert stats["dead"] == 1
+
+
+@pytest.mark.integration
+def test_queue_worker_fills_every_pool(tmp_path):
+    """Тест: исполнитель берёт заданий по числу потоков всех пулов, а не только max_workers."""  # noqa: RUF002
+    job_queue = SQLiteJobQueue(tmp_path / "queue.db")
+    job_queue.add(
+        [
+            "https://www.youtube.com/watch?v=1",
+            "https://vimeo.com/1",
+            "https://www.youtube.com/watch?v=2",
+            "https://www.youtube.com/watch?v=3",
+        ],
+    )
+    release = threading.Event()
+    started = []
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+        instance.download.side_effect = lambda urls: release.wait(5)
+        engine = DownloadEngine(
+            max_workers=1,
+            download_dir=tmp_path,
+            pools=[PoolPolicy("youtube", YOUTUBE_HOSTS, workers=2)],
+        )
+        engine.add_listener(lambda event, item: event == "started" and started.append(item.url))
+        worker = QueueWorker(job_queue, engine, "w1", poll_interval=0.05)
+        worker.start()
+        try:
+            deadline = time.monotonic() + 5
+            while len(started) < 3 and time.monotonic() < deadline:  # noqa: PLR2004
+                time.sleep(0.05)
+            assert len(started) == 3  # noqa: PLR2004
+            assert job_queue.stats()["leased"] == 3  # noqa: PLR2004
+        finally:
+            release.set()
+            worker.stop()
+            engine.shutdown()
+            worker.release_unfinished()
+    job_queue.close()
+
+
+@pytest.mark.integration
+def test_queue_worker_survives_bad_reply(tmp_path):
+    """Тест: ошибка разбора ответа очереди не останавливает выдачу заданий."""
+    job_queue = SQLiteJobQueue(tmp_path / "queue.db")
+    job_queue.add(["https://youtube.com/watch?v=ok"])
+    claim = job_queue.claim
+    calls = []
+
+    def flaky_claim(worker, limit=1):
+        calls.append(limit)
+        if len(calls) == 1:
+            raise json.JSONDecodeError("Expecting value", "", 0)
+        return claim(worker, limit=limit)
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        mock_class.return_value.__enter__.return_value = MagicMock()
+        engine = DownloadEngine(max_workers=1, download_dir=tmp_path)
+        with patch.object(job_queue, "claim", side_effect=flaky_claim):
+            worker = QueueWorker(job_queue, engine, "w1", poll_interval=0.05)
+            worker.start()
+            try:
+                deadline = time.monotonic() + 5
+                while job_queue.stats()["completed"] < 1 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                worker.stop()
+                engine.shutdown()
+                worker.release_unfinished()
+
+    stats = job_queue.stats()
+    job_queue.close()
+    assert len(calls) > 1
+    assert stats["completed"] == 1
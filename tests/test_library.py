@@ -0,0 +1,138 @@
+# tests/test_library.py
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src import library
+from src.app import LibraryModel
+from src.library import LibraryChanges, LibraryIndex
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    root = tmp_path / "result"
+    (root / "playlist").mkdir(parents=True)
+    (root / "a.mp4").write_bytes(b"a" * 10)
+    (root / "playlist" / "b.webm").write_bytes(b"b" * 20)
+    (root / "notes.txt").write_bytes(b"n")
+    (root / "c.webm.part").write_bytes(b"partial")
+    return root
+
+
+@pytest.fixture
+def index(downloads):
+    library_index = LibraryIndex(downloads)
+    yield library_index
+    library_index.close()
+
+
+def _names(entries):
+    return sorted(os.path.basename(entry.path) for entry in entries)
+
+
+@pytest.mark.unit
+class TestLibraryIndex:
+    """Тесты инкрементального индекса папки загрузок."""
+
+    def test_first_refresh_adds_files(self, index):
+        """Тест первого обхода: служебные и незавершённые файлы не попадают в список."""
+        changes = index.refresh()
+
+        assert _names(changes.added) == ["a.mp4", "b.webm", "notes.txt"]
+        assert changes.changed == []
+        assert changes.removed == []
+
+    def test_refresh_touches_only_changed_entries(self, index, downloads):
+        """Тест: повторный обход сообщает только об изменениях."""  # noqa: RUF002
+        index.refresh()
+        assert index.refresh() == LibraryChanges([], [], [])
+
+        (downloads / "a.mp4").write_bytes(b"a" * 30)
+        (downloads / "playlist" / "b.webm").unlink()
+        (downloads / "d.mp3").write_bytes(b"d")
+
+        changes = index.refresh()
+
+        assert _names(changes.added) == ["d.mp3"]
+        assert _names(changes.changed) == ["a.mp4"]
+        assert [os.path.basename(path) for path in changes.removed] == ["b.webm"]
+
+    def test_cache_survives_reopen(self, index, downloads):
+        """Тест: повторное открытие показывает список без обхода папки."""
+        index.refresh()
+        index.close()
+
+        reopened = LibraryIndex(downloads)
+        try:
+            with patch.object(library.os, "scandir") as scandir:
+                entries = reopened.entries()
+            scandir.assert_not_called()
+            assert _names(entries) == ["a.mp4", "b.webm", "notes.txt"]
+            assert reopened.refresh() == LibraryChanges([], [], [])
+        finally:
+            reopened.close()
+
+    def test_probe_reads_only_new_media(self, index, downloads):
+        """Тест: ffprobe вызывается только для ещё не прочитанных медиафайлов."""
+        index.refresh()
+        info = {"duration": 12.5, "width": 1280, "height": 720}
+
+        with patch.object(library, "probe", return_value=info) as probe:
+            updated = index.probe()
+            assert index.probe() == []
+
+        assert probe.call_count == 2  # noqa: PLR2004 — a.mp4 и b.webm, не notes.txt
+        assert {entry.height for entry in updated} == {720}
+        entry = index.query("a.mp4")[0]
+        assert entry.duration == 12.5  # noqa: PLR2004
+        assert entry.probed
+
+        (downloads / "a.mp4").write_bytes(b"changed")
+        index.refresh()
+        assert [os.path.basename(path) for path in index.pending_probe()] == ["a.mp4"]
+
+    def test_probe_failure_is_not_retried(self, index):
+        """Тест: нечитаемый файл помечается прочитанным без параметров."""
+        index.refresh()
+
+        with patch.object(library, "probe", side_effect=OSError("no ffprobe")):
+            updated = index.probe()
+
+        assert all(entry.probed and entry.duration is None for entry in updated)
+        assert index.pending_probe() == []
+
+    def test_query_filters_and_sorts(self, index):
+        index.refresh()
+
+        assert _names(index.query("WEBM")) == ["b.webm"]
+        assert [os.path.basename(e.path) for e in index.query(sort="size")] == ["b.webm", "a.mp4", "notes.txt"]
+
+    def test_delete_removes_file_and_entry(self, index, downloads):
+        index.refresh()
+
+        index.delete(downloads / "a.mp4")
+
+        assert not (downloads / "a.mp4").exists()
+        assert "a.mp4" not in _names(index.entries())
+
+
+@pytest.mark.gui
+def test_library_model_applies_changes(qapp, index, downloads):
+    """Тест модели таблицы: точечное применение изменений."""
+    model = LibraryModel()
+    model.set_entries(index.entries())
+    model.apply(index.refresh())
+    assert model.rowCount() == 3  # noqa: PLR2004
+
+    (downloads / "notes.txt").unlink()
+    changes = index.refresh()
+    removed_rows = []
+    model.rowsRemoved.connect(lambda _parent, first, _last: removed_rows.append(first))
+    model.apply(changes)
+
+    assert model.rowCount() == 2  # noqa: PLR2004
+    assert len(removed_rows) == 1
+    names = {model.data(model.index(row, 0)) for row in range(model.rowCount())}
+    assert names == {"a.mp4", "b.webm"}
+    assert model.data(model.index(0, 1)).endswith("Б")
@@ -1,15 +1,20 @@
 # tests/test_main_window.py
 import sys
+from unittest.mock import patch
 
 import pytest
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (
     QLabel,
+    QMessageBox,
     QProgressBar,
     QPushButton,
 )
 
 sys.path.insert(0, ".")
 
+from src.engine import DOWNLOADING, FAILED, POSTPROCESSING, DownloadItem
+
 
 @pytest.mark.gui
 class TestMainWindow:
@@ -123,6 +128,53 @@ class TestProgressBars:
         main_window.overall_bar.setValue(75)
         assert main_window.overall_bar.value() == 75
 
+    def test_queue_rows_refresh_on_timer_tick(self, main_window, tmp_path):
+        """Тест таблицы очереди: строки обновляются только при refresh_status()."""
+        first = DownloadItem("https://youtube.com/watch?v=1", "best", tmp_path)
+        second = DownloadItem("https://youtube.com/watch?v=2", "best", tmp_path)
+        model = main_window.queue_model
+        model.add_items([first, second])
+        changed_rows = []
+        model.dataChanged.connect(lambda top, bottom: changed_rows.extend(range(top.row(), bottom.row() + 1)))
+
+        first.state = DOWNLOADING
+        first.downloaded_bytes, first.total_bytes, first.speed, first.eta = 512, 1024, 2048, 65
+        assert model.data(model.index(0, 1)) == "В очереди"
+
+        main_window.refresh_status()
+
+        assert changed_rows == [0]
+        assert model.data(model.index(0, 1)) == "Загрузка"
+        assert model.data(model.index(0, 2)) == "50%"
+        assert model.data(model.index(0, 4)) == "2.0 КБ/с"
+        assert model.data(model.index(0, 5)) == "1:05"
+        assert main_window.progress_bar.value() == 50
+        # Без изменений — без перерисовки
+        main_window.refresh_status()
+        assert changed_rows == [0]
+
+        second.state, second.postprocessor = POSTPROCESSING, "Merger"
+        first.state, first.error = FAILED, "HTTP Error 403"
+        main_window.refresh_status()
+        assert changed_rows == [0, 0, 1]
+        assert model.data(model.index(1, 1)) == "Склейка"
+        assert model.data(model.index(0, 1), Qt.ToolTipRole) == "HTTP Error 403"
+
+    def test_controls_apply_to_selection_or_batch(self, main_window, tmp_path, mocker):
+        """Тест кнопок паузы/отмены: выделенные строки или весь пакет."""
+        items = [DownloadItem(f"https://youtube.com/watch?v={i}", "best", tmp_path) for i in range(3)]
+        main_window.queue_model.add_items(items)
+        engine = main_window.engine = mocker.MagicMock()
+
+        main_window.queue_view.selectRow(1)
+        main_window.control_downloads("pause")
+        engine.pause.assert_called_once_with(items[1].id)
+
+        main_window.queue_view.clearSelection()
+        main_window.control_downloads("cancel")
+        assert [c.args[0] for c in engine.cancel.call_args_list] == [item.id for item in items]
+        main_window.engine = None
+
 
 @pytest.mark.gui
 class TestDownloadButton:
@@ -206,3 +258,50 @@ class TestUIIntegration:
 
         main_window.download_button.setEnabled(True)
         assert main_window.download_button.isEnabled()
+
+
+@pytest.mark.gui
+class TestLibraryPanel:
+    """Тесты панели «Библиотека»."""
+
+    def test_index_opened_when_tab_shown(self, main_window, qtbot, mocker):
+        """Тест: индекс библиотеки не создаётся, пока вкладка не открыта."""
+        mocker.patch("src.library.probe", return_value={})
+        index_file = main_window.download_dir / ".library.sqlite3"
+        main_window.show()
+        assert main_window.library_panel.index is None
+        assert not index_file.exists()
+
+        main_window.tabs.setCurrentWidget(main_window.library_panel)
+
+        qtbot.waitUntil(lambda: main_window.library_panel.index is not None)
+        assert index_file.exists()
+
+    def test_library_lists_downloaded_files(self, main_window, qtbot):
+        """Тест: обновление показывает файлы папки загрузки."""
+        (main_window.download_dir / "Video.mp4").write_bytes(b"video")
+        panel = main_window.library_panel
+
+        with patch("src.library.probe", return_value={"duration": 65, "width": 640, "height": 360}):
+            panel.refresh()
+            qtbot.waitUntil(lambda: panel.model.rowCount() == 1)
+            qtbot.waitUntil(lambda: panel.model.data(panel.model.index(0, 3)) == "640x360")
+
+        assert panel.model.data(panel.model.index(0, 0)) == "Video.mp4"
+        assert panel.model.data(panel.model.index(0, 2)) == "1:05"
+
+    def test_library_delete_selected(self, main_window, qtbot, mocker):
+        """Тест удаления выбранного файла с подтверждением."""  # noqa: RUF002
+        video = main_window.download_dir / "Video.mp4"
+        video.write_bytes(b"video")
+        panel = main_window.library_panel
+        mocker.patch("src.library.probe", return_value={})
+        panel.refresh()
+        qtbot.waitUntil(lambda: panel.model.rowCount() == 1)
+        mocker.patch("src.app.QtWidgets.QMessageBox.question", return_value=QMessageBox.Yes)
+
+        panel.table.selectRow(0)
+        panel.delete_selected()
+
+        assert not video.exists()
+        assert panel.model.rowCount() == 0
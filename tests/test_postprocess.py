@@ -0,0 +1,191 @@
+# tests/test_postprocess.py
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yt_dlp
+from yt_dlp.postprocessor import FFmpegMergerPP
+
+from src.engine import DONE, FAILED, POSTPROCESSING, DownloadEngine
+from src.postprocess import LoudnessNormalizePP, PostprocessPool, defer_postprocessing
+
+URLS = ["https://youtube.com/watch?v=1", "https://youtube.com/watch?v=2"]
+
+
+@pytest.mark.unit
+def test_defer_postprocessing_returns_immediately():
+    """Тест: post_process ставится в очередь, а не выполняется сразу."""  # noqa: RUF002
+    ydl = MagicMock()
+    original = ydl.post_process
+    jobs = []
+    defer_postprocessing(ydl, jobs.append)
+
+    info = {"id": "x"}
+    assert ydl.post_process("video.webm", info, {}) is info
+    original.assert_not_called()
+
+    jobs[0]()
+    original.assert_called_once_with("video.webm", info, {})
+
+
+@pytest.mark.unit
+def test_deferred_jobs_use_separate_ydl():
+    """Тест: постобработка идёт не на загрузчике, одновременным задачам — разные экземпляры."""
+    ydl = MagicMock()
+    original = ydl.post_process
+    jobs = []
+    twins = []
+
+    def factory():
+        twin = MagicMock()
+        # Пока первая задача выполняется, начинается вторая
+        twin.post_process.side_effect = lambda filename, *_args: jobs[1]() if filename == "1.webm" else None
+        twins.append(twin)
+        return twin
+
+    defer_postprocessing(ydl, jobs.append, factory)
+    for name in ("1.webm", "2.webm", "3.webm"):
+        ydl.post_process(name, {}, {})
+
+    jobs[0]()
+    jobs[2]()
+
+    original.assert_not_called()
+    assert len(twins) == 2  # noqa: PLR2004
+    calls = [[c.args[0] for c in twin.post_process.call_args_list] for twin in twins]
+    # Третья задача получает освободившийся экземпляр
+    assert calls == [["1.webm"], ["2.webm", "3.webm"]]
+
+
+@pytest.mark.unit
+def test_deferred_merger_uses_twin():
+    """Тест: склейка, созданная на загрузчике, выполняется с экземпляром постобработки."""  # noqa: RUF002
+    ydl = MagicMock()
+    twin = MagicMock()
+    jobs = []
+    defer_postprocessing(ydl, jobs.append, lambda: twin)
+    merger = FFmpegMergerPP(ydl)
+    info = {"__postprocessors": [merger]}
+
+    ydl.post_process("video.webm", info, {})
+    jobs[0]()
+
+    assert merger._downloader is twin  # noqa: SLF001
+    twin.post_process.assert_called_once_with("video.webm", info, {})
+
+
+@pytest.mark.unit
+def test_pool_size_defaults_to_cpu_count():
+    with patch("src.postprocess.os.cpu_count", return_value=6):
+        pool = PostprocessPool()
+    try:
+        assert pool.max_workers == 6
+    finally:
+        pool.close()
+
+
+def run_engine(post_process, on_event=None):
+    """Движок с mock YoutubeDL: download вызывает post_process как yt-dlp"""  # noqa: RUF002
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instances = []
+
+        def make_ydl(opts, **_kwargs):
+            instance = MagicMock()
+            instance.post_process = MagicMock(side_effect=post_process)
+
+            def download(urls):
+                path = f"{urls[0][-1]}.{opts['merge_output_format']}"
+                instance.post_process(path, {"filepath": path}, {})
+                for hook in opts["post_hooks"]:
+                    hook(path)
+
+            instance.download.side_effect = download
+            instances.append(instance)
+            ctx = MagicMock()
+            ctx.__enter__.return_value = instance
+            return ctx
+
+        mock_class.side_effect = make_ydl
+        events = []
+        engine = DownloadEngine(max_workers=1, postprocess_workers=2)
+        engine.add_listener(lambda event, item: events.append((event, item.id)))
+        if on_event is not None:
+            engine.add_listener(on_event)
+        try:
+            items = engine.submit(URLS)
+            assert engine.wait(items, timeout=5)
+        finally:
+            engine.shutdown()
+    return items, events
+
+
+@pytest.mark.integration
+def test_worker_released_before_merge_finishes():
+    """Тест: следующая загрузка начинается, пока идёт склейка предыдущей."""
+    second_started = threading.Event()
+    merges = []
+
+    def post_process(filename, info, files_to_move=None):
+        # Склейка первого видео ждёт начала загрузки второго
+        if filename.startswith("1"):
+            assert second_started.wait(5)
+        merges.append(filename)
+        return info
+
+    def on_event(event, item):
+        if event == "started" and item.url == URLS[1]:
+            second_started.set()
+
+    items, events = run_engine(post_process, on_event)
+
+    assert all(item.state == DONE for item in items)
+    assert sorted(merges) == ["1.webm", "2.webm"]
+    assert (POSTPROCESSING, items[0].id) in events
+    assert items[0].files == ["1.webm"]
+
+
+@pytest.mark.integration
+def test_failed_merge_retries_with_mkv():
+    """Тест: ошибка склейки в webm — повтор со склейкой в mkv."""  # noqa: RUF002
+    def post_process(filename, info, files_to_move=None):
+        if filename.endswith(".webm"):
+            raise yt_dlp.utils.PostProcessingError("codec not supported")
+        return info
+
+    items, _events = run_engine(post_process)
+
+    assert [item.state for item in items] == [DONE, DONE]
+    assert items[0].files == ["1.mkv"]
+
+
+@pytest.mark.integration
+def test_failed_fallback_merge_fails_item():
+    def post_process(filename, info, files_to_move=None):
+        raise yt_dlp.utils.PostProcessingError("broken")
+
+    items, _events = run_engine(post_process)
+
+    assert items[0].state == FAILED
+    assert "broken" in items[0].error
+
+
+@pytest.mark.unit
+def test_loudness_normalization_reencodes_in_place(tmp_path):
+    """Тест: loudnorm перекодирует файл в тот же формат."""
+    path = tmp_path / "song.mp3"
+    path.write_bytes(b"original")
+
+    def run_ffmpeg(src, dst, opts):
+        assert src == str(path)
+        with open(dst, "wb") as f:  # noqa: PTH123
+            f.write(b"normalized")
+
+    pp = LoudnessNormalizePP(MagicMock(), target=-14)
+    with patch.object(pp, "run_ffmpeg", side_effect=run_ffmpeg) as run:
+        files, _ = pp.run({"filepath": str(path), "ext": "mp3"})
+
+    opts = run.call_args.args[2]
+    assert "loudnorm=I=-14:TP=-1.5:LRA=11" in opts
+    assert opts[opts.index("-c:a") + 1] == "libmp3lame"
+    assert files == []
+    assert path.read_bytes() == b"normalized"
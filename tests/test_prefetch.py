@@ -0,0 +1,114 @@
+# tests/test_prefetch.py
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src import prefetch
+from src.engine import DONE, DownloadEngine
+
+URLS = [f"https://youtube.com/watch?v={index}" for index in range(3)]
+
+
+@pytest.fixture
+def mock_ydl():
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+        mock_class.sanitize_info.side_effect = lambda info, **_kwargs: info
+        instance.extract_info.side_effect = lambda url, download: {"webpage_url": url, "filesize": 100}
+        yield instance
+
+
+@pytest.mark.integration
+def test_transfers_use_prefetched_metadata(mock_ydl):
+    """Тест: пока идёт первая загрузка, следующие элементы извлекаются заранее."""
+    gate = threading.Event()
+    prefetched = []
+
+    def transfer(*_args, **_kwargs):
+        assert gate.wait(5)
+
+    mock_ydl.download.side_effect = transfer
+    mock_ydl.process_ie_result.side_effect = transfer
+
+    engine = DownloadEngine(max_workers=1, prefetch=2)
+    engine.add_listener(lambda event, item: event == "prefetched" and prefetched.append(item))
+    try:
+        items = engine.submit(URLS)
+        for _ in range(50):
+            if {items[1], items[2]} <= set(prefetched):
+                break
+            threading.Event().wait(0.1)
+        gate.set()
+        assert engine.wait(items, timeout=5)
+    finally:
+        engine.shutdown()
+
+    assert all(item.state == DONE for item in items)
+    assert items[2].expected_bytes == 100
+    transferred = [c.args[0]["webpage_url"] for c in mock_ydl.process_ie_result.call_args_list]
+    assert URLS[1] in transferred
+    assert URLS[2] in transferred
+
+
+@pytest.mark.integration
+def test_failed_prefetch_falls_back_to_download(mock_ydl):
+    """Тест: при ошибке извлечения загрузка идёт обычным путём."""
+    mock_ydl.extract_info.side_effect = RuntimeError("network")
+
+    engine = DownloadEngine(max_workers=1, prefetch=2)
+    try:
+        (item,) = engine.submit(URLS[:1])
+        assert item.wait(5)
+    finally:
+        engine.shutdown()
+
+    assert item.state == DONE
+    mock_ydl.download.assert_called_once_with([URLS[0]])
+    mock_ydl.process_ie_result.assert_not_called()
+
+
+@pytest.mark.integration
+def test_sjf_estimates_items_beyond_lookahead(mock_ydl):
+    """Тест sjf: оценки есть у всех ожидающих элементов, короткие качаются первыми."""  # noqa: RUF002
+    urls = [f"https://youtube.com/watch?v={index}" for index in range(6)]
+    sizes = {url: (10 - index) * 100 for index, url in enumerate(urls)}
+    mock_ydl.extract_info.side_effect = lambda url, download: {"webpage_url": url, "filesize": sizes[url]}
+    gate = threading.Event()
+    transferred = []
+
+    def download(download_urls):
+        transferred.append(download_urls[0])
+        assert gate.wait(5)
+
+    mock_ydl.download.side_effect = download
+    mock_ydl.process_ie_result.side_effect = lambda info, **_kwargs: transferred.append(info["webpage_url"])
+
+    engine = DownloadEngine(max_workers=1, prefetch=2, policy="sjf")
+    try:
+        items = engine.submit(urls)
+        for _ in range(50):
+            if transferred and all(item.expected_bytes is not None for item in items[1:]):
+                break
+            threading.Event().wait(0.1)
+        gate.set()
+        assert engine.wait(items, timeout=5)
+    finally:
+        engine.shutdown()
+
+    assert all(item.state == DONE for item in items)
+    # Первый элемент мог начаться до оценок, остальные — от коротких к длинным
+    assert sorted(transferred) == sorted(urls)
+    assert transferred[1:] == sorted(transferred[1:], key=sizes.get)
+
+
+@pytest.mark.unit
+def test_stale_metadata_is_discarded(monkeypatch):
+    """Тест: устаревшие метаданные не используются."""
+    prefetcher = prefetch.Prefetcher(MagicMock())
+    item = MagicMock(id=1)
+    prefetcher._results[1] = (0.0, {"id": "x"})  # noqa: SLF001
+    monkeypatch.setattr(prefetch.time, "monotonic", lambda: prefetch.PREFETCH_MAX_AGE + 1)
+
+    assert prefetcher.take(item) is None
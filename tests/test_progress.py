@@ -0,0 +1,113 @@
+# tests/test_progress.py
+import pytest
+
+from src.engine import DONE, DOWNLOADING, FAILED, DownloadItem
+from src.progress import BatchProgress, ThroughputEstimator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _item(tmp_path, state, downloaded=0, total=None, expected=None):
+    item = DownloadItem("https://youtube.com/watch?v=1", "best", tmp_path)
+    item.state = state
+    item.downloaded_bytes = downloaded
+    item.total_bytes = total
+    item.expected_bytes = expected
+    return item
+
+
+@pytest.mark.unit
+class TestThroughputEstimator:
+    """Тесты скользящего среднего скорости."""
+
+    def test_rate_needs_min_span(self):
+        """Тест: по одному наблюдению скорость неизвестна."""
+        clock = FakeClock()
+        estimator = ThroughputEstimator(window=10, min_span=2, clock=clock)
+        estimator.add(0)
+        assert estimator.rate() is None
+        clock.now = 1
+        estimator.add(100)
+        assert estimator.rate() is None
+
+        clock.now = 2
+        estimator.add(200)
+
+        assert estimator.rate() == 100  # noqa: PLR2004
+
+    def test_old_samples_leave_window(self):
+        """Тест: старые наблюдения выходят из окна."""
+        clock = FakeClock()
+        estimator = ThroughputEstimator(window=10, min_span=1, clock=clock)
+        # 10 с по 1000 Б/с, затем 10 с по 100 Б/с
+        transferred = 0
+        for second in range(21):
+            clock.now = second
+            estimator.add(transferred)
+            transferred += 1000 if second < 10 else 100  # noqa: PLR2004
+
+        assert estimator.rate() == pytest.approx(100, rel=0.1)
+
+    def test_counter_reset_restarts_estimate(self):
+        """Тест: уменьшение счётчика (повтор с нуля) сбрасывает наблюдения."""  # noqa: RUF002
+        clock = FakeClock()
+        estimator = ThroughputEstimator(min_span=1, clock=clock)
+        estimator.add(1000)
+        clock.now = 5
+        estimator.add(0)
+
+        assert estimator.rate() is None
+
+
+@pytest.mark.unit
+class TestBatchProgress:
+    """Тесты прогресса пакета по байтам."""
+
+    def test_large_item_dominates_percent(self, tmp_path):
+        """Тест: девять готовых маленьких роликов не дают 90% при большом видео."""
+        mb = 1024 * 1024
+        items = [_item(tmp_path, DONE, downloaded=10 * mb, total=10 * mb) for _ in range(9)]
+        items.append(_item(tmp_path, DOWNLOADING, downloaded=0, expected=10 * 1024 * mb))
+
+        status = BatchProgress().update(items)
+
+        assert status.percent < 1
+        assert status.total_bytes == 10 * 1024 * mb + 90 * mb
+
+    def test_unknown_size_uses_average(self, tmp_path):
+        """Тест: неизвестный объём оценивается средним известных."""
+        items = [_item(tmp_path, DOWNLOADING, downloaded=50, total=100), _item(tmp_path, DOWNLOADING)]
+
+        status = BatchProgress().update(items)
+
+        assert status.total_bytes == 200  # noqa: PLR2004
+        assert status.percent == 25  # noqa: PLR2004
+
+    def test_failed_item_has_no_remaining_bytes(self, tmp_path):
+        """Тест: неудачный элемент не оставляет байт до конца пакета."""
+        items = [_item(tmp_path, DONE, downloaded=100), _item(tmp_path, FAILED, downloaded=10, expected=1000)]
+
+        status = BatchProgress().update(items)
+
+        assert status.percent == 100  # noqa: PLR2004
+        assert status.eta is None
+
+    def test_eta_from_smoothed_rate(self, tmp_path):
+        """Тест оценки времени до конца по средней скорости."""
+        clock = FakeClock()
+        progress = BatchProgress(ThroughputEstimator(min_span=1, clock=clock))
+        item = _item(tmp_path, DOWNLOADING, downloaded=0, total=1000)
+        progress.update([item])
+
+        clock.now = 2
+        item.downloaded_bytes = 200
+        status = progress.update([item])
+
+        assert status.rate == 100  # noqa: PLR2004
+        assert status.eta == 8  # noqa: PLR2004
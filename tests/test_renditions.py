@@ -0,0 +1,175 @@
+# tests/test_renditions.py
+import json
+import subprocess
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src import renditions
+from src.engine import DONE, DownloadEngine
+from src.renditions import make_rendition, parse_output, plan_rendition
+
+H264_1080 = {"vcodec": "h264", "acodec": "aac", "height": 1080}
+VP9_OPUS_480 = {"vcodec": "vp9", "acodec": "opus", "height": 480}
+
+
+@pytest.mark.unit
+class TestParseOutput:
+    """Тесты разбора выходных профилей."""
+
+    def test_profiles(self):
+        assert parse_output("480").value == 480  # noqa: PLR2004
+        assert parse_output("720p").kind == "video"
+        assert parse_output("audio:m4a").value.codec == "m4a"
+        assert parse_output("remux:mp4").value == "mp4"
+
+    @pytest.mark.parametrize("spec", ["hd", "remux:avi", "audio:flac", "0"])
+    def test_invalid(self, spec):
+        with pytest.raises(ValueError):  # noqa: PT011
+            parse_output(spec)
+
+
+@pytest.mark.unit
+class TestPlanRendition:
+    """Тесты выбора копирования или перекодирования."""
+
+    def test_audio_copied_when_codec_matches(self):
+        """Тест: AAC копируется в m4a без перекодирования."""
+        assert plan_rendition(parse_output("audio:m4a"), H264_1080) == ("audio", "m4a", ["-vn", "-c:a", "copy"])
+
+    def test_audio_transcoded_when_codec_differs(self):
+        _suffix, ext, args = plan_rendition(parse_output("audio:mp3"), H264_1080)
+
+        assert ext == "mp3"
+        assert args[args.index("-c:a") + 1] == "libmp3lame"
+
+    def test_loudness_forces_transcode(self):
+        _suffix, _ext, args = plan_rendition(parse_output("audio:m4a:-16"), H264_1080)
+
+        assert "copy" not in args
+        assert "loudnorm=I=-16:TP=-1.5:LRA=11" in args
+
+    def test_downscale_transcodes_video_and_copies_audio(self):
+        suffix, ext, args = plan_rendition(parse_output("480"), H264_1080)
+
+        assert (suffix, ext) == ("480p", "mp4")
+        assert args[args.index("-c:v") + 1] == "libx264"
+        assert args[args.index("-c:a") + 1] == "copy"
+
+    def test_small_compatible_source_is_copied(self):
+        """Тест: источник уже не больше нужной высоты — только перепаковка."""
+        _suffix, _ext, args = plan_rendition(parse_output("1080"), H264_1080)
+
+        assert args[args.index("-c:v") + 1] == "copy"
+
+    def test_webm_source_into_mp4(self):
+        """Тест: VP9/Opus не копируются в mp4."""
+        _suffix, _ext, args = plan_rendition(parse_output("720"), VP9_OPUS_480)
+
+        assert args[args.index("-c:v") + 1] == "libx264"
+        assert args[args.index("-c:a") + 1] == "aac"
+
+
+@pytest.mark.unit
+def test_make_rendition_runs_ffmpeg(tmp_path):
+    """Тест вызова ffprobe и ffmpeg с записью через временный файл."""  # noqa: RUF002
+    source = tmp_path / "Video.webm"
+    source.write_bytes(b"video")
+
+    def run(cmd, **_kwargs):
+        if "ffprobe" in cmd[0]:
+            streams = [{"codec_type": "audio", "codec_name": "opus"}, {"codec_type": "video", "codec_name": "vp9"}]
+            return MagicMock(stdout=json.dumps({"streams": streams}))
+        with open(cmd[-1], "wb") as f:  # noqa: PTH123
+            f.write(b"audio")
+        return MagicMock()
+
+    with patch.object(renditions.subprocess, "run", side_effect=run) as mock_run:
+        target = make_rendition(source, "audio:opus", ffmpeg_location=str(tmp_path / "ffmpeg.exe"))
+
+    assert target == tmp_path / "Video.audio.opus"
+    assert target.read_bytes() == b"audio"
+    ffmpeg_cmd = mock_run.call_args_list[-1].args[0]
+    assert ffmpeg_cmd[0] == str(tmp_path / "ffmpeg.exe")
+    assert mock_run.call_args_list[0].args[0][0] == str(tmp_path / "ffprobe.exe")
+    assert ffmpeg_cmd[ffmpeg_cmd.index("-c:a") + 1] == "copy"
+
+
+@pytest.mark.unit
+def test_make_rendition_error_cleans_up(tmp_path):
+    source = tmp_path / "Video.mp4"
+    source.write_bytes(b"video")
+    error = subprocess.CalledProcessError(1, "ffmpeg", stderr="Invalid data")
+
+    with (
+        patch.object(renditions, "probe", return_value=H264_1080),
+        patch.object(renditions.subprocess, "run", side_effect=error),
+        pytest.raises(RuntimeError, match="Invalid data"),
+    ):
+        make_rendition(source, "480")
+
+    assert list(tmp_path.iterdir()) == [source]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("postprocess_workers", [0, 2])
+@pytest.mark.parametrize("videos", [["Video.webm"], ["First.webm", "Second.webm"]], ids=["video", "playlist"])
+def test_engine_fans_out_renditions(tmp_path, postprocess_workers, videos):
+    """Тест: версии создаются из каждого скачанного файла, включая все видео плейлиста."""
+    def fake_rendition(source, spec, ffmpeg_location=None):
+        return f"{source}.{spec}"
+
+    with (
+        patch("yt_dlp.YoutubeDL") as mock_class,
+        patch("src.engine.make_rendition", side_effect=fake_rendition),
+    ):
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+
+        def download(_urls):
+            for video in videos:
+                for hook in mock_class.call_args.args[0]["post_hooks"]:
+                    hook(video)
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(download_dir=tmp_path, postprocess_workers=postprocess_workers)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"], outputs=["480", "audio:mp3"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert instance.download.call_count == 1
+    assert sorted(item.files) == sorted(
+        path for video in videos for path in (video, f"{video}.480", f"{video}.audio:mp3")
+    )
+
+
+@pytest.mark.unit
+def test_submit_rejects_unknown_output(tmp_path):
+    engine = DownloadEngine(download_dir=tmp_path)
+    with pytest.raises(ValueError, match="профиль"):
+        engine.submit(["https://youtube.com/watch?v=1"], outputs=["8k-hdr"])
+    assert engine.items() == []
+
+
+@pytest.mark.unit
+def test_make_rendition_without_ffprobe(tmp_path):
+    """Тест: без ffprobe рядом с ffmpeg версия всё равно создаётся, с перекодированием."""  # noqa: RUF002
+    source = tmp_path / "Video.webm"
+    source.write_bytes(b"video")
+
+    def run(cmd, **_kwargs):
+        if "ffprobe" in cmd[0]:
+            raise FileNotFoundError(2, "No such file or directory", cmd[0])
+        with open(cmd[-1], "wb") as f:  # noqa: PTH123
+            f.write(b"audio")
+        return MagicMock()
+
+    with patch.object(renditions.subprocess, "run", side_effect=run) as mock_run:
+        target = make_rendition(source, "audio:opus", ffmpeg_location=str(tmp_path / "ffmpeg.exe"))
+
+    assert target.read_bytes() == b"audio"
+    ffmpeg_cmd = mock_run.call_args_list[-1].args[0]
+    assert ffmpeg_cmd[ffmpeg_cmd.index("-c:a") + 1] != "copy"  # кодек источника неизвестен
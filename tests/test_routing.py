@@ -0,0 +1,36 @@
+# tests/test_routing.py
+import pytest
+
+from src.routing import DEFAULT_POOL, YOUTUBE_HOSTS, PoolPolicy, Router, parse_pool
+
+
+@pytest.mark.unit
+class TestRouting:
+    """Тесты распределения ссылок по пулам."""
+
+    def test_parse_pool(self):
+        """Тест разбора описания пула."""
+        pool = parse_pool("www.Vimeo.com, vk.com=2/5/10")
+
+        assert pool == PoolPolicy("vimeo.com", ("vimeo.com", "vk.com"), 2, 5 * 1024 * 1024, 10)
+        assert parse_pool("vimeo.com=3") == PoolPolicy("vimeo.com", ("vimeo.com",), 3)
+
+    @pytest.mark.parametrize("spec", ["vimeo.com", "=2", "vimeo.com=0", "vimeo.com=two", "vimeo.com=1/2/3/4"])
+    def test_parse_pool_rejects_invalid(self, spec):
+        """Тест отклонения неверных описаний."""
+        with pytest.raises(ValueError, match="пула"):
+            parse_pool(spec)
+
+    def test_route_by_host_and_subdomain(self):
+        """Тест: поддомены и короткие ссылки идут в пул сайта, остальное — в пул по умолчанию."""
+        router = Router([PoolPolicy("youtube", YOUTUBE_HOSTS, 2), parse_pool("vimeo.com=1")])
+
+        assert router.route("https://www.youtube.com/watch?v=1") == "youtube"
+        assert router.route("https://music.youtube.com/watch?v=1") == "youtube"
+        assert router.route("https://youtu.be/abc") == "youtube"
+        assert router.route("https://player.vimeo.com/video/1") == "vimeo.com"
+        assert router.route("https://example.com/video.mp4") == DEFAULT_POOL
+
+    def test_pool_names_must_be_unique(self):
+        with pytest.raises(ValueError, match="уникальны"):
+            Router([PoolPolicy("a", ("a.com",)), PoolPolicy("a", ("b.com",))])
@@ -0,0 +1,173 @@
+# tests/test_scheduling.py
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.scheduling import FairPolicy, FIFOPolicy, Scheduler, ShortestJobFirstPolicy, make_policy
+
+
+def make_item(name, size=None, owner=None, created_at=0.0, urgent=False, pool="default"):
+    return SimpleNamespace(
+        name=name,
+        expected_bytes=size,
+        owner=owner,
+        created_at=created_at,
+        finished=False,
+        urgent=urgent,
+        pool=pool,
+    )
+
+
+def drain(scheduler, count):
+    return [scheduler.get().name for _ in range(count)]
+
+
+@pytest.mark.unit
+class TestPolicies:
+    """Тесты политик планирования."""
+
+    def test_fifo(self):
+        scheduler = Scheduler("fifo")
+        for name, size in (("long", 100), ("short", 1)):
+            scheduler.put(make_item(name, size))
+
+        assert drain(scheduler, 2) == ["long", "short"]
+
+    def test_shortest_job_first(self):
+        """Тест: короткие первыми, без оценки — в конце по порядку."""
+        scheduler = Scheduler(ShortestJobFirstPolicy(clock=lambda: 0.0))
+        for name, size in (("long", 100), ("unknown1", None), ("short", 1), ("unknown2", None), ("mid", 10)):
+            scheduler.put(make_item(name, size))
+
+        assert drain(scheduler, 5) == ["short", "mid", "long", "unknown1", "unknown2"]
+
+    def test_sjf_starvation_guard(self):
+        """Тест: давно ждущий элемент выбирается вне очереди."""
+        policy = ShortestJobFirstPolicy(max_wait=60, clock=lambda: 100.0)
+        pending = [make_item("long", 100, created_at=0.0), make_item("short", 1, created_at=90.0)]
+
+        assert policy.pick(pending).name == "long"
+
+    def test_fair_round_robin_between_owners(self):
+        """Тест: большой плейлист не вытесняет другого владельца."""
+        scheduler = Scheduler(FairPolicy())
+        for index in range(3):
+            scheduler.put(make_item(f"a{index}", owner="playlist"))
+        scheduler.put(make_item("b0", owner="user"))
+        scheduler.put(make_item("b1", owner="user"))
+
+        assert drain(scheduler, 5) == ["a0", "b0", "a1", "b1", "a2"]
+
+    @pytest.mark.parametrize(
+        "policy",
+        [FIFOPolicy, lambda: ShortestJobFirstPolicy(clock=lambda: 0.0), FairPolicy],
+        ids=["fifo", "sjf", "fair"],
+    )
+    def test_ordered_matches_drain_order(self, policy):
+        """Тест: ordered() совпадает с порядком выдачи элементов."""  # noqa: RUF002
+        scheduler = Scheduler(policy())
+        for index, (owner, size) in enumerate((("a", 30), ("a", None), ("b", 10), ("a", 20), ("b", None))):
+            scheduler.put(make_item(f"{owner}{index}", size, owner=owner))
+        scheduler.put(make_item("urgent", 50, owner="c", urgent=True))
+
+        expected = [item.name for item in scheduler.ordered()]
+
+        assert drain(scheduler, 6) == expected
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError, match="Неизвестная"):
+            make_policy("lifo")
+
+
+@pytest.mark.unit
+class TestScheduler:
+    """Тесты очереди с планированием."""  # noqa: RUF002
+
+    def test_finished_items_are_skipped(self):
+        scheduler = Scheduler()
+        cancelled = make_item("cancelled")
+        cancelled.finished = True
+        scheduler.put(cancelled)
+        scheduler.put(make_item("next"))
+
+        assert scheduler.get().name == "next"
+        assert len(scheduler) == 0
+
+    def test_discard_removes_item(self):
+        """Тест: приостановленный элемент убирается из очереди."""
+        scheduler = Scheduler()
+        paused = make_item("paused")
+        scheduler.put(paused)
+        scheduler.put(make_item("next"))
+
+        scheduler.discard(paused)
+        scheduler.discard(paused)
+
+        assert [item.name for item in scheduler.pending()] == ["next"]
+
+    def test_urgent_items_go_first(self):
+        """Тест: срочные элементы выдаются раньше обычных, вытесненный — первым из обычных."""
+        scheduler = Scheduler()
+        scheduler.put(make_item("bulk"))
+        scheduler.put(make_item("urgent", urgent=True))
+        scheduler.put(make_item("preempted"), front=True)
+
+        assert drain(scheduler, 3) == ["urgent", "preempted", "bulk"]
+
+    def test_urgent_only_waits_for_urgent_item(self):
+        """Тест зарезервированного потока: обычные элементы он не берёт."""
+        scheduler = Scheduler()
+        scheduler.put(make_item("bulk"))
+        result = []
+        thread = threading.Thread(target=lambda: result.append(scheduler.get(urgent_only=True).name))
+        thread.start()
+        scheduler.put(make_item("urgent", urgent=True))
+        thread.join(5)
+
+        assert result == ["urgent"]
+        assert [item.name for item in scheduler.pending()] == ["bulk"]
+
+    def test_pool_worker_takes_only_its_items(self):
+        """Тест пулов: поток пула берёт только элементы своего пула."""
+        scheduler = Scheduler()
+        scheduler.put(make_item("vimeo"))
+        scheduler.put(make_item("youtube", pool="youtube"))
+
+        assert scheduler.get(pool="youtube").name == "youtube"
+        assert scheduler.get(pool="default").name == "vimeo"
+
+    def test_blocked_items_are_skipped(self):
+        """Тест: элемент, который нельзя начать, пропускается и ждёт в очереди."""
+        blocked = {"throttled"}
+        reserved = []
+
+        def reserve(item):
+            reserved.append(item.name)
+            return True
+
+        scheduler = Scheduler(ready=lambda item: item.name not in blocked, reserve=reserve)
+        scheduler.put(make_item("throttled"))
+        scheduler.put(make_item("other"))
+
+        assert scheduler.get().name == "other"
+        result = []
+        thread = threading.Thread(target=lambda: result.append(scheduler.get().name))
+        thread.start()
+        blocked.clear()
+        scheduler.wake()
+        thread.join(5)
+
+        assert result == ["throttled"]
+        assert reserved == ["other", "throttled"]
+
+    def test_stop_wakes_blocked_get(self):
+        """Тест: put(None) будит ожидающий поток."""
+        scheduler = Scheduler()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(scheduler.get()))
+        thread.start()
+        scheduler.put(None)
+        thread.join(5)
+
+        assert result == [None]
@@ -0,0 +1,161 @@
+# tests/test_segmented.py
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+import yt_dlp
+
+from src.segmented import (
+    STATE_SUFFIX,
+    SegmentedFD,
+    is_eligible,
+    split_segments,
+    use_segmented_downloader,
+)
+
+PAYLOAD = bytes(range(256)) * 400  # 102400 байт
+SEGMENT = 16 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Отдаёт PAYLOAD, поддерживая (или игнорируя) заголовок Range."""
+
+    def do_GET(self):
+        self.server.ranges.append(self.headers.get("Range"))
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match and self.server.support_range:
+            start = int(match[1])
+            end = int(match[2]) if match[2] else len(PAYLOAD) - 1
+            body = PAYLOAD[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.ranges = []
+    httpd.support_range = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def ydl():
+    with yt_dlp.YoutubeDL({"quiet": True, "noprogress": True}) as instance:
+        yield instance
+
+
+def _info(server):
+    host, port = server.server_address
+    return {"url": f"http://{host}:{port}/video.mp4", "filesize": len(PAYLOAD), "http_headers": {}}
+
+
+@pytest.mark.unit
+class TestEligibility:
+    """Тесты выбора форматов для сегментной загрузки."""
+
+    def test_segments_cover_file(self):
+        """Тест разбиения: сегменты без пропусков и перекрытий."""
+        assert split_segments(10, 4) == [(0, 3), (4, 7), (8, 9)]
+
+    def test_only_large_progressive_files(self):
+        """Тест: только http(s) с точным размером от порога."""  # noqa: RUF002
+        info = {"url": "https://cdn.example/v.mp4", "filesize": 100}
+
+        assert is_eligible(info, min_size=50)
+        assert not is_eligible(info, min_size=500)
+        assert not is_eligible({**info, "filesize": None, "filesize_approx": 100}, min_size=50)
+        assert not is_eligible({**info, "protocol": "m3u8_native"}, min_size=50)
+        assert not is_eligible({**info, "http_headers": {"Range": "bytes=0-10"}}, min_size=50)
+
+    def test_small_files_use_native_downloader(self):
+        """Тест: неподходящий формат передаётся исходному YoutubeDL.dl."""
+        ydl = MagicMock()
+        original = ydl.dl
+        use_segmented_downloader(ydl, min_size=1000)
+
+        ydl.dl("video.mp4", {"url": "https://cdn.example/v.mp4", "filesize": 10})
+
+        original.assert_called_once()
+
+
+@pytest.mark.integration
+class TestSegmentedFD:
+    """Тесты загрузки диапазонами через локальный HTTP-сервер."""
+
+    def test_download_in_parallel_ranges(self, server, ydl, tmp_path):
+        """Тест: файл собирается из сегментов, список сегментов удаляется."""
+        target = tmp_path / "video.mp4"
+        events = []
+        fd = SegmentedFD(ydl, ydl.params, connections=3, segment_size=SEGMENT)
+        fd.add_progress_hook(lambda d: events.append(d["status"]))
+
+        assert fd.download(str(target), _info(server)) == (True, True)
+
+        assert target.read_bytes() == PAYLOAD
+        assert len(server.ranges) == len(split_segments(len(PAYLOAD), SEGMENT))
+        assert not (tmp_path / f"video.mp4.part{STATE_SUFFIX}").exists()
+        assert events[-1] == "finished"
+
+    def test_resume_fetches_missing_segments(self, server, ydl, tmp_path):
+        """Тест докачки: готовые сегменты из списка не запрашиваются снова."""
+        target = tmp_path / "video.mp4"
+        part = tmp_path / "video.mp4.part"
+        # Сегменты 0 и 2 скачаны, остальное — мусор
+        data = bytearray(len(PAYLOAD))
+        for start, end in (split_segments(len(PAYLOAD), SEGMENT)[i] for i in (0, 2)):
+            data[start : end + 1] = PAYLOAD[start : end + 1]
+        part.write_bytes(bytes(data))
+        state = {"size": len(PAYLOAD), "segment_size": SEGMENT, "done": [0, 2]}
+        (tmp_path / f"video.mp4.part{STATE_SUFFIX}").write_text(json.dumps(state))
+
+        fd = SegmentedFD(ydl, ydl.params, connections=2, segment_size=SEGMENT)
+        fd.download(str(target), _info(server))
+
+        assert target.read_bytes() == PAYLOAD
+        assert f"bytes=0-{SEGMENT - 1}" not in server.ranges
+        assert f"bytes={2 * SEGMENT}-{3 * SEGMENT - 1}" not in server.ranges
+        assert len(server.ranges) == len(split_segments(len(PAYLOAD), SEGMENT)) - 2
+
+    def test_fallback_without_range_support(self, server, ydl, tmp_path):
+        """Тест: сервер без Range — файл качается одним соединением."""
+        server.support_range = False
+        target = tmp_path / "video.mp4"
+        fd = SegmentedFD(ydl, ydl.params, connections=2, segment_size=SEGMENT)
+
+        fd.download(str(target), _info(server))
+
+        assert target.read_bytes() == PAYLOAD
+        assert not (tmp_path / f"video.mp4.part{STATE_SUFFIX}").exists()
+
+    def test_hook_exception_stops_segments(self, server, ydl, tmp_path):
+        """Тест: исключение из progress hook (пауза) прерывает загрузку, список сохраняется."""
+
+        def pause(d):
+            if d["status"] == "downloading":
+                raise yt_dlp.utils.DownloadCancelled
+
+        fd = SegmentedFD(ydl, ydl.params, connections=2, segment_size=SEGMENT)
+        fd.add_progress_hook(pause)
+
+        with pytest.raises(yt_dlp.utils.DownloadCancelled):
+            fd.download(str(tmp_path / "video.mp4"), _info(server))
+
+        assert not (tmp_path / "video.mp4").exists()
+        assert (tmp_path / f"video.mp4.part{STATE_SUFFIX}").exists()
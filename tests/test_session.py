@@ -0,0 +1,143 @@
+# tests/test_session.py
+import os
+import socket
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yt_dlp
+
+from src.session import DNSCache, SharedSession
+
+COOKIES = (
+    "# Netscape HTTP Cookie File\n"
+    ".youtube.com\tTRUE\t/\tTRUE\t2147483647\t{name}\t{value}\n"
+)
+
+
+@pytest.fixture
+def cookies_file(tmp_path):
+    """Файл cookies в формате Netscape."""
+    path = tmp_path / "cookies.txt"
+    path.write_text(COOKIES.format(name="SID", value="one"))
+    return path
+
+
+def cookie_values(jar):
+    return {cookie.name: cookie.value for cookie in jar}
+
+
+@pytest.mark.unit
+class TestDNSCache:
+    """Тесты кэша DNS."""
+
+    def test_cached_until_ttl(self):
+        """Тест повторного использования ответа до истечения TTL."""
+        now = [0.0]
+        cache = DNSCache(ttl=10, clock=lambda: now[0])
+        resolver = MagicMock(return_value=[("addr",)])
+        cache._original = resolver  # noqa: SLF001
+
+        cache.getaddrinfo("example.com", 443)
+        cache.getaddrinfo("example.com", 443)
+        assert resolver.call_count == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        now[0] = 11
+        cache.getaddrinfo("example.com", 443)
+        assert resolver.call_count == 2
+
+    def test_errors_are_not_cached(self):
+        """Тест: ошибки разрешения не кэшируются."""
+        cache = DNSCache(ttl=10)
+        cache._original = MagicMock(side_effect=socket.gaierror("fail"))  # noqa: SLF001
+
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                cache.getaddrinfo("missing.invalid", 80)
+        assert cache._original.call_count == 2  # noqa: SLF001
+
+    def test_install_and_uninstall(self):
+        """Тест подмены socket.getaddrinfo."""
+        original = socket.getaddrinfo
+        cache = DNSCache()
+        cache.install()
+        try:
+            assert socket.getaddrinfo == cache.getaddrinfo
+        finally:
+            cache.uninstall()
+        assert socket.getaddrinfo is original
+
+    def test_last_session_restores_getaddrinfo(self):
+        """Тест: кэш DNS общий для сессий и снимается при закрытии последней."""
+        original = socket.getaddrinfo
+        first, second = SharedSession(dns_ttl=10), SharedSession(dns_ttl=10)
+        cache = first.dns_cache
+        try:
+            assert second.dns_cache is cache
+            first.close()
+            assert socket.getaddrinfo == cache.getaddrinfo
+        finally:
+            first.close()
+            second.close()
+        assert socket.getaddrinfo == original
+
+
+@pytest.mark.unit
+class TestSharedSession:
+    """Тесты общей сессии."""
+
+    def test_cookies_loaded_once(self, cookies_file):
+        """Тест: cookie jar загружается один раз и общий для всех."""
+        session = SharedSession(cookies_file, dns_ttl=None)
+
+        with patch.object(type(session.cookiejar), "load") as load:
+            assert session.cookiejar is session.cookiejar
+            assert session.refresh() is False
+            load.assert_not_called()
+        assert cookie_values(session.cookiejar) == {"SID": "one"}
+
+    def test_reload_when_file_changes(self, cookies_file):
+        """Тест перечитывания cookies при изменении файла."""
+        session = SharedSession(cookies_file, dns_ttl=None)
+        jar = session.cookiejar
+
+        cookies_file.write_text(COOKIES.format(name="SID", value="two"))
+        stat = cookies_file.stat()
+        os.utime(cookies_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert session.refresh() is True
+        assert session.cookiejar is jar
+        assert cookie_values(jar) == {"SID": "two"}
+
+    def test_missing_cookies_file(self, tmp_path):
+        """Тест работы без файла cookies."""
+        session = SharedSession(tmp_path / "cookies.txt", dns_ttl=None)
+
+        assert cookie_values(session.cookiejar) == {}
+
+    def test_youtubedl_instances_share_director_and_jar(self, cookies_file):
+        """Тест: экземпляры YoutubeDL используют общий пул и cookies."""
+        session = SharedSession(cookies_file, dns_ttl=None)
+        first = session.attach(yt_dlp.YoutubeDL({"quiet": True}))
+        second = session.attach(yt_dlp.YoutubeDL({"quiet": True, "format": "worst"}))
+
+        assert first.cookiejar is second.cookiejar is session.cookiejar
+        assert first._request_director is second._request_director  # noqa: SLF001
+
+        director = first._request_director  # noqa: SLF001
+        with patch.object(director, "close") as close:
+            session.detach(first)
+            first.close()
+            close.assert_not_called()
+
+            session.close()
+            close.assert_called_once()
+
+    def test_different_proxy_gets_own_director(self):
+        """Тест: разные сетевые опции — разные пулы."""
+        session = SharedSession(dns_ttl=None)
+        direct = session.attach(yt_dlp.YoutubeDL({"quiet": True}))
+        proxied = session.attach(yt_dlp.YoutubeDL({"quiet": True, "proxy": "http://127.0.0.1:1"}))
+
+        assert direct._request_director is not proxied._request_director  # noqa: SLF001
+        session.close()
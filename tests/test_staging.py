@@ -0,0 +1,181 @@
+# tests/test_staging.py
+import hashlib
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src import staging
+from src.engine import DONE, DownloadEngine
+from src.staging import FileMover, move_file, staging_subdir
+
+
+@pytest.mark.unit
+class TestMoveFile:
+    """Тесты переноса файла в итоговую папку."""
+
+    def test_same_filesystem_uses_rename(self, tmp_path):
+        """Тест атомарного переименования в пределах одной ФС."""
+        src = tmp_path / "staging" / "video.webm"
+        src.parent.mkdir()
+        src.write_bytes(b"data")
+        inode = src.stat().st_ino
+
+        dst = move_file(src, tmp_path / "final")
+
+        assert dst == tmp_path / "final" / "video.webm"
+        assert dst.read_bytes() == b"data"
+        assert dst.stat().st_ino == inode
+        assert not src.exists()
+
+    def test_cross_filesystem_streams_and_fsyncs(self, tmp_path):
+        """Тест потокового копирования с fsync между ФС."""  # noqa: RUF002
+        src = tmp_path / "video.webm"
+        src.write_bytes(b"x" * 1000)
+
+        with (
+            patch.object(staging, "same_filesystem", return_value=False),
+            patch.object(staging.os, "fsync", wraps=staging.os.fsync) as fsync,
+        ):
+            dst = move_file(src, tmp_path / "share", chunk_size=64)
+
+        assert dst.read_bytes() == b"x" * 1000
+        assert not src.exists()
+        assert not (tmp_path / "share" / "video.webm.moving").exists()
+        assert fsync.call_count >= 1
+
+    def test_failed_copy_keeps_source(self, tmp_path):
+        """Тест: при ошибке копирования исходный файл остаётся."""
+        src = tmp_path / "video.webm"
+        src.write_bytes(b"data")
+
+        with (
+            patch.object(staging, "same_filesystem", return_value=False),
+            patch.object(staging.os, "replace", side_effect=OSError("disk full")),
+            pytest.raises(OSError, match="disk full"),
+        ):
+            move_file(src, tmp_path / "share")
+
+        assert src.exists()
+        assert not (tmp_path / "share" / "video.webm.moving").exists()
+
+    @pytest.mark.parametrize("same_filesystem", [True, False])
+    def test_existing_file_is_not_overwritten(self, tmp_path, same_filesystem):
+        """Тест: одноимённый файл в итоговой папке остаётся, перенесённый получает суффикс."""
+        src = tmp_path / "staging" / "video.webm"
+        src.parent.mkdir()
+        src.write_bytes(b"new")
+        final_dir = tmp_path / "final"
+        final_dir.mkdir()
+        (final_dir / "video.webm").write_bytes(b"old")
+        (final_dir / "video (1).webm").write_bytes(b"older")
+
+        with patch.object(staging, "same_filesystem", return_value=same_filesystem):
+            dst = move_file(src, final_dir)
+
+        assert dst == final_dir / "video (2).webm"
+        assert dst.read_bytes() == b"new"
+        assert (final_dir / "video.webm").read_bytes() == b"old"
+
+
+@pytest.mark.unit
+def test_staging_subdir_per_destination(tmp_path):
+    """Тест: у каждой итоговой папки своя подпапка staging."""  # noqa: RUF002
+    first = staging_subdir(tmp_path / "staging", tmp_path / "a")
+
+    assert first.parent == tmp_path / "staging"
+    assert first == staging_subdir(tmp_path / "staging", tmp_path / "a")
+    assert first != staging_subdir(tmp_path / "staging", tmp_path / "b")
+
+
+@pytest.mark.unit
+def test_file_mover_runs_in_background(tmp_path):
+    """Тест фонового переноса через Future."""
+    src = tmp_path / "a.mp4"
+    src.write_bytes(b"data")
+    mover = FileMover()
+    try:
+        dst = mover.submit(src, tmp_path / "final").result(timeout=5)
+    finally:
+        mover.close()
+
+    assert dst.read_bytes() == b"data"
+
+
+@pytest.mark.integration
+def test_engine_downloads_into_staging(tmp_path):
+    """Тест движка: загрузка в staging и перенос в итоговую папку."""
+    staging_dir = tmp_path / "staging"
+    final_dir = tmp_path / "final"
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+
+        def download(urls):
+            opts = mock_class.call_args.args[0]
+            assert opts["outtmpl"].startswith(str(staging_subdir(staging_dir, final_dir)))
+            staging_dir.mkdir(exist_ok=True)
+            path = staging_dir / "Video.webm"
+            path.write_bytes(b"video")
+            for hook in opts["post_hooks"]:
+                hook(str(path))
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(download_dir=final_dir, staging_dir=staging_dir)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert (final_dir / "Video.webm").read_bytes() == b"video"
+    assert not (staging_dir / "Video.webm").exists()
+    assert item.filename == str(final_dir / "Video.webm")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("same_filesystem", [True, False])
+def test_move_file_hashes_content(tmp_path, same_filesystem):
+    """Тест хеширования содержимого при переносе."""
+    src = tmp_path / "video.webm"
+    src.write_bytes(b"x" * 1000)
+    hasher = hashlib.sha256()
+
+    with patch.object(staging, "same_filesystem", return_value=same_filesystem):
+        move_file(src, tmp_path / "share", chunk_size=64, hasher=hasher)
+
+    assert hasher.hexdigest() == hashlib.sha256(b"x" * 1000).hexdigest()
+
+
+@pytest.mark.integration
+def test_engine_skips_file_already_in_destination(tmp_path):
+    """Тест движка: видео, уже лежащее в итоговой папке, не скачивается в staging заново."""
+    staging_dir = tmp_path / "staging"
+    final_dir = tmp_path / "final"
+    final_dir.mkdir()
+    (final_dir / "Video.webm").write_bytes(b"old")
+    info = {"extractor_key": "Youtube", "id": "1", "format_id": "22"}
+
+    with patch("yt_dlp.YoutubeDL") as mock_class:
+        instance = MagicMock()
+        mock_class.return_value.__enter__.return_value = instance
+        instance.prepare_filename.return_value = str(staging_subdir(staging_dir, final_dir) / "Video.webm")
+
+        def download(urls):
+            opts = mock_class.call_args.args[0]
+            if opts["match_filter"](info, incomplete=False) is not None:
+                return
+            pytest.fail("видео скачано повторно")
+
+        instance.download.side_effect = download
+        engine = DownloadEngine(download_dir=final_dir, staging_dir=staging_dir)
+        try:
+            (item,) = engine.submit(["https://youtube.com/watch?v=1"])
+            assert item.wait(5)
+        finally:
+            engine.shutdown()
+
+    assert item.state == DONE
+    assert item.files == [str(final_dir / "Video.webm")]
+    assert (final_dir / "Video.webm").read_bytes() == b"old"